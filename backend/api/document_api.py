@@ -3,17 +3,21 @@ Document API endpoints for KRAI Engine
 """
 
 import asyncio
+import json
 import logging
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional
 import uuid
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, BackgroundTasks, Depends
+from fastapi import APIRouter, HTTPException, UploadFile, File, BackgroundTasks, Depends, Response
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
 from production_document_processor import DocumentProcessor, DatabaseManager
+from upload_spool import spool_upload, UploadTooLarge
+from pagination import InvalidCursor, encode_cursor, keyset_page_query
+from content_counters import read_content_counters
 from config.database_config import db_config
 
 # Configure logging
@@ -64,6 +68,7 @@ class ProcessingStats(BaseModel):
     embeddings_generated: int
     errors: int
     uptime: str
+    totals: Optional[Dict[str, int]] = None
 
 # Dependency to get processor instance
 async def get_processor():
@@ -118,10 +123,8 @@ async def upload_document(
         file_id = str(uuid.uuid4())
         file_path = upload_dir / f"{file_id}_{file.filename}"
         
-        # Save uploaded file
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Stream uploaded file to disk in chunks
+        await spool_upload(file, path=file_path)
         
         logger.info(f"🚀 Processing uploaded document: {file.filename}")
         
@@ -152,14 +155,17 @@ async def upload_document(
     
     except HTTPException:
         raise
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"❌ Document upload failed: {e}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 @router.get("/list", response_model=List[DocumentInfo])
 async def list_documents(
+    response: Response,
     limit: int = 50,
-    offset: int = 0,
+    cursor: Optional[str] = None,
     document_type: Optional[str] = None,
     manufacturer: Optional[str] = None,
     processor: DocumentProcessor = Depends(get_processor)
@@ -167,9 +173,12 @@ async def list_documents(
     """
     List documents with optional filtering
     
+    Pages newest first by (created_at, id). When more documents may follow,
+    the X-Next-Cursor response header carries the token for the next page.
+    
     Args:
         limit: Maximum number of documents to return
-        offset: Number of documents to skip
+        cursor: X-Next-Cursor value of the previous page
         document_type: Filter by document type
         manufacturer: Filter by manufacturer
         processor: Document processor instance
@@ -178,8 +187,14 @@ async def list_documents(
         List of document information
     """
     try:
-        # Build query with filters
-        query = """
+        page_query, params = keyset_page_query(limit, cursor, document_type, manufacturer)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        # Details and counts only for the rows of this page
+        query = f"""
+            WITH page AS ({page_query})
             SELECT 
                 d.id,
                 d.file_name,
@@ -190,40 +205,20 @@ async def list_documents(
                 d.total_pages as pages,
                 d.created_at,
                 d.processing_status,
-                COUNT(c.id) as chunks
-            FROM krai_core.documents d
+                (SELECT COUNT(*) FROM krai_intelligence.chunks c
+                 WHERE c.document_id = d.id AND c.manufacturer_id = d.manufacturer_id) as chunks
+            FROM page p
+            JOIN krai_core.documents d ON d.id = p.id
             LEFT JOIN krai_core.manufacturers m ON d.manufacturer_id = m.id
-            LEFT JOIN krai_intelligence.chunks c ON d.id = c.document_id
-            WHERE 1=1
+            ORDER BY p.created_at DESC, p.id DESC
         """
         
-        params = []
-        param_count = 0
-        
-        if document_type:
-            param_count += 1
-            query += f" AND d.document_type = ${param_count}"
-            params.append(document_type)
-        
-        if manufacturer:
-            param_count += 1
-            query += f" AND m.name = ${param_count}"
-            params.append(manufacturer)
-        
-        query += """
-            GROUP BY d.id, m.name
-            ORDER BY d.created_at DESC
-            LIMIT ${} OFFSET ${}
-        """.format(param_count + 1, param_count + 2)
-        
-        params.extend([limit, offset])
-        
         # Execute query
-        results = await processor.db.execute_query(query, tuple(params))
+        rows = await processor.db.execute_query(query, tuple(params))
         
         # Convert to response format
         documents = []
-        for row in results:
+        for row in rows:
             metadata = json.loads(row['metadata']) if row['metadata'] else {}
             
             documents.append(DocumentInfo(
@@ -239,6 +234,9 @@ async def list_documents(
                 processing_status=row['processing_status']
             ))
         
+        if rows and len(rows) == limit:
+            response.headers["X-Next-Cursor"] = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+        
         return documents
     
     except Exception as e:
@@ -280,7 +278,7 @@ async def search_documents(
                 c.section_title,
                 1 - (e.embedding_vector <=> %s) as similarity_score
             FROM krai_intelligence.embeddings e
-            JOIN krai_intelligence.chunks c ON e.chunk_id = c.id
+            JOIN krai_intelligence.chunks c ON e.chunk_id = c.id AND e.manufacturer_id = c.manufacturer_id
             JOIN krai_core.documents d ON c.document_id = d.id
             LEFT JOIN krai_core.manufacturers m ON d.manufacturer_id = m.id
             WHERE 1 - (e.embedding_vector <=> %s) > 0.7
@@ -312,7 +310,7 @@ async def search_documents(
         count_query = """
             SELECT COUNT(*) as total
             FROM krai_intelligence.embeddings e
-            JOIN krai_intelligence.chunks c ON e.chunk_id = c.id
+            JOIN krai_intelligence.chunks c ON e.chunk_id = c.id AND e.manufacturer_id = c.manufacturer_id
             JOIN krai_core.documents d ON c.document_id = d.id
             LEFT JOIN krai_core.manufacturers m ON d.manufacturer_id = m.id
             WHERE 1 - (e.embedding_vector <=> %s) > 0.7
@@ -379,7 +377,7 @@ async def get_document(
                 COUNT(c.id) as chunks
             FROM krai_core.documents d
             LEFT JOIN krai_core.manufacturers m ON d.manufacturer_id = m.id
-            LEFT JOIN krai_intelligence.chunks c ON d.id = c.document_id
+            LEFT JOIN krai_intelligence.chunks c ON d.id = c.document_id AND d.manufacturer_id = c.manufacturer_id
             WHERE d.id = $1
             GROUP BY d.id, m.name
         """
@@ -427,11 +425,11 @@ async def delete_document(
         Success message
     """
     try:
-        # Delete document (CASCADE will handle chunks and embeddings)
-        query = "DELETE FROM krai_core.documents WHERE id = $1"
-        affected_rows = await processor.db.execute_update(query, (document_id,))
+        # Delete document, chunks and embeddings by manufacturer key
+        query = "SELECT krai_core.delete_document($1) AS deleted"
+        results = await processor.db.execute_query(query, (document_id,))
         
-        if affected_rows == 0:
+        if not results or not results[0]['deleted']:
             raise HTTPException(status_code=404, detail="Document not found")
         
         return {"message": "Document deleted successfully"}
@@ -458,6 +456,10 @@ async def get_processing_stats(
     try:
         stats = processor.get_stats()
         
+        # Catalog totals from the trigger-maintained counters (16_content_counters.sql)
+        async with processor.db_pool.acquire() as conn:
+            totals = await read_content_counters(conn)
+        
         # Calculate uptime (simplified)
         uptime = "Unknown"  # In production, you'd track start time
         
@@ -466,7 +468,8 @@ async def get_processing_stats(
             chunks_created=stats['chunks_created'],
             embeddings_generated=stats['embeddings_generated'],
             errors=stats['errors'],
-            uptime=uptime
+            uptime=uptime,
+            totals=totals
         )
     
     except Exception as e:
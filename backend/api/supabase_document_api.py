@@ -10,11 +10,14 @@ from pathlib import Path
 from typing import Dict, List, Optional
 import uuid
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, BackgroundTasks, Depends
+from fastapi import APIRouter, HTTPException, UploadFile, File, BackgroundTasks, Depends, Response
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
 from supabase_document_processor import SupabaseDocumentProcessor
+from upload_spool import spool_upload, UploadTooLarge
+from pagination import InvalidCursor, encode_cursor, keyset_page_query
+from content_counters import read_content_counters
 from config.supabase_config import SupabaseConfig
 
 # Configure logging
@@ -70,6 +73,7 @@ class SupabaseProcessingStats(BaseModel):
     images_processed: int
     errors: int
     uptime: str
+    totals: Optional[Dict[str, int]] = None
 
 # Dependency to get processor instance
 async def get_supabase_processor():
@@ -120,10 +124,8 @@ async def upload_document_to_supabase(
         file_id = str(uuid.uuid4())
         file_path = upload_dir / f"{file_id}_{file.filename}"
         
-        # Save uploaded file
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Stream uploaded file to disk in chunks
+        await spool_upload(file, path=file_path)
         
         logger.info(f"🚀 Processing uploaded document with Supabase: {file.filename}")
         
@@ -156,14 +158,17 @@ async def upload_document_to_supabase(
     
     except HTTPException:
         raise
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"❌ Supabase document upload failed: {e}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 @router.get("/list", response_model=List[SupabaseDocumentInfo])
 async def list_supabase_documents(
+    response: Response,
     limit: int = 50,
-    offset: int = 0,
+    cursor: Optional[str] = None,
     document_type: Optional[str] = None,
     manufacturer: Optional[str] = None,
     processor: SupabaseDocumentProcessor = Depends(get_supabase_processor)
@@ -171,9 +176,12 @@ async def list_supabase_documents(
     """
     List documents with Supabase storage information
     
+    Pages newest first by (created_at, id). When more documents may follow,
+    the X-Next-Cursor response header carries the token for the next page.
+    
     Args:
         limit: Maximum number of documents to return
-        offset: Number of documents to skip
+        cursor: X-Next-Cursor value of the previous page
         document_type: Filter by document type
         manufacturer: Filter by manufacturer
         processor: Supabase document processor instance
@@ -182,8 +190,14 @@ async def list_supabase_documents(
         List of document information with Supabase URLs
     """
     try:
-        # Build query with filters
-        query = """
+        page_query, params = keyset_page_query(limit, cursor, document_type, manufacturer)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        # Details and counts only for the rows of this page
+        query = f"""
+            WITH page AS ({page_query})
             SELECT 
                 d.id,
                 d.file_name,
@@ -195,36 +209,15 @@ async def list_supabase_documents(
                 d.created_at,
                 d.processing_status,
                 d.storage_url,
-                COUNT(DISTINCT c.id) as chunks,
-                COUNT(DISTINCT i.id) as images
-            FROM krai_core.documents d
+                (SELECT COUNT(*) FROM krai_content.images i WHERE i.document_id = d.id) as images,
+                (SELECT COUNT(*) FROM krai_intelligence.chunks c
+                 WHERE c.document_id = d.id AND c.manufacturer_id = d.manufacturer_id) as chunks
+            FROM page p
+            JOIN krai_core.documents d ON d.id = p.id
             LEFT JOIN krai_core.manufacturers m ON d.manufacturer_id = m.id
-            LEFT JOIN krai_intelligence.chunks c ON d.id = c.document_id
-            LEFT JOIN krai_content.images i ON d.id = i.document_id
-            WHERE 1=1
+            ORDER BY p.created_at DESC, p.id DESC
         """
         
-        params = []
-        param_count = 0
-        
-        if document_type:
-            param_count += 1
-            query += f" AND d.document_type = ${param_count}"
-            params.append(document_type)
-        
-        if manufacturer:
-            param_count += 1
-            query += f" AND m.name = ${param_count}"
-            params.append(manufacturer)
-        
-        query += """
-            GROUP BY d.id, m.name, d.storage_url
-            ORDER BY d.created_at DESC
-            LIMIT ${} OFFSET ${}
-        """.format(param_count + 1, param_count + 2)
-        
-        params.extend([limit, offset])
-        
         # Execute query
         async with processor.db_pool.acquire() as conn:
             rows = await conn.fetch(query, *params)
@@ -249,6 +242,9 @@ async def list_supabase_documents(
                 processing_status=row['processing_status']
             ))
         
+        if rows and len(rows) == limit:
+            response.headers["X-Next-Cursor"] = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+        
         return documents
     
     except Exception as e:
@@ -303,7 +299,7 @@ async def search_supabase_documents(
                     ELSE NULL
                 END as images
             FROM krai_intelligence.embeddings e
-            JOIN krai_intelligence.chunks c ON e.chunk_id = c.id
+            JOIN krai_intelligence.chunks c ON e.chunk_id = c.id AND e.manufacturer_id = c.manufacturer_id
             JOIN krai_core.documents d ON c.document_id = d.id
             LEFT JOIN krai_core.manufacturers m ON d.manufacturer_id = m.id
             LEFT JOIN krai_content.images i ON d.id = i.document_id
@@ -345,7 +341,7 @@ async def search_supabase_documents(
         count_query = """
             SELECT COUNT(DISTINCT c.id) as total
             FROM krai_intelligence.embeddings e
-            JOIN krai_intelligence.chunks c ON e.chunk_id = c.id
+            JOIN krai_intelligence.chunks c ON e.chunk_id = c.id AND e.manufacturer_id = c.manufacturer_id
             JOIN krai_core.documents d ON c.document_id = d.id
             LEFT JOIN krai_core.manufacturers m ON d.manufacturer_id = m.id
             WHERE 1 - (e.embedding_vector <=> %s) > 0.7
@@ -415,7 +411,7 @@ async def get_supabase_document(
                 COUNT(DISTINCT i.id) as images
             FROM krai_core.documents d
             LEFT JOIN krai_core.manufacturers m ON d.manufacturer_id = m.id
-            LEFT JOIN krai_intelligence.chunks c ON d.id = c.document_id
+            LEFT JOIN krai_intelligence.chunks c ON d.id = c.document_id AND d.manufacturer_id = c.manufacturer_id
             LEFT JOIN krai_content.images i ON d.id = i.document_id
             WHERE d.id = $1
             GROUP BY d.id, m.name, d.storage_url
@@ -528,12 +524,12 @@ async def delete_supabase_document(
         # Note: In a real implementation, you would also delete files from Supabase storage
         # For now, we only delete from the database
         
-        query = "DELETE FROM krai_core.documents WHERE id = $1"
+        # Deletes chunks and embeddings by manufacturer key (13_content_manufacturer_keys.sql)
+        query = "SELECT krai_core.delete_document($1)"
         async with processor.db_pool.acquire() as conn:
-            result = await conn.execute(query, document_id)
+            deleted = await conn.fetchval(query, document_id)
         
-        # Check if any rows were affected
-        if "DELETE 0" in result:
+        if not deleted:
             raise HTTPException(status_code=404, detail="Document not found")
         
         return {"message": "Document deleted successfully from Supabase"}
@@ -560,6 +556,10 @@ async def get_supabase_processing_stats(
     try:
         stats = processor.get_stats()
         
+        # Catalog totals from the trigger-maintained counters
+        async with processor.db_pool.acquire() as conn:
+            totals = await read_content_counters(conn)
+        
         # Calculate uptime (simplified)
         uptime = "Unknown"  # In production, you'd track start time
         
@@ -569,7 +569,8 @@ async def get_supabase_processing_stats(
             embeddings_generated=stats['embeddings_generated'],
             images_processed=stats['images_processed'],
             errors=stats['errors'],
-            uptime=uptime
+            uptime=uptime,
+            totals=totals
         )
     
     except Exception as e:
@@ -590,24 +591,12 @@ async def get_supabase_storage_info(
         Storage bucket information and statistics
     """
     try:
-        # Get storage statistics
+        # Storage statistics from the trigger-maintained counters (no table scans)
         async with processor.db_pool.acquire() as conn:
-            # Document count
-            doc_count_query = "SELECT COUNT(*) as count FROM krai_core.documents"
-            doc_count_row = await conn.fetchrow(doc_count_query)
-            
-            # Image count
-            image_count_query = "SELECT COUNT(*) as count FROM krai_content.images"
-            image_count_row = await conn.fetchrow(image_count_query)
-            
-            # Total storage size
-            size_query = """
-                SELECT 
-                    SUM(size_bytes) as total_size,
-                    AVG(size_bytes) as avg_size
-                FROM krai_core.documents
-            """
-            size_row = await conn.fetchrow(size_query)
+            totals = await read_content_counters(conn)
+        
+        total_documents = totals.get('documents', 0)
+        total_size = totals.get('document_bytes', 0)
         
         return {
             'storage_buckets': {
@@ -615,10 +604,10 @@ async def get_supabase_storage_info(
                 'images': processor.supabase_config.config['image_bucket']
             },
             'statistics': {
-                'total_documents': doc_count_row['count'],
-                'total_images': image_count_row['count'],
-                'total_size_bytes': size_row['total_size'] or 0,
-                'average_size_bytes': size_row['avg_size'] or 0
+                'total_documents': total_documents,
+                'total_images': totals.get('images', 0),
+                'total_size_bytes': total_size,
+                'average_size_bytes': total_size / total_documents if total_documents else 0
             },
             'supabase_url': processor.supabase_config.supabase_url
         }
@@ -0,0 +1,190 @@
+"""
+Error Code / Part Number Index for KR-AI-Engine
+
+Persists error-code and part-number postings (code -> chunk/page) at
+ingestion so technicians can look codes up without an LLM or vector search.
+Postings live in krai_intelligence.error_codes and
+krai_intelligence.part_number_mentions (hash-indexed on the code).
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from metrics import SQL_DURATION
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Column widths from the schema (error_codes.error_code VARCHAR(20),
+# part_number_mentions.part_number VARCHAR(100))
+MAX_ERROR_CODE_LENGTH = 20
+MAX_PART_NUMBER_LENGTH = 100
+
+def normalize_code(code: str) -> str:
+    """Canonical form used for both postings and lookups"""
+    return code.strip().upper()
+
+class CodeIndex:
+    """Builds, stores and queries error-code and part-number postings"""
+
+    def __init__(self, db_pool, classifier):
+        self.db_pool = db_pool
+        self.classifier = classifier
+
+    def build_postings(self, chunks: List[Dict], manufacturer: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Extract code -> chunk postings from stored chunks using the JSON config patterns"""
+        error_postings: Dict[tuple, Dict[str, Any]] = {}
+        part_postings: Dict[tuple, Dict[str, Any]] = {}
+
+        if not manufacturer or manufacturer == "unknown":
+            return {"error_codes": [], "part_numbers": []}
+
+        for chunk in chunks:
+            if not chunk.get("id"):
+                continue
+
+            for match in self.classifier._extract_error_codes_json(chunk["text"], manufacturer):
+                code = normalize_code(match["code"])
+                if len(code) > MAX_ERROR_CODE_LENGTH:
+                    continue
+                error_postings.setdefault((chunk["id"], code), {
+                    "chunk_id": chunk["id"],
+                    "code": code,
+                    "description": match.get("description"),
+                    "page_number": chunk.get("page_start")
+                })
+
+            for match in self.classifier._extract_part_numbers_json(chunk["text"], manufacturer):
+                part_number = normalize_code(match["part_number"])
+                if len(part_number) > MAX_PART_NUMBER_LENGTH:
+                    continue
+                part_postings.setdefault((chunk["id"], part_number), {
+                    "chunk_id": chunk["id"],
+                    "code": part_number,
+                    "description": match.get("description"),
+                    "page_number": chunk.get("page_start")
+                })
+
+        return {
+            "error_codes": list(error_postings.values()),
+            "part_numbers": list(part_postings.values())
+        }
+
+    async def index_document(self, document_id: str, chunks: List[Dict], manufacturer: str) -> Dict[str, int]:
+        """Bulk-write postings for a document's chunks"""
+        postings = self.build_postings(chunks, manufacturer)
+        if not postings["error_codes"] and not postings["part_numbers"]:
+            return {"error_codes": 0, "part_numbers": 0}
+
+        async with self.db_pool.acquire() as conn:
+            async with conn.transaction():
+                manufacturer_id = await conn.fetchval(
+                    "SELECT manufacturer_id FROM krai_core.documents WHERE id = $1", document_id
+                )
+
+                if postings["error_codes"]:
+                    with SQL_DURATION.time(statement="insert_error_code_postings"), \
+                            tracer.span("db.insert_error_code_postings", rows=len(postings["error_codes"])):
+                        await conn.executemany(
+                            """
+                            INSERT INTO krai_intelligence.error_codes
+                            (chunk_id, document_id, manufacturer_id, error_code, error_description,
+                             page_number, confidence_score, extraction_method)
+                            VALUES ($1, $2, $3, $4, $5, $6, 1.0, 'json_config_patterns')
+                            ON CONFLICT DO NOTHING
+                            """,
+                            [
+                                (p["chunk_id"], document_id, manufacturer_id, p["code"],
+                                 p["description"], p["page_number"])
+                                for p in postings["error_codes"]
+                            ]
+                        )
+
+                if postings["part_numbers"]:
+                    with SQL_DURATION.time(statement="insert_part_number_postings"), \
+                            tracer.span("db.insert_part_number_postings", rows=len(postings["part_numbers"])):
+                        await conn.executemany(
+                            """
+                            INSERT INTO krai_intelligence.part_number_mentions
+                            (chunk_id, document_id, manufacturer_id, part_number, part_description,
+                             page_number, extraction_method)
+                            VALUES ($1, $2, $3, $4, $5, $6, 'json_config_patterns')
+                            ON CONFLICT DO NOTHING
+                            """,
+                            [
+                                (p["chunk_id"], document_id, manufacturer_id, p["code"],
+                                 p["description"], p["page_number"])
+                                for p in postings["part_numbers"]
+                            ]
+                        )
+
+        logger.info(f"🔢 Indexed {len(postings['error_codes'])} error code and "
+                    f"{len(postings['part_numbers'])} part number postings")
+        return {
+            "error_codes": len(postings["error_codes"]),
+            "part_numbers": len(postings["part_numbers"])
+        }
+
+    async def lookup_error_code(self, code: str, manufacturer: Optional[str] = None,
+                                limit: int = 50) -> List[Dict[str, Any]]:
+        """Return the chunks that mention an error code"""
+        return await self._lookup(
+            "krai_intelligence.error_codes", "error_code", "error_description",
+            code, manufacturer, limit
+        )
+
+    async def lookup_part_number(self, part_number: str, manufacturer: Optional[str] = None,
+                                 limit: int = 50) -> List[Dict[str, Any]]:
+        """Return the chunks that mention a part number"""
+        return await self._lookup(
+            "krai_intelligence.part_number_mentions", "part_number", "part_description",
+            part_number, manufacturer, limit
+        )
+
+    async def _lookup(self, table: str, code_column: str, description_column: str,
+                      code: str, manufacturer: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        """Equality probe on the hash-indexed code column"""
+        params: List[Any] = [normalize_code(code)]
+        manufacturer_filter = ""
+        if manufacturer:
+            params.append(manufacturer)
+            manufacturer_filter = f" AND m.name = ${len(params)}"
+        params.append(limit)
+
+        sql = f"""
+            SELECT p.{code_column} AS code,
+                   p.{description_column} AS description,
+                   p.page_number,
+                   p.document_id,
+                   p.chunk_id,
+                   c.text_chunk,
+                   d.filename,
+                   d.document_type,
+                   m.name AS manufacturer
+            FROM {table} p
+            LEFT JOIN krai_intelligence.chunks c ON c.id = p.chunk_id AND c.manufacturer_id = p.manufacturer_id
+            LEFT JOIN krai_core.documents d ON d.id = p.document_id
+            LEFT JOIN krai_core.manufacturers m ON m.id = p.manufacturer_id
+            WHERE p.{code_column} = $1 {manufacturer_filter}
+            ORDER BY p.document_id, p.page_number
+            LIMIT ${len(params)}
+        """
+
+        async with self.db_pool.acquire() as conn:
+            with SQL_DURATION.time(statement="lookup_code_postings"):
+                rows = await conn.fetch(sql, *params)
+
+        return [
+            {
+                "code": row["code"],
+                "description": row["description"],
+                "page_number": row["page_number"],
+                "document_id": str(row["document_id"]) if row["document_id"] else None,
+                "chunk_id": str(row["chunk_id"]) if row["chunk_id"] else None,
+                "content": row["text_chunk"],
+                "filename": row["filename"],
+                "document_type": row["document_type"],
+                "manufacturer": row["manufacturer"]
+            }
+            for row in rows
+        ]
@@ -111,7 +111,9 @@ class ProductionConfig:
                 "model_name": os.getenv("OLLAMA_EMBEDDING_MODEL", "embeddinggemma"),
                 "dimension": 768,
                 "batch_size": self.device_config["batch_size"],
-                "normalize": True
+                "normalize": True,
+                # Matryoshka coarse index on the first N dimensions (256/128), 0 = off
+                "truncate_dimension": int(os.getenv("OLLAMA_EMBEDDING_TRUNCATE_DIM", 0))
             },
             "vision": {
                 "model_name": os.getenv("OLLAMA_VISION_MODEL", "llava:7b"),
@@ -129,27 +131,64 @@ class ProductionConfig:
     
     def _configure_performance(self) -> Dict[str, Any]:
         """Configure performance optimizations"""
-        return {
+        performance = {
             "async_processing": True,
             "concurrent_documents": int(os.getenv("ML_CONCURRENT_DOCUMENTS", 3)),
             "concurrent_chunks": 10,
             "embedding_cache_size": 10000,
             "vector_cache_size": 1000,
             "image_cache_size": 500,
-            "enable_quantization": True,
+            # halfvec | binary: store quantized embedding copies and search them with rescoring
+            "vector_quantization": os.getenv("KRAI_VECTOR_QUANTIZATION", "none").strip().lower() or "none",
+            "rescore_candidates": int(os.getenv("KRAI_RESCORE_CANDIDATES", 200)),
+            # Re-embed chunks whose embedding call failed (pending_embeddings) in the background
+            "embedding_backfill": os.getenv("KRAI_EMBEDDING_BACKFILL", "true").lower() == "true",
+            "backfill_interval": float(os.getenv("KRAI_BACKFILL_INTERVAL", 30)),
+            "backfill_batch_size": int(os.getenv("KRAI_BACKFILL_BATCH_SIZE", 256)),
+            # Online re-embedding when the embedding model changes (embedding_migration.py)
+            "reembed_batch_size": int(os.getenv("KRAI_REEMBED_BATCH_SIZE", 128)),
+            "reembed_rate": float(os.getenv("KRAI_REEMBED_RATE", 50)),
+            "reembed_gc_batch_size": int(os.getenv("KRAI_REEMBED_GC_BATCH_SIZE", 5000)),
+            "reembed_poll_interval": float(os.getenv("KRAI_REEMBED_POLL_INTERVAL", 10)),
+            # Route manufacturer-filtered vector searches to per-scope partial HNSW indexes
+            "scoped_vector_search": os.getenv("KRAI_SCOPED_VECTOR_SEARCH", "true").lower() == "true",
+            "scope_refresh_interval": float(os.getenv("KRAI_SCOPE_REFRESH_INTERVAL", 60)),
+            # Exact recount of krai_system.content_counters (0 disables the job)
+            "counter_reconcile_interval": float(os.getenv("KRAI_COUNTER_RECONCILE_INTERVAL", 3600)),
             "enable_compression": True,
             "enable_caching": True,
             "memory_optimization": True,
             "gpu_memory_fraction": 0.8 if self.device_config["device"] == "cuda" else 1.0
         }
+        performance["enable_quantization"] = performance["vector_quantization"] != "none"
+        return performance
     
     def get_ollama_config(self) -> Dict[str, Any]:
         """Get Ollama-specific configuration"""
+        base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
         return {
-            "base_url": os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
+            "base_url": base_url,
+            # Several hosts: comma-separated, routed by ollama_pool.py (falls back to OLLAMA_BASE_URL)
+            "base_urls": [url.strip() for url in os.getenv("OLLAMA_BASE_URLS", base_url).split(",") if url.strip()],
+            "health_interval": float(os.getenv("OLLAMA_HEALTH_INTERVAL", 15)),
+            "backend_failure_threshold": int(os.getenv("OLLAMA_BACKEND_FAILURE_THRESHOLD", 3)),
             "timeout": int(os.getenv("OLLAMA_TIMEOUT", 300)),
-            "retry_attempts": 3,
-            "retry_delay": 1,
+            "retry_attempts": int(os.getenv("OLLAMA_RETRY_ATTEMPTS", 3)),
+            "retry_delay": float(os.getenv("OLLAMA_RETRY_DELAY", 1)),
+            # Adaptive concurrency (AIMD) and circuit breaker, see ollama_transport.py
+            "max_concurrency": int(os.getenv("OLLAMA_MAX_CONCURRENCY", 8)),
+            "latency_tolerance": float(os.getenv("OLLAMA_LATENCY_TOLERANCE", 2.0)),
+            "breaker_failure_threshold": int(os.getenv("OLLAMA_BREAKER_THRESHOLD", 5)),
+            "breaker_reset_seconds": float(os.getenv("OLLAMA_BREAKER_RESET_SECONDS", 30)),
+            "breaker_max_wait": float(os.getenv("OLLAMA_BREAKER_MAX_WAIT", 300)),
+            # Share of each concurrency limit bulk ingestion keeps while chat/search requests are present
+            "bulk_share": float(os.getenv("OLLAMA_BULK_SHARE", 0.25)),
+            # Model affinity: group calls by model so a single GPU does not reload per call
+            "keep_alive": os.getenv("OLLAMA_KEEP_ALIVE", "30m"),
+            "model_affinity": os.getenv("OLLAMA_MODEL_AFFINITY", "true").lower() == "true",
+            "affinity_linger_seconds": float(os.getenv("OLLAMA_AFFINITY_LINGER_SECONDS", 0.5)),
+            "affinity_max_hold_seconds": float(os.getenv("OLLAMA_AFFINITY_MAX_HOLD_SECONDS", 60)),
+            "preload_models": os.getenv("OLLAMA_PRELOAD_MODELS", "true").lower() == "true",
             "models": {
                 "llm": self.model_config["llm"]["model_name"],
                 "embedding": self.model_config["embedding"]["model_name"],
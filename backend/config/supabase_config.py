@@ -9,6 +9,8 @@ from typing import Dict, Optional
 from pathlib import Path
 from dotenv import load_dotenv
 
+from tracing import tracer
+
 # Load environment variables from .env file
 load_dotenv(Path(__file__).parent.parent.parent / '.env')
 
@@ -121,32 +123,37 @@ class SupabaseStorage:
                 'Content-Type': content_type
             }
             
-            async with httpx.AsyncClient() as client:
-                # First check if file already exists
-                check_url = f"{self.storage_url}/object/{bucket_name}/{unique_filename}"
-                check_response = await client.head(check_url, headers={'Authorization': f'Bearer {self.config.supabase_service_key}'})
+            with tracer.span("storage.upload", bucket=bucket_name, bytes=len(file_content)) as span:
+                async with httpx.AsyncClient() as client:
+                    # First check if file already exists
+                    check_url = f"{self.storage_url}/object/{bucket_name}/{unique_filename}"
+                    check_response = await client.head(check_url, headers={'Authorization': f'Bearer {self.config.supabase_service_key}'})
                 
-                if check_response.status_code == 200:
-                    # File already exists, return existing URL
-                    storage_url = f"{self.config.supabase_url}/storage/v1/object/{bucket_name}/{unique_filename}"
-                    print(f"⏭️ File already exists: {unique_filename}")
-                    return storage_url
+                    if check_response.status_code == 200:
+                        if span:
+                            span.set_attribute("deduplicated", True)
+                        # File already exists, return existing URL
+                        storage_url = f"{self.config.supabase_url}/storage/v1/object/{bucket_name}/{unique_filename}"
+                        print(f"⏭️ File already exists: {unique_filename}")
+                        return storage_url
                 
-                # File doesn't exist, upload it
-                response = await client.post(
-                    upload_url,
-                    headers=headers,
-                    content=file_content
-                )
+                    # File doesn't exist, upload it
+                    response = await client.post(
+                        upload_url,
+                        headers=headers,
+                        content=file_content
+                    )
+                    if span:
+                        span.set_attribute("http_status", response.status_code)
                 
-                if response.status_code in [200, 201]:
-                    # Return storage URL (not public since buckets are private)
-                    storage_url = f"{self.config.supabase_url}/storage/v1/object/{bucket_name}/{unique_filename}"
-                    print(f"✅ Uploaded file: {unique_filename}")
-                    return storage_url
-                else:
-                    print(f"❌ Upload failed: {response.status_code} - {response.text}")
-                    return None
+                    if response.status_code in [200, 201]:
+                        # Return storage URL (not public since buckets are private)
+                        storage_url = f"{self.config.supabase_url}/storage/v1/object/{bucket_name}/{unique_filename}"
+                        print(f"✅ Uploaded file: {unique_filename}")
+                        return storage_url
+                    else:
+                        print(f"❌ Upload failed: {response.status_code} - {response.text}")
+                        return None
         
         except Exception as e:
             print(f"❌ Error uploading file: {e}")
@@ -0,0 +1,113 @@
+# KRAI Engine - Content Counters
+# O(1) catalog totals from krai_system.content_counters and the job that corrects their drift
+
+"""
+Row counts of documents, images, chunks and embeddings and the summed
+document size are maintained by statement-level triggers in the writing
+transaction (16_content_counters.sql). Stats endpoints read them with
+read_content_counters instead of COUNT(*) over the tables.
+
+ContentCounterReconciler recounts each counter every interval seconds, one
+counter per transaction, and records the drift it corrected; a non-zero
+drift means something bypassed the triggers (a direct partition write,
+session_replication_role = replica, a restore). Every API worker runs one:
+a transaction-scoped advisory lock per counter lets only one of them
+recount at a time, and a counter reconciled within the last interval is
+skipped, so the table is counted once per interval, not once per worker.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from metrics import CONTENT_COUNTER_DRIFT, SQL_DURATION
+
+logger = logging.getLogger(__name__)
+
+CONTENT_COUNTERS = ("documents", "document_bytes", "images", "chunks", "embeddings")
+
+# Advisory lock key (namespace, counter) serialising reconciliation across workers
+RECONCILE_LOCK_SQL = "SELECT pg_try_advisory_xact_lock(hashtext('krai_content_counters'), hashtext($1))"
+
+async def read_content_counters(conn) -> Dict[str, int]:
+    """Current value of every counter (sums at most 16 slot rows each)"""
+    with SQL_DURATION.time(statement="read_content_counters"):
+        rows = await conn.fetch("SELECT name, value FROM krai_system.content_counter_totals")
+    return {row["name"]: row["value"] for row in rows}
+
+class ContentCounterReconciler:
+    """Periodically recounts krai_system.content_counters exactly"""
+
+    def __init__(self, db_pool, interval: float = 3600.0):
+        self.db_pool = db_pool
+        self.interval = interval
+        self.last_run_at: Optional[float] = None
+        self.last_drift: Dict[str, int] = {}
+        self.last_skipped: List[str] = []
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"🧮 Content counter reconciliation started (every {self.interval:.0f}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.error(f"❌ Content counter reconciliation failed: {e}")
+
+    async def run_once(self) -> Dict[str, int]:
+        """Reconcile every counter no other worker is handling; returns the drift per reconciled counter"""
+        drift = {}
+        skipped = []
+        async with self.db_pool.acquire() as conn:
+            for counter in CONTENT_COUNTERS:
+                # Writers to the counted table wait while it is recounted; one short transaction each
+                async with conn.transaction():
+                    if not await conn.fetchval(RECONCILE_LOCK_SQL, counter):
+                        skipped.append(counter)
+                        continue
+                    # Another worker finished this counter within the current interval
+                    recent = await conn.fetchval(
+                        "SELECT MIN(reconciled_at) > NOW() - make_interval(secs => $2) "
+                        "FROM krai_system.content_counters WHERE name = $1",
+                        counter, self.interval * 0.9)
+                    if recent:
+                        skipped.append(counter)
+                        continue
+                    with SQL_DURATION.time(statement="reconcile_content_counter"):
+                        drift[counter] = await conn.fetchval("SELECT krai_system.reconcile_content_counter($1)", counter)
+                if drift[counter]:
+                    CONTENT_COUNTER_DRIFT.inc(abs(drift[counter]), counter=counter)
+                    logger.warning(f"⚠️ Content counter '{counter}' drifted by {drift[counter]:+d}, corrected")
+        self.last_drift = drift
+        self.last_skipped = skipped
+        self.last_run_at = time.time()
+        self.last_error = None
+        return drift
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "interval_seconds": self.interval,
+            "last_run_at": self.last_run_at,
+            "last_drift": self.last_drift,
+            "last_skipped": self.last_skipped,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,250 @@
+# KRAI Engine - Embedding Backfill
+# Pending-embedding queue and the background worker that re-embeds it
+
+"""
+A chunk whose embedding call fails is not stored with a placeholder vector
+(a zero vector would poison cosine search and the HNSW index). Instead it is
+recorded in krai_intelligence.pending_embeddings (10_embedding_backfill.sql)
+and EmbeddingBackfillWorker re-embeds the queue in large batches:
+
+- Only while the Ollama circuit breaker is closed and a healthy host serves
+  the embedding model; otherwise it sleeps for interval seconds.
+- Batches are leased with FOR UPDATE SKIP LOCKED and a lease timestamp, so
+  several API workers can run it side by side and a crashed worker's batch
+  becomes due again.
+- Embeddings go through the bulk lane of the shared transport, behind
+  interactive traffic; failed chunks back off exponentially per row.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from metrics import EMBEDDING_BACKFILL, EMBEDDINGS_PENDING, SQL_DURATION
+from vector_quantization import QuantizationMode, insert_columns, l2_normalize, vector_literal
+
+logger = logging.getLogger(__name__)
+
+# (texts, model) -> one embedding per text, None where the call failed
+EmbedFunction = Callable[[List[str], str], Awaitable[List[Optional[List[float]]]]]
+
+async def store_embeddings(conn, chunk_ids: Sequence[Any], vectors: Sequence[List[float]], model_name: str,
+                           quantization: QuantizationMode = QuantizationMode.NONE,
+                           model_version: str = "latest") -> List[Any]:
+    """Insert embeddings in one statement; skips chunks that already have one for the model. Returns the new ids
+
+    The manufacturer key and document_type are taken from the chunk's document.
+    """
+    if not chunk_ids:
+        return []
+    if quantization.quantized:
+        vectors = [l2_normalize(vector) for vector in vectors]
+    quantized_columns, quantized_values = insert_columns(quantization, vector_param="v.embedding")
+    with SQL_DURATION.time(statement="insert_embeddings"):
+        rows = await conn.fetch(
+            f"""
+            INSERT INTO krai_intelligence.embeddings
+            (chunk_id, manufacturer_id, document_type, embedding, model_name, model_version,
+             created_at{quantized_columns})
+            SELECT v.chunk_id, c.manufacturer_id, d.document_type, v.embedding::vector, $3, $4,
+                   NOW(){quantized_values}
+            FROM unnest($1::uuid[], $2::text[]) AS v(chunk_id, embedding)
+            JOIN krai_intelligence.chunks c ON c.id = v.chunk_id
+            JOIN krai_core.documents d ON d.id = c.document_id
+            WHERE NOT EXISTS (
+                SELECT 1 FROM krai_intelligence.embeddings e
+                WHERE e.chunk_id = v.chunk_id AND e.manufacturer_id = c.manufacturer_id AND e.model_name = $3
+            )
+            RETURNING id
+            """,
+            list(chunk_ids), [vector_literal(vector) for vector in vectors], model_name, model_version
+        )
+    return [row["id"] for row in rows]
+
+async def record_pending(conn, chunk_ids: Sequence[Any], model_name: str, error: Optional[str]):
+    """Queue chunks for the backfill worker (a chunk already queued keeps its attempt count)"""
+    if not chunk_ids:
+        return
+    with SQL_DURATION.time(statement="record_pending_embeddings"):
+        await conn.executemany(
+            """
+            INSERT INTO krai_intelligence.pending_embeddings (chunk_id, model_name, last_error)
+            VALUES ($1, $2, $3)
+            ON CONFLICT (chunk_id, model_name) DO UPDATE SET last_error = EXCLUDED.last_error
+            """,
+            [(chunk_id, model_name, error) for chunk_id in chunk_ids]
+        )
+
+async def clear_pending(conn, chunk_ids: Sequence[Any], model_name: str):
+    if not chunk_ids:
+        return
+    with SQL_DURATION.time(statement="clear_pending_embeddings"):
+        await conn.execute(
+            """
+            DELETE FROM krai_intelligence.pending_embeddings
+            WHERE model_name = $1 AND chunk_id = ANY($2::uuid[])
+            """,
+            model_name, list(chunk_ids)
+        )
+
+class EmbeddingBackfillWorker:
+    """Re-embeds krai_intelligence.pending_embeddings while Ollama is healthy"""
+
+    def __init__(self, db_pool, transport, embed: EmbedFunction, model_name: str,
+                 quantization: QuantizationMode = QuantizationMode.NONE, interval: float = 30.0,
+                 batch_size: int = 256, lease_seconds: float = 600.0, max_backoff_seconds: float = 3600.0):
+        self.db_pool = db_pool
+        self.transport = transport
+        self.embed = embed
+        self.model_name = model_name
+        self.model_version = "latest"
+        self.quantization = quantization
+        self.interval = interval
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.pending: Optional[int] = None
+        self.last_batch_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.stats = {"batches": 0, "embedded": 0, "failed": 0, "skipped_unhealthy": 0}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def backend_healthy(self) -> bool:
+        if self.transport.breaker.state != "closed":
+            return False
+        return any(backend.healthy and backend.serves(self.model_name) for backend in self.transport.pool.backends)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"🩹 Embedding backfill worker started (batch {self.batch_size}, every {self.interval:.0f}s)")
+
+    def wake(self):
+        """Run the next pass now instead of after interval"""
+        self._wake.set()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                drained = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.error(f"❌ Embedding backfill pass failed: {e}")
+                drained = True
+            if drained:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+    async def count_pending(self, model: Optional[str] = None) -> int:
+        model = model or self.model_name
+        async with self.db_pool.acquire() as conn:
+            with SQL_DURATION.time(statement="count_pending_embeddings"):
+                self.pending = await conn.fetchval(
+                    "SELECT COUNT(*) FROM krai_intelligence.pending_embeddings WHERE model_name = $1",
+                    model
+                )
+        EMBEDDINGS_PENDING.set(self.pending, model=model)
+        return self.pending
+
+    async def _lease(self, model: str) -> List[Any]:
+        async with self.db_pool.acquire() as conn:
+            with SQL_DURATION.time(statement="lease_pending_embeddings"):
+                return await conn.fetch(
+                    """
+                    WITH due AS (
+                        SELECT chunk_id, manufacturer_id
+                        FROM krai_intelligence.pending_embeddings
+                        WHERE model_name = $1 AND next_attempt_at <= NOW()
+                        ORDER BY next_attempt_at
+                        LIMIT $2
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    UPDATE krai_intelligence.pending_embeddings p
+                    SET attempts = p.attempts + 1,
+                        next_attempt_at = NOW() + make_interval(secs => $3)
+                    FROM due
+                    JOIN krai_intelligence.chunks c ON c.id = due.chunk_id AND c.manufacturer_id = due.manufacturer_id
+                    WHERE p.chunk_id = due.chunk_id AND p.model_name = $1
+                    RETURNING p.chunk_id, c.text_chunk
+                    """,
+                    model, self.batch_size, self.lease_seconds
+                )
+
+    async def run_once(self) -> bool:
+        """One batch; returns True when there is nothing more to do right now"""
+        # A migration cut-over may switch model_name while the batch is in flight
+        model, version = self.model_name, self.model_version
+        if not await self.count_pending(model):
+            return True
+        if not self.backend_healthy():
+            self.stats["skipped_unhealthy"] += 1
+            return True
+
+        leased = await self._lease(model)
+        if not leased:
+            return True
+
+        started = time.perf_counter()
+        vectors = await self.embed([row["text_chunk"] for row in leased], model)
+        succeeded = [(row["chunk_id"], vector) for row, vector in zip(leased, vectors) if vector]
+        failed = [row["chunk_id"] for row, vector in zip(leased, vectors) if not vector]
+
+        async with self.db_pool.acquire() as conn:
+            async with conn.transaction():
+                await store_embeddings(conn, [chunk_id for chunk_id, _ in succeeded],
+                                       [vector for _, vector in succeeded], model, self.quantization, version)
+                await clear_pending(conn, [chunk_id for chunk_id, _ in succeeded], model)
+                if failed:
+                    error = self.transport.breaker.last_error or "embedding failed"
+                    with SQL_DURATION.time(statement="backoff_pending_embeddings"):
+                        await conn.execute(
+                            """
+                            UPDATE krai_intelligence.pending_embeddings
+                            SET last_error = $3,
+                                next_attempt_at = NOW() + make_interval(secs => LEAST($4 * power(2, attempts - 1), $5))
+                            WHERE model_name = $1 AND chunk_id = ANY($2::uuid[])
+                            """,
+                            model, failed, error, self.interval, self.max_backoff_seconds
+                        )
+
+        self.stats["batches"] += 1
+        self.stats["embedded"] += len(succeeded)
+        self.stats["failed"] += len(failed)
+        self.last_batch_at = time.time()
+        EMBEDDING_BACKFILL.inc(len(succeeded), status="embedded")
+        if failed:
+            EMBEDDING_BACKFILL.inc(len(failed), status="failed")
+        logger.info(f"🩹 Backfilled {len(succeeded)}/{len(leased)} embeddings "
+                    f"in {time.perf_counter() - started:.1f}s ({self.pending - len(succeeded)} pending)")
+
+        # A full, clean batch means more may be due: go again without waiting
+        return bool(failed) or len(leased) < self.batch_size
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "model": self.model_name,
+            "pending": self.pending,
+            "backend_healthy": self.backend_healthy(),
+            "batch_size": self.batch_size,
+            "interval_seconds": self.interval,
+            "last_batch_at": self.last_batch_at,
+            "last_error": self.last_error,
+            **self.stats,
+        }
@@ -0,0 +1,453 @@
+# KRAI Engine - Embedding Migration
+# Online re-embedding of stored chunks when the embedding model changes
+
+"""
+Moving to another embedding model does not reprocess any PDF: the text of
+krai_intelligence.chunks is re-embedded into rows of the new model while
+search keeps serving the old one (11_embedding_migrations.sql):
+
+1. running: a keyset pass over chunks (ordered by id) embeds batch_size
+   chunks at a time through the bulk lane, at most `rate` chunks per second
+   and only while Ollama is healthy. A catch-up pass then embeds chunks
+   added or missed meanwhile (those that fail go to pending_embeddings).
+2. Cut-over: one UPDATE sets status = 'collecting'. Every API worker polls
+   the table and switches search, ingestion and the backfill worker to the
+   new model within poll_interval.
+3. collecting: after a grace period (so no worker still writes or searches
+   the old model) the old rows are deleted gc_batch_size at a time.
+
+One worker holds a lease on the migration row and drives it; any worker can
+report progress from the row.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from embedding_backfill import record_pending, store_embeddings
+from metrics import EMBEDDING_MIGRATION_CHUNKS, SQL_DURATION
+from status_backends import worker_id
+from vector_quantization import QuantizationMode
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("running", "collecting", "cancelling")
+
+ModelEmbedFunction = Callable[[List[str], str], Awaitable[List[Optional[List[float]]]]]
+
+class MigrationConflict(Exception):
+    """Another migration is active, or the request does not apply to the current one"""
+
+async def active_embedding_model(conn) -> Optional[Tuple[str, str]]:
+    """(model, version) of the last migration that was cut over, None if there was none"""
+    row = await conn.fetchrow(
+        """
+        SELECT target_model, target_version
+        FROM krai_intelligence.embedding_migrations
+        WHERE status IN ('collecting', 'completed')
+        ORDER BY cut_over_at DESC
+        LIMIT 1
+        """
+    )
+    return (row["target_model"], row["target_version"]) if row else None
+
+def _affected_rows(status: str) -> int:
+    # asyncpg returns the command tag, e.g. "DELETE 5000"
+    return int(status.split()[-1]) if status and status.split()[-1].isdigit() else 0
+
+class EmbeddingMigrator:
+    """Drives krai_intelligence.embedding_migrations"""
+
+    def __init__(self, db_pool, transport, embed: ModelEmbedFunction,
+                 current_model: Callable[[], Tuple[str, str]], on_cutover: Callable[[str, str], None],
+                 quantization: QuantizationMode = QuantizationMode.NONE, dimension: int = 768,
+                 batch_size: int = 128, rate: float = 50.0, gc_batch_size: int = 5000,
+                 poll_interval: float = 10.0):
+        self.db_pool = db_pool
+        self.transport = transport
+        self.embed = embed
+        self.current_model = current_model
+        self.on_cutover = on_cutover
+        self.quantization = quantization
+        self.dimension = dimension
+        self.batch_size = batch_size
+        self.rate = rate
+        self.gc_batch_size = gc_batch_size
+        self.poll_interval = poll_interval
+        # Workers switch within one poll; old rows stay until all of them have
+        self.cutover_grace_seconds = poll_interval * 3
+        self.lease_seconds = max(poll_interval * 6, 60.0)
+        self.worker_id = worker_id()
+        self.phase: Optional[str] = None
+        self._recent: Deque[Tuple[float, int]] = deque()
+        self._gc_caught_up: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            busy = False
+            try:
+                await self.sync_active_model()
+                busy = await self.step()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Embedding migration step failed: {e}")
+                await self._set_error(f"{type(e).__name__}: {e}")
+            if not busy:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+    async def sync_active_model(self):
+        """Follow a cut-over made by any worker"""
+        async with self.db_pool.acquire() as conn:
+            active = await active_embedding_model(conn)
+        if active and active != self.current_model():
+            logger.info(f"🔁 Embedding model switched to {active[0]} ({active[1]})")
+            self.on_cutover(*active)
+
+    # -- API ---------------------------------------------------------------
+
+    async def start_migration(self, target_model: str, target_version: str = "latest") -> Dict[str, Any]:
+        source_model, source_version = self.current_model()
+        # Rows are told apart by model_name, so a new version needs a distinct model name
+        if target_model == source_model:
+            raise MigrationConflict(f"{target_model} is already the active embedding model")
+        async with self.db_pool.acquire() as conn:
+            async with conn.transaction():
+                active = await conn.fetchval(
+                    "SELECT id FROM krai_intelligence.embedding_migrations WHERE status = ANY($1::text[])",
+                    list(ACTIVE_STATUSES)
+                )
+                if active:
+                    raise MigrationConflict(f"Embedding migration {active} is still active")
+                total = await conn.fetchval("SELECT COUNT(*) FROM krai_intelligence.chunks")
+                migration_id = await conn.fetchval(
+                    """
+                    INSERT INTO krai_intelligence.embedding_migrations
+                    (source_model, source_version, target_model, target_version, total_chunks)
+                    VALUES ($1, $2, $3, $4, $5)
+                    RETURNING id
+                    """,
+                    source_model, source_version, target_model, target_version, total
+                )
+        logger.info(f"🔁 Embedding migration {migration_id}: {source_model} -> {target_model} ({total} chunks)")
+        self._recent.clear()
+        self._wake.set()
+        return await self.status()
+
+    async def cancel(self) -> Dict[str, Any]:
+        """Cancel before the cut-over; the new model's rows are then deleted in batches"""
+        async with self.db_pool.acquire() as conn:
+            cancelled = await conn.fetchval(
+                """
+                UPDATE krai_intelligence.embedding_migrations
+                SET status = 'cancelling', updated_at = NOW()
+                WHERE status = 'running'
+                RETURNING id
+                """
+            )
+        if not cancelled:
+            raise MigrationConflict("No embedding migration is running (a cut-over migration cannot be cancelled)")
+        self._wake.set()
+        return await self.status()
+
+    async def status(self) -> Optional[Dict[str, Any]]:
+        """Latest migration with progress, throughput and ETA"""
+        async with self.db_pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT *, EXTRACT(EPOCH FROM (COALESCE(cut_over_at, NOW()) - started_at)) AS elapsed_seconds
+                FROM krai_intelligence.embedding_migrations
+                ORDER BY id DESC
+                LIMIT 1
+                """
+            )
+        if row is None:
+            return None
+
+        # Failed chunks count as processed: they wait in pending_embeddings for the backfill worker
+        processed = row["migrated_chunks"] + row["failed_chunks"]
+        total = max(row["total_chunks"], processed)
+        remaining = max(total - processed, 0)
+        elapsed = float(row["elapsed_seconds"] or 0)
+        average = processed / elapsed if elapsed > 0 else None
+        throughput = row["chunks_per_second"] or average
+        eta = None
+        if row["status"] == "running":
+            eta = round(remaining / throughput, 1) if throughput else None
+        elif row["status"] == "collecting":
+            eta = 0.0
+        return {
+            "id": row["id"],
+            "source_model": row["source_model"],
+            "source_version": row["source_version"],
+            "target_model": row["target_model"],
+            "target_version": row["target_version"],
+            "status": row["status"],
+            "phase": self.phase if row["worker_id"] == self.worker_id else None,
+            "total_chunks": total,
+            "migrated_chunks": row["migrated_chunks"],
+            "failed_chunks": row["failed_chunks"],
+            "progress_percent": round(100.0 * processed / total, 1) if total else 100.0,
+            "throughput_chunks_per_second": round(throughput, 1) if throughput else None,
+            "average_chunks_per_second": round(average, 1) if average else None,
+            "eta_seconds": eta,
+            "gc_deleted": row["gc_deleted"],
+            "rate_limit_chunks_per_second": self.rate,
+            "worker_id": row["worker_id"],
+            "started_at": row["started_at"].isoformat() if row["started_at"] else None,
+            "cut_over_at": row["cut_over_at"].isoformat() if row["cut_over_at"] else None,
+            "completed_at": row["completed_at"].isoformat() if row["completed_at"] else None,
+            "last_error": row["last_error"],
+        }
+
+    # -- job ---------------------------------------------------------------
+
+    async def _claim(self) -> Optional[Any]:
+        """Active migration if this worker holds (or took over) its lease"""
+        async with self.db_pool.acquire() as conn:
+            return await conn.fetchrow(
+                """
+                UPDATE krai_intelligence.embedding_migrations
+                SET worker_id = $2, lease_until = NOW() + make_interval(secs => $3)
+                WHERE status = ANY($1::text[])
+                  AND (worker_id IS NULL OR worker_id = $2 OR lease_until < NOW())
+                RETURNING *, EXTRACT(EPOCH FROM (NOW() - cut_over_at)) AS since_cutover
+                """,
+                list(ACTIVE_STATUSES), self.worker_id, self.lease_seconds
+            )
+
+    async def step(self) -> bool:
+        """One batch of the active migration; returns True when more work is ready right away"""
+        migration = await self._claim()
+        if migration is None:
+            self.phase = None
+            return False
+        if migration["status"] == "running":
+            return await self._migrate(migration)
+        if migration["status"] == "collecting":
+            if migration["since_cutover"] < self.cutover_grace_seconds:
+                self.phase = "cutover_grace"
+                return False
+            return await self._collect(migration, migration["source_model"], "completed")
+        return await self._collect(migration, migration["target_model"], "cancelled")
+
+    def _ollama_ready(self, model: str) -> bool:
+        return self.transport.breaker.state == "closed" and \
+            any(backend.healthy and backend.serves(model) for backend in self.transport.pool.backends)
+
+    async def _next_batch(self, migration) -> List[Any]:
+        async with self.db_pool.acquire() as conn:
+            if not migration["pass_complete"]:
+                with SQL_DURATION.time(statement="migration_next_chunks"):
+                    rows = await conn.fetch(
+                        """
+                        SELECT id, text_chunk FROM krai_intelligence.chunks
+                        WHERE $1::uuid IS NULL OR id > $1
+                        ORDER BY id
+                        LIMIT $2
+                        """,
+                        migration["chunk_cursor"], self.batch_size
+                    )
+                if rows:
+                    self.phase = "first_pass"
+                    return rows
+                await conn.execute(
+                    "UPDATE krai_intelligence.embedding_migrations SET pass_complete = TRUE WHERE id = $1",
+                    migration["id"]
+                )
+            self.phase = "catch_up"
+            return await self._missing_chunks(conn, migration["target_model"])
+
+    async def _missing_chunks(self, conn, model: str) -> List[Any]:
+        """Chunks without a row (or a pending entry) for `model`: ingested meanwhile or missed"""
+        with SQL_DURATION.time(statement="migration_missing_chunks"):
+            return await conn.fetch(
+                """
+                SELECT c.id, c.text_chunk FROM krai_intelligence.chunks c
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM krai_intelligence.embeddings e
+                    WHERE e.chunk_id = c.id AND e.model_name = $1
+                ) AND NOT EXISTS (
+                    SELECT 1 FROM krai_intelligence.pending_embeddings p
+                    WHERE p.chunk_id = c.id AND p.model_name = $1
+                )
+                LIMIT $2
+                """,
+                model, self.batch_size
+            )
+
+    async def _embed_batch(self, migration, rows: List[Any], advance_cursor: bool) -> bool:
+        """Embed and store `rows` as the target model; False when the migration had to fail"""
+        started = time.monotonic()
+        model, version = migration["target_model"], migration["target_version"]
+        vectors = await self.embed([row["text_chunk"] for row in rows], model)
+        embedded = [(row["id"], vector) for row, vector in zip(rows, vectors) if vector]
+        failed = [row["id"] for row, vector in zip(rows, vectors) if not vector]
+
+        if embedded and len(embedded[0][1]) != self.dimension:
+            await self._finish(migration["id"], "failed",
+                               f"{model} returns {len(embedded[0][1])} dimensions, the embeddings table stores {self.dimension}")
+            return False
+
+        async with self.db_pool.acquire() as conn:
+            async with conn.transaction():
+                await store_embeddings(conn, [chunk_id for chunk_id, _ in embedded],
+                                       [vector for _, vector in embedded], model, self.quantization, version)
+                await record_pending(conn, failed, model, self.transport.breaker.last_error)
+                await conn.execute(
+                    """
+                    UPDATE krai_intelligence.embedding_migrations
+                    SET migrated_chunks = migrated_chunks + $2,
+                        failed_chunks = failed_chunks + $3,
+                        chunk_cursor = CASE WHEN $4 THEN $5::uuid ELSE chunk_cursor END,
+                        chunks_per_second = $6,
+                        updated_at = NOW()
+                    WHERE id = $1
+                    """,
+                    migration["id"], len(embedded), len(failed), advance_cursor, rows[-1]["id"],
+                    self._throughput(len(rows))
+                )
+        EMBEDDING_MIGRATION_CHUNKS.inc(len(embedded), operation="embedded")
+        if failed:
+            EMBEDDING_MIGRATION_CHUNKS.inc(len(failed), operation="failed")
+
+        # Throttle: at most `rate` chunks per second on average
+        if self.rate > 0:
+            await asyncio.sleep(max(len(rows) / self.rate - (time.monotonic() - started), 0.0))
+        return True
+
+    def _throughput(self, count: int) -> float:
+        """Chunks per second over the last minute"""
+        now = time.monotonic()
+        self._recent.append((now, count))
+        while len(self._recent) > 1 and now - self._recent[0][0] > 60:
+            self._recent.popleft()
+        span = now - self._recent[0][0]
+        if span <= 0:
+            return 0.0
+        # The oldest entry marks the window start, its chunks were done before it
+        return sum(n for _, n in list(self._recent)[1:]) / span
+
+    async def _migrate(self, migration) -> bool:
+        if not self._ollama_ready(migration["target_model"]):
+            self.phase = "waiting_for_ollama"
+            return False
+        rows = await self._next_batch(migration)
+        if rows:
+            return await self._embed_batch(migration, rows, advance_cursor=self.phase == "first_pass")
+        await self._cut_over(migration)
+        return True
+
+    async def _cut_over(self, migration):
+        async with self.db_pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE krai_intelligence.embedding_migrations
+                SET status = 'collecting', cut_over_at = NOW(), updated_at = NOW(),
+                    total_chunks = GREATEST(total_chunks, migrated_chunks + failed_chunks)
+                WHERE id = $1 AND status = 'running'
+                """,
+                migration["id"]
+            )
+        logger.info(f"🔀 Embedding migration {migration['id']} cut over to {migration['target_model']}")
+        self.on_cutover(migration["target_model"], migration["target_version"])
+        self._gc_caught_up = None
+
+    async def _collect(self, migration, model: str, final_status: str) -> bool:
+        """Delete `model`'s rows in batches; after a cut-over, first embed chunks still only on the old model"""
+        if final_status == "completed" and self._gc_caught_up != migration["id"]:
+            if not self._ollama_ready(migration["target_model"]):
+                self.phase = "waiting_for_ollama"
+                return False
+            async with self.db_pool.acquire() as conn:
+                rows = await self._missing_chunks(conn, migration["target_model"])
+            if rows:
+                self.phase = "catch_up"
+                return await self._embed_batch(migration, rows, advance_cursor=False)
+            self._gc_caught_up = migration["id"]
+
+        self.phase = "garbage_collection"
+        async with self.db_pool.acquire() as conn:
+            with SQL_DURATION.time(statement="migration_gc"):
+                deleted = _affected_rows(await conn.execute(
+                    """
+                    DELETE FROM krai_intelligence.embeddings
+                    WHERE id IN (
+                        SELECT id FROM krai_intelligence.embeddings
+                        WHERE model_name = $1
+                        LIMIT $2
+                    )
+                    """,
+                    model, self.gc_batch_size
+                ))
+            if deleted:
+                await conn.execute(
+                    """
+                    UPDATE krai_intelligence.embedding_migrations
+                    SET gc_deleted = gc_deleted + $2, updated_at = NOW()
+                    WHERE id = $1
+                    """,
+                    migration["id"], deleted
+                )
+                EMBEDDING_MIGRATION_CHUNKS.inc(deleted, operation="deleted")
+                # Leave room for search and ingestion between batches
+                await asyncio.sleep(0.1)
+                return True
+            await conn.execute("DELETE FROM krai_intelligence.pending_embeddings WHERE model_name = $1", model)
+
+        await self._finish(migration["id"], final_status)
+        logger.info(f"✅ Embedding migration {migration['id']} {final_status} "
+                    f"({migration['gc_deleted']} {model} rows deleted)")
+        return False
+
+    async def _finish(self, migration_id: int, status: str, error: Optional[str] = None):
+        async with self.db_pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE krai_intelligence.embedding_migrations
+                SET status = $2, last_error = COALESCE($3, last_error),
+                    completed_at = NOW(), updated_at = NOW(), worker_id = NULL, lease_until = NULL
+                WHERE id = $1
+                """,
+                migration_id, status, error
+            )
+        if error:
+            logger.error(f"❌ Embedding migration {migration_id} failed: {error}")
+        self.phase = None
+
+    async def _set_error(self, error: str):
+        try:
+            async with self.db_pool.acquire() as conn:
+                await conn.execute(
+                    """
+                    UPDATE krai_intelligence.embedding_migrations
+                    SET last_error = $2, updated_at = NOW()
+                    WHERE worker_id = $1 AND status = ANY($3::text[])
+                    """,
+                    self.worker_id, error, list(ACTIVE_STATUSES)
+                )
+        except Exception:
+            pass
@@ -0,0 +1,583 @@
+"""
+Hybrid Search for KR-AI-Engine
+
+Combines PostgreSQL full-text search (idx_chunks_text_fts) with pgvector
+ANN search (idx_embeddings_vector_hnsw) using reciprocal-rank fusion.
+With a quantized vector mode or a Matryoshka coarse dimension the ANN leg
+walks the smaller halfvec, binary or truncated-prefix HNSW index instead and
+rescores its candidates at full precision.
+Vector searches filtered to a manufacturer (and document type) are routed to
+that scope's partial HNSW index, or searched exactly when the scope is small
+(12_filtered_vector_indexes.sql), instead of post-filtering the global index.
+Chunks carry their document's manufacturer_id (13_content_manufacturer_keys.sql):
+every query joins them on (id, manufacturer_id) and manufacturer filters also
+bind manufacturer_id, so once the tables are partitioned by manufacturer
+(14_partitioned_content.sql) the planner prunes to the requested partitions.
+Queries containing exact error codes or part numbers (as defined in
+config/error_code_patterns.json) take a fast path through the postings
+written by code_index.py, which needs no embedding.
+"""
+
+import asyncio
+import json
+import logging
+import re
+import time
+import uuid
+from enum import Enum
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from metrics import SQL_DURATION
+from vector_quantization import (DEFAULT_RESCORE_CANDIDATES, QuantizationMode, candidate_order,
+                                 l2_normalize, vector_literal)
+
+logger = logging.getLogger(__name__)
+
+# Filter combinations (manufacturer x document type) answered by the scoped path
+MAX_SCOPED_SUBQUERIES = 16
+
+def scope_predicate(manufacturer_id: Any, document_type: Optional[str] = None, alias: str = "e") -> str:
+    """Literal WHERE clause of a scope's partial HNSW index
+
+    The planner only uses a partial index when the query's WHERE clause implies
+    the index predicate, which a bind parameter never does, so the values are
+    inlined. Both come from vector_index_scopes, never from the request.
+    """
+    prefix = f"{alias}." if alias else ""
+    predicate = f"{prefix}manufacturer_id = '{uuid.UUID(str(manufacturer_id))}'::uuid"
+    if document_type is not None:
+        quoted = document_type.replace("'", "''")
+        predicate += f" AND {prefix}document_type = '{quoted}'"
+    return predicate
+
+class SearchMode(str, Enum):
+    """Retrieval strategies supported by the search engine"""
+    VECTOR = "vector"
+    LEXICAL = "lexical"
+    HYBRID = "hybrid"
+
+class ErrorCodeMatcher:
+    """Detects exact error codes and part numbers in a search query"""
+
+    def __init__(self, config_path: Optional[Path] = None):
+        self.config_path = config_path or Path(__file__).parent / "config" / "error_code_patterns.json"
+        self.error_code_validators: Dict[str, re.Pattern] = {}
+        self.part_number_validators: Dict[str, re.Pattern] = {}
+        self._load_patterns()
+
+    def _load_patterns(self):
+        """Compile the manufacturer patterns once at startup"""
+        try:
+            with open(self.config_path, 'r', encoding='utf-8') as f:
+                patterns = json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to load error code patterns, exact-code fast path disabled: {e}")
+            return
+
+        for manufacturer, settings in patterns.get('error_code_patterns', {}).items():
+            if settings.get('validation_regex'):
+                self.error_code_validators[manufacturer] = re.compile(settings['validation_regex'])
+
+        for manufacturer, settings in patterns.get('part_number_patterns', {}).items():
+            if settings.get('validation_regex'):
+                self.part_number_validators[manufacturer] = re.compile(settings['validation_regex'])
+
+    def find_codes(self, query: str) -> List[Dict[str, Any]]:
+        """Return the exact codes contained in a query, with candidate manufacturers"""
+        codes: Dict[str, Dict[str, Any]] = {}
+
+        for token in re.findall(r"[A-Za-z0-9][A-Za-z0-9.\-]*[A-Za-z0-9]", query):
+            candidate = token.upper()
+
+            for manufacturer, validator in self.error_code_validators.items():
+                if validator.match(candidate):
+                    entry = codes.setdefault(candidate, {"code": candidate, "kind": "error_code", "manufacturers": []})
+                    entry["manufacturers"].append(manufacturer)
+
+            # Part numbers mix letters and digits (C4127-60001); plain words
+            # and bare numbers also satisfy the loose validation regex
+            if candidate in codes or not (re.search(r"\d", candidate) and re.search(r"[A-Z]", candidate)):
+                continue
+
+            for manufacturer, validator in self.part_number_validators.items():
+                if validator.match(candidate):
+                    entry = codes.setdefault(candidate, {"code": candidate, "kind": "part_number", "manufacturers": []})
+                    entry["manufacturers"].append(manufacturer)
+
+        return list(codes.values())
+
+    def strip_codes(self, query: str, codes: List[Dict[str, Any]]) -> str:
+        """Remove detected codes (and filler words) to see whether anything else was asked"""
+        remainder = query
+        for code in codes:
+            remainder = re.sub(re.escape(code["code"]), " ", remainder, flags=re.IGNORECASE)
+        remainder = re.sub(r"\b(error|code|codes|part|number|pn|fehler|fehlercode)\b", " ", remainder, flags=re.IGNORECASE)
+        return re.sub(r"[^\w]+", " ", remainder).strip()
+
+class HybridSearchEngine:
+    """Runs lexical and vector retrieval concurrently and fuses the rankings"""
+
+    # Standard RRF damping constant (Cormack et al.)
+    RRF_K = 60
+
+    _RESULT_COLUMNS = """
+        c.id AS chunk_id,
+        c.document_id,
+        c.text_chunk,
+        c.chunk_index,
+        c.page_start,
+        c.page_end,
+        d.document_type,
+        m.name AS manufacturer
+    """
+
+    def __init__(self, db_pool, embed_query: Callable[[str], Awaitable[Optional[List[float]]]],
+                 embedding_model_name: str, matcher: Optional[ErrorCodeMatcher] = None,
+                 quantization: QuantizationMode = QuantizationMode.NONE,
+                 rescore_candidates: int = DEFAULT_RESCORE_CANDIDATES,
+                 coarse_dimension: int = 0, scoped_search: bool = True,
+                 scope_refresh_interval: float = 60.0):
+        self.db_pool = db_pool
+        self.embed_query = embed_query
+        self.embedding_model_name = embedding_model_name
+        self.matcher = matcher or ErrorCodeMatcher()
+        self.quantization = quantization
+        self.rescore_candidates = rescore_candidates
+        self.coarse_dimension = coarse_dimension
+        self.scoped_search = scoped_search
+        self.scope_refresh_interval = scope_refresh_interval
+        # (manufacturer name, document type or None) -> vector_index_scopes row
+        self._scopes: Dict[Tuple[str, Optional[str]], Dict[str, Any]] = {}
+        self._manufacturer_ids: Dict[str, Any] = {}
+        self._scopes_loaded_at: Optional[float] = None
+        self._scopes_lock = asyncio.Lock()
+        self._scopes_error: Optional[str] = None
+
+    async def search(self, query: str, limit: int = 10, mode: SearchMode = SearchMode.HYBRID,
+                     document_types: Optional[List[str]] = None,
+                     manufacturers: Optional[List[str]] = None,
+                     similarity_threshold: float = 0.0) -> Dict[str, Any]:
+        """Search chunks and return fused, de-duplicated results"""
+        start_time = time.perf_counter()
+        candidate_limit = max(limit * 4, 50)
+        timings: Dict[str, float] = {}
+        if manufacturers:
+            # Manufacturer ids for partition pruning (cached)
+            await self._load_scopes()
+
+        # Exact-code fast path: codes are matched verbatim, no embedding needed
+        codes = self.matcher.find_codes(query) if mode != SearchMode.VECTOR else []
+        exact_results: List[Dict[str, Any]] = []
+        if codes:
+            exact_start = time.perf_counter()
+            exact_results = await self._exact_code_search(codes, limit, document_types, manufacturers)
+            timings["exact_code_time"] = time.perf_counter() - exact_start
+
+            code_only_query = not self.matcher.strip_codes(query, codes)
+            if exact_results and (code_only_query or len(exact_results) >= limit):
+                return self._build_response(query, mode, exact_results[:limit], codes, start_time, timings,
+                                            fast_path=True)
+
+        # Lexical and vector legs run concurrently on separate pool connections
+        legs: Dict[str, Awaitable] = {}
+        if mode in (SearchMode.LEXICAL, SearchMode.HYBRID):
+            legs["lexical"] = self._timed(timings, "lexical_time",
+                                          self._lexical_search(query, candidate_limit, document_types, manufacturers))
+        if mode in (SearchMode.VECTOR, SearchMode.HYBRID):
+            legs["vector"] = self._vector_leg(query, candidate_limit, document_types, manufacturers,
+                                              similarity_threshold, timings)
+
+        results = dict(zip(legs, await self._gather_legs(*legs.values())))
+        lexical_results = results.get("lexical", [])
+        vector_results = results.get("vector", [])
+
+        # A single leg keeps its native score (cosine similarity / ts_rank_cd)
+        rankings = [ranking for ranking in (lexical_results, vector_results) if ranking]
+        fused = rankings[0] if len(rankings) == 1 else self._reciprocal_rank_fusion(rankings)
+
+        # Exact-code hits are pinned ahead of the fused ranking
+        pinned_ids = {result["chunk_id"] for result in exact_results}
+        combined = exact_results + [result for result in fused if result["chunk_id"] not in pinned_ids]
+
+        return self._build_response(query, mode, combined[:limit], codes, start_time, timings,
+                                    fast_path=False)
+
+    async def _gather_legs(self, *legs: Awaitable) -> List[Any]:
+        """Run search legs concurrently; if one fails the others are cancelled, not leaked"""
+        tasks = [asyncio.ensure_future(leg) for leg in legs]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _timed(self, timings: Dict[str, float], key: str, coro: Awaitable):
+        """Await a coroutine and record its wall time"""
+        started = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            timings[key] = time.perf_counter() - started
+
+    async def _vector_leg(self, query: str, limit: int, document_types: Optional[List[str]],
+                          manufacturers: Optional[List[str]], similarity_threshold: float,
+                          timings: Dict[str, float]) -> List[Dict[str, Any]]:
+        """Embed the query and run the ANN search"""
+        embedding = await self._timed(timings, "embedding_time", self.embed_query(query))
+        if not embedding:
+            logger.warning("⚠️ Query embedding unavailable, vector leg skipped")
+            return []
+
+        return await self._timed(
+            timings, "vector_time",
+            self._vector_search(embedding, limit, document_types, manufacturers, similarity_threshold)
+        )
+
+    def _filter_clause(self, params: List[Any], document_types: Optional[List[str]],
+                       manufacturers: Optional[List[str]]) -> str:
+        """Build filter SQL, appending bind parameters in place"""
+        clause = ""
+        if document_types:
+            params.append(document_types)
+            clause += f" AND d.document_type = ANY(${len(params)})"
+        if manufacturers:
+            params.append(manufacturers)
+            clause += f" AND m.name = ANY(${len(params)})"
+            manufacturer_ids = [self._manufacturer_ids.get(name) for name in manufacturers]
+            if all(manufacturer_ids):
+                # Partition key of chunks; names created since the last reload are only matched by name
+                params.append(manufacturer_ids)
+                clause += f" AND c.manufacturer_id = ANY(${len(params)}::uuid[])"
+        return clause
+
+    async def _exact_code_search(self, codes: List[Dict[str, Any]], limit: int,
+                                 document_types: Optional[List[str]],
+                                 manufacturers: Optional[List[str]]) -> List[Dict[str, Any]]:
+        """Resolve detected codes via the ingestion postings, falling back to full-text"""
+        results = await self._postings_search(codes, limit, document_types, manufacturers)
+        if results:
+            return results
+
+        # Documents indexed before the postings existed: phrase-match instead.
+        # The english parser keeps codes like 13.20.01 or C2152 as single tokens
+        params: List[Any] = [" OR ".join(f'"{code["code"]}"' for code in codes)]
+        filters = self._filter_clause(params, document_types, manufacturers)
+        params.append(limit)
+
+        sql = f"""
+            SELECT {self._RESULT_COLUMNS},
+                   ts_rank_cd(to_tsvector('english', c.text_chunk), q) AS score
+            FROM krai_intelligence.chunks c
+            CROSS JOIN websearch_to_tsquery('english', $1) AS q
+            JOIN krai_core.documents d ON d.id = c.document_id
+            LEFT JOIN krai_core.manufacturers m ON m.id = d.manufacturer_id
+            WHERE to_tsvector('english', c.text_chunk) @@ q {filters}
+            ORDER BY score DESC
+            LIMIT ${len(params)}
+        """
+
+        async with self.db_pool.acquire() as conn:
+            with SQL_DURATION.time(statement="search_exact_code_fts"):
+                rows = await conn.fetch(sql, *params)
+
+        return [self._row_to_result(row, "exact_code", row["score"]) for row in rows]
+
+    async def _postings_search(self, codes: List[Dict[str, Any]], limit: int,
+                               document_types: Optional[List[str]],
+                               manufacturers: Optional[List[str]]) -> List[Dict[str, Any]]:
+        """Probe the hash-indexed error code / part number postings"""
+        params: List[Any] = [[code["code"] for code in codes]]
+        filters = self._filter_clause(params, document_types, manufacturers)
+        params.append(limit)
+
+        sql = f"""
+            SELECT {self._RESULT_COLUMNS},
+                   1.0 AS score
+            FROM (
+                SELECT chunk_id, manufacturer_id FROM krai_intelligence.error_codes WHERE error_code = ANY($1)
+                UNION
+                SELECT chunk_id, manufacturer_id FROM krai_intelligence.part_number_mentions WHERE part_number = ANY($1)
+            ) AS postings
+            JOIN krai_intelligence.chunks c
+                ON c.id = postings.chunk_id AND c.manufacturer_id = postings.manufacturer_id
+            JOIN krai_core.documents d ON d.id = c.document_id
+            LEFT JOIN krai_core.manufacturers m ON m.id = d.manufacturer_id
+            WHERE true {filters}
+            ORDER BY c.document_id, c.chunk_index
+            LIMIT ${len(params)}
+        """
+
+        async with self.db_pool.acquire() as conn:
+            with SQL_DURATION.time(statement="search_code_postings"):
+                rows = await conn.fetch(sql, *params)
+
+        return [self._row_to_result(row, "exact_code", row["score"]) for row in rows]
+
+    async def _lexical_search(self, query: str, limit: int, document_types: Optional[List[str]],
+                              manufacturers: Optional[List[str]]) -> List[Dict[str, Any]]:
+        """Ranked full-text search using the idx_chunks_text_fts GIN index"""
+        params: List[Any] = [query]
+        filters = self._filter_clause(params, document_types, manufacturers)
+        params.append(limit)
+
+        # OR the query lexemes together: AND semantics would drop most chunks
+        # for natural-language questions, and ts_rank_cd still rewards coverage
+        sql = f"""
+            SELECT {self._RESULT_COLUMNS},
+                   ts_rank_cd(to_tsvector('english', c.text_chunk), q) AS score
+            FROM krai_intelligence.chunks c
+            CROSS JOIN LATERAL (
+                SELECT NULLIF(replace(plainto_tsquery('english', $1)::text, '&', '|'), '')::tsquery AS q
+            ) AS lexemes
+            JOIN krai_core.documents d ON d.id = c.document_id
+            LEFT JOIN krai_core.manufacturers m ON m.id = d.manufacturer_id
+            WHERE to_tsvector('english', c.text_chunk) @@ q {filters}
+            ORDER BY score DESC
+            LIMIT ${len(params)}
+        """
+
+        async with self.db_pool.acquire() as conn:
+            with SQL_DURATION.time(statement="search_lexical"):
+                rows = await conn.fetch(sql, *params)
+
+        return [self._row_to_result(row, "lexical", row["score"]) for row in rows]
+
+    async def _vector_search(self, embedding: List[float], limit: int,
+                             document_types: Optional[List[str]],
+                             manufacturers: Optional[List[str]],
+                             similarity_threshold: float) -> List[Dict[str, Any]]:
+        """Approximate nearest-neighbour search on the HNSW index"""
+        if self.scoped_search and manufacturers:
+            results = await self._scoped_vector_search(embedding, limit, document_types, manufacturers,
+                                                       similarity_threshold)
+            if results is not None:
+                return results
+
+        if self.quantization.quantized or self.coarse_dimension:
+            return await self._rescored_vector_search(embedding, limit, document_types, manufacturers,
+                                                       similarity_threshold)
+
+        vector_str = vector_literal(embedding)
+        params: List[Any] = [vector_str, self.embedding_model_name]
+        filters = self._filter_clause(params, document_types, manufacturers)
+        params.append(limit)
+
+        sql = f"""
+            SELECT {self._RESULT_COLUMNS},
+                   1 - (e.embedding <=> $1::vector) AS score
+            FROM krai_intelligence.embeddings e
+            JOIN krai_intelligence.chunks c ON c.id = e.chunk_id AND c.manufacturer_id = e.manufacturer_id
+            JOIN krai_core.documents d ON d.id = c.document_id
+            LEFT JOIN krai_core.manufacturers m ON m.id = d.manufacturer_id
+            WHERE e.model_name = $2 {filters}
+            ORDER BY e.embedding <=> $1::vector
+            LIMIT ${len(params)}
+        """
+
+        async with self.db_pool.acquire() as conn:
+            with SQL_DURATION.time(statement="search_vector"):
+                rows = await conn.fetch(sql, *params)
+
+        return [
+            self._row_to_result(row, "vector", row["score"])
+            for row in rows
+            if row["score"] >= similarity_threshold
+        ]
+
+    async def _rescored_vector_search(self, embedding: List[float], limit: int,
+                                      document_types: Optional[List[str]],
+                                      manufacturers: Optional[List[str]],
+                                      similarity_threshold: float) -> List[Dict[str, Any]]:
+        """Walk the coarse (truncated, halfvec or binary) HNSW index for candidates, rescore them on the float32 column"""
+        candidates = max(self.rescore_candidates, limit)
+        params: List[Any] = [vector_literal(l2_normalize(embedding)), self.embedding_model_name]
+        filters = self._filter_clause(params, document_types, manufacturers)
+        params.append(candidates)
+        candidates_param = len(params)
+        params.append(limit)
+
+        sql = f"""
+            SELECT {self._RESULT_COLUMNS},
+                   1 - (candidates.embedding <=> $1::vector) AS score
+            FROM (
+                SELECT e.chunk_id, e.manufacturer_id, e.embedding
+                FROM krai_intelligence.embeddings e
+                JOIN krai_intelligence.chunks c ON c.id = e.chunk_id AND c.manufacturer_id = e.manufacturer_id
+                JOIN krai_core.documents d ON d.id = c.document_id
+                LEFT JOIN krai_core.manufacturers m ON m.id = d.manufacturer_id
+                WHERE e.model_name = $2 {filters}
+                ORDER BY {candidate_order(self.quantization, coarse_dimension=self.coarse_dimension)}
+                LIMIT ${candidates_param}
+            ) AS candidates
+            JOIN krai_intelligence.chunks c
+                ON c.id = candidates.chunk_id AND c.manufacturer_id = candidates.manufacturer_id
+            JOIN krai_core.documents d ON d.id = c.document_id
+            LEFT JOIN krai_core.manufacturers m ON m.id = d.manufacturer_id
+            ORDER BY score DESC
+            LIMIT ${len(params)}
+        """
+
+        statement = f"search_vector_mrl{self.coarse_dimension}" if self.coarse_dimension \
+            else f"search_vector_{self.quantization.value}"
+        async with self.db_pool.acquire() as conn:
+            # HNSW returns at most ef_search rows, so widen it to the candidate count
+            async with conn.transaction():
+                await conn.execute(f"SET LOCAL hnsw.ef_search = {int(min(candidates, 1000))}")
+                with SQL_DURATION.time(statement=statement):
+                    rows = await conn.fetch(sql, *params)
+
+        return [
+            self._row_to_result(row, "vector", row["score"])
+            for row in rows
+            if row["score"] >= similarity_threshold
+        ]
+
+    async def _load_scopes(self) -> Dict[Tuple[str, Optional[str]], Dict[str, Any]]:
+        """vector_index_scopes (and manufacturer ids) by manufacturer name, reloaded every scope_refresh_interval seconds"""
+        if self._scopes_loaded_at is not None \
+                and time.monotonic() - self._scopes_loaded_at < self.scope_refresh_interval:
+            return self._scopes
+
+        async with self._scopes_lock:
+            if self._scopes_loaded_at is not None \
+                    and time.monotonic() - self._scopes_loaded_at < self.scope_refresh_interval:
+                return self._scopes
+            try:
+                async with self.db_pool.acquire() as conn:
+                    with SQL_DURATION.time(statement="load_manufacturer_ids"):
+                        manufacturers = await conn.fetch("SELECT id, name FROM krai_core.manufacturers")
+                    self._manufacturer_ids = {row["name"]: row["id"] for row in manufacturers}
+                    with SQL_DURATION.time(statement="load_vector_index_scopes"):
+                        rows = await conn.fetch(
+                            """
+                            SELECT m.name, s.manufacturer_id, s.document_type, s.row_count, s.index_name
+                            FROM krai_intelligence.vector_index_scopes s
+                            JOIN krai_core.manufacturers m ON m.id = s.manufacturer_id
+                            """
+                        )
+                self._scopes = {(row["name"], row["document_type"]): dict(row) for row in rows}
+                self._scopes_error = None
+            except Exception as e:
+                if self._scopes_error is None:
+                    logger.warning(f"⚠️ Vector index scopes unavailable, filtered searches use the global index "
+                                   f"(12_filtered_vector_indexes.sql applied?): {e}")
+                self._scopes = {}
+                self._scopes_error = str(e)
+            self._scopes_loaded_at = time.monotonic()
+            return self._scopes
+
+    async def _scoped_vector_search(self, embedding: List[float], limit: int,
+                                    document_types: Optional[List[str]],
+                                    manufacturers: List[str],
+                                    similarity_threshold: float) -> Optional[List[Dict[str, Any]]]:
+        """Search each filtered scope on its own partial index (or exactly); None when a scope is unknown"""
+        scopes = await self._load_scopes()
+        if not scopes or len(manufacturers) * len(document_types or [None]) > MAX_SCOPED_SUBQUERIES:
+            return None
+
+        params: List[Any] = [vector_literal(embedding), self.embedding_model_name, limit]
+        subqueries: List[str] = []
+        post_filtered = False
+        for manufacturer in manufacturers:
+            manufacturer_scope = scopes.get((manufacturer, None))
+            if manufacturer_scope is None:
+                # Not counted yet (new manufacturer, or no refresh since the migration)
+                return None
+            for document_type in document_types or [None]:
+                scope = scopes.get((manufacturer, document_type)) if document_type is not None else None
+                extra = ""
+                if scope is None:
+                    scope = manufacturer_scope
+                    if document_type is not None:
+                        params.append(document_type)
+                        extra = f" AND e.document_type = ${len(params)}"
+                        post_filtered = True
+                # Small scopes have no HNSW index of their own: "+ 0" keeps the planner off the
+                # global one and sorts the btree-filtered rows exactly
+                order = "e.embedding <=> $1::vector" if scope["index_name"] else "(e.embedding <=> $1::vector) + 0"
+                subqueries.append(f"""
+                    (SELECT e.chunk_id, e.manufacturer_id, e.embedding <=> $1::vector AS distance
+                     FROM krai_intelligence.embeddings e
+                     WHERE e.model_name = $2
+                       AND {scope_predicate(scope["manufacturer_id"], scope["document_type"])}{extra}
+                     ORDER BY {order}
+                     LIMIT $3)""")
+
+        sql = f"""
+            SELECT {self._RESULT_COLUMNS},
+                   1 - hits.distance AS score
+            FROM ({" UNION ALL ".join(subqueries)}) AS hits
+            JOIN krai_intelligence.chunks c ON c.id = hits.chunk_id AND c.manufacturer_id = hits.manufacturer_id
+            JOIN krai_core.documents d ON d.id = c.document_id
+            LEFT JOIN krai_core.manufacturers m ON m.id = d.manufacturer_id
+            ORDER BY hits.distance
+            LIMIT $3
+        """
+
+        # A document type filtered after a manufacturer index walk needs more candidates
+        ef_search = max(limit, self.rescore_candidates if post_filtered else 40)
+        async with self.db_pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(f"SET LOCAL hnsw.ef_search = {int(min(ef_search, 1000))}")
+                with SQL_DURATION.time(statement="search_vector_scoped"):
+                    rows = await conn.fetch(sql, *params)
+
+        return [
+            self._row_to_result(row, "vector", row["score"])
+            for row in rows
+            if row["score"] >= similarity_threshold
+        ]
+
+    def _reciprocal_rank_fusion(self, rankings: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Fuse ranked lists: score(d) = sum over lists of 1 / (k + rank)"""
+        fused: Dict[str, Dict[str, Any]] = {}
+
+        for ranking in rankings:
+            for rank, result in enumerate(ranking, start=1):
+                entry = fused.get(result["chunk_id"])
+                if entry is None:
+                    entry = dict(result, similarity_score=0.0, match_sources=[], source_scores={})
+                    fused[result["chunk_id"]] = entry
+                entry["similarity_score"] += 1.0 / (self.RRF_K + rank)
+                entry["match_sources"].append(result["match_sources"][0])
+                entry["source_scores"].update(result["source_scores"])
+
+        return sorted(fused.values(), key=lambda result: result["similarity_score"], reverse=True)
+
+    def _row_to_result(self, row, source: str, score: float) -> Dict[str, Any]:
+        """Convert a database row into an API result"""
+        return {
+            "chunk_id": str(row["chunk_id"]),
+            "document_id": str(row["document_id"]),
+            "similarity_score": float(score),
+            "content": row["text_chunk"],
+            "match_sources": [source],
+            "source_scores": {source: float(score)},
+            "metadata": {
+                "document_type": row["document_type"],
+                "manufacturer": row["manufacturer"],
+                "chunk_index": row["chunk_index"],
+                "page_number": row["page_start"],
+                "page_start": row["page_start"],
+                "page_end": row["page_end"]
+            }
+        }
+
+    def _build_response(self, query: str, mode: SearchMode, results: List[Dict[str, Any]],
+                        codes: List[Dict[str, Any]], start_time: float,
+                        timings: Dict[str, float], fast_path: bool) -> Dict[str, Any]:
+        """Assemble the search response"""
+        return {
+            "results": results,
+            "total_results": len(results),
+            "query": query,
+            "mode": mode.value,
+            "exact_codes": codes,
+            "fast_path": fast_path,
+            "query_time": time.perf_counter() - start_time,
+            "embedding_time": timings.get("embedding_time", 0.0),
+            "timings": timings
+        }
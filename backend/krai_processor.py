@@ -7,17 +7,20 @@ Usage:
     python krai_processor.py --mode production
     python krai_processor.py --mode image_only --file path/to/document.pdf
     python krai_processor.py --mode demo --verbose
+    python krai_processor.py --mode production --dir /archive/pdfs --glob "**/*.pdf"
 """
 
 import os
 import sys
 import argparse
 import asyncio
+import glob
 import json
+import time
 import uuid
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Set
 from dotenv import load_dotenv
 
 # Add backend to path for imports
@@ -26,6 +29,47 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 # Import production components
 from production_document_processor import ProductionDocumentProcessor
 from config.supabase_config import SupabaseConfig, SupabaseStorage
+from upload_spool import DocumentSource
+from pdf_pages import ImageRef, materialize
+from profiler import SamplingProfiler
+
+class BatchManifest:
+    """Append-only JSONL record of completed file hashes, used to resume batch runs"""
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self.completed: Set[str] = set()
+        self._load()
+    
+    def _load(self):
+        """Read completed hashes; a truncated last line from a crash is ignored"""
+        if not self.path.exists():
+            return
+        
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    self.completed.add(json.loads(line)['hash'])
+                except (ValueError, KeyError):
+                    continue
+    
+    def is_completed(self, file_hash: str) -> bool:
+        return file_hash in self.completed
+    
+    def record(self, file_hash: str, file_path: Path, results: Dict[str, Any]):
+        """Append one completed document and flush it to disk immediately"""
+        entry = {
+            'hash': file_hash,
+            'file': str(file_path),
+            'document_id': results.get('document_id'),
+            'pages': results.get('pages', 0),
+            'completed_at': datetime.now().isoformat()
+        }
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.completed.add(file_hash)
 
 class KRAIProcessor:
     """Universal KR-AI-Engine processor with configurable modes"""
@@ -44,6 +88,8 @@ class KRAIProcessor:
         self.stats = {
             'start_time': datetime.now(),
             'documents_processed': 0,
+            'documents_skipped': 0,
+            'pages_processed': 0,
             'images_extracted': 0,
             'images_analyzed': 0,
             'chunks_created': 0,
@@ -194,73 +240,92 @@ class KRAIProcessor:
             print(f"❌ Initialization failed: {e}")
             raise
     
-    async def process_document(self, file_path: str) -> Dict[str, Any]:
-        """Process a document based on configuration"""
+    async def process_document(self, file_path: str, source: Optional[DocumentSource] = None) -> Dict[str, Any]:
+        """Process a document based on configuration (under the sampling profiler with --profile)"""
+        if not self.config.get('profile'):
+            return await self._process_document(file_path, source)
+        
+        profiler = SamplingProfiler(self.config.get('profile_rate_hz'))
+        profiler.start()
+        try:
+            results = await self._process_document(file_path, source)
+        finally:
+            profile_name = f"{Path(file_path).stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+            profile = await profiler.save(profile_name)
+            print(f"🔥 Profile: {profile.get('path')} ({profile['samples']} samples at {profile['rate_hz']} Hz)")
+        results['profile'] = profile
+        return results
+    
+    async def _process_document(self, file_path: str, source: Optional[DocumentSource] = None) -> Dict[str, Any]:
+        """Run the enabled pipeline stages for one document"""
         try:
             file_path = Path(file_path)
-            if not file_path.exists():
-                raise FileNotFoundError(f"File not found: {file_path}")
-            
-            # Read file content
-            with open(file_path, 'rb') as f:
-                file_content = f.read()
+            if source is None:
+                if not file_path.exists():
+                    raise FileNotFoundError(f"File not found: {file_path}")
+                
+                # Hash in chunks; the PDF itself is read through an mmap
+                source = await asyncio.to_thread(DocumentSource.from_path, file_path)
             
-            # Store file content and filename for later use
-            self.file_content = file_content
-            self.current_filename = file_path.name
+            # Per-document state stays local so documents can run concurrently
+            analyzed_images = []
+            content_result = {}
                 
             if self.config['verbose_logging']:
-                print(f"📄 Processing: {file_path.name} ({len(file_content)/1024/1024:.1f} MB)")
+                print(f"📄 Processing: {file_path.name} ({source.size/1024/1024:.1f} MB)")
             
             results = {
                 'file_path': str(file_path),
-                'file_size': len(file_content),
+                'file_size': source.size,
                 'processing_stages': []
             }
             
-            # === TEXT EXTRACTION ===
-            if self.config.get('enable_text_extraction', False):
-                if self.config['verbose_logging']:
-                    print("📝 Extracting text content...")
-                
-                content_result = await self.processor._extract_content_with_gpu(file_content)
-                results['text_length'] = len(content_result.get('text', ''))
-                results['images_found'] = len(content_result.get('images', []))
-                results['processing_stages'].append('text_extraction')
-                
-                if self.config['verbose_logging']:
-                    print(f"   ✅ Extracted {results['text_length']} characters")
-                    print(f"   ✅ Found {results['images_found']} images")
-            
-            # === IMAGE EXTRACTION & ANALYSIS ===
-            if self.config.get('enable_image_extraction', False):
-                if self.config['verbose_logging']:
-                    print("🖼️ Extracting images...")
-                
-                # Extract images (already done in text extraction)
-                images = content_result.get('images', [])
-                self.stats['images_extracted'] = len(images)
-                results['processing_stages'].append('image_extraction')
+            # The PDF stays mapped until the image stages have loaded their ImageRefs
+            with source.open() as stream:
+                # === TEXT EXTRACTION ===
+                if self.config.get('enable_text_extraction', False):
+                    if self.config['verbose_logging']:
+                        print("📝 Extracting text content...")
+                    
+                    content_result = await self.processor._extract_content_with_gpu(stream)
+                    results['text_length'] = len(content_result.get('text', ''))
+                    results['images_found'] = len(content_result.get('images', []))
+                    results['pages'] = content_result.get('pages', 0)
+                    results['processing_stages'].append('text_extraction')
+                    
+                    if self.config['verbose_logging']:
+                        print(f"   ✅ Extracted {results['text_length']} characters")
+                        print(f"   ✅ Found {results['images_found']} images")
                 
-                # Analyze images if enabled
-                if self.config.get('enable_image_analysis', False) and images:
+                # === IMAGE EXTRACTION & ANALYSIS ===
+                if self.config.get('enable_image_extraction', False):
                     if self.config['verbose_logging']:
-                        print(f"👁️ Analyzing {len(images)} images...")
+                        print("🖼️ Extracting images...")
                     
-                    analyzed_images = await self._analyze_images(images, str(file_path))
-                    results['analyzed_images'] = len(analyzed_images)
-                    self.stats['images_analyzed'] = len(analyzed_images)
-                    results['processing_stages'].append('image_analysis')
+                    # Extract images (already done in text extraction)
+                    images = content_result.get('images', [])
+                    self.stats['images_extracted'] += len(images)
+                    results['processing_stages'].append('image_extraction')
                     
-                    # Upload images if enabled
-                    if self.config.get('enable_image_upload', False) and self.storage:
+                    # Analyze images if enabled
+                    if self.config.get('enable_image_analysis', False) and images:
                         if self.config['verbose_logging']:
-                            print("☁️ Uploading images to storage...")
+                            print(f"👁️ Analyzing {len(images)} images...")
                         
-                        uploaded_count = await self._upload_images(analyzed_images)
-                        results['uploaded_images'] = uploaded_count
-                        results['processing_stages'].append('image_upload')
-            
+                        analyzed_images = await self._analyze_images(images, str(file_path))
+                        results['analyzed_images'] = len(analyzed_images)
+                        self.stats['images_analyzed'] += len(analyzed_images)
+                        results['processing_stages'].append('image_analysis')
+                        
+                        # Upload images if enabled
+                        if self.config.get('enable_image_upload', False) and self.storage:
+                            if self.config['verbose_logging']:
+                                print("☁️ Uploading images to storage...")
+                            
+                            uploaded_count = await self._upload_images(analyzed_images, file_path.name)
+                            results['uploaded_images'] = uploaded_count
+                            results['processing_stages'].append('image_upload')
+                
             # === CLASSIFICATION ===
             classification = None
             if self.config.get('enable_classification', False):
@@ -271,8 +336,6 @@ class KRAIProcessor:
                     file_path.name, 
                     content_result.get('text', '')
                 )
-                # Store classification for intelligent image routing
-                self.classification_result = classification
                 results['classification'] = classification
                 results['processing_stages'].append('classification')
                 
@@ -296,12 +359,10 @@ class KRAIProcessor:
                     print("💾 Storing document in database...")
                 
                 # Create storage_result with hash for deduplication
-                import hashlib
-                file_hash = hashlib.sha256(self.file_content).hexdigest()
                 storage_result = {
-                    'hash': file_hash,
+                    'hash': source.sha256,
                     'url': f'local://documents/{file_path.name}',
-                    'size': len(self.file_content)
+                    'size': source.size
                 }
                 
                 # Create default version/model results
@@ -311,7 +372,6 @@ class KRAIProcessor:
                 # Store document using the production processor's method
                 document_id = await self.processor._store_document_in_db(
                     file_path,
-                    self.file_content,
                     storage_result,
                     content_result,
                     classification,
@@ -339,12 +399,13 @@ class KRAIProcessor:
                 chunk_result = await self.processor._process_chunks_with_gpu(
                     str(document_id),
                     content_result.get('text', ''),
-                    classification or {}
+                    classification or {},
+                    content_result.get('page_spans')
                 )
                 
                 chunks = chunk_result.get('chunks', [])
                 results['chunks_created'] = len(chunks)
-                self.stats['chunks_created'] = len(chunks)
+                self.stats['chunks_created'] += len(chunks)
                 results['processing_stages'].append('chunking')
                 
                 if self.config['verbose_logging']:
@@ -362,7 +423,7 @@ class KRAIProcessor:
                     
                     embeddings = embedding_result.get('embedding_ids', [])
                     results['embeddings_generated'] = len(embeddings)
-                    self.stats['embeddings_generated'] = len(embeddings)
+                    self.stats['embeddings_generated'] += len(embeddings)
                     results['processing_stages'].append('embeddings')
                     
                     if self.config['verbose_logging']:
@@ -370,6 +431,7 @@ class KRAIProcessor:
             
             # Update statistics
             self.stats['documents_processed'] += 1
+            self.stats['pages_processed'] += results.get('pages', 0)
             
             return results
             
@@ -404,7 +466,16 @@ class KRAIProcessor:
                     print(f"   🔧 Processing first image type: {type(image_data)}")
                 
                 # Handle different image data formats
-                if isinstance(image_data, bytes):
+                if isinstance(image_data, ImageRef):
+                    # Lazy reference - bytes are loaded at upload time
+                    analyzed_image = {
+                        'data': image_data,
+                        'analysis': f"image_{i}_from_page_{image_data.page_no}",
+                        'type': 'extracted_image',
+                        'index': i,
+                        'page': image_data.page_no
+                    }
+                elif isinstance(image_data, bytes):
                     # Raw bytes - create structure
                     analyzed_image = {
                         'data': image_data,
@@ -443,7 +514,8 @@ class KRAIProcessor:
         
         return analyzed_images
     
-    async def _upload_images(self, images: List[Dict]) -> int:
+    async def _upload_images(self, images: List[Dict], filename: str,
+                             document_type: str = 'service_manual') -> int:
         """Upload images to Supabase storage"""
         uploaded_count = 0
         
@@ -457,8 +529,8 @@ class KRAIProcessor:
                 
                 # Route image intelligently based on document type and content
                 routing_result = image_router.route_image(
-                    document_type=getattr(self, 'classification_result', {}).get('document_type', 'service_manual'),
-                    document_filename=getattr(self, 'current_filename', 'unknown.pdf'),
+                    document_type=document_type,
+                    document_filename=filename,
                     image_description=analysis,
                     upload_source="extraction"  # This is extracted from document
                 )
@@ -476,7 +548,7 @@ class KRAIProcessor:
                 # Upload to appropriate bucket
                 upload_result = await self.storage.upload_image(
                     image_path,
-                    image.get('data', b''),
+                    materialize(image),
                     image_type
                 )
                 
@@ -492,6 +564,70 @@ class KRAIProcessor:
         
         return uploaded_count
     
+    async def process_batch(self, files: List[Path], manifest: BatchManifest) -> Dict[str, Any]:
+        """Process many files with one initialized pipeline, MAX_CONCURRENT at a time"""
+        concurrency = max(1, self.config['max_concurrent'])
+        queue: asyncio.Queue = asyncio.Queue()
+        for file_path in files:
+            queue.put_nowait(file_path)
+        
+        failures: List[Dict[str, str]] = []
+        batch_start = time.perf_counter()
+        
+        async def worker():
+            while True:
+                try:
+                    file_path = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                
+                try:
+                    # Hash in chunks off the event loop; extraction reads the file through an mmap
+                    source = await asyncio.to_thread(DocumentSource.from_path, file_path)
+                    file_hash = source.sha256
+                    
+                    if manifest.is_completed(file_hash):
+                        self.stats['documents_skipped'] += 1
+                        continue
+                    
+                    results = await self.process_document(str(file_path), source)
+                    manifest.record(file_hash, file_path, results)
+                    
+                    done = self.stats['documents_processed']
+                    print(f"✅ [{done + self.stats['documents_skipped']}/{len(files)}] {file_path.name} "
+                          f"({results.get('pages', 0)} pages)")
+                    
+                except Exception as e:
+                    failures.append({'file': str(file_path), 'error': str(e)})
+                    print(f"❌ {file_path.name}: {e}")
+        
+        print(f"🚀 Batch: {len(files)} files, {len(manifest.completed)} already in manifest, "
+              f"concurrency {concurrency}")
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        
+        return {
+            'files': len(files),
+            'processed': self.stats['documents_processed'],
+            'skipped': self.stats['documents_skipped'],
+            'failed': failures,
+            'wall_time_seconds': time.perf_counter() - batch_start
+        }
+    
+    def print_throughput(self, batch_result: Dict[str, Any]):
+        """Print aggregate batch throughput"""
+        elapsed = max(batch_result['wall_time_seconds'], 1e-9)
+        
+        print("\n📈 Batch Throughput")
+        print(f"   📄 Documents: {batch_result['processed']} processed, "
+              f"{batch_result['skipped']} skipped (manifest), {len(batch_result['failed'])} failed")
+        print(f"   ⏱️ Wall time: {elapsed:.1f}s")
+        print(f"   📄 {batch_result['processed'] / elapsed * 60:.2f} docs/min")
+        print(f"   📃 {self.stats['pages_processed'] / elapsed:.2f} pages/s")
+        print(f"   🧠 {self.stats['embeddings_generated'] / elapsed:.2f} embeddings/s")
+        
+        for failure in batch_result['failed'][:20]:
+            print(f"   ❌ {failure['file']}: {failure['error']}")
+    
     def print_summary(self, results: Optional[Dict] = None):
         """Print processing summary"""
         duration = datetime.now() - self.stats['start_time']
@@ -501,6 +637,7 @@ class KRAIProcessor:
         print("="*60)
         print(f"🕐 Duration: {duration}")
         print(f"📄 Documents: {self.stats['documents_processed']}")
+        print(f"📃 Pages: {self.stats['pages_processed']}")
         print(f"🖼️ Images Extracted: {self.stats['images_extracted']}")
         print(f"👁️ Images Analyzed: {self.stats['images_analyzed']}")
         print(f"🧩 Chunks Created: {self.stats['chunks_created']}")
@@ -535,6 +672,9 @@ Examples:
   python krai_processor.py --mode image_only --file manual.pdf --verbose
   python krai_processor.py --mode demo --file test.pdf
   python krai_processor.py --mode embedding_only --file service_manual.pdf
+  python krai_processor.py --mode production --dir /archive/pdfs
+  python krai_processor.py --mode production --glob "/archive/**/*.pdf" --manifest archive.jsonl
+  python krai_processor.py --mode production --file slow_manual.pdf --profile --profile-rate 200
         """
     )
     
@@ -546,6 +686,30 @@ Examples:
                        type=str,
                        help='Path to PDF file to process (overrides TEST_PDF_PATH in .env)')
     
+    parser.add_argument('--dir',
+                       type=str,
+                       help='Process every matching file below this directory (batch mode)')
+    
+    parser.add_argument('--glob',
+                       type=str,
+                       help='File pattern for batch mode; relative to --dir (default **/*.pdf) or a standalone path pattern')
+    
+    parser.add_argument('--manifest',
+                       type=str,
+                       help='Manifest of completed file hashes for resuming (default: <dir>/.krai_manifest.jsonl)')
+    
+    parser.add_argument('--concurrency',
+                       type=int,
+                       help='Documents processed concurrently in batch mode (overrides MAX_CONCURRENT)')
+    
+    parser.add_argument('--profile',
+                       action='store_true',
+                       help='Run each document under the sampling profiler and write a collapsed-stack profile')
+    
+    parser.add_argument('--profile-rate',
+                       type=int,
+                       help='Profiler sampling rate in Hz (default KRAI_PROFILE_RATE_HZ or 100)')
+    
     parser.add_argument('--verbose', 
                        action='store_true',
                        help='Enable verbose output')
@@ -570,6 +734,42 @@ Examples:
     if args.debug:
         processor.config['debug_mode'] = True
     
+    if args.concurrency:
+        processor.config['max_concurrent'] = args.concurrency
+    
+    if args.profile:
+        processor.config['profile'] = True
+        processor.config['profile_rate_hz'] = args.profile_rate
+    
+    # Batch mode: initialize once, process the whole file set
+    if args.dir or args.glob:
+        if args.dir:
+            base_dir = Path(args.dir)
+            files = sorted(p for p in base_dir.glob(args.glob or '**/*.pdf') if p.is_file())
+            manifest_path = Path(args.manifest) if args.manifest else base_dir / '.krai_manifest.jsonl'
+        else:
+            files = sorted(Path(p) for p in glob.glob(args.glob, recursive=True) if Path(p).is_file())
+            manifest_path = Path(args.manifest or '.krai_manifest.jsonl')
+        
+        if not files:
+            print("❌ No files matched")
+            return
+        
+        try:
+            await processor.initialize()
+            print(f"🚀 Starting {processor.config['mode']} mode batch processing...")
+            batch_result = await processor.process_batch(files, BatchManifest(manifest_path))
+            processor.print_summary()
+            processor.print_throughput(batch_result)
+        except Exception as e:
+            print(f"❌ Fatal error: {e}")
+            if processor.config['debug_mode']:
+                import traceback
+                traceback.print_exc()
+        finally:
+            await processor.cleanup()
+        return
+    
     # Determine file to process
     file_path = args.file or processor.config['test_pdf_path']
     if not file_path:
@@ -0,0 +1,307 @@
+# KRAI Engine - Prometheus Metrics
+# Lock-free histograms, counters and gauges rendered in the Prometheus text format
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers a 5 ms SQL statement up to a 40 minute document
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 1200.0, 2400.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class _HistogramShard:
+    """Bucket counts written by exactly one thread"""
+
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+
+class Histogram(_Metric):
+    """Histogram whose hot path takes no lock
+
+    Every thread records into its own shard (the event loop is one thread, each
+    to_thread worker another), so increments never race; shards are summed
+    only when /metrics is scraped.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> thread id -> shard
+        self._series: Dict[Tuple[str, ...], Dict[int, _HistogramShard]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels) if labels else ()
+        shards = self._series.get(key)
+        if shards is None:
+            shards = self._series.setdefault(key, {})
+        thread_id = threading.get_ident()
+        shard = shards.get(thread_id)
+        if shard is None:
+            shard = shards.setdefault(thread_id, _HistogramShard(len(self.buckets) + 1))
+        shard.counts[bisect_left(self.buckets, value)] += 1
+        shard.sum += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the duration of a with-block (works inside async functions too)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Tuple[List[int], float]]:
+        """Per label set: (non-cumulative bucket counts incl. +Inf, sum)"""
+        result = {}
+        for key, shards in list(self._series.items()):
+            counts = [0] * (len(self.buckets) + 1)
+            total = 0.0
+            for shard in list(shards.values()):
+                for i, count in enumerate(shard.counts):
+                    counts[i] += count
+                total += shard.sum
+            result[key] = (counts, total)
+        return result
+
+    def summary(self, **labels) -> Dict[str, float]:
+        """Count, mean and bucket-interpolated p50/p95/p99 for one label set"""
+        counts, total = self.snapshot().get(self._key(labels), ([], 0.0))
+        observations = sum(counts)
+        if not observations:
+            return {"count": 0}
+        return {
+            "count": observations,
+            "mean": total / observations,
+            "p50": self._quantile(counts, 0.50),
+            "p95": self._quantile(counts, 0.95),
+            "p99": self._quantile(counts, 0.99)
+        }
+
+    def _quantile(self, counts: List[int], q: float) -> float:
+        rank = q * sum(counts)
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * ((rank - cumulative) / count)
+            cumulative += count
+        return self.buckets[-1]
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, (counts, total) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(list(self.buckets) + [float("inf")], counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class Counter(_Metric):
+    """Monotonic counter, sharded per thread like Histogram"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._series: Dict[Tuple[str, ...], Dict[int, List[float]]] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels) if labels else ()
+        shards = self._series.get(key)
+        if shards is None:
+            shards = self._series.setdefault(key, {})
+        thread_id = threading.get_ident()
+        cell = shards.get(thread_id)
+        if cell is None:
+            cell = shards.setdefault(thread_id, [0.0])
+        cell[0] += amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for key, shards in sorted(self._series.items()):
+            total = sum(cell[0] for cell in list(shards.values()))
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(total)}")
+        return lines
+
+class Gauge(_Metric):
+    """Point-in-time value; either set directly or sampled from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+        self._callback_error: Optional[str] = None
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        # Only called from the event loop thread
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, callback: Callable[[], Dict[Tuple[str, ...], float]]):
+        """Sample values at scrape time: callback returns {label values tuple: value}"""
+        self._callback = callback
+
+    @contextmanager
+    def track_inprogress(self, **labels) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        values = dict(self._values)
+        if self._callback:
+            try:
+                values.update(self._callback())
+                self._callback_error = None
+            except Exception as e:
+                # Logged once per distinct error, not on every scrape
+                error = f"{type(e).__name__}: {e}"
+                if error != self._callback_error:
+                    logger.warning(f"⚠️ Gauge {self.name} callback failed: {error}")
+                    self._callback_error = error
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class MetricsRegistry:
+    """Holds all metrics of the process and renders /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Global registry
+registry = MetricsRegistry()
+
+STAGE_DURATION = registry.histogram(
+    "krai_stage_duration_seconds", "Duration of document processing stages", ("stage", "status"))
+DOCUMENT_DURATION = registry.histogram(
+    "krai_document_duration_seconds", "End-to-end document processing time", ("status",))
+OLLAMA_REQUEST_DURATION = registry.histogram(
+    "krai_ollama_request_duration_seconds", "Latency of Ollama API calls", ("model", "operation"))
+OLLAMA_TIME_TO_FIRST_TOKEN = registry.histogram(
+    "krai_ollama_time_to_first_token_seconds", "Time until the first streamed token", ("model", "endpoint"))
+OLLAMA_REQUEST_ERRORS = registry.counter(
+    "krai_ollama_request_errors_total", "Failed Ollama API calls", ("model", "operation"))
+OLLAMA_RETRIES = registry.counter(
+    "krai_ollama_retries_total", "Ollama calls retried after a retryable failure", ("model", "operation"))
+OLLAMA_CONCURRENCY_LIMIT = registry.gauge(
+    "krai_ollama_concurrency_limit", "Adaptive limit of concurrent Ollama calls", ("operation",))
+OLLAMA_BREAKER_STATE = registry.gauge(
+    "krai_ollama_circuit_state", "Ollama circuit breaker state (0 closed, 1 half-open, 2 open)")
+OLLAMA_QUEUE_WAIT = registry.histogram(
+    "krai_ollama_queue_wait_seconds", "Time Ollama calls waited for a concurrency slot", ("lane", "operation"))
+OLLAMA_BACKEND_HEALTHY = registry.gauge(
+    "krai_ollama_backend_healthy", "1 while an Ollama host passes health checks", ("backend",))
+OLLAMA_BACKEND_OUTSTANDING = registry.gauge(
+    "krai_ollama_backend_outstanding", "Requests in flight per Ollama host", ("backend",))
+OLLAMA_MODEL_SWITCHES = registry.counter(
+    "krai_ollama_model_switches_total", "Model affinity hand-overs to another model", ("model",))
+OLLAMA_ACTIVE_MODEL = registry.gauge(
+    "krai_ollama_active_model", "1 for the model currently admitted by the affinity scheduler", ("model",))
+EMBEDDINGS_PENDING = registry.gauge(
+    "krai_embeddings_pending", "Chunks waiting for the embedding backfill worker", ("model",))
+EMBEDDING_BACKFILL = registry.counter(
+    "krai_embedding_backfill_total", "Chunks processed by the embedding backfill worker", ("status",))
+EMBEDDING_MIGRATION_CHUNKS = registry.counter(
+    "krai_embedding_migration_chunks_total", "Chunks re-embedded or rows deleted by embedding migrations", ("operation",))
+CONTENT_COUNTER_DRIFT = registry.counter(
+    "krai_content_counter_drift_total", "Absolute drift corrected by content counter reconciliation", ("counter",))
+SQL_DURATION = registry.histogram(
+    "krai_sql_duration_seconds", "Latency of SQL statements by statement class", ("statement",))
+HTTP_REQUESTS_IN_FLIGHT = registry.gauge(
+    "krai_http_requests_in_flight", "HTTP requests currently being served")
+QUEUE_DEPTH = registry.gauge(
+    "krai_queue_depth", "Work waiting or running per queue", ("queue",))
+
+class InFlightMiddleware:
+    """ASGI middleware counting HTTP requests until their last byte is sent (covers streaming responses)"""
+
+    def __init__(self, app, gauge: Gauge = HTTP_REQUESTS_IN_FLIGHT):
+        self.app = app
+        self.gauge = gauge
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        self.gauge.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.gauge.dec()
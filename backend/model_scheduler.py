@@ -0,0 +1,146 @@
+# KRAI Engine - Model Affinity Scheduler
+# Groups Ollama work by model across documents so a single GPU is not reloaded per call
+
+"""
+With several documents in flight, one document's vision calls and another's
+embedding calls interleave and Ollama unloads/reloads models on every switch.
+The scheduler admits requests for one active model at a time: work for other
+models queues until the active model has been idle for linger_seconds (so a
+document's next image arrives before the GPU is handed over), then the
+highest-priority model with waiting work becomes active (vision before
+embedding before LLM by default). max_hold_seconds bounds how long one model
+may keep the GPU while others wait.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from metrics import OLLAMA_ACTIVE_MODEL, OLLAMA_MODEL_SWITCHES
+
+logger = logging.getLogger(__name__)
+
+class ModelAffinityScheduler:
+    """Admit Ollama requests for one model at a time"""
+
+    def __init__(self, priority: Optional[List[str]] = None, linger_seconds: float = 0.5,
+                 max_hold_seconds: float = 60.0):
+        self.priority = [model for model in (priority or []) if model]
+        self.linger_seconds = linger_seconds
+        self.max_hold_seconds = max_hold_seconds
+        self.active: Optional[str] = None
+        self.active_since = 0.0
+        self.idle_since = 0.0
+        self.draining = False
+        self.in_flight: Counter = Counter()
+        self.waiting: Counter = Counter()
+        self.switches = 0
+        self._condition = asyncio.Condition()
+        self._linger: Optional[asyncio.TimerHandle] = None
+
+    def _rank(self, model: str) -> int:
+        return self.priority.index(model) if model in self.priority else len(self.priority)
+
+    def _admissible(self, model: str) -> bool:
+        if self.active is None:
+            return True
+        if model != self.active or self.draining:
+            return False
+        # Fairness: stop admitting once the active model has held the GPU too long and others wait
+        if self.max_hold_seconds and time.monotonic() - self.active_since > self.max_hold_seconds \
+                and any(count for other, count in self.waiting.items() if other != model):
+            self.draining = True
+            return False
+        return True
+
+    def _activate(self, model: Optional[str]):
+        if model == self.active:
+            return
+        if self.active is not None and model is not None:
+            self.switches += 1
+            OLLAMA_MODEL_SWITCHES.inc(model=model)
+            logger.info(f"🔀 Ollama model affinity: {self.active} -> {model} "
+                        f"(waiting: {dict(+self.waiting)})")
+        if self.active is not None:
+            OLLAMA_ACTIVE_MODEL.set(0, model=self.active)
+        if model is not None:
+            OLLAMA_ACTIVE_MODEL.set(1, model=model)
+        self.active = model
+        self.active_since = self.idle_since = time.monotonic()
+        self.draining = False
+
+    def _next_model(self) -> Optional[str]:
+        candidates = [model for model, count in self.waiting.items() if count]
+        if self.draining and len(candidates) > 1:
+            # Fairness hand-over: the model that held the GPU too long goes last
+            candidates = [model for model in candidates if model != self.active]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda model: (self._rank(model), -self.waiting[model]))
+
+    def _cancel_linger(self):
+        if self._linger is not None:
+            self._linger.cancel()
+            self._linger = None
+
+    async def _hand_over(self):
+        """Called when the active model went idle: switch to the next model with waiting work"""
+        async with self._condition:
+            self._linger = None
+            if self.active is None or self.in_flight[self.active] or \
+                    (self.waiting[self.active] and not self.draining):
+                return
+            self._activate(self._next_model())
+            self._condition.notify_all()
+
+    def _schedule_hand_over(self):
+        self._cancel_linger()
+        others_waiting = any(count for model, count in self.waiting.items() if model != self.active)
+        if not others_waiting:
+            # Nothing else queued: keep the model active (and loaded) for whoever comes next
+            return
+        # Linger counts from when the active model went idle, not from when others arrived
+        idle_for = time.monotonic() - self.idle_since
+        delay = 0.0 if self.draining else max(self.linger_seconds - idle_for, 0.0)
+        loop = asyncio.get_running_loop()
+        self._linger = loop.call_later(delay, lambda: asyncio.ensure_future(self._hand_over()))
+
+    @asynccontextmanager
+    async def turn(self, model: str):
+        """Hold a slot for `model`; waits while another model owns the GPU"""
+        async with self._condition:
+            if model == self.active:
+                self._cancel_linger()
+            if not self._admissible(model):
+                self.waiting[model] += 1
+                if not self.in_flight[self.active] and self._linger is None:
+                    self._schedule_hand_over()
+                try:
+                    await self._condition.wait_for(lambda: self._admissible(model))
+                finally:
+                    self.waiting[model] -= 1
+            if self.active is None:
+                self._activate(model)
+            self.in_flight[model] += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.in_flight[model] -= 1
+                if not self.in_flight[model] and model == self.active:
+                    self.idle_since = time.monotonic()
+                    self._schedule_hand_over()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "active_model": self.active,
+            "active_for_seconds": round(time.monotonic() - self.active_since, 1) if self.active else 0.0,
+            "draining": self.draining,
+            "in_flight": dict(+self.in_flight),
+            "waiting": dict(+self.waiting),
+            "switches": self.switches,
+            "priority": self.priority,
+        }
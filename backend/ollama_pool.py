@@ -0,0 +1,222 @@
+# KRAI Engine - Ollama Backend Pool
+# Health-checked Ollama hosts with model-aware, least-outstanding, document-sticky routing
+
+"""
+OLLAMA_BASE_URLS lists several Ollama hosts; OllamaTransport asks the pool for
+a backend on every attempt:
+
+- Health: GET /api/tags on every host at startup and every health_interval
+  seconds records which models each host has. failure_threshold consecutive
+  request failures mark a host unhealthy until its next successful check.
+- Model-aware: only healthy hosts that list the model are candidates (all
+  hosts that list it if none is healthy, so the transport's retries and
+  circuit breaker still decide).
+- Least outstanding: the candidate with the fewest requests in flight wins,
+  ties go to the lower observed latency.
+- Sticky: while a document is processed (bind_document), its calls for a
+  model stay on the host chosen first so that host keeps the model warm. A
+  document is pinned to the host with the fewest documents pinned for that
+  model (then least outstanding); fast hosts release pins sooner and so take
+  more documents.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+from metrics import OLLAMA_BACKEND_HEALTHY, OLLAMA_BACKEND_OUTSTANDING
+
+logger = logging.getLogger(__name__)
+
+# Document whose processing the current task belongs to (set by bind_document)
+_document_key: ContextVar[Optional[str]] = ContextVar("krai_ollama_document", default=None)
+
+class OllamaBackend:
+    """One Ollama host"""
+
+    def __init__(self, url: str, max_connections: int):
+        self.url = url.rstrip("/")
+        self.max_connections = max_connections
+        self.models: Optional[List[str]] = None  # None until the first health check
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.latency: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.url,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections)
+            )
+        return self._client
+
+    def serves(self, model: Optional[str]) -> bool:
+        # Same substring match as the required-model checks ("embeddinggemma" ~ "embeddinggemma:latest")
+        if model is None or self.models is None:
+            return True
+        return any(model in name for name in self.models)
+
+    def _set_healthy(self, healthy: bool):
+        if healthy != self.healthy:
+            logger.warning(f"{'✅' if healthy else '❌'} Ollama backend {self.url} "
+                           f"{'healthy again' if healthy else 'marked unhealthy'}"
+                           + ("" if healthy else f": {self.last_error}"))
+        self.healthy = healthy
+        OLLAMA_BACKEND_HEALTHY.set(1 if healthy else 0, backend=self.url)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "models": self.models,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "consecutive_failures": self.failures,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency else None,
+            "last_error": self.last_error,
+            "checked_seconds_ago": round(time.monotonic() - self.checked_at, 1) if self.checked_at else None,
+        }
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class OllamaPool:
+    """Routes Ollama calls across hosts"""
+
+    def __init__(self, urls: Iterable[str], max_connections: int = 24, failure_threshold: int = 3,
+                 health_interval: float = 15.0):
+        self.backends = [OllamaBackend(url, max_connections) for url in dict.fromkeys(urls) if url]
+        if not self.backends:
+            raise ValueError("At least one Ollama base URL is required")
+        self.failure_threshold = failure_threshold
+        self.health_interval = health_interval
+        self.sticky: Dict[Tuple[str, str], OllamaBackend] = {}
+        self._health_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.backends)
+
+    # -- health ------------------------------------------------------------
+
+    async def _check(self, backend: OllamaBackend, timeout: float) -> List[Dict[str, Any]]:
+        try:
+            response = await backend.client.get("/api/tags", timeout=timeout)
+            if response.status_code != 200:
+                raise RuntimeError(f"/api/tags returned {response.status_code}")
+            models = response.json().get("models", [])
+        except Exception as e:
+            backend.last_error = f"{type(e).__name__}: {e}"
+            backend.checked_at = time.monotonic()
+            backend._set_healthy(False)
+            return []
+        backend.models = [model["name"] for model in models]
+        backend.checked_at = time.monotonic()
+        backend.failures = 0
+        backend._set_healthy(True)
+        return models
+
+    async def check(self, timeout: float = 10.0) -> List[Dict[str, Any]]:
+        """Health-check every host; returns the union of their /api/tags models"""
+        results = await asyncio.gather(*(self._check(backend, timeout) for backend in self.backends))
+        merged: Dict[str, Dict[str, Any]] = {}
+        for models in results:
+            for model in models:
+                merged.setdefault(model["name"], model)
+        return list(merged.values())
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check()
+
+    def start_health_checks(self):
+        if self._health_task is None and self.health_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    # -- routing -----------------------------------------------------------
+
+    def bind_document(self, key: str) -> Token:
+        """Route this task's (and its children's) calls sticky to one host per model"""
+        return _document_key.set(key)
+
+    def release_document(self, token: Token):
+        key = _document_key.get()
+        _document_key.reset(token)
+        if key is not None:
+            for sticky_key in [k for k in self.sticky if k[0] == key]:
+                del self.sticky[sticky_key]
+
+    def choose(self, model: Optional[str], exclude: Iterable[OllamaBackend] = ()) -> OllamaBackend:
+        """Backend for the next call of `model`; `exclude` holds hosts that already failed this call"""
+        exclude = set(exclude)
+        serving = [b for b in self.backends if b.serves(model) and b not in exclude]
+        candidates = [b for b in serving if b.healthy] or serving \
+            or [b for b in self.backends if b not in exclude] or self.backends
+
+        key = _document_key.get()
+        if key is None or model is None:
+            return min(candidates, key=lambda b: (b.outstanding, b.latency or 0.0))
+
+        sticky = self.sticky.get((key, model))
+        if sticky in candidates:
+            return sticky
+        pinned = Counter(b.url for (_, pinned_model), b in self.sticky.items() if pinned_model == model)
+        backend = min(candidates, key=lambda b: (pinned[b.url], b.outstanding, b.latency or 0.0))
+        self.sticky[(key, model)] = backend
+        return backend
+
+    @contextmanager
+    def request(self, backend: OllamaBackend):
+        backend.outstanding += 1
+        backend.requests += 1
+        OLLAMA_BACKEND_OUTSTANDING.set(backend.outstanding, backend=backend.url)
+        try:
+            yield
+        finally:
+            backend.outstanding -= 1
+            OLLAMA_BACKEND_OUTSTANDING.set(backend.outstanding, backend=backend.url)
+
+    def record_success(self, backend: OllamaBackend, latency: float):
+        backend.failures = 0
+        # EWMA so a host that slows down loses ties quickly
+        backend.latency = latency if backend.latency is None else 0.8 * backend.latency + 0.2 * latency
+        if not backend.healthy:
+            backend._set_healthy(True)
+
+    def record_failure(self, backend: OllamaBackend, error: str):
+        backend.failures += 1
+        backend.last_error = error
+        if backend.healthy and backend.failures >= self.failure_threshold:
+            backend._set_healthy(False)
+            # Documents pinned to it move on with their next call
+            for sticky_key in [k for k, b in self.sticky.items() if b is backend]:
+                del self.sticky[sticky_key]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "backends": [backend.snapshot() for backend in self.backends],
+            "sticky_routes": len(self.sticky),
+            "health_interval_seconds": self.health_interval,
+        }
+
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for backend in self.backends:
+            await backend.close()
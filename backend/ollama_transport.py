@@ -0,0 +1,518 @@
+# KRAI Engine - Ollama Transport
+# Shared Ollama client with adaptive concurrency, circuit breaker, jittered retries and host pool
+
+"""
+Every Ollama call of the document processor goes through one OllamaTransport:
+
+- AdaptiveLimiter (one per operation: embed, vision, generate) caps requests
+  in flight AIMD-style. The limit grows by one per window of successful calls
+  whose latency stays within latency_tolerance x the observed no-load latency,
+  and is halved (at most once per window) when latency degrades or a call fails.
+- CircuitBreaker opens after breaker_failure_threshold consecutive failures.
+  While open, ingestion callers wait (up to breaker_max_wait seconds) instead
+  of sending requests; interactive callers (search) fail fast. After the reset
+  timeout one probe request is let through (half-open); the timeout doubles
+  on each failed probe.
+- Retryable failures (connection errors, timeouts, 429, 5xx) are retried up to
+  retry_attempts times with full-jitter exponential backoff from retry_delay.
+- Requests run in one of two lanes. Interactive callers (chat, vision analyze,
+  search query embeddings) are granted limiter slots before queued bulk
+  ingestion calls, and while any interactive request is in flight or queued,
+  bulk calls may only use bulk_share of each limit (at least one slot).
+- With model affinity enabled, ingestion calls pass a ModelAffinityScheduler
+  (model_scheduler.py) so work is grouped by model; interactive calls bypass it.
+  Every request carries keep_alive so the active model stays resident.
+- Each attempt is routed to one host of the OllamaPool (ollama_pool.py); a
+  retry never goes to a host that already failed the same call. Limits and the
+  breaker cover the pool as a whole.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Union
+
+import httpx
+
+from metrics import (OLLAMA_BREAKER_STATE, OLLAMA_CONCURRENCY_LIMIT, OLLAMA_QUEUE_WAIT, OLLAMA_REQUEST_DURATION,
+                     OLLAMA_REQUEST_ERRORS, OLLAMA_RETRIES)
+from model_scheduler import ModelAffinityScheduler
+from ollama_pool import OllamaBackend, OllamaPool
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+class OllamaError(Exception):
+    """Ollama answered with a non-retryable error (e.g. 404 for a missing model)"""
+
+class OllamaUnavailable(OllamaError):
+    """Circuit open or retries exhausted"""
+
+LANES = ("interactive", "bulk")
+
+class InteractiveLoad:
+    """Counts interactive requests across all operations; bulk is throttled while any are present"""
+
+    def __init__(self, bulk_share: float = 0.25):
+        self.bulk_share = bulk_share
+        self.active = 0
+        self.limiters: List["AdaptiveLimiter"] = []
+
+    @property
+    def present(self) -> bool:
+        return self.active > 0
+
+    @contextmanager
+    def track(self):
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            if not self.active:
+                # Bulk waiters held back by the throttle may run again
+                for limiter in self.limiters:
+                    limiter.dispatch()
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit driven by observed latency, with an interactive and a bulk lane
+
+    Interactive waiters are always granted before bulk waiters. While interactive
+    load is present, bulk may only use bulk_share of the limit (at least one slot).
+    """
+
+    def __init__(self, name: str, initial: int = 2, min_limit: int = 1, max_limit: int = 8,
+                 latency_tolerance: float = 2.0, load: Optional[InteractiveLoad] = None):
+        self.name = name
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.load = load or InteractiveLoad()
+        self.load.limiters.append(self)
+        self.lane_in_flight = {lane: 0 for lane in LANES}
+        self.queues: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+        self.no_load_latency: Optional[float] = None
+        self.last_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        OLLAMA_CONCURRENCY_LIMIT.set(int(self.limit), operation=name)
+
+    @property
+    def in_flight(self) -> int:
+        return sum(self.lane_in_flight.values())
+
+    @property
+    def waiting(self) -> int:
+        return sum(self._queued(lane) for lane in LANES)
+
+    def _queued(self, lane: str) -> int:
+        return sum(1 for waiter in self.queues[lane] if not waiter.done())
+
+    def _bulk_capacity(self) -> int:
+        if not self.load.present:
+            return int(self.limit)
+        return max(1, int(self.limit * self.load.bulk_share))
+
+    def _free(self, lane: str) -> bool:
+        if self.in_flight >= int(self.limit):
+            return False
+        return lane == "interactive" or self.lane_in_flight["bulk"] < self._bulk_capacity()
+
+    def dispatch(self):
+        """Grant free slots to queued waiters, interactive lane first"""
+        for lane in LANES:
+            queue = self.queues[lane]
+            while queue and self._free(lane):
+                waiter = queue.popleft()
+                if waiter.done():
+                    # Cancelled while queued
+                    continue
+                self.lane_in_flight[lane] += 1
+                waiter.set_result(None)
+
+    def _release(self, lane: str):
+        self.lane_in_flight[lane] -= 1
+        self.dispatch()
+
+    @asynccontextmanager
+    async def slot(self, lane: str = "bulk"):
+        start = time.perf_counter()
+        # Queue behind earlier waiters of the same lane (and behind interactive ones for bulk)
+        queued_ahead = self.queues[lane] or (lane == "bulk" and self.queues["interactive"])
+        if queued_ahead or not self._free(lane):
+            waiter = asyncio.get_running_loop().create_future()
+            self.queues[lane].append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Granted just before the cancellation arrived
+                    self._release(lane)
+                raise
+        else:
+            self.lane_in_flight[lane] += 1
+        OLLAMA_QUEUE_WAIT.observe(time.perf_counter() - start, lane=lane, operation=self.name)
+        try:
+            yield
+        finally:
+            self._release(lane)
+
+    def record(self, latency: Optional[float], ok: bool):
+        """Adjust the limit after a call (latency None for failures without a response)"""
+        now = time.monotonic()
+        if latency is not None:
+            self.last_latency = latency
+            if ok:
+                # Slowly forget the minimum so a permanently slower model is re-baselined
+                baseline = self.no_load_latency
+                self.no_load_latency = latency if baseline is None else min(latency, baseline * 1.01)
+
+        degraded = not ok or (latency is not None and self.no_load_latency is not None
+                              and latency > self.no_load_latency * self.latency_tolerance)
+        if degraded:
+            # One decrease per window: the calls already in flight saw the same congestion
+            window = self.no_load_latency or latency or 1.0
+            if now - self._last_decrease >= window:
+                self.limit = max(float(self.min_limit), self.limit / 2)
+                self._last_decrease = now
+        else:
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+        OLLAMA_CONCURRENCY_LIMIT.set(int(self.limit), operation=self.name)
+        # A higher limit frees slots for queued waiters
+        self.dispatch()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "lanes": {lane: {"in_flight": self.lane_in_flight[lane], "waiting": self._queued(lane)}
+                      for lane in LANES},
+            "no_load_latency_ms": round(self.no_load_latency * 1000, 1) if self.no_load_latency else None,
+            "last_latency_ms": round(self.last_latency * 1000, 1) if self.last_latency else None,
+        }
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half_open probe -> closed / open"""
+
+    STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, max_reset_timeout: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.opened_count = 0
+        self.last_error: Optional[str] = None
+        self._probe_in_flight = False
+        self._state_changed = asyncio.Event()
+        OLLAMA_BREAKER_STATE.set(0)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning(f"🔌 Ollama circuit breaker {self.state} -> {state}")
+        self.state = state
+        OLLAMA_BREAKER_STATE.set(self.STATES[state])
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        self._state_changed.set()
+        self._state_changed = asyncio.Event()
+
+    def _retry_at(self) -> float:
+        return (self.opened_at or 0.0) + self.reset_timeout
+
+    async def acquire(self, max_wait: float):
+        """Wait until a request may be sent; raises OllamaUnavailable after max_wait seconds"""
+        deadline = time.monotonic() + max_wait
+        while True:
+            if self.state == "closed":
+                return
+            now = time.monotonic()
+            if self.state == "open" and now >= self._retry_at():
+                self._set_state("half_open")
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+
+            wait = deadline - now
+            if wait <= 0:
+                raise OllamaUnavailable(f"Ollama circuit {self.state} (last error: {self.last_error})")
+            if self.state == "open":
+                wait = min(wait, max(self._retry_at() - now, 0.05))
+            try:
+                await asyncio.wait_for(self._state_changed.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def abandon(self):
+        """The caller gave up (cancelled) before its request completed"""
+        if self._probe_in_flight:
+            self._probe_in_flight = False
+            self._wake_waiters()
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        if self.state != "closed":
+            self.reset_timeout = self.base_reset_timeout
+            self._set_state("closed")
+
+    def record_failure(self, error: str):
+        self.consecutive_failures += 1
+        self.last_error = error
+        probe_failed = self.state == "half_open"
+        self._probe_in_flight = False
+        if probe_failed:
+            self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+        if probe_failed or (self.state == "closed" and self.consecutive_failures >= self.failure_threshold):
+            self.opened_at = time.monotonic()
+            self.opened_count += 1
+            self._set_state("open")
+
+    def snapshot(self) -> Dict[str, Any]:
+        retry_in = max(self._retry_at() - time.monotonic(), 0.0) if self.state == "open" else 0.0
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout_seconds": self.reset_timeout,
+            "retry_in_seconds": round(retry_in, 1),
+            "times_opened": self.opened_count,
+            "last_error": self.last_error,
+        }
+
+class OllamaTransport:
+    """All Ollama calls of a process, over one or more hosts"""
+
+    def __init__(self, base_urls: Union[str, List[str]], timeout: float = 300.0, retry_attempts: int = 3, retry_delay: float = 1.0,
+                 max_concurrency: int = 8, latency_tolerance: float = 2.0, breaker_failure_threshold: int = 5,
+                 breaker_reset_seconds: float = 30.0, breaker_max_wait: float = 300.0,
+                 keep_alive: Optional[str] = None, scheduler: Optional[ModelAffinityScheduler] = None,
+                 bulk_share: float = 0.25, health_interval: float = 15.0, backend_failure_threshold: int = 3):
+        urls = [base_urls] if isinstance(base_urls, str) else list(base_urls)
+        self.pool = OllamaPool(urls, max_connections=max_concurrency * 3, failure_threshold=backend_failure_threshold,
+                               health_interval=health_interval)
+        self.timeout = timeout
+        self.retry_attempts = retry_attempts
+        self.retry_delay = retry_delay
+        self.max_concurrency = max_concurrency
+        self.latency_tolerance = latency_tolerance
+        self.breaker_max_wait = breaker_max_wait
+        self.keep_alive = keep_alive
+        self.scheduler = scheduler
+        self.breaker = CircuitBreaker(breaker_failure_threshold, breaker_reset_seconds)
+        self.load = InteractiveLoad(bulk_share)
+        self.limiters: Dict[str, AdaptiveLimiter] = {}
+        self.retries = 0
+
+    @classmethod
+    def from_config(cls, ollama_config: Dict[str, Any]) -> "OllamaTransport":
+        scheduler = None
+        # The affinity gate models one GPU; with several hosts each keeps its own models warm
+        if ollama_config.get("model_affinity") and len(ollama_config["base_urls"]) == 1:
+            models = ollama_config["models"]
+            scheduler = ModelAffinityScheduler(
+                # Drain vision work first, then embedding batches
+                [models["vision"], models["embedding"], models["llm"]],
+                linger_seconds=ollama_config["affinity_linger_seconds"],
+                max_hold_seconds=ollama_config["affinity_max_hold_seconds"],
+            )
+        return cls(
+            ollama_config["base_urls"],
+            timeout=ollama_config["timeout"],
+            retry_attempts=ollama_config["retry_attempts"],
+            retry_delay=ollama_config["retry_delay"],
+            max_concurrency=ollama_config["max_concurrency"],
+            latency_tolerance=ollama_config["latency_tolerance"],
+            breaker_failure_threshold=ollama_config["breaker_failure_threshold"],
+            breaker_reset_seconds=ollama_config["breaker_reset_seconds"],
+            breaker_max_wait=ollama_config["breaker_max_wait"],
+            keep_alive=ollama_config.get("keep_alive"),
+            scheduler=scheduler,
+            bulk_share=ollama_config["bulk_share"],
+            health_interval=ollama_config["health_interval"],
+            backend_failure_threshold=ollama_config["backend_failure_threshold"],
+        )
+
+    def limiter(self, operation: str) -> AdaptiveLimiter:
+        if operation not in self.limiters:
+            # max_concurrency is per host
+            self.limiters[operation] = AdaptiveLimiter(operation, max_limit=self.max_concurrency * len(self.pool),
+                                                       latency_tolerance=self.latency_tolerance, load=self.load)
+        return self.limiters[operation]
+
+    def _with_keep_alive(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if self.keep_alive and "keep_alive" not in payload:
+            return {**payload, "keep_alive": self.keep_alive}
+        return payload
+
+    @asynccontextmanager
+    async def _affinity(self, model: str, interactive: bool):
+        if self.scheduler is None or interactive:
+            yield
+            return
+        async with self.scheduler.turn(model):
+            yield
+
+    async def post(self, path: str, payload: Dict[str, Any], operation: str, model: str,
+                   timeout: Optional[float] = None, interactive: bool = False) -> Dict[str, Any]:
+        """POST with retries; interactive callers jump the queue and do not wait for an open circuit"""
+        if interactive:
+            with self.load.track():
+                return await self._post(path, payload, operation, model, timeout, interactive)
+        return await self._post(path, payload, operation, model, timeout, interactive)
+
+    async def _post(self, path: str, payload: Dict[str, Any], operation: str, model: str,
+                    timeout: Optional[float], interactive: bool) -> Dict[str, Any]:
+        limiter = self.limiter(operation)
+        lane = "interactive" if interactive else "bulk"
+        payload = self._with_keep_alive(payload)
+        max_wait = 0.0 if interactive else self.breaker_max_wait
+        last_error = "no attempt made"
+        failed: List[OllamaBackend] = []
+
+        for attempt in range(self.retry_attempts + 1):
+            if attempt:
+                self.retries += 1
+                OLLAMA_RETRIES.inc(model=model, operation=operation)
+                # Full jitter: uniform in [0, delay * 2^attempt]
+                await asyncio.sleep(random.uniform(0, self.retry_delay * 2 ** (attempt - 1)))
+
+            await self.breaker.acquire(max_wait)
+            async with self._affinity(model, interactive), limiter.slot(lane):
+                backend = self.pool.choose(model, exclude=failed)
+                start = time.perf_counter()
+                try:
+                    with self.pool.request(backend), \
+                            OLLAMA_REQUEST_DURATION.time(model=model, operation=operation), \
+                            tracer.span(f"ollama.{operation}", model=model, attempt=attempt, backend=backend.url):
+                        response = await backend.client.post(path, json=payload, timeout=timeout or self.timeout)
+                except (httpx.TransportError, httpx.TimeoutException) as e:
+                    last_error = f"{type(e).__name__}: {e} ({backend.url})"
+                    OLLAMA_REQUEST_ERRORS.inc(model=model, operation=operation)
+                    self.breaker.record_failure(last_error)
+                    self.pool.record_failure(backend, last_error)
+                    failed.append(backend)
+                    limiter.record(None, ok=False)
+                    continue
+                except BaseException:
+                    self.breaker.abandon()
+                    raise
+                latency = time.perf_counter() - start
+
+            if response.status_code == 200:
+                self.breaker.record_success()
+                self.pool.record_success(backend, latency)
+                limiter.record(latency, ok=True)
+                return response.json()
+
+            OLLAMA_REQUEST_ERRORS.inc(model=model, operation=operation)
+            last_error = f"HTTP {response.status_code}: {response.text[:200]} ({backend.url})"
+            if response.status_code == 429 or response.status_code >= 500:
+                self.breaker.record_failure(last_error)
+                self.pool.record_failure(backend, last_error)
+                failed.append(backend)
+                limiter.record(latency, ok=False)
+                continue
+
+            if response.status_code == 404 and any(other is not backend and other not in failed and other.serves(model)
+                                                   for other in self.pool.backends):
+                # Model missing on this host (list older than the last health check): try another one
+                backend.models = [name for name in (backend.models or []) if model not in name]
+                failed.append(backend)
+                self.breaker.record_success()
+                limiter.record(latency, ok=True)
+                continue
+
+            # The backend is up; the request itself is wrong
+            self.breaker.record_success()
+            limiter.record(latency, ok=True)
+            raise OllamaError(f"Ollama {path} failed: {last_error}")
+
+        raise OllamaUnavailable(f"Ollama {path} failed after {self.retry_attempts + 1} attempts: {last_error}")
+
+    @asynccontextmanager
+    async def stream(self, path: str, payload: Dict[str, Any], operation: str) -> AsyncIterator[httpx.Response]:
+        """Streaming POST in the interactive lane (no retries: tokens may already be forwarded)
+
+        The caller reads the response lines and records its own latency metrics.
+        """
+        with self.load.track():
+            await self.breaker.acquire(0.0)
+            async with self.limiter(operation).slot("interactive"):
+                backend = self.pool.choose(payload.get("model"))
+                try:
+                    with self.pool.request(backend):
+                        async with backend.client.stream("POST", path, json=self._with_keep_alive(payload),
+                                                         timeout=httpx.Timeout(self.timeout, connect=10)) as response:
+                            if response.status_code == 429 or response.status_code >= 500:
+                                self.breaker.record_failure(f"HTTP {response.status_code}")
+                                self.pool.record_failure(backend, f"HTTP {response.status_code}")
+                            else:
+                                self.breaker.record_success()
+                            yield response
+                except (httpx.TransportError, httpx.TimeoutException) as e:
+                    error = f"{type(e).__name__}: {e} ({backend.url})"
+                    self.breaker.record_failure(error)
+                    self.pool.record_failure(backend, error)
+                    raise
+                except BaseException:
+                    self.breaker.abandon()
+                    raise
+
+    async def list_models(self, timeout: float = 10.0) -> List[Dict[str, Any]]:
+        """Health-check all hosts and return the union of their /api/tags models; not gated by the breaker"""
+        models = await self.pool.check(timeout)
+        if not any(backend.healthy for backend in self.pool.backends):
+            errors = "; ".join(f"{b.url}: {b.last_error}" for b in self.pool.backends)
+            raise OllamaUnavailable(f"No Ollama host reachable ({errors})")
+        return models
+
+    async def preload(self, models: Dict[str, str]) -> List[str]:
+        """Load models with keep_alive so the first document does not pay the load time
+
+        `models` maps operation -> model name; embedding models are loaded through
+        /api/embed, everything else through an empty /api/generate. Every healthy
+        host that has the model loads it.
+        """
+        loaded = []
+        for operation, model in models.items():
+            if operation == "embed":
+                path, payload = "/api/embed", {"model": model, "input": ""}
+            else:
+                path, payload = "/api/generate", {"model": model}
+            for backend in self.pool.backends:
+                if not backend.healthy or not backend.serves(model):
+                    continue
+                try:
+                    response = await backend.client.post(path, json=self._with_keep_alive(payload),
+                                                         timeout=self.timeout)
+                    if response.status_code != 200:
+                        raise OllamaError(f"HTTP {response.status_code}: {response.text[:200]}")
+                    loaded.append(f"{model}@{backend.url}" if len(self.pool) > 1 else model)
+                except (OllamaError, httpx.HTTPError) as e:
+                    logger.warning(f"⚠️ Preloading {model} on {backend.url} failed: {e}")
+        return loaded
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "pool": self.pool.snapshot(),
+            "circuit_breaker": self.breaker.snapshot(),
+            "concurrency": {name: limiter.snapshot() for name, limiter in self.limiters.items()},
+            "retries": self.retries,
+            "retry_attempts": self.retry_attempts,
+            "keep_alive": self.keep_alive,
+            "interactive_requests": self.load.active,
+            "bulk_share": self.load.bulk_share,
+            "model_affinity": self.scheduler.snapshot() if self.scheduler else None,
+        }
+
+    async def close(self):
+        await self.pool.close()
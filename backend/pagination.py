@@ -0,0 +1,67 @@
+# KRAI Engine - Keyset Pagination
+# Opaque cursors over (created_at, id) so listing cost does not grow with page depth
+
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded"""
+
+def encode_cursor(created_at: datetime, document_id) -> str:
+    """Opaque token for the position after (created_at, id)"""
+    payload = json.dumps({"c": created_at.isoformat(), "i": str(document_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(token: str) -> Tuple[datetime, uuid.UUID]:
+    """(created_at, id) of a token returned by encode_cursor"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["c"]), uuid.UUID(payload["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {token!r}") from e
+
+def keyset_page_query(
+    limit: int,
+    cursor: Optional[str] = None,
+    document_type: Optional[str] = None,
+    manufacturer: Optional[str] = None,
+) -> Tuple[str, List]:
+    """
+    Query for one page of document ids, newest first.
+
+    Selects only (id, created_at) with equality filters ahead of the keyset
+    predicate, so each filter combination is answered by an index-only scan
+    of the matching idx_documents_*_created_id index (migration 15) and stops
+    after `limit` rows at any depth. The manufacturer name is resolved to its
+    id first; a name lookup through a join would defeat the ordered scan.
+    """
+    conditions = []
+    params: List = []
+
+    if document_type:
+        params.append(document_type)
+        conditions.append(f"d.document_type = ${len(params)}")
+
+    if manufacturer:
+        params.append(manufacturer)
+        conditions.append(f"d.manufacturer_id = (SELECT id FROM krai_core.manufacturers WHERE name = ${len(params)})")
+
+    if cursor:
+        created_at, document_id = decode_cursor(cursor)
+        params.extend([created_at, document_id])
+        conditions.append(f"(d.created_at, d.id) < (${len(params) - 1}, ${len(params)})")
+
+    params.append(limit)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"""
+        SELECT d.id, d.created_at
+        FROM krai_core.documents d
+        {where}
+        ORDER BY d.created_at DESC, d.id DESC
+        LIMIT ${len(params)}
+    """
+    return query, params
@@ -0,0 +1,154 @@
+# KRAI Engine - Page-Streaming PDF Extraction
+# Yields (page_no, text, image_refs) one page at a time; image bytes are loaded on demand
+
+import logging
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# PyPDF2 caches every object it resolves; dropping the cache every N pages keeps memory flat
+PAGE_CACHE_RELEASE_INTERVAL = 50
+
+class ImageRef:
+    """Reference to an image inside a PDF; bytes are materialized only by load()"""
+
+    __slots__ = ("page_no", "index", "name", "filter", "width", "height", "colorspace", "_loader")
+
+    def __init__(self, page_no: int, index: int, name: str, loader: Callable[[], bytes],
+                 filter: Optional[str] = None, width: Optional[int] = None, height: Optional[int] = None,
+                 colorspace: Optional[str] = None):
+        self.page_no = page_no
+        self.index = index
+        self.name = name
+        self.filter = filter
+        self.width = width
+        self.height = height
+        self.colorspace = colorspace
+        self._loader = loader
+
+    def load(self) -> bytes:
+        """Read the image bytes (the source document must still be open)"""
+        return self._loader()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "page": self.page_no,
+            "index": self.index,
+            "name": self.name,
+            "filter": self.filter,
+            "width": self.width,
+            "height": self.height,
+            "colorspace": self.colorspace
+        }
+
+    def __repr__(self) -> str:
+        return f"ImageRef(page={self.page_no}, index={self.index}, name={self.name!r})"
+
+class PageContent(NamedTuple):
+    page_no: int
+    text: str
+    image_refs: List[ImageRef]
+
+def materialize(image) -> bytes:
+    """Image bytes from an ImageRef, a legacy {'data': ...} dict or raw bytes"""
+    if isinstance(image, ImageRef):
+        return image.load()
+    if isinstance(image, dict):
+        return materialize(image.get("data", b""))
+    return image
+
+# Image filters the vision pipeline can consume directly (JPEG / Flate-encoded PNG data)
+SUPPORTED_IMAGE_FILTERS = ("/DCTDecode", "/FlateDecode")
+
+def _pypdf_image_loader(reader, page_index: int, name: str) -> Callable[[], bytes]:
+    """Re-resolve the XObject from the reader instead of keeping its data alive"""
+    def load() -> bytes:
+        xobjects = reader.pages[page_index]["/Resources"]["/XObject"].get_object()
+        return xobjects[name].get_object()._data
+    return load
+
+def _pypdf_image_refs(reader, page, page_index: int) -> List[ImageRef]:
+    """Image XObjects of a page; their data is dropped with the reader cache, not kept in the refs"""
+    refs = []
+    resources = page.get("/Resources", {})
+    if "/XObject" not in resources:
+        return refs
+
+    xobjects = resources["/XObject"].get_object()
+    for name in xobjects:
+        try:
+            obj = xobjects[name].get_object()
+            if obj.get("/Subtype") != "/Image" or obj.get("/Filter") not in SUPPORTED_IMAGE_FILTERS:
+                continue
+            refs.append(ImageRef(
+                page_no=page_index + 1,
+                index=len(refs),
+                name=str(name),
+                loader=_pypdf_image_loader(reader, page_index, name),
+                filter=str(obj.get("/Filter")),
+                width=obj.get("/Width"),
+                height=obj.get("/Height"),
+                colorspace=str(obj.get("/ColorSpace")) if obj.get("/ColorSpace") else None
+            ))
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to inspect image {name} on page {page_index + 1}: {e}")
+    return refs
+
+def iter_pdf_pages(stream, release_interval: int = PAGE_CACHE_RELEASE_INTERVAL) -> Iterator[PageContent]:
+    """Lazily yield PageContent for every page of a PDF read with PyPDF2
+
+    The stream (file handle, mmap or BytesIO) must stay open while pages are
+    consumed and while ImageRefs are loaded.
+    """
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(stream)
+    total_pages = len(reader.pages)
+
+    for page_index in range(total_pages):
+        text = ""
+        image_refs: List[ImageRef] = []
+        try:
+            page = reader.pages[page_index]
+            text = page.extract_text() or ""
+            image_refs = _pypdf_image_refs(reader, page, page_index)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to extract page {page_index + 1}: {e}")
+
+        yield PageContent(page_index + 1, text, image_refs)
+
+        if release_interval and (page_index + 1) % release_interval == 0:
+            # Resolved objects (content streams, images) are re-read from the stream on demand
+            cache = getattr(reader, "resolved_objects", None)
+            if isinstance(cache, dict):
+                cache.clear()
+
+def iter_pymupdf_pages(doc) -> Iterator[PageContent]:
+    """Lazily yield PageContent for an open PyMuPDF (fitz) document"""
+    import fitz
+
+    def pixmap_loader(xref: int) -> Callable[[], bytes]:
+        def load() -> bytes:
+            pix = fitz.Pixmap(doc, xref)
+            if pix.n - pix.alpha >= 4:  # CMYK -> RGB
+                pix = fitz.Pixmap(fitz.csRGB, pix)
+            return pix.tobytes("png")
+        return load
+
+    for page_index in range(len(doc)):
+        page = doc[page_index]
+        image_refs = []
+        for img in page.get_images():
+            # (xref, smask, width, height, bpc, colorspace, alt colorspace, name, filter, ...)
+            xref = img[0]
+            image_refs.append(ImageRef(
+                page_no=page_index + 1,
+                index=len(image_refs),
+                name=img[7] if len(img) > 7 else str(xref),
+                loader=pixmap_loader(xref),
+                filter=img[8] if len(img) > 8 else None,
+                width=img[2],
+                height=img[3],
+                colorspace=img[5] or 'unknown'
+            ))
+        yield PageContent(page_index + 1, page.get_text(), image_refs)
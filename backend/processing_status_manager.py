@@ -3,13 +3,19 @@
 
 import asyncio
 import time
-from typing import Dict, List, Optional, Any
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Set
 from datetime import datetime
 from enum import Enum
 from dataclasses import dataclass, asdict
 import json
 import logging
 
+from status_backends import StatusBackend
+from metrics import STAGE_DURATION, DOCUMENT_DURATION
+from tracing import tracer
+
 logger = logging.getLogger(__name__)
 
 class ProcessingStage(Enum):
@@ -75,6 +81,9 @@ class DocumentProcessingStatus:
     overall_status: ProcessingStatus = ProcessingStatus.PENDING
     current_stage: Optional[ProcessingStage] = None
     stages: Dict[ProcessingStage, StageProgress] = None
+    process_id: Optional[str] = None
+    # Sampling profile of this job when one was requested (path, samples, rate)
+    profile: Optional[Dict[str, Any]] = None
     
     def __post_init__(self):
         if self.stages is None:
@@ -117,6 +126,7 @@ class DocumentProcessingStatus:
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON serialization"""
         return {
+            'process_id': self.process_id,
             'document_id': self.document_id,
             'filename': self.filename,
             'file_size': self.file_size,
@@ -130,31 +140,221 @@ class DocumentProcessingStatus:
             'stages': {
                 stage.value: stage_progress.to_dict() 
                 for stage, stage_progress in self.stages.items()
-            }
+            },
+            'profile': self.profile
         }
 
+def _merge_delta(base: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """Return base updated with delta (nested dicts merged, inputs left untouched)"""
+    merged = dict(base)
+    for key, value in delta.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge_delta(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+class StatusSubscription:
+    """A single stream consumer; pending deltas are coalesced per process"""
+    
+    def __init__(self, broker: 'StatusEventBroker', process_id: Optional[str] = None):
+        self.broker = broker
+        self.process_id = process_id
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self.summary: Optional[Dict[str, Any]] = None
+        self._event = asyncio.Event()
+    
+    def push(self, process_id: str, delta: Dict[str, Any], summary: Optional[Dict[str, Any]] = None):
+        """Queue a delta, merging it into any not-yet-delivered delta for the same process"""
+        if self.process_id and process_id != self.process_id:
+            return
+        
+        existing = self.pending.get(process_id)
+        if existing is None:
+            # Deltas are shared between subscribers and never mutated
+            self.pending[process_id] = delta
+        else:
+            self.pending[process_id] = _merge_delta(existing, delta)
+            self.broker.stats['deltas_coalesced'] += 1
+        
+        if summary is not None:
+            self.summary = summary
+        self._event.set()
+    
+    async def next_batch(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Wait for pending deltas; returns None if nothing arrived within timeout"""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        
+        # Let a burst of progress ticks collapse into one message
+        if self.broker.coalesce_interval > 0:
+            await asyncio.sleep(self.broker.coalesce_interval)
+        
+        self._event.clear()
+        batch = {'processes': self.pending, 'timestamp': time.time()}
+        if self.summary is not None:
+            batch['summary'] = self.summary
+        self.pending = {}
+        self.summary = None
+        
+        self.broker.stats['batches_delivered'] += 1
+        return batch
+    
+    def close(self):
+        """Detach from the broker"""
+        self.broker.unsubscribe(self)
+
+class StatusEventBroker:
+    """Fans out stage transitions and progress deltas to stream subscribers"""
+    
+    def __init__(self, coalesce_interval: float = 0.25):
+        self.coalesce_interval = coalesce_interval
+        self._subscribers: Set[StatusSubscription] = set()
+        self.stats = {
+            'events_published': 0,
+            'deltas_coalesced': 0,
+            'batches_delivered': 0
+        }
+    
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+    
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+    
+    def subscribe(self, process_id: Optional[str] = None) -> StatusSubscription:
+        """Register a new subscriber"""
+        subscription = StatusSubscription(self, process_id)
+        self._subscribers.add(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription: StatusSubscription):
+        """Remove a subscriber"""
+        self._subscribers.discard(subscription)
+    
+    def publish(self, process_id: str, delta: Dict[str, Any], summary: Optional[Dict[str, Any]] = None):
+        """Deliver a delta to every subscriber (non-blocking)"""
+        self.stats['events_published'] += 1
+        for subscription in self._subscribers:
+            subscription.push(process_id, delta, summary)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Broker statistics for the performance endpoint"""
+        return dict(self.stats, subscribers=self.subscriber_count,
+                    coalesce_interval=self.coalesce_interval)
+
 class ProcessingStatusManager:
     """Manages processing status for all documents"""
     
-    def __init__(self):
+    def __init__(self, backend: Optional[StatusBackend] = None):
         self.active_processes: Dict[str, DocumentProcessingStatus] = {}
-        self.completed_processes: List[DocumentProcessingStatus] = []
+        # Recent completions keyed by process id (oldest first); older entries
+        # are served by a persistent backend if one is configured
+        self.completed_processes: "OrderedDict[str, DocumentProcessingStatus]" = OrderedDict()
+        self.document_index: Dict[str, str] = {}
         self.max_completed_history = 50
         self._lock = asyncio.Lock()
+        self.events = StatusEventBroker()
+        self.backend = backend or StatusBackend()
+    
+    async def set_backend(self, backend: StatusBackend):
+        """Swap the persistence backend (called once the database pool exists)"""
+        await self.backend.stop()
+        self.backend = backend
+        await self.backend.start(on_remote_update=self._on_remote_update)
+        logger.info(f"📊 Processing status backend: {backend.name}")
+    
+    async def close(self):
+        """Flush pending status writes"""
+        await self.backend.stop()
+    
+    def _persist(self, process_id: str, status: DocumentProcessingStatus, final: bool = False):
+        """Queue the current state for the backend; writes are batched there"""
+        if self.backend.persistent:
+            self.backend.save(process_id, status, final)
+    
+    def _on_remote_update(self, process_id: str, data: Dict[str, Any]):
+        """Relay a status written by another worker to local stream subscribers"""
+        if process_id in self.active_processes or not self.events.has_subscribers:
+            return
+        
+        delta = {'state': data}
+        if data.get('overall_status') in (ProcessingStatus.COMPLETED.value, ProcessingStatus.FAILED.value):
+            delta['removed'] = True
+        self.events.publish(process_id, delta)
+    
+    def _publish(self, process_id: str, status: DocumentProcessingStatus,
+                 stage: Optional[ProcessingStage] = None, **extra):
+        """Publish the changed fields of a process (skipped when nobody is listening)"""
+        if not self.events.has_subscribers:
+            return
+        
+        delta = {
+            'overall_status': status.overall_status.value,
+            'current_stage': status.current_stage.value if status.current_stage else None,
+            'overall_progress_percent': status.overall_progress_percent,
+            'total_duration': status.total_duration,
+            'estimated_remaining': status.estimated_remaining
+        }
+        if stage is not None:
+            delta['stages'] = {stage.value: status.stages[stage].to_dict()}
+        delta.update(extra)
+        
+        summary = None
+        if 'created' in extra or 'removed' in extra:
+            summary = {
+                'active_processes': len(self.active_processes),
+                'completed_processes': len(self.completed_processes),
+                'average_processing_time': self._average_duration()
+            }
+        
+        self.events.publish(process_id, delta, summary)
+    
+    def _average_duration(self) -> float:
+        """Average duration of the completions held in memory"""
+        if not self.completed_processes:
+            return 0
+        total_duration = sum(proc.total_duration or 0 for proc in self.completed_processes.values())
+        return total_duration / len(self.completed_processes)
+    
+    async def subscribe_events(self, process_id: Optional[str] = None):
+        """Subscribe to status deltas; returns (subscription, snapshot) taken atomically"""
+        async with self._lock:
+            subscription = self.events.subscribe(process_id)
+            snapshot = [
+                status.to_dict()
+                for pid, status in self.active_processes.items()
+                if process_id is None or pid == process_id
+            ]
+            local_ids = list(self.active_processes.keys())
+        
+        # Jobs running on other workers (persistent backends only)
+        remote = await self.backend.list_active(exclude=local_ids)
+        snapshot.extend(status for status in remote
+                        if process_id is None or status.get('process_id') == process_id)
+        return subscription, snapshot
     
     async def create_process(self, filename: str, file_size: int) -> str:
         """Create a new processing status entry"""
         async with self._lock:
-            process_id = f"proc_{int(time.time() * 1000)}"
+            # Random suffix keeps ids unique across workers and hosts
+            process_id = f"proc_{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}"
             
             status = DocumentProcessingStatus(
                 document_id=None,  # Will be set later
                 filename=filename,
                 file_size=file_size,
-                start_time=datetime.now()
+                start_time=datetime.now(),
+                process_id=process_id
             )
             
             self.active_processes[process_id] = status
+            self._publish(process_id, status, created=status.to_dict())
+            self._persist(process_id, status)
             
             logger.info(f"📊 Created processing status for: {filename} (ID: {process_id})")
             return process_id
@@ -177,6 +377,10 @@ class ProcessingStatusManager:
             stage_progress.total_operations = total_operations
             stage_progress.current_operation = current_operation
             stage_progress.progress_percent = 0
+            # Becomes the parent of every span the stage opens in this task
+            tracer.open_span(process_id, stage.value, f"stage.{stage.value}", stage=stage.value)
+            self._publish(process_id, status, stage)
+            self._persist(process_id, status)
             
             logger.info(f"🔄 Started stage {stage.value} for {status.filename}")
     
@@ -199,6 +403,8 @@ class ProcessingStatusManager:
                 stage_progress.progress_percent = int(
                     (completed_operations / stage_progress.total_operations) * 100
                 )
+            self._publish(process_id, status, stage)
+            self._persist(process_id, status)
             
             logger.debug(f"📈 Updated {stage.value}: {stage_progress.progress_percent}% - {current_operation}")
     
@@ -214,6 +420,11 @@ class ProcessingStatusManager:
             stage_progress.status = ProcessingStatus.COMPLETED
             stage_progress.end_time = datetime.now()
             stage_progress.progress_percent = 100
+            if stage_progress.duration is not None:
+                STAGE_DURATION.observe(stage_progress.duration, stage=stage.value, status="completed")
+            tracer.close_span(process_id, stage.value)
+            self._publish(process_id, status, stage)
+            self._persist(process_id, status)
             
             logger.info(f"✅ Completed stage {stage.value} for {status.filename} "
                        f"(Duration: {stage_progress.duration:.2f}s)")
@@ -230,9 +441,15 @@ class ProcessingStatusManager:
             stage_progress.status = ProcessingStatus.FAILED
             stage_progress.end_time = datetime.now()
             stage_progress.error_message = error_message
+            if stage_progress.duration is not None:
+                STAGE_DURATION.observe(stage_progress.duration, stage=stage.value, status="failed")
+            tracer.close_span(process_id, stage.value, error_message)
             
             # Mark overall status as failed
             status.overall_status = ProcessingStatus.FAILED
+            DOCUMENT_DURATION.observe((datetime.now() - status.start_time).total_seconds(), status="failed")
+            self._publish(process_id, status, stage)
+            self._persist(process_id, status, final=True)
             
             logger.error(f"❌ Failed stage {stage.value} for {status.filename}: {error_message}")
     
@@ -243,41 +460,76 @@ class ProcessingStatusManager:
                 return
             
             status = self.active_processes[process_id]
-            status.document_id = document_id
+            status.document_id = str(document_id) if document_id else None
             status.overall_status = ProcessingStatus.COMPLETED
             status.end_time = datetime.now()
             status.current_stage = None
+            DOCUMENT_DURATION.observe(status.total_duration, status="completed")
             
             # Move to completed history
-            self.completed_processes.append(status)
+            self.completed_processes[process_id] = status
+            if status.document_id:
+                self.document_index[status.document_id] = process_id
             
             # Limit completed history
-            if len(self.completed_processes) > self.max_completed_history:
-                self.completed_processes = self.completed_processes[-self.max_completed_history:]
+            while len(self.completed_processes) > self.max_completed_history:
+                evicted_id, evicted = self.completed_processes.popitem(last=False)
+                if evicted.document_id and self.document_index.get(evicted.document_id) == evicted_id:
+                    del self.document_index[evicted.document_id]
             
             # Remove from active processes
             del self.active_processes[process_id]
+            self._publish(process_id, status, removed=True, document_id=status.document_id)
+            self._persist(process_id, status, final=True)
             
             logger.info(f"🎉 Completed processing: {status.filename} "
                        f"(Total Duration: {status.total_duration:.2f}s)")
     
+    async def attach_profile(self, process_id: str, profile: Dict[str, Any]):
+        """Link a sampling profile to a running or completed process"""
+        async with self._lock:
+            status = self.active_processes.get(process_id) or self.completed_processes.get(process_id)
+            if status is None:
+                return
+            
+            status.profile = profile
+            self._publish(process_id, status, profile=profile)
+            self._persist(process_id, status, final=status.end_time is not None)
+    
     async def get_process_status(self, process_id: str) -> Optional[Dict[str, Any]]:
-        """Get status for a specific process"""
+        """Get status for a specific process (document ids are accepted as well)"""
         async with self._lock:
             if process_id in self.active_processes:
                 return self.active_processes[process_id].to_dict()
             
-            # Check completed processes
-            for completed in self.completed_processes:
-                if completed.document_id == process_id or f"proc_{process_id}" in str(completed.document_id):
-                    return completed.to_dict()
+            if process_id in self.completed_processes:
+                return self.completed_processes[process_id].to_dict()
             
-            return None
+            by_document = self.document_index.get(process_id)
+            if by_document:
+                return self.completed_processes[by_document].to_dict()
+        
+        # Not held by this worker: ask the shared backend
+        if process_id.startswith("proc_"):
+            return await self.backend.load(process_id)
+        return await self.backend.load_by_document(process_id)
+    
+    async def get_status_by_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Get the latest processing status for a document"""
+        async with self._lock:
+            process_id = self.document_index.get(document_id)
+            if process_id:
+                return self.completed_processes[process_id].to_dict()
+        
+        return await self.backend.load_by_document(document_id)
     
     async def get_all_active_processes(self) -> List[Dict[str, Any]]:
         """Get all active processing statuses"""
         async with self._lock:
-            return [status.to_dict() for status in self.active_processes.values()]
+            local = [status.to_dict() for status in self.active_processes.values()]
+            local_ids = list(self.active_processes.keys())
+        
+        return local + await self.backend.list_active(exclude=local_ids)
     
     async def get_processing_summary(self) -> Dict[str, Any]:
         """Get a summary of all processing activities"""
@@ -285,16 +537,11 @@ class ProcessingStatusManager:
             active_count = len(self.active_processes)
             completed_count = len(self.completed_processes)
             
-            # Calculate average processing time from completed
-            avg_duration = 0
-            if self.completed_processes:
-                total_duration = sum(proc.total_duration or 0 for proc in self.completed_processes)
-                avg_duration = total_duration / len(self.completed_processes)
-            
             return {
                 'active_processes': active_count,
                 'completed_processes': completed_count,
-                'average_processing_time': avg_duration,
+                'average_processing_time': self._average_duration(),
+                'status_backend': self.backend.get_stats(),
                 'active_details': [
                     {
                         'filename': status.filename,
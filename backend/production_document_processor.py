@@ -8,13 +8,13 @@ import asyncio
 import aiohttp
 import json
 import logging
+from contextlib import nullcontext
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Union
 import torch
 import numpy as np
 # from sentence_transformers import SentenceTransformer  # Not needed for Ollama API
-import httpx
 from PIL import Image
 import io
 
@@ -32,6 +32,20 @@ from intelligent_model_extractor import IntelligentModelExtractor
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+from hybrid_search import HybridSearchEngine
+from vector_quantization import QuantizationMode
+from code_index import CodeIndex
+from status_backends import create_status_backend
+from upload_spool import DocumentSource, peak_rss_bytes, current_rss_bytes, MB
+from pdf_pages import ImageRef, iter_pdf_pages, materialize
+from metrics import SQL_DURATION
+from embedding_backfill import EmbeddingBackfillWorker, clear_pending, record_pending, store_embeddings
+from embedding_migration import EmbeddingMigrator
+from content_counters import ContentCounterReconciler, read_content_counters
+from ollama_transport import OllamaError, OllamaTransport
+from tracing import tracer
+from profiler import SamplingProfiler
+
 # Import status monitoring
 from processing_status_manager import (
     status_manager, ProcessingStage, ProcessingStatus,
@@ -58,8 +72,9 @@ class ProductionDocumentProcessor:
         # Initialize embedding model configuration for Ollama
         self._initialize_embedding_model()
         
-        # Initialize Ollama client
+        # Initialize Ollama client (shared transport: adaptive concurrency, circuit breaker, retries)
         self.ollama_base_url = self.config.get_ollama_config()["base_url"]
+        self.ollama = OllamaTransport.from_config(self.config.get_ollama_config())
         
         # Initialize model names
         self.llm_model = None
@@ -99,6 +114,11 @@ class ProductionDocumentProcessor:
         self.embedding_cache = {}
         self.vector_cache = {}
         
+        # Background re-embedding of failed chunks and model migrations (started in initialize)
+        self.embedding_backfill: Optional[EmbeddingBackfillWorker] = None
+        self.embedding_migrator: Optional[EmbeddingMigrator] = None
+        self.counter_reconciler: Optional[ContentCounterReconciler] = None
+        
     def _initialize_embedding_model(self) -> None:
         """Initialize embedding model configuration for Ollama"""
         try:
@@ -112,8 +132,27 @@ class ProductionDocumentProcessor:
             
             # Store model configuration for Ollama API calls
             self.embedding_model_name = model_name
+            self.embedding_model_version = "latest"
             self.embedding_device = device
             
+            # Quantized (halfvec / binary) copies for the ANN index, rescored at full precision
+            self.vector_quantization = QuantizationMode(self.config.performance_config["vector_quantization"])
+            self.rescore_candidates = self.config.performance_config["rescore_candidates"]
+            if self.vector_quantization.quantized:
+                logger.info(f"🗜️ Vector quantization: {self.vector_quantization.value} "
+                            f"(rescoring top {self.rescore_candidates})")
+            
+            # Matryoshka coarse index over the leading dimensions (09_matryoshka_index.sql)
+            embedding_config = self.config.model_config["embedding"]
+            self.coarse_dimension = embedding_config.get("truncate_dimension") or 0
+            if self.coarse_dimension and not 0 < self.coarse_dimension < embedding_config["dimension"]:
+                logger.warning(f"⚠️ Ignoring truncate_dimension {self.coarse_dimension} "
+                               f"(must be below {embedding_config['dimension']})")
+                self.coarse_dimension = 0
+            if self.coarse_dimension:
+                logger.info(f"🪆 Matryoshka coarse index: first {self.coarse_dimension} dimensions "
+                            f"(rescoring top {self.rescore_candidates})")
+            
             logger.info(f"✅ Embedding model configuration ready for Ollama API")
             
         except Exception as e:
@@ -129,12 +168,63 @@ class ProductionDocumentProcessor:
             self.db_pool = await self._create_database_pool()
             logger.info("✅ Database connection pool initialized")
             
+            # Hybrid (full-text + vector) search over stored chunks
+            self.search_engine = HybridSearchEngine(
+                self.db_pool, self.embed_query, self.embedding_model_name,
+                quantization=self.vector_quantization, rescore_candidates=self.rescore_candidates,
+                coarse_dimension=self.coarse_dimension,
+                scoped_search=self.config.performance_config["scoped_vector_search"],
+                scope_refresh_interval=self.config.performance_config["scope_refresh_interval"]
+            )
+            
+            # Error code / part number postings
+            self.code_index = CodeIndex(self.db_pool, self.classifier)
+            
+            # Shared processing status (KRAI_STATUS_BACKEND=memory|postgres)
+            await status_manager.set_backend(
+                create_status_backend(self.db_pool, self.supabase_config.get_database_url())
+            )
+            
             # Setup Supabase storage buckets
             await self._setup_storage_buckets()
             
             # Test Ollama connection
             await self._test_ollama_connection()
             
+            # Re-embed chunks whose embedding call failed, while Ollama is healthy
+            performance = self.config.performance_config
+            if performance["embedding_backfill"]:
+                self.embedding_backfill = EmbeddingBackfillWorker(
+                    self.db_pool, self.ollama, self._embed_with_model, self.embedding_model_name,
+                    quantization=self.vector_quantization, interval=performance["backfill_interval"],
+                    batch_size=performance["backfill_batch_size"]
+                )
+                self.embedding_backfill.start()
+            
+            # Online re-embedding; also picks up a model cut over by another worker
+            self.embedding_migrator = EmbeddingMigrator(
+                self.db_pool, self.ollama, self._embed_with_model,
+                lambda: (self.embedding_model_name, self.embedding_model_version), self.set_embedding_model,
+                quantization=self.vector_quantization,
+                dimension=self.config.model_config["embedding"]["dimension"],
+                batch_size=performance["reembed_batch_size"], rate=performance["reembed_rate"],
+                gc_batch_size=performance["reembed_gc_batch_size"],
+                poll_interval=performance["reembed_poll_interval"]
+            )
+            try:
+                await self.embedding_migrator.sync_active_model()
+                self.embedding_migrator.start()
+            except Exception as e:
+                logger.warning(f"⚠️ Embedding migrations unavailable (11_embedding_migrations.sql applied?): {e}")
+                self.embedding_migrator = None
+            
+            # Corrects drift of the trigger-maintained catalog counters
+            if performance["counter_reconcile_interval"] > 0:
+                self.counter_reconciler = ContentCounterReconciler(
+                    self.db_pool, interval=performance["counter_reconcile_interval"]
+                )
+                self.counter_reconciler.start()
+            
             logger.info("✅ Production Document Processor initialized successfully")
             
         except Exception as e:
@@ -167,45 +257,64 @@ class ProductionDocumentProcessor:
             logger.warning(f"⚠️ Storage bucket setup warning: {e}")
     
     async def _test_ollama_connection(self):
-        """Test Ollama connection"""
+        """Test Ollama connection (health-checks every host of the pool)"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.ollama_base_url}/api/tags", timeout=10)
-                if response.status_code == 200:
-                    models = response.json().get("models", [])
-                    logger.info(f"✅ Ollama connected - {len(models)} models available")
-                    
-                    # Check required models
-                    model_names = [model["name"] for model in models]
-                    required_models = [
-                        self.config.model_config["llm"]["model_name"],
-                        self.config.model_config["embedding"]["model_name"],
-                        self.config.model_config["vision"]["model_name"]
-                    ]
-                    
-                    missing_models = [m for m in required_models if not any(m in name for name in model_names)]
-                    if missing_models:
-                        logger.warning(f"⚠️ Missing models: {missing_models}")
-                    else:
-                        logger.info("✅ All required models available")
-                    
-                    # Store model info for production use
-                    self.available_models = model_names
-                    self.missing_models = missing_models
-                    
-                    # Initialize model names for production use
-                    self.llm_model = self.config.model_config["llm"]["model_name"]
-                    self.vision_model = self.config.model_config["vision"]["model_name"]
-                    
-                    logger.info(f"🤖 LLM Model: {self.llm_model}")
-                    logger.info(f"👁️ Vision Model: {self.vision_model}")
-                    logger.info(f"🧠 Embedding Model: {self.embedding_model_name}")
-                else:
-                    logger.error(f"❌ Ollama connection failed: {response.status_code}")
-                    
+            # Periodic /api/tags checks keep the pool's host and model lists current
+            self.ollama.pool.start_health_checks()
+            models = await self.ollama.list_models()
+            healthy = sum(1 for backend in self.ollama.pool.backends if backend.healthy)
+            logger.info(f"✅ Ollama connected - {len(models)} models available on "
+                        f"{healthy}/{len(self.ollama.pool)} hosts")
+            
+            # Check required models
+            model_names = [model["name"] for model in models]
+            required_models = [
+                self.config.model_config["llm"]["model_name"],
+                self.config.model_config["embedding"]["model_name"],
+                self.config.model_config["vision"]["model_name"]
+            ]
+            
+            missing_models = [m for m in required_models if not any(m in name for name in model_names)]
+            if missing_models:
+                logger.warning(f"⚠️ Missing models: {missing_models}")
+            else:
+                logger.info("✅ All required models available")
+            
+            # Store model info for production use
+            self.available_models = model_names
+            self.missing_models = missing_models
+            
+            # Initialize model names for production use
+            self.llm_model = self.config.model_config["llm"]["model_name"]
+            self.vision_model = self.config.model_config["vision"]["model_name"]
+            
+            logger.info(f"🤖 LLM Model: {self.llm_model}")
+            logger.info(f"👁️ Vision Model: {self.vision_model}")
+            logger.info(f"🧠 Embedding Model: {self.embedding_model_name}")
+
+            if self.config.get_ollama_config()["preload_models"]:
+                # Vision last: it is drained first, so it should be the resident model on a single GPU
+                preload = {"embed": self.embedding_model_name, "vision": self.vision_model}
+                preload = {op: m for op, m in preload.items() if m not in missing_models}
+                loaded = await self.ollama.preload(preload)
+                logger.info(f"🔥 Preloaded models (keep_alive {self.ollama.keep_alive}): {loaded}")
+                
         except Exception as e:
             logger.error(f"❌ Ollama connection test failed: {e}")
     
+    def set_embedding_model(self, model_name: str, model_version: str = "latest"):
+        """Switch search, ingestion and backfill to another embedding model (migration cut-over)"""
+        if model_name != self.config.model_config["embedding"]["model_name"]:
+            logger.info(f"🧠 Embedding model {model_name} ({model_version}) overrides "
+                        f"OLLAMA_EMBEDDING_MODEL={self.config.model_config['embedding']['model_name']}")
+        self.embedding_model_name = model_name
+        self.embedding_model_version = model_version
+        if getattr(self, "search_engine", None):
+            self.search_engine.embedding_model_name = model_name
+        if self.embedding_backfill:
+            self.embedding_backfill.model_name = model_name
+            self.embedding_backfill.model_version = model_version
+    
     def _calculate_file_hash(self, content: bytes) -> str:
         """Calculate SHA256 hash of file content"""
         import hashlib
@@ -240,13 +349,38 @@ class ProductionDocumentProcessor:
         else:
             return "error"
     
-    async def process_document(self, file_path: Path, file_content: bytes) -> Dict[str, Any]:
-        """Process a document with full AI pipeline"""
+    async def process_document(self, file_path: Path, file_content: Union[bytes, DocumentSource],
+                               profile: bool = False, profile_rate_hz: Optional[int] = None) -> Dict[str, Any]:
+        """Process a document with full AI pipeline (from bytes or a spooled file)
+        
+        With profile=True the job runs under the sampling profiler and the
+        collapsed-stack profile is linked from its processing status.
+        """
         start_time = datetime.now()
         document_id = None
+        rss_peak_before = peak_rss_bytes()
+        
+        if isinstance(file_content, DocumentSource):
+            source = file_content
+        else:
+            source = None
+        file_size = source.size if source else len(file_content)
         
         # Create processing status
-        process_id = await create_processing_status(file_path.name, len(file_content))
+        process_id = await create_processing_status(file_path.name, file_size)
+        # Stage, Ollama, storage and DB spans of this task nest under this root
+        trace = tracer.begin_trace(process_id, "process_document", filename=file_path.name, file_size=file_size)
+        trace_error = None
+        # Ollama calls of this document stay on one host per model
+        ollama_route = self.ollama.pool.bind_document(process_id)
+        
+        profiler = None
+        if profile:
+            profiler = SamplingProfiler(profile_rate_hz)
+            profiler.start()
+            await status_manager.attach_profile(process_id, dict(
+                profiler.summary(), url=f"/api/production/processing/profile/{process_id}"
+            ))
         
         try:
             logger.info(f"🚀 Starting production processing for: {file_path.name} (Status ID: {process_id})")
@@ -257,34 +391,38 @@ class ProductionDocumentProcessor:
             # OPTIMIZED: No file storage, only process and extract data
             storage_result = {
                 'url': f"processed://in-memory/{file_path.name}",  # Virtual URL for tracking
-                'hash': self._calculate_file_hash(file_content),
-                'size': len(file_content),
+                'hash': source.sha256 if source else self._calculate_file_hash(file_content),
+                'size': file_size,
                 'storage_cost': 0.0  # ZERO storage cost!
             }
             
             await status_manager.complete_stage(process_id, ProcessingStage.UPLOAD)
             logger.info(f"✅ Document uploaded: {storage_result['url']}")
             
-            # 2. Extract content from PDF
-            await update_processing_status(process_id, ProcessingStage.EXTRACT_CONTENT, "Extracting text and images from PDF...")
-            extraction_result = await self._extract_content_with_gpu(file_content)
-            await status_manager.complete_stage(process_id, ProcessingStage.EXTRACT_CONTENT)
-            
-            # 3. Process images with Vision AI
-            if extraction_result.get("images"):
-                await update_processing_status(process_id, ProcessingStage.PROCESS_IMAGES, 
-                                             f"Processing {len(extraction_result['images'])} images with Vision AI...",
-                                             0, len(extraction_result["images"]))
-                image_results = await self._process_images_with_vision(
-                    extraction_result["images"], 
-                    file_content,
-                    document_id=None,  # Will be set later
-                    process_id=process_id
-                )
-                await status_manager.complete_stage(process_id, ProcessingStage.PROCESS_IMAGES)
-            else:
-                await status_manager.complete_stage(process_id, ProcessingStage.PROCESS_IMAGES)
-                image_results = {"images": []}
+            # The PDF stays open (mmap / BytesIO) until the image stage has loaded its ImageRefs
+            with (source.open() if source else nullcontext(io.BytesIO(file_content))) as stream:
+                # 2. Extract content from PDF
+                await update_processing_status(process_id, ProcessingStage.EXTRACT_CONTENT, "Extracting text and images from PDF...")
+                extraction_result = await self._extract_content_with_gpu(stream)
+                await status_manager.complete_stage(process_id, ProcessingStage.EXTRACT_CONTENT)
+                
+                # 3. Process images with Vision AI
+                if extraction_result.get("images"):
+                    await update_processing_status(process_id, ProcessingStage.PROCESS_IMAGES, 
+                                                 f"Processing {len(extraction_result['images'])} images with Vision AI...",
+                                                 0, len(extraction_result["images"]))
+                    image_results = await self._process_images_with_vision(
+                        extraction_result["images"], 
+                        document_id=None,  # Will be set later
+                        process_id=process_id
+                    )
+                    await status_manager.complete_stage(process_id, ProcessingStage.PROCESS_IMAGES)
+                else:
+                    await status_manager.complete_stage(process_id, ProcessingStage.PROCESS_IMAGES)
+                    image_results = {"images": []}
+                
+                # Image references are only valid while the stream is open
+                extraction_result["images"] = []
             
             # 4. Classify document
             await update_processing_status(process_id, ProcessingStage.CLASSIFY_DOCUMENT, "Analyzing document type and manufacturer...")
@@ -311,7 +449,7 @@ class ProductionDocumentProcessor:
             # 6. Store document in database
             await update_processing_status(process_id, ProcessingStage.STORE_DOCUMENT, "Storing document metadata in database...")
             document_id = await self._store_document_in_db(
-                file_path, file_content, storage_result, extraction_result,
+                file_path, storage_result, extraction_result,
                 classification_result, version_result, model_result, image_results
             )
             await status_manager.complete_stage(process_id, ProcessingStage.STORE_DOCUMENT)
@@ -319,9 +457,19 @@ class ProductionDocumentProcessor:
             # 7. Process chunks with GPU acceleration
             await update_processing_status(process_id, ProcessingStage.PROCESS_CHUNKS, "Creating intelligent text chunks...")
             chunk_result = await self._process_chunks_with_gpu(
-                document_id, extraction_result["text"], classification_result
+                document_id, extraction_result["text"], classification_result,
+                extraction_result.get("page_spans")
             )
             self.stats["chunks_created"] += len(chunk_result["chunks"])
+            
+            # Index error codes / part numbers found in the stored chunks
+            try:
+                code_index_result = await self.code_index.index_document(
+                    document_id, chunk_result["chunks"], classification_result["manufacturer"]
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Code indexing failed: {e}")
+                code_index_result = {"error_codes": 0, "part_numbers": 0}
             await status_manager.complete_stage(process_id, ProcessingStage.PROCESS_CHUNKS)
             
             # 8. Generate embeddings with GPU
@@ -338,6 +486,7 @@ class ProductionDocumentProcessor:
             # Finalize processing
             await update_processing_status(process_id, ProcessingStage.FINALIZE, "Completing processing...")
             processing_time = (datetime.now() - start_time).total_seconds()
+            rss_peak_after = peak_rss_bytes()
             await status_manager.complete_stage(process_id, ProcessingStage.FINALIZE)
             await status_manager.complete_process(process_id, document_id)
             
@@ -351,9 +500,16 @@ class ProductionDocumentProcessor:
                     "pages": extraction_result["pages"],
                     "chunks": len(chunk_result["chunks"]),
                     "embeddings": len(embedding_result["embeddings"]),
+                    "pending_embeddings": embedding_result.get("pending", 0),
                     "images": len(image_results),
                     "models": len(model_result["models"]),
-                    "confidence": classification_result.get("confidence", 0.0)
+                    "error_code_postings": code_index_result["error_codes"],
+                    "part_number_postings": code_index_result["part_numbers"],
+                    "confidence": classification_result.get("confidence", 0.0),
+                    "file_size_mb": round(file_size / MB, 2),
+                    # Process-wide RSS high-water mark; growth is what this document added to it
+                    "peak_rss_mb": round(rss_peak_after / MB, 1),
+                    "peak_rss_growth_mb": round((rss_peak_after - rss_peak_before) / MB, 1)
                 },
                 "gpu_used": self.config.device_config["device"],
                 "performance_metrics": {
@@ -365,6 +521,7 @@ class ProductionDocumentProcessor:
         except Exception as e:
             logger.error(f"❌ Production document processing failed: {e}")
             self.stats["errors"] += 1
+            trace_error = e
             
             # Fail current stage if it exists
             try:
@@ -383,82 +540,55 @@ class ProductionDocumentProcessor:
                 "processing_time": (datetime.now() - start_time).total_seconds(),
                 "process_id": process_id if 'process_id' in locals() else None
             }
+        
+        finally:
+            tracer.end_trace(trace, trace_error)
+            self.ollama.pool.release_document(ollama_route)
+            if profiler:
+                await status_manager.attach_profile(process_id, dict(
+                    await profiler.save(process_id), url=f"/api/production/processing/profile/{process_id}"
+                ))
     
-    async def _extract_content_with_gpu(self, file_content: bytes) -> Dict[str, Any]:
-        """Extract content from PDF with GPU acceleration"""
+    async def _extract_content_with_gpu(self, file_content) -> Dict[str, Any]:
+        """Extract text and image references from PDF bytes or a seekable stream (file handle / mmap)"""
         try:
-            import PyPDF2
-            
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-            pages = len(pdf_reader.pages)
-            
-            text_content = []
-            images = []
-            
-            for page_num, page in enumerate(pdf_reader.pages):
-                try:
-                    text = page.extract_text()
-                    if text.strip():
-                        text_content.append(text)
-                    
-                    # Extract images from page
-                    try:
-                        page_images = self._extract_images_from_page(page, page_num)
-                        images.extend(page_images)
-                    except Exception as e:
-                        logger.warning(f"⚠️ Failed to extract images from page {page_num}: {e}")
-                        
-                except Exception as e:
-                    logger.warning(f"⚠️ Failed to extract text from page {page_num}: {e}")
-            
-            return {
-                "text": "\n".join(text_content),
-                "pages": pages,
-                "images": images,  # Extracted images from PDF
-                "extraction_method": "PyPDF2"
-            }
+            # Page parsing is CPU-bound; run it off the event loop so other
+            # requests and concurrent batch documents are not stalled
+            return await asyncio.to_thread(self._extract_pdf_content, file_content)
             
         except Exception as e:
             logger.error(f"❌ Content extraction failed: {e}")
             raise
     
-    def _extract_images_from_page(self, page, page_num: int) -> List[bytes]:
-        """Extract images from a PDF page"""
-        try:
-            images = []
-            
-            # Get page resources
-            if "/XObject" in page.get("/Resources", {}):
-                xobjects = page["/Resources"]["/XObject"].get_object()
-                
-                for obj_name in xobjects:
-                    obj = xobjects[obj_name]
-                    
-                    # Check if it's an image
-                    if obj.get("/Subtype") == "/Image":
-                        try:
-                            # Extract image data
-                            if obj.get("/Filter") == "/DCTDecode":  # JPEG
-                                image_data = obj._data
-                                images.append(image_data)
-                                logger.info(f"📷 Extracted JPEG image from page {page_num}")
-                                
-                            elif obj.get("/Filter") == "/FlateDecode":  # PNG
-                                image_data = obj._data
-                                images.append(image_data)
-                                logger.info(f"📷 Extracted PNG image from page {page_num}")
-                                
-                        except Exception as e:
-                            logger.warning(f"⚠️ Failed to extract image {obj_name} from page {page_num}: {e}")
-                            continue
-            
-            return images
-            
-        except Exception as e:
-            logger.warning(f"⚠️ Failed to extract images from page {page_num}: {e}")
-            return []
+    def _extract_pdf_content(self, file_content) -> Dict[str, Any]:
+        """Parse text and image references page by page (runs in a worker thread)"""
+        stream = io.BytesIO(file_content) if isinstance(file_content, bytes) else file_content
+        
+        text_content = []
+        images: List[ImageRef] = []
+        # (character offset in the joined text, 1-based page number)
+        page_spans = []
+        offset = 0
+        pages = 0
+        
+        # Pages are consumed one at a time; image bytes stay in the PDF until a stage loads them
+        for page_no, text, image_refs in iter_pdf_pages(stream):
+            pages = page_no
+            if text.strip():
+                text_content.append(text)
+                page_spans.append((offset, page_no))
+                offset += len(text) + 1  # "\n" separator
+            images.extend(image_refs)
+        
+        return {
+            "text": "\n".join(text_content),
+            "pages": pages,
+            "images": images,  # ImageRefs; the source stream must stay open until they are loaded
+            "page_spans": page_spans,
+            "extraction_method": "PyPDF2"
+        }
     
-    async def _process_images_with_vision(self, images: List, file_content: bytes, document_id: str = None, process_id: str = None) -> List[Dict]:
+    async def _process_images_with_vision(self, images: List, document_id: str = None, process_id: str = None) -> List[Dict]:
         """Process images with Vision AI model"""
         if not images:
             return []
@@ -469,102 +599,99 @@ class ProductionDocumentProcessor:
         vision_config = self.config.get_vision_config()
         
         try:
-            async with httpx.AsyncClient() as client:
-                for i, image_data in enumerate(images):
-                    try:
-                        # Update progress
-                        if process_id:
-                            await status_manager.update_stage_progress(
-                                process_id, ProcessingStage.PROCESS_IMAGES, 
-                                i, f"Processing image {i+1}/{len(images)} with Vision AI..."
-                            )
-                        # Convert image to base64
-                        import base64
-                        image_b64 = base64.b64encode(image_data).decode('utf-8')
-                        
-                        # Call Ollama Vision API
-                        payload = {
-                            "model": vision_config["model_name"],
-                            "prompt": "Analyze this technical document image. Describe any diagrams, charts, error codes, part numbers, or technical specifications you can identify.",
-                            "images": [image_b64],
-                            "stream": False,
-                            "options": {
-                                "temperature": 0.3,
-                                "max_new_tokens": vision_config["max_new_tokens"]
-                            }
-                        }
-                        
-                        response = await client.post(
-                            f"{self.ollama_base_url}/api/generate",
-                            json=payload,
-                            timeout=60
+            for i, image in enumerate(images):
+                try:
+                    # Load this image's bytes only now
+                    image_data = materialize(image)
+                    
+                    # Update progress
+                    if process_id:
+                        await status_manager.update_stage_progress(
+                            process_id, ProcessingStage.PROCESS_IMAGES, 
+                            i, f"Processing image {i+1}/{len(images)} with Vision AI..."
                         )
-                        
-                        if response.status_code == 200:
-                            result = response.json()
-                            analysis = result.get("response", "")
+                    # Convert image to base64
+                    import base64
+                    image_b64 = base64.b64encode(image_data).decode('utf-8')
+                    
+                    # Call Ollama Vision API
+                    payload = {
+                        "model": vision_config["model_name"],
+                        "prompt": "Analyze this technical document image. Describe any diagrams, charts, error codes, part numbers, or technical specifications you can identify.",
+                        "images": [image_b64],
+                        "stream": False,
+                        "options": {
+                            "temperature": 0.3,
+                            "max_new_tokens": vision_config["max_new_tokens"]
+                        }
+                    }
+                    
+                    result = await self.ollama.post("/api/generate", payload, operation="vision",
+                                                    model=vision_config["model_name"], timeout=60)
+                    analysis = result.get("response", "")
+                    
+                    # Upload image to specialized Supabase bucket (ENABLED!)
+                    image_storage = None
+                    if self.supabase_storage:
+                        try:
+                            # Determine image type based on analysis content
+                            image_type = self._determine_image_type(analysis, document_id)
                             
-                            # Upload image to specialized Supabase bucket (ENABLED!)
-                            image_storage = None
-                            if self.supabase_storage:
-                                try:
-                                    # Determine image type based on analysis content
-                                    image_type = self._determine_image_type(analysis, document_id)
-                                    
-                                    image_path = Path(f"doc_{document_id}_image_{i}_{hash(str(image_data))[:8]}.png")
-                                    image_storage = await self.supabase_storage.upload_image(
-                                        image_path, image_data, image_type
-                                    )
-                                    if image_storage:
-                                        logger.info(f"✅ Image uploaded to {image_storage['bucket']}: {image_storage['url']}")
-                                    else:
-                                        logger.warning(f"⚠️ Image upload returned None: {image_path}")
-                                except Exception as upload_err:
-                                    logger.error(f"❌ Image upload failed for image_{i}: {upload_err}")
-                                    image_storage = None
+                            image_path = Path(f"doc_{document_id}_image_{i}_{hash(str(image_data))[:8]}.png")
+                            image_storage = await self.supabase_storage.upload_image(
+                                image_path, image_data, image_type
+                            )
+                            if image_storage:
+                                logger.info(f"✅ Image uploaded to {image_storage['bucket']}: {image_storage['url']}")
                             else:
-                                logger.warning(f"⚠️ Supabase Storage not initialized, skipping image_{i} upload")
-                            
-                            # Store image in database
-                            image_record = {
-                                "image_index": i,
-                                "analysis": analysis,
-                                "storage_url": image_storage["url"] if image_storage else None,
-                                "hash": image_storage["hash"] if image_storage else None,
-                                "size": image_storage["size"] if image_storage else 0,
-                                "content_type": image_storage["content_type"] if image_storage else "image/png"
-                            }
-                            results.append(image_record)
-                            
-                            logger.info(f"✅ Vision analysis completed for image {i}")
-                            
-                    except Exception as e:
-                        logger.error(f"❌ Vision analysis failed for image {i}: {e}")
-                        results.append({
-                            "image_index": i,
-                            "analysis": "",
-                            "error": str(e)
-                        })
-        
+                                logger.warning(f"⚠️ Image upload returned None: {image_path}")
+                        except Exception as upload_err:
+                            logger.error(f"❌ Image upload failed for image_{i}: {upload_err}")
+                            image_storage = None
+                    else:
+                        logger.warning(f"⚠️ Supabase Storage not initialized, skipping image_{i} upload")
+                    
+                    # Store image in database
+                    image_record = {
+                        "image_index": i,
+                        "analysis": analysis,
+                        "storage_url": image_storage["url"] if image_storage else None,
+                        "hash": image_storage["hash"] if image_storage else None,
+                        "size": image_storage["size"] if image_storage else 0,
+                        "content_type": image_storage["content_type"] if image_storage else "image/png"
+                    }
+                    results.append(image_record)
+                    
+                    logger.info(f"✅ Vision analysis completed for image {i}")
+                        
+                except Exception as e:
+                    logger.error(f"❌ Vision analysis failed for image {i}: {e}")
+                    results.append({
+                        "image_index": i,
+                        "analysis": "",
+                        "error": str(e)
+                    })
+    
         except Exception as e:
             logger.error(f"❌ Vision processing failed: {e}")
         
         # Store images in database
         if results:
-            async with self.db_pool.acquire() as conn:
+            async with self.db_pool.acquire() as conn, tracer.span("db.insert_images", rows=len(results)):
                 for image_result in results:
-                    await conn.execute(
-                        """
-                        INSERT INTO krai_content.images 
-                        (document_id, image_index, storage_url, file_hash, ai_description, created_at)
-                        VALUES ($1, $2, $3, $4, $5, NOW())
-                        """,
-                        self.current_document_id,  # We need to pass document_id
-                        image_result["image_index"],
-                        image_result["storage_url"],
-                        image_result["hash"],
-                        image_result["analysis"]
-                    )
+                    with SQL_DURATION.time(statement="insert_image"):
+                        await conn.execute(
+                            """
+                            INSERT INTO krai_content.images 
+                            (document_id, image_index, storage_url, file_hash, ai_description, created_at)
+                            VALUES ($1, $2, $3, $4, $5, NOW())
+                            """,
+                            self.current_document_id,  # We need to pass document_id
+                            image_result["image_index"],
+                            image_result["storage_url"],
+                            image_result["hash"],
+                            image_result["analysis"]
+                        )
             
             logger.info(f"✅ Stored {len(results)} images in database")
         
@@ -599,19 +726,25 @@ class ProductionDocumentProcessor:
         content_weight = 0.7
         filename_weight = 0.3
         
+        # JSONConfigClassifier nests the labels under "classification"
+        content_labels = content_result.get("classification", content_result)
+        filename_labels = filename_result.get("classification", filename_result)
+        
         # Combine document types
-        doc_type = content_result.get("document_type", "unknown")
+        doc_type = content_labels.get("document_type", "unknown")
         if doc_type == "unknown":
-            doc_type = filename_result.get("document_type", "unknown")
+            doc_type = filename_labels.get("document_type", "unknown")
         
         # Combine manufacturers
-        manufacturer = content_result.get("manufacturer", "unknown")
+        manufacturer = content_labels.get("manufacturer", "unknown")
         if manufacturer == "unknown":
-            manufacturer = filename_result.get("manufacturer", "unknown")
+            manufacturer = filename_labels.get("manufacturer", "unknown")
         
         # Combine confidence scores
-        content_confidence = content_result.get("confidence", 0.0)
-        filename_confidence = filename_result.get("confidence", 0.0)
+        content_confidence = content_result.get("analysis", {}).get(
+            "hybrid_confidence", content_result.get("confidence", 0.0))
+        filename_confidence = filename_result.get("analysis", {}).get(
+            "hybrid_confidence", filename_result.get("confidence", 0.0))
         
         combined_confidence = (
             content_confidence * content_weight + 
@@ -621,14 +754,24 @@ class ProductionDocumentProcessor:
         return {
             "document_type": doc_type,
             "manufacturer": manufacturer,
+            "series": content_labels.get("series", filename_labels.get("series", "unknown")),
             "confidence": combined_confidence,
             "filename_classification": filename_result,
             "content_classification": content_result
         }
     
-    async def _process_chunks_with_gpu(self, document_id: str, text: str, classification: Dict) -> Dict:
+    async def _process_chunks_with_gpu(self, document_id: str, text: str, classification: Dict,
+                                       page_spans: Optional[List[Tuple[int, int]]] = None) -> Dict:
         """Process text into chunks with GPU acceleration"""
         try:
+            import bisect
+            span_offsets = [span[0] for span in page_spans or []]
+            
+            def page_at(position: int) -> int:
+                if not span_offsets:
+                    return 1
+                return page_spans[max(0, bisect.bisect_right(span_offsets, position) - 1)][1]
+            
             chunk_size = self.config.model_config["chunking"]["default_chunk_size"]
             chunk_overlap = self.config.model_config["chunking"]["chunk_overlap"]
             
@@ -645,34 +788,38 @@ class ProductionDocumentProcessor:
                         "text": chunk_text,
                         "start_position": start,
                         "end_position": end,
-                        "chunk_index": len(chunks)
+                        "chunk_index": len(chunks),
+                        "page_start": page_at(start),
+                        "page_end": page_at(min(end, len(text)) - 1)
                     })
                 
                 start = end - chunk_overlap
             
             # Store chunks in database
             chunk_ids = []
-            async with self.db_pool.acquire() as conn:
+            async with self.db_pool.acquire() as conn, tracer.span("db.insert_chunks", rows=len(chunks)):
                 for chunk in chunks:
                     # Generate fingerprint for chunk
                     import hashlib
                     fingerprint = hashlib.md5(chunk["text"].encode('utf-8')).hexdigest()
                     
-                    chunk_id = await conn.fetchval(
-                             """
-                             INSERT INTO krai_intelligence.chunks 
-                             (document_id, text_chunk, chunk_index, page_start, page_end, processing_status, fingerprint, created_at)
-                             VALUES ($1, $2, $3, $4, $5, $6, $7, NOW())
-                             RETURNING id
-                             """,
-                             document_id,
-                             chunk["text"],
-                             chunk["chunk_index"],
-                             chunk.get("page_start", 1),
-                             chunk.get("page_end", 1),
-                             "completed",
-                             fingerprint
-                         )
+                    with SQL_DURATION.time(statement="insert_chunk"):
+                        chunk_id = await conn.fetchval(
+                                 """
+                                 INSERT INTO krai_intelligence.chunks 
+                                 (document_id, manufacturer_id, text_chunk, chunk_index, page_start, page_end, processing_status, fingerprint, created_at)
+                                 VALUES ($1, (SELECT manufacturer_id FROM krai_core.documents WHERE id = $1),
+                                         $2, $3, $4, $5, $6, $7, NOW())
+                                 RETURNING id
+                                 """,
+                                 document_id,
+                                 chunk["text"],
+                                 chunk["chunk_index"],
+                                 chunk.get("page_start", 1),
+                                 chunk.get("page_end", 1),
+                                 "completed",
+                                 fingerprint
+                             )
                     chunk_ids.append(chunk_id)
                     chunk["id"] = chunk_id
             
@@ -684,123 +831,108 @@ class ProductionDocumentProcessor:
             raise
     
     async def _generate_embeddings_with_gpu(self, document_id: str, chunks: List[Dict]) -> Dict:
-        """Generate embeddings using Ollama API with deduplication"""
+        """Generate embeddings using Ollama API with deduplication
+        
+        Only chunks without an embedding for the model are embedded; chunks whose
+        call fails are queued in pending_embeddings for the backfill worker.
+        """
         try:
-            logger.info(f"🔄 Starting embedding generation for {len(chunks)} chunks")
+            # Fixed for the whole document even if a migration cuts over meanwhile
+            model_name, model_version = self.embedding_model_name, self.embedding_model_version
             
-            # Check if embeddings already exist for this document
+            # Chunks that already have an embedding (e.g. a re-run after a partial failure)
             async with self.db_pool.acquire() as conn:
-                existing_count = await conn.fetchval("""
-                    SELECT COUNT(e.id) 
-                    FROM krai_intelligence.embeddings e
-                    JOIN krai_intelligence.chunks c ON e.chunk_id = c.id
-                    WHERE c.document_id = $1 AND e.model_name = $2
-                """, document_id, self.embedding_model_name)
-                
-                if existing_count > 0:
-                    logger.info(f"🔄 Found {existing_count} existing embeddings for document {document_id}, skipping generation")
-                    return {
-                        'embeddings': [],
-                        'embedding_ids': [],
-                        'skipped': True,
-                        'existing_count': existing_count
-                    }
-            
-            # Generate embeddings for all chunks
-            batch_texts = [chunk["text"] for chunk in chunks]
-            logger.info(f"🔄 Calling Ollama API for {len(batch_texts)} texts")
-            batch_embeddings = await self._generate_ollama_embeddings(batch_texts)
-            logger.info(f"✅ Received {len(batch_embeddings)} embeddings from Ollama")
+                with SQL_DURATION.time(statement="count_document_embeddings"):
+                    existing = await conn.fetch("""
+                        SELECT e.chunk_id
+                        FROM krai_intelligence.embeddings e
+                        JOIN krai_intelligence.chunks c ON e.chunk_id = c.id
+                        WHERE c.document_id = $1 AND e.model_name = $2
+                    """, document_id, model_name)
+            existing_ids = {row["chunk_id"] for row in existing}
+            missing = [chunk for chunk in chunks if chunk["id"] not in existing_ids]
+            
+            if not missing:
+                logger.info(f"🔄 Found {len(existing_ids)} existing embeddings for document {document_id}, skipping generation")
+                return {
+                    'embeddings': [],
+                    'embedding_ids': [],
+                    'pending': 0,
+                    'skipped': True,
+                    'existing_count': len(existing_ids)
+                }
             
-            # Store embeddings in database
-            embedding_ids = []
-            async with self.db_pool.acquire() as conn:
-                for i, (chunk, embedding_vector) in enumerate(zip(chunks, batch_embeddings)):
-                    logger.info(f"🔄 Processing embedding {i+1}/{len(chunks)}")
-                    
-                    # CRITICAL: Convert list to string format for pgvector
-                    if isinstance(embedding_vector, list):
-                        vector_str = '[' + ','.join(map(str, embedding_vector)) + ']'
-                        logger.info(f"✅ Converted embedding to string format: {len(embedding_vector)} dimensions")
-                    else:
-                        logger.error(f"❌ Embedding is not a list: {type(embedding_vector)}")
-                        raise ValueError(f"Expected list, got {type(embedding_vector)}")
-                    
-                    try:
-                        embedding_id = await conn.fetchval(
-                            """
-                            INSERT INTO krai_intelligence.embeddings 
-                            (chunk_id, embedding, model_name, model_version, created_at)
-                            VALUES ($1, $2, $3, $4, NOW())
-                            RETURNING id
-                            """,
-                            chunk["id"],
-                            vector_str,  # This is guaranteed to be a string
-                            self.embedding_model_name,
-                            "latest"
-                        )
-                        embedding_ids.append(embedding_id)
-                        logger.info(f"✅ Stored embedding {i+1} with ID: {embedding_id}")
-                        
-                        # Update progress if we have access to process_id
-                        # Note: This would need to be passed through the call chain
-                        
-                    except Exception as db_error:
-                        logger.error(f"❌ Database error for embedding {i+1}: {db_error}")
-                        logger.error(f"❌ Chunk ID: {chunk['id']} (type: {type(chunk['id'])})")
-                        logger.error(f"❌ Vector string: {vector_str[:50]}... (type: {type(vector_str)})")
-                        raise
+            logger.info(f"🔄 Calling Ollama API for {len(missing)} texts "
+                        f"({len(existing_ids)} chunks already embedded)")
+            batch_embeddings = await self._generate_ollama_embeddings([chunk["text"] for chunk in missing],
+                                                                      model=model_name)
+            embedded = [(chunk["id"], vector) for chunk, vector in zip(missing, batch_embeddings) if vector]
+            failed = [chunk["id"] for chunk, vector in zip(missing, batch_embeddings) if not vector]
+            logger.info(f"✅ Received {len(embedded)} embeddings from Ollama")
+            
+            # Store embeddings and queue failures in one transaction
+            async with self.db_pool.acquire() as conn, tracer.span("db.insert_embeddings", rows=len(embedded)):
+                async with conn.transaction():
+                    embedding_ids = await store_embeddings(
+                        conn, [chunk_id for chunk_id, _ in embedded], [vector for _, vector in embedded],
+                        model_name, self.vector_quantization, model_version
+                    )
+                    await clear_pending(conn, [chunk_id for chunk_id, _ in embedded], model_name)
+                    await record_pending(conn, failed, model_name, self.ollama.breaker.last_error)
             
+            if failed:
+                logger.warning(f"⚠️ {len(failed)} chunks of document {document_id} queued for embedding backfill")
+                if self.embedding_backfill:
+                    self.embedding_backfill.wake()
             logger.info(f"✅ Generated and stored {len(embedding_ids)} embeddings with Ollama")
             
             # Return simplified structure
             return {
-                "embeddings": [{"dimension": len(emb), "model": self.embedding_model_name} for emb in batch_embeddings],
-                "embedding_ids": embedding_ids
+                "embeddings": [{"dimension": len(vector), "model": model_name} for _, vector in embedded],
+                "embedding_ids": embedding_ids,
+                "pending": len(failed)
             }
             
         except Exception as e:
             logger.error(f"❌ Embedding generation failed: {e}")
             raise
     
-    async def _generate_ollama_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings using Ollama API"""
-        try:
-            import httpx
-            
-            embeddings = []
-            
-            async with httpx.AsyncClient() as client:
-                for text in texts:
-                    response = await client.post(
-                        f"{self.ollama_base_url}/api/embeddings",
-                        json={
-                            "model": self.embedding_model_name,
-                            "prompt": text
-                        },
-                        timeout=30.0
-                    )
-                    
-                    if response.status_code == 200:
-                        result = response.json()
-                        print(f"DEBUG: Ollama response type: {type(result)}")
-                        print(f"DEBUG: Ollama response keys: {result.keys()}")
-                        print(f"DEBUG: embedding type: {type(result['embedding'])}")
-                        print(f"DEBUG: embedding first 5 values: {result['embedding'][:5]}")
-                        embeddings.append(result["embedding"])
-                    else:
-                        logger.error(f"❌ Ollama embedding failed: {response.status_code} - {response.text}")
-                        # Fallback to zero vector
-                        embeddings.append([0.0] * 768)
-            
-            return embeddings
-            
-        except Exception as e:
-            logger.error(f"❌ Ollama embedding generation failed: {e}")
-            # Fallback to zero vectors
-            return [[0.0] * 768 for _ in texts]
+    async def _generate_ollama_embeddings(self, texts: List[str], interactive: bool = False,
+                                          model: Optional[str] = None) -> List[Optional[List[float]]]:
+        """Generate embeddings using Ollama API
+        
+        Requests run concurrently; the shared transport's adaptive limit decides
+        how many are actually in flight. A failed text yields None. `model`
+        defaults to the active embedding model.
+        """
+        model = model or self.embedding_model_name
+        
+        async def embed(text: str) -> Optional[List[float]]:
+            try:
+                result = await self.ollama.post(
+                    "/api/embeddings",
+                    {"model": model, "prompt": text},
+                    operation="embed", model=model, timeout=30.0, interactive=interactive
+                )
+            except OllamaError as e:
+                logger.error(f"❌ Ollama embedding failed: {e}")
+                return None
+            embedding = result.get("embedding")
+            # An all-zero vector has no direction: treat it as a failure, never store it
+            return embedding if embedding and any(embedding) else None
+        
+        return await asyncio.gather(*(embed(text) for text in texts))
     
-    async def _store_document_in_db(self, file_path: Path, file_content: bytes, 
+    async def _embed_with_model(self, texts: List[str], model: str) -> List[Optional[List[float]]]:
+        """Bulk-lane embeddings for the backfill worker and embedding migrations"""
+        return await self._generate_ollama_embeddings(texts, model=model)
+    
+    async def embed_query(self, text: str) -> Optional[List[float]]:
+        """Embed a search query; returns None when Ollama could not produce an embedding"""
+        # Interactive: fail fast instead of waiting for an open circuit
+        return (await self._generate_ollama_embeddings([text], interactive=True))[0]
+    
+    async def _store_document_in_db(self, file_path: Path,
                                   storage_result: Dict, extraction_result: Dict,
                                   classification_result: Dict, version_result: Dict,
                                   model_result: Dict, image_results: List) -> str:
@@ -811,10 +943,11 @@ class ProductionDocumentProcessor:
             # Check for duplicates by hash
             file_hash = storage_result["hash"]
             async with self.db_pool.acquire() as conn:
-                existing_doc = await conn.fetchval(
-                    "SELECT id FROM krai_core.documents WHERE file_hash = $1 LIMIT 1",
-                    file_hash
-                )
+                with SQL_DURATION.time(statement="lookup_document_hash"):
+                    existing_doc = await conn.fetchval(
+                        "SELECT id FROM krai_core.documents WHERE file_hash = $1 LIMIT 1",
+                        file_hash
+                    )
                 if existing_doc:
                     logger.info(f"🔄 Document with hash {file_hash[:16]}... already exists: {existing_doc}")
                     return str(existing_doc)
@@ -846,27 +979,28 @@ class ProductionDocumentProcessor:
                     )
                 
                 # Insert into database with correct schema
-                await conn.execute("""
-                    INSERT INTO krai_core.documents 
-                    (id, title, document_type, version, language, file_path, 
-                     file_size, file_hash, storage_url, metadata, processing_status, 
-                     manufacturer_id, created_at, updated_at)
-                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
-                """, 
-                document_id, 
-                file_path.name,
-                classification_result.get("document_type", "unknown"), 
-                classification_result.get("version", ""),
-                "en",  # Default language
-                storage_result["url"],
-                len(file_content),
-                storage_result["hash"],
-                storage_result["url"],
-                json.dumps(metadata),
-                "completed",
-                manufacturer_id,
-                datetime.now(),
-                datetime.now())
+                with SQL_DURATION.time(statement="insert_document"), tracer.span("db.insert_document"):
+                    await conn.execute("""
+                        INSERT INTO krai_core.documents 
+                        (id, title, document_type, version, language, file_path, 
+                         file_size, file_hash, storage_url, metadata, processing_status, 
+                         manufacturer_id, created_at, updated_at)
+                        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
+                    """, 
+                    document_id, 
+                    file_path.name,
+                    classification_result.get("document_type", "unknown"), 
+                    classification_result.get("version", ""),
+                    "en",  # Default language
+                    storage_result["url"],
+                    storage_result["size"],
+                    storage_result["hash"],
+                    storage_result["url"],
+                    json.dumps(metadata),
+                    "completed",
+                    manufacturer_id,
+                    datetime.now(),
+                    datetime.now())
             
             logger.info(f"✅ Document stored in database: {document_id}")
             return document_id
@@ -879,12 +1013,25 @@ class ProductionDocumentProcessor:
         """Get processing statistics"""
         uptime = (datetime.now() - self.stats["start_time"]).total_seconds()
         
+        # Catalog totals across all workers, maintained by triggers (16_content_counters.sql)
+        try:
+            async with self.db_pool.acquire() as conn:
+                totals = await read_content_counters(conn)
+        except Exception as e:
+            logger.warning(f"⚠️ Content counters unavailable (16_content_counters.sql applied?): {e}")
+            totals = None
+        
         return {
+            "totals": totals,
+            "counter_reconciliation": self.counter_reconciler.snapshot() if self.counter_reconciler else None,
             "documents_processed": self.stats["documents_processed"],
             "chunks_created": self.stats["chunks_created"],
             "embeddings_generated": self.stats["embeddings_generated"],
             "images_processed": self.stats["images_processed"],
             "errors": self.stats["errors"],
+            "peak_rss_mb": round(peak_rss_bytes() / MB, 1),
+            "current_rss_mb": round(current_rss_bytes() / MB, 1),
+            "embedding_backfill": self.embedding_backfill.snapshot() if self.embedding_backfill else None,
             "uptime_seconds": uptime,
             "device": self.config.device_config["device"],
             "device_name": self.config.device_config["device_name"],
@@ -892,7 +1039,7 @@ class ProductionDocumentProcessor:
             "performance_config": self.config.performance_config
         }
     
-    async def _process_images_with_vision(self, images: List, file_content: bytes) -> List[Dict]:
+    async def _process_images_with_vision(self, images: List, document_id: str = None, process_id: str = None) -> List[Dict]:
         """Process images with Vision AI (LLaVA)"""
         try:
             if not images:
@@ -903,8 +1050,11 @@ class ProductionDocumentProcessor:
             processed_images = []
             seen_hashes = set()  # Track image hashes to prevent duplicates
             
-            for i, image_data in enumerate(images):
+            for i, image in enumerate(images):
                 try:
+                    # Load this image's bytes only now; they are released after the iteration
+                    image_data = materialize(image)
+                    
                     # Calculate image hash for deduplication
                     import hashlib
                     image_hash = hashlib.sha256(image_data).hexdigest()
@@ -978,10 +1128,10 @@ class ProductionDocumentProcessor:
             Provide a structured analysis in JSON format."""
             
             # Call Ollama Vision API
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.ollama_base_url}/api/generate",
-                    json={
+            try:
+                result = await self.ollama.post(
+                    "/api/generate",
+                    {
                         "model": self.vision_model,
                         "prompt": prompt,
                         "images": [image_base64],
@@ -991,24 +1141,22 @@ class ProductionDocumentProcessor:
                             "top_p": 0.9
                         }
                     },
-                    timeout=60
+                    operation="vision", model=self.vision_model, timeout=60
                 )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    vision_analysis = {
-                        "model_used": self.vision_model,
-                        "analysis": result.get("response", ""),
-                        "processing_time": result.get("total_duration", 0) / 1_000_000_000,  # Convert to seconds
-                        "confidence": 0.8  # Default confidence for vision analysis
-                    }
-                    
-                    logger.info(f"✅ Vision AI analysis completed for image {image_index}")
-                    return vision_analysis
-                else:
-                    logger.error(f"❌ Vision AI API error: {response.status_code}")
-                    return {"error": f"API error: {response.status_code}"}
-                    
+            except OllamaError as e:
+                logger.error(f"❌ Vision AI API error: {e}")
+                return {"error": f"API error: {e}"}
+            
+            vision_analysis = {
+                "model_used": self.vision_model,
+                "analysis": result.get("response", ""),
+                "processing_time": result.get("total_duration", 0) / 1_000_000_000,  # Convert to seconds
+                "confidence": 0.8  # Default confidence for vision analysis
+            }
+            
+            logger.info(f"✅ Vision AI analysis completed for image {image_index}")
+            return vision_analysis
+            
         except Exception as e:
             logger.error(f"❌ Vision AI analysis failed: {e}")
             return {"error": str(e)}
@@ -1016,8 +1164,16 @@ class ProductionDocumentProcessor:
     async def close(self):
         """Close the document processor"""
         try:
+            if self.embedding_migrator:
+                await self.embedding_migrator.stop()
+            if self.embedding_backfill:
+                await self.embedding_backfill.stop()
+            if self.counter_reconciler:
+                await self.counter_reconciler.stop()
             if hasattr(self, 'db_pool'):
+                await status_manager.close()
                 await self.db_pool.close()
+            await self.ollama.close()
             logger.info("✅ Production Document Processor closed")
         except Exception as e:
             logger.error(f"❌ Error closing processor: {e}")
\ No newline at end of file
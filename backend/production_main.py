@@ -6,15 +6,17 @@ Optimized for Apple M1 Pro with MPS and NVIDIA CUDA support
 import asyncio
 import logging
 import os
+import time
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse, Response
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator
 import json
 from dotenv import load_dotenv
+from pydantic import BaseModel
 
 # Load environment variables from ROOT .env file (Single Source of Truth)
 root_env_path = Path(__file__).parent.parent / '.env'
@@ -27,7 +29,15 @@ else:
 
 from production_document_processor import ProductionDocumentProcessor
 from config.production_config import config
-from processing_status_manager import status_manager
+from processing_status_manager import status_manager, ProcessingStage
+from hybrid_search import SearchMode
+from embedding_migration import MigrationConflict
+from upload_spool import spool_upload, UploadTooLarge
+from tracing import tracer
+from profiler import profile_path
+from metrics import (registry, CONTENT_TYPE as METRICS_CONTENT_TYPE, InFlightMiddleware,
+                     OLLAMA_REQUEST_DURATION, OLLAMA_REQUEST_ERRORS, OLLAMA_TIME_TO_FIRST_TOKEN,
+                     QUEUE_DEPTH, STAGE_DURATION)
 
 # Configure logging
 logging.basicConfig(
@@ -39,6 +49,31 @@ logger = logging.getLogger(__name__)
 # Global processor instance
 processor: Optional[ProductionDocumentProcessor] = None
 
+# Streaming statistics (time-to-first-token is recorded in OLLAMA_TIME_TO_FIRST_TOKEN)
+streaming_stats: Dict[str, Any] = {
+    "streams_started": 0,
+    "streams_completed": 0,
+    "streams_cancelled": 0,
+    "streams_failed": 0
+}
+
+# Seconds between keep-alive messages on idle status streams
+STATUS_STREAM_HEARTBEAT = 15.0
+
+def _queue_depths() -> Dict[tuple, float]:
+    """Sampled on every /metrics scrape"""
+    depths = {
+        ("active_processes",): len(status_manager.active_processes),
+        ("status_subscribers",): status_manager.events.subscriber_count
+    }
+    pool = getattr(processor, "db_pool", None)
+    if pool is not None:
+        depths[("db_pool_in_use",)] = pool.get_size() - pool.get_idle_size()
+        depths[("db_pool_idle",)] = pool.get_idle_size()
+    return depths
+
+QUEUE_DEPTH.set_function(_queue_depths)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
@@ -72,6 +107,9 @@ app = FastAPI(
 # Mount static files for status monitor
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+# Count in-flight requests (including streamed responses)
+app.add_middleware(InFlightMiddleware)
+
 # Add CORS middleware
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://localhost:8001,http://127.0.0.1:54323").split(",")
 app.add_middleware(
@@ -92,6 +130,11 @@ async def root():
         "gpu_support": True
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics (text exposition format)"""
+    return Response(content=registry.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -138,8 +181,9 @@ async def upload_error_image(
         if not file.filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp')):
             raise HTTPException(status_code=400, detail="Only image files are supported")
         
-        # Read file content
-        file_content = await file.read()
+        # Stream to a spool file instead of holding the image in memory
+        spooled = await spool_upload(file)
+        spooled.cleanup()
         
         logger.info(f"🚨 Processing error image upload: {file.filename}")
         
@@ -152,12 +196,14 @@ async def upload_error_image(
         return {
             "message": "Error image upload endpoint ready",
             "filename": file.filename,
-            "size": len(file_content),
+            "size": spooled.size,
             "note": "DSGVO anonymization and AI/ML storage to be implemented"
         }
         
     except HTTPException:
         raise
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"❌ Error image upload failed: {e}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
@@ -167,25 +213,29 @@ async def upload_document(
     file: UploadFile = File(...),
     document_type: Optional[str] = Form(None),
     manufacturer: Optional[str] = Form(None),
-    models: Optional[str] = Form(None)
+    models: Optional[str] = Form(None),
+    profile: bool = Form(False),
+    profile_rate_hz: Optional[int] = Form(None)
 ):
-    """Upload and process a document with production pipeline"""
+    """Upload and process a document with production pipeline (profile=true samples the job)"""
     if not processor:
         raise HTTPException(status_code=503, detail="Processor not initialized")
     
+    spooled = None
     try:
         # Validate file type
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Only PDF files are supported")
         
-        # Read file content
-        file_content = await file.read()
+        # Stream to a spool file (SHA-256 computed on the way); extraction reads it via mmap
+        spooled = await spool_upload(file)
         file_path = Path(file.filename)
         
-        logger.info(f"🚀 Processing document: {file.filename}")
+        logger.info(f"🚀 Processing document: {file.filename} ({spooled.size / 1024 / 1024:.1f} MB spooled)")
         
         # Process document with production pipeline
-        result = await processor.process_document(file_path, file_content)
+        result = await processor.process_document(file_path, spooled, profile=profile,
+                                                  profile_rate_hz=profile_rate_hz)
         
         if result["status"] == "error":
             raise HTTPException(status_code=500, detail=f"Processing failed: {result['error']}")
@@ -201,9 +251,14 @@ async def upload_document(
         
     except HTTPException:
         raise
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"❌ Document upload failed: {e}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
+    finally:
+        if spooled:
+            spooled.cleanup()
 
 @app.get("/api/production/documents/stats")
 async def get_processing_stats():
@@ -248,6 +303,60 @@ async def get_processing_status(process_id: str):
         logger.error(f"❌ Failed to get process status: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get process status: {e}")
 
+@app.get("/api/production/processing/status/document/{document_id}")
+async def get_processing_status_by_document(document_id: str):
+    """Get the latest processing status for a document"""
+    try:
+        status = await status_manager.get_status_by_document(document_id)
+        if not status:
+            raise HTTPException(status_code=404, detail="No processing status for document")
+        
+        return status
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Failed to get document status: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get document status: {e}")
+
+@app.get("/api/production/processing/trace/{process_id}")
+async def get_processing_trace(process_id: str, format: str = "tree"):
+    """Span tree of a processing job (format=otlp returns the OTLP/JSON export)"""
+    try:
+        if format not in ("tree", "otlp"):
+            raise HTTPException(status_code=400, detail="format must be 'tree' or 'otlp'")
+        
+        trace = tracer.get_trace(process_id)
+        if trace:
+            return trace.to_otlp() if format == "otlp" else trace.to_tree()
+        
+        # Evicted from memory or traced by another worker: fall back to the JSON export
+        exported = await asyncio.to_thread(tracer.load_exported, process_id) if format == "tree" else None
+        if not exported:
+            raise HTTPException(status_code=404, detail="Trace not found")
+        return exported
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Failed to get processing trace: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get processing trace: {e}")
+
+@app.get("/api/production/processing/profile/{process_id}")
+async def get_processing_profile(process_id: str):
+    """Collapsed-stack profile of a job uploaded with profile=true (flamegraph.pl / speedscope input)"""
+    try:
+        path = profile_path(process_id)
+        if not await asyncio.to_thread(path.is_file):
+            raise HTTPException(status_code=404, detail="Profile not found")
+        
+        content = await asyncio.to_thread(path.read_text)
+        return Response(content=content, media_type="text/plain; charset=utf-8",
+                        headers={"Content-Disposition": f'inline; filename="{path.name}"'})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Failed to get processing profile: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get processing profile: {e}")
+
 @app.get("/api/production/processing/summary")
 async def get_processing_summary():
     """Get a summary of processing activities"""
@@ -258,6 +367,53 @@ async def get_processing_summary():
         logger.error(f"❌ Failed to get processing summary: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get processing summary: {e}")
 
+@app.get("/api/production/processing/events")
+async def stream_processing_events(request: Request, process_id: Optional[str] = None):
+    """Stream processing status as Server-Sent Events: one snapshot, then coalesced deltas"""
+    subscription, snapshot = await status_manager.subscribe_events(process_id)
+    summary = await status_manager.get_processing_summary()
+    
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            yield _sse_event("snapshot", {"active_processes": snapshot, "summary": summary})
+            
+            while not await request.is_disconnected():
+                batch = await subscription.next_batch(timeout=STATUS_STREAM_HEARTBEAT)
+                if batch is None:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield _sse_event("delta", batch)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            subscription.close()
+    
+    return _sse_response(event_stream())
+
+@app.websocket("/ws/processing")
+@app.websocket("/ws/processing/{process_id}")
+async def processing_events_websocket(websocket: WebSocket, process_id: Optional[str] = None):
+    """WebSocket variant of the processing status stream"""
+    await websocket.accept()
+    subscription, snapshot = await status_manager.subscribe_events(process_id)
+    
+    try:
+        summary = await status_manager.get_processing_summary()
+        await websocket.send_json({"type": "snapshot", "active_processes": snapshot, "summary": summary})
+        
+        while True:
+            batch = await subscription.next_batch(timeout=STATUS_STREAM_HEARTBEAT)
+            if batch is None:
+                await websocket.send_json({"type": "heartbeat", "timestamp": time.time()})
+                continue
+            await websocket.send_json(dict(batch, type="delta"))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.warning(f"⚠️ Status WebSocket closed: {e}")
+    finally:
+        subscription.close()
+
 @app.get("/status", response_class=HTMLResponse)
 async def status_monitor():
     """Status monitoring page"""
@@ -274,40 +430,319 @@ async def get_models_status():
         raise HTTPException(status_code=503, detail="Processor not initialized")
     
     try:
-        import httpx
+        try:
+            # Union of all pool hosts (also refreshes their health)
+            models = await processor.ollama.list_models()
+        except Exception as e:
+            # Report the breaker even while Ollama is down
+            logger.warning(f"⚠️ Ollama not reachable for model status: {e}")
+            return {
+                "ollama_reachable": False,
+                "error": str(e),
+                "transport": processor.ollama.snapshot()
+            }
+        
+        # Check required models
+        required_models = [
+            config.model_config["llm"]["model_name"],
+            config.model_config["embedding"]["model_name"],
+            config.model_config["vision"]["model_name"]
+        ]
+        
+        model_status = {}
+        for required in required_models:
+            available = any(required in model["name"] for model in models)
+            model_status[required] = {
+                "available": available,
+                "status": "loaded" if available else "not_found"
+            }
+        
+        return {
+            "ollama_reachable": True,
+            "total_models": len(models),
+            "required_models": model_status,
+            "available_models": [model["name"] for model in models],
+            # Hosts, circuit breaker and adaptive concurrency of the shared Ollama transport
+            "transport": processor.ollama.snapshot()
+        }
+                
+    except Exception as e:
+        logger.error(f"❌ Failed to get model status: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get model status: {e}")
+
+@app.get("/api/production/embeddings/backfill")
+async def get_embedding_backfill_status():
+    """Chunks waiting for an embedding and the backfill worker's progress"""
+    if not processor:
+        raise HTTPException(status_code=503, detail="Processor not initialized")
+    if not processor.embedding_backfill:
+        return {"enabled": False}
+
+    try:
+        await processor.embedding_backfill.count_pending()
+        return {"enabled": True, **processor.embedding_backfill.snapshot()}
+    except Exception as e:
+        logger.error(f"❌ Failed to get embedding backfill status: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get embedding backfill status: {e}")
+
+class EmbeddingMigrationRequest(BaseModel):
+    target_model: str
+    target_version: str = "latest"
+
+def _embedding_migrator():
+    if not processor:
+        raise HTTPException(status_code=503, detail="Processor not initialized")
+    if not processor.embedding_migrator:
+        raise HTTPException(status_code=503, detail="Embedding migrations unavailable (run 11_embedding_migrations.sql)")
+    return processor.embedding_migrator
+
+@app.post("/api/production/embeddings/migrations")
+async def start_embedding_migration(request: EmbeddingMigrationRequest):
+    """Re-embed all chunks with another model in the background, then cut over"""
+    migrator = _embedding_migrator()
+    try:
+        models = [model["name"] for model in await processor.ollama.list_models()]
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Ollama not reachable: {e}")
+    if not any(request.target_model in name for name in models):
+        raise HTTPException(status_code=400, detail=f"Model {request.target_model} is not available on any Ollama host")
+
+    try:
+        return await migrator.start_migration(request.target_model, request.target_version)
+    except MigrationConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"❌ Failed to start embedding migration: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to start embedding migration: {e}")
+
+@app.get("/api/production/embeddings/migration")
+async def get_embedding_migration_status():
+    """Progress, throughput and ETA of the latest embedding migration"""
+    migrator = _embedding_migrator()
+    try:
+        return {
+            "active_model": processor.embedding_model_name,
+            "active_version": processor.embedding_model_version,
+            "migration": await migrator.status()
+        }
+    except Exception as e:
+        logger.error(f"❌ Failed to get embedding migration status: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get embedding migration status: {e}")
+
+@app.post("/api/production/embeddings/migration/cancel")
+async def cancel_embedding_migration():
+    """Cancel a migration that has not cut over yet"""
+    migrator = _embedding_migrator()
+    try:
+        return await migrator.cancel()
+    except MigrationConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"❌ Failed to cancel embedding migration: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to cancel embedding migration: {e}")
+
+class SearchRequest(BaseModel):
+    query: str
+    limit: int = 10
+    similarity_threshold: float = 0.0
+    document_types: Optional[List[str]] = None
+    manufacturers: Optional[List[str]] = None
+    mode: SearchMode = SearchMode.HYBRID
+
+@app.post("/api/production/search")
+async def search_documents(request: SearchRequest):
+    """Hybrid full-text + vector search over processed document chunks"""
+    if not processor:
+        raise HTTPException(status_code=503, detail="Processor not initialized")
+    
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    
+    try:
+        return await processor.search_engine.search(
+            request.query,
+            limit=max(1, min(request.limit, 100)),
+            mode=request.mode,
+            document_types=request.document_types,
+            manufacturers=request.manufacturers,
+            similarity_threshold=request.similarity_threshold
+        )
+    except Exception as e:
+        logger.error(f"❌ Search failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Search failed: {e}")
+
+@app.get("/api/production/error-codes/{code}")
+async def lookup_error_code(code: str, manufacturer: Optional[str] = None, limit: int = 50):
+    """Look up the chunks and pages that mention an error code"""
+    if not processor:
+        raise HTTPException(status_code=503, detail="Processor not initialized")
+    
+    try:
+        start_time = time.perf_counter()
+        results = await processor.code_index.lookup_error_code(code, manufacturer, max(1, min(limit, 500)))
+        if not results:
+            raise HTTPException(status_code=404, detail=f"Error code {code} not found")
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{config.get_ollama_config()['base_url']}/api/tags")
+        return {
+            "code": results[0]["code"],
+            "results": results,
+            "total_results": len(results),
+            "query_time": time.perf_counter() - start_time
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error code lookup failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Error code lookup failed: {e}")
+
+@app.get("/api/production/part-numbers/{part_number}")
+async def lookup_part_number(part_number: str, manufacturer: Optional[str] = None, limit: int = 50):
+    """Look up the chunks and pages that mention a part number"""
+    if not processor:
+        raise HTTPException(status_code=503, detail="Processor not initialized")
+    
+    try:
+        start_time = time.perf_counter()
+        results = await processor.code_index.lookup_part_number(part_number, manufacturer, max(1, min(limit, 500)))
+        if not results:
+            raise HTTPException(status_code=404, detail=f"Part number {part_number} not found")
+        
+        return {
+            "part_number": results[0]["code"],
+            "results": results,
+            "total_results": len(results),
+            "query_time": time.perf_counter() - start_time
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Part number lookup failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Part number lookup failed: {e}")
+
+CHAT_SYSTEM_PROMPT = """You are KR-AI, an AI assistant specialized in printer and technical document analysis. 
+        You help users with troubleshooting, error codes, part numbers, and technical specifications.
+        Always provide accurate, helpful information based on the provided context."""
+
+DEFAULT_VISION_PROMPT = "Analyze this technical document image. Describe any diagrams, charts, error codes, part numbers, or technical specifications you can identify."
+
+def _build_chat_payload(query: str, document_ids: Optional[str], stream: bool) -> Dict[str, Any]:
+    """Build the Ollama generate payload for a chat request"""
+    # Build context from documents if specified
+    context = ""
+    if document_ids:
+        # TODO: Implement document context retrieval
+        context = "Document context will be added here"
+    
+    chat_prompt = f"{CHAT_SYSTEM_PROMPT}\n\nContext: {context}\n\nUser: {query}"
+    
+    return {
+        "model": config.model_config["llm"]["model_name"],
+        "prompt": chat_prompt,
+        "stream": stream,
+        "options": {
+            "temperature": config.model_config["llm"]["temperature"],
+            "max_tokens": config.model_config["llm"]["max_tokens"],
+            "top_p": config.model_config["llm"]["top_p"],
+            "repeat_penalty": config.model_config["llm"]["repeat_penalty"]
+        }
+    }
+
+def _build_vision_payload(image_b64: str, prompt: str, stream: bool) -> Dict[str, Any]:
+    """Build the Ollama generate payload for a vision request"""
+    return {
+        "model": config.model_config["vision"]["model_name"],
+        "prompt": prompt,
+        "images": [image_b64],
+        "stream": stream,
+        "options": {
+            "temperature": 0.3,
+            "max_new_tokens": config.model_config["vision"]["max_new_tokens"]
+        }
+    }
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _stream_ollama_generate(request: Request, payload: Dict[str, Any], 
+                                  endpoint: str) -> AsyncIterator[str]:
+    """Forward Ollama's streamed tokens to the client as Server-Sent Events.
+    
+    Leaving the httpx stream context closes the connection to Ollama, which
+    aborts generation - so a client disconnect stops GPU work immediately.
+    Streams run in the transport's interactive lane, ahead of bulk ingestion.
+    """
+    start_time = time.perf_counter()
+    time_to_first_token = None
+    tokens_streamed = 0
+    streaming_stats["streams_started"] += 1
+    operation = f"{endpoint}_stream"
+    
+    try:
+        async with processor.ollama.stream("/api/generate", payload, operation=endpoint) as response:
+            if response.status_code != 200:
+                streaming_stats["streams_failed"] += 1
+                OLLAMA_REQUEST_ERRORS.inc(model=payload["model"], operation=operation)
+                yield _sse_event("error", {"detail": f"Ollama API returned {response.status_code}"})
+                return
             
-            if response.status_code == 200:
-                models = response.json().get("models", [])
+            async for line in response.aiter_lines():
+                if await request.is_disconnected():
+                    streaming_stats["streams_cancelled"] += 1
+                    logger.info(f"🛑 Client disconnected from {endpoint} stream after {tokens_streamed} tokens - cancelling generation")
+                    return
                 
-                # Check required models
-                required_models = [
-                    config.model_config["llm"]["model_name"],
-                    config.model_config["embedding"]["model_name"],
-                    config.model_config["vision"]["model_name"]
-                ]
+                if not line.strip():
+                    continue
                 
-                model_status = {}
-                for required in required_models:
-                    available = any(required in model["name"] for model in models)
-                    model_status[required] = {
-                        "available": available,
-                        "status": "loaded" if available else "not_found"
-                    }
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    streaming_stats["streams_failed"] += 1
+                    yield _sse_event("error", {"detail": chunk["error"]})
+                    return
                 
-                return {
-                    "total_models": len(models),
-                    "required_models": model_status,
-                    "available_models": [model["name"] for model in models]
-                }
-            else:
-                raise Exception(f"Ollama API returned {response.status_code}")
+                token = chunk.get("response", "")
+                if token:
+                    if time_to_first_token is None:
+                        time_to_first_token = time.perf_counter() - start_time
+                        OLLAMA_TIME_TO_FIRST_TOKEN.observe(time_to_first_token, model=payload["model"],
+                                                           endpoint=endpoint)
+                    tokens_streamed += 1
+                    yield _sse_event("token", {"token": token})
                 
+                if chunk.get("done"):
+                    streaming_stats["streams_completed"] += 1
+                    yield _sse_event("done", {
+                        "model": payload["model"],
+                        "processing_time": chunk.get("total_duration", 0) / 1e9,
+                        "tokens_generated": chunk.get("eval_count", tokens_streamed),
+                        "time_to_first_token": time_to_first_token
+                    })
+                    return
+                    
+    except asyncio.CancelledError:
+        # Starlette cancels the generator when the client goes away
+        streaming_stats["streams_cancelled"] += 1
+        logger.info(f"🛑 {endpoint} stream cancelled after {tokens_streamed} tokens")
+        raise
     except Exception as e:
-        logger.error(f"❌ Failed to get model status: {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to get model status: {e}")
+        streaming_stats["streams_failed"] += 1
+        OLLAMA_REQUEST_ERRORS.inc(model=payload["model"], operation=operation)
+        logger.error(f"❌ {endpoint} stream failed: {e}")
+        yield _sse_event("error", {"detail": str(e)})
+    finally:
+        OLLAMA_REQUEST_DURATION.observe(time.perf_counter() - start_time, model=payload["model"], operation=operation)
+
+def _sse_response(stream: AsyncIterator[str]) -> StreamingResponse:
+    """Wrap an SSE generator in a non-buffered streaming response"""
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable proxy buffering (nginx)
+        }
+    )
 
 @app.post("/api/production/chat")
 async def chat_with_documents(
@@ -319,68 +754,44 @@ async def chat_with_documents(
         raise HTTPException(status_code=503, detail="Processor not initialized")
     
     try:
-        import httpx
-        
-        # Build context from documents if specified
-        context = ""
-        if document_ids:
-            # TODO: Implement document context retrieval
-            context = "Document context will be added here"
-        
-        # Prepare chat prompt
-        system_prompt = """You are KR-AI, an AI assistant specialized in printer and technical document analysis. 
-        You help users with troubleshooting, error codes, part numbers, and technical specifications.
-        Always provide accurate, helpful information based on the provided context."""
-        
-        chat_prompt = f"{system_prompt}\n\nContext: {context}\n\nUser: {query}"
-        
-        # Call Ollama LLM API
-        ollama_config = config.get_ollama_config()
-        payload = {
+        # Call Ollama LLM API (interactive lane: ahead of bulk ingestion)
+        payload = _build_chat_payload(query, document_ids, stream=False)
+        result = await processor.ollama.post("/api/generate", payload, operation="chat",
+                                             model=payload["model"], timeout=120, interactive=True)
+        return {
+            "response": result.get("response", ""),
             "model": config.model_config["llm"]["model_name"],
-            "prompt": chat_prompt,
-            "stream": False,
-            "options": {
-                "temperature": config.model_config["llm"]["temperature"],
-                "max_tokens": config.model_config["llm"]["max_tokens"],
-                "top_p": config.model_config["llm"]["top_p"],
-                "repeat_penalty": config.model_config["llm"]["repeat_penalty"]
-            }
+            "processing_time": result.get("total_duration", 0) / 1e9,  # Convert to seconds
+            "tokens_generated": result.get("eval_count", 0)
         }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{ollama_config['base_url']}/api/generate",
-                json=payload,
-                timeout=120
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    "response": result.get("response", ""),
-                    "model": config.model_config["llm"]["model_name"],
-                    "processing_time": result.get("total_duration", 0) / 1e9,  # Convert to seconds
-                    "tokens_generated": result.get("eval_count", 0)
-                }
-            else:
-                raise Exception(f"Ollama API returned {response.status_code}")
                 
     except Exception as e:
         logger.error(f"❌ Chat failed: {e}")
         raise HTTPException(status_code=500, detail=f"Chat failed: {e}")
 
+@app.post("/api/production/chat/stream")
+async def chat_with_documents_stream(
+    request: Request,
+    query: str = Form(...),
+    document_ids: Optional[str] = Form(None)
+):
+    """Chat with processed documents, streaming tokens as Server-Sent Events"""
+    if not processor:
+        raise HTTPException(status_code=503, detail="Processor not initialized")
+    
+    payload = _build_chat_payload(query, document_ids, stream=True)
+    return _sse_response(_stream_ollama_generate(request, payload, "chat"))
+
 @app.post("/api/production/vision/analyze")
 async def analyze_image(
     file: UploadFile = File(...),
-    prompt: str = Form("Analyze this technical document image. Describe any diagrams, charts, error codes, part numbers, or technical specifications you can identify.")
+    prompt: str = Form(DEFAULT_VISION_PROMPT)
 ):
     """Analyze image with Vision AI"""
     if not processor:
         raise HTTPException(status_code=503, detail="Processor not initialized")
     
     try:
-        import httpx
         import base64
         
         # Validate file type
@@ -391,37 +802,17 @@ async def analyze_image(
         image_content = await file.read()
         image_b64 = base64.b64encode(image_content).decode('utf-8')
         
-        # Call Ollama Vision API
-        payload = {
+        # Call Ollama Vision API (interactive lane: shares the vision limit with ingestion, but goes first)
+        payload = _build_vision_payload(image_b64, prompt, stream=False)
+        result = await processor.ollama.post("/api/generate", payload, operation="vision",
+                                             model=payload["model"], timeout=120, interactive=True)
+        return {
+            "analysis": result.get("response", ""),
             "model": config.model_config["vision"]["model_name"],
-            "prompt": prompt,
-            "images": [image_b64],
-            "stream": False,
-            "options": {
-                "temperature": 0.3,
-                "max_new_tokens": config.model_config["vision"]["max_new_tokens"]
-            }
+            "processing_time": result.get("total_duration", 0) / 1e9,
+            "image_size": len(image_content),
+            "prompt_used": prompt
         }
-        
-        ollama_config = config.get_ollama_config()
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{ollama_config['base_url']}/api/generate",
-                json=payload,
-                timeout=120
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    "analysis": result.get("response", ""),
-                    "model": config.model_config["vision"]["model_name"],
-                    "processing_time": result.get("total_duration", 0) / 1e9,
-                    "image_size": len(image_content),
-                    "prompt_used": prompt
-                }
-            else:
-                raise Exception(f"Vision API returned {response.status_code}")
                 
     except HTTPException:
         raise
@@ -429,6 +820,28 @@ async def analyze_image(
         logger.error(f"❌ Vision analysis failed: {e}")
         raise HTTPException(status_code=500, detail=f"Vision analysis failed: {e}")
 
+@app.post("/api/production/vision/analyze/stream")
+async def analyze_image_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    prompt: str = Form(DEFAULT_VISION_PROMPT)
+):
+    """Analyze image with Vision AI, streaming tokens as Server-Sent Events"""
+    if not processor:
+        raise HTTPException(status_code=503, detail="Processor not initialized")
+    
+    import base64
+    
+    # Validate file type
+    if not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="Only image files are supported")
+    
+    image_content = await file.read()
+    image_b64 = base64.b64encode(image_content).decode('utf-8')
+    
+    payload = _build_vision_payload(image_b64, prompt, stream=True)
+    return _sse_response(_stream_ollama_generate(request, payload, "vision"))
+
 @app.get("/api/production/performance")
 async def get_performance_metrics():
     """Get performance metrics"""
@@ -452,6 +865,32 @@ async def get_performance_metrics():
                 "error_rate": stats["errors"] / max(stats["documents_processed"], 1),
                 "uptime_hours": uptime / 3600
             },
+            # Percentiles estimated from the /metrics histograms
+            "latency_seconds": {
+                "embedding": OLLAMA_REQUEST_DURATION.summary(
+                    model=config.model_config["embedding"]["model_name"], operation="embed"
+                ),
+                "stages": {
+                    stage.value: STAGE_DURATION.summary(stage=stage.value, status="completed")
+                    for stage in ProcessingStage
+                }
+            },
+            "streaming_metrics": {
+                "streams_started": streaming_stats["streams_started"],
+                "streams_completed": streaming_stats["streams_completed"],
+                "streams_cancelled": streaming_stats["streams_cancelled"],
+                "streams_failed": streaming_stats["streams_failed"],
+                # Percentiles estimated from krai_ollama_time_to_first_token_seconds
+                "time_to_first_token_seconds": {
+                    "chat": OLLAMA_TIME_TO_FIRST_TOKEN.summary(
+                        model=config.model_config["llm"]["model_name"], endpoint="chat"
+                    ),
+                    "vision": OLLAMA_TIME_TO_FIRST_TOKEN.summary(
+                        model=config.model_config["vision"]["model_name"], endpoint="vision"
+                    )
+                },
+                "status_events": status_manager.events.get_stats()
+            },
             "system_metrics": {
                 "device": config.device_config["device"],
                 "device_name": config.device_config["device_name"],
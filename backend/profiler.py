@@ -0,0 +1,164 @@
+# KRAI Engine - Sampling Profiler
+# Opt-in wall-clock profiler for one document; writes collapsed stacks for flamegraph tools
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_HZ = 100
+MAX_RATE_HZ = 1000
+MAX_STACK_DEPTH = 256
+
+def default_rate_hz() -> int:
+    return int(os.getenv("KRAI_PROFILE_RATE_HZ", str(DEFAULT_RATE_HZ)))
+
+def profile_dir() -> Path:
+    return Path(os.getenv("KRAI_PROFILE_DIR", "profiles"))
+
+def profile_path(name: str) -> Path:
+    """Collapsed-stack file of a profile (name is a process id or file stem)"""
+    return profile_dir() / f"{Path(name).name}.folded"
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    """Samples one asyncio task from a background thread
+
+    While the task runs, the sample is the event loop thread's stack cut at the
+    task's coroutine; while it is suspended, the sample is its await chain with
+    an "[awaiting ...]" leaf. The profile therefore shows wall-clock time, both
+    CPU work (PyPDF2, chunking) and waits (Ollama, storage, Postgres), and only
+    for this document even if other documents share the event loop.
+
+    Nothing is created unless a profile is requested, so the normal path pays
+    nothing.
+    """
+
+    def __init__(self, rate_hz: Optional[int] = None):
+        rate_hz = rate_hz or default_rate_hz()
+        self.rate_hz = max(1, min(int(rate_hz), MAX_RATE_HZ))
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._task: Optional[asyncio.Task] = None
+        self._thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started_at: Optional[float] = None
+        self._duration: float = 0.0
+
+    def start(self):
+        """Start sampling the calling task (or the calling thread outside asyncio)"""
+        try:
+            self._task = asyncio.current_task()
+        except RuntimeError:
+            self._task = None
+        self._thread_id = threading.get_ident()
+        self._started_at = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name="krai-profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        if self._sampler is None:
+            return
+        self._stop.set()
+        self._sampler.join()
+        self._sampler = None
+        self._duration = time.perf_counter() - self._started_at
+
+    def _run(self):
+        interval = 1.0 / self.rate_hz
+        next_sample = time.perf_counter() + interval
+        while not self._stop.wait(max(0.0, next_sample - time.perf_counter())):
+            next_sample += interval
+            try:
+                stack = self._sample()
+            except Exception:
+                # Frames can change under us; a lost sample is not worth a crash
+                continue
+            if stack:
+                self.samples[";".join(stack)] += 1
+                self.sample_count += 1
+
+    def _sample(self) -> List[str]:
+        """Frame labels of one sample, root first"""
+        task = self._task
+        if task is None:
+            frame = sys._current_frames().get(self._thread_id)
+            return self._thread_stack(frame, stop_at=None)
+        if task.done():
+            return []
+
+        coro = task.get_coro()
+        if getattr(coro, "cr_running", False):
+            frame = sys._current_frames().get(self._thread_id)
+            return self._thread_stack(frame, stop_at=coro.cr_frame)
+        return self._await_chain(coro)
+
+    def _thread_stack(self, frame, stop_at) -> List[str]:
+        labels = []
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            labels.append(_frame_label(frame))
+            if frame is stop_at:
+                break
+            frame = frame.f_back
+        else:
+            if stop_at is not None:
+                # The task was suspended between the two reads
+                return self._await_chain(self._task.get_coro())
+        labels.reverse()
+        return labels
+
+    def _await_chain(self, awaitable) -> List[str]:
+        labels = []
+        while awaitable is not None and len(labels) < MAX_STACK_DEPTH:
+            frame = (getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+                     or getattr(awaitable, "ag_frame", None))
+            if frame is None:
+                labels.append(f"[awaiting {type(awaitable).__name__}]")
+                break
+            labels.append(_frame_label(frame))
+            awaitable = (getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+                         or getattr(awaitable, "ag_await", None))
+        else:
+            labels.append("[awaiting]")
+        return labels
+
+    def folded(self) -> str:
+        """Collapsed stacks ("frame;frame;frame count"), as read by flamegraph.pl, speedscope and inferno"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    async def save(self, name: str) -> Dict[str, Any]:
+        """Stop sampling and write the profile; returns the summary linked from the status entry"""
+        self.stop()
+        path = profile_path(name)
+
+        def write():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(self.folded())
+
+        try:
+            await asyncio.to_thread(write)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to write profile {path}: {e}")
+            return self.summary(error=str(e))
+        logger.info(f"🔥 Profile written: {path} ({self.sample_count} samples)")
+        return self.summary(path=str(path))
+
+    def summary(self, **extra) -> Dict[str, Any]:
+        return dict({
+            "status": "running" if self._sampler is not None else "completed",
+            "format": "folded",
+            "rate_hz": self.rate_hz,
+            "samples": self.sample_count,
+            "duration_s": round(self._duration, 3)
+        }, **extra)
@@ -0,0 +1,316 @@
+# KRAI Engine - Processing Status Backends
+# Pluggable persistence for ProcessingStatusManager
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import SQL_DURATION
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payloads are limited to 8000 bytes; process ids are ~30 bytes each
+NOTIFY_CHANNEL = "krai_processing_status"
+NOTIFY_BATCH_SIZE = 100
+
+# Backoff between LISTEN reconnect attempts after the connection is lost
+LISTEN_RECONNECT_MIN_DELAY = 1.0
+LISTEN_RECONNECT_MAX_DELAY = 30.0
+
+def worker_id() -> str:
+    """Identifier of this API worker (host:pid)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class StatusBackend:
+    """In-memory backend: status lives only in the worker that runs the job"""
+
+    name = "memory"
+    persistent = False
+
+    async def start(self, on_remote_update: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        """Start background work (flushers, listeners)"""
+
+    async def stop(self):
+        """Flush pending writes and release resources"""
+
+    def save(self, process_id: str, status, final: bool = False):
+        """Record the latest state of a process (must not block)"""
+
+    async def load(self, process_id: str) -> Optional[Dict[str, Any]]:
+        """Load a process that this worker does not hold in memory"""
+        return None
+
+    async def load_by_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Load the latest process for a document"""
+        return None
+
+    async def list_active(self, exclude: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Active processes owned by other workers"""
+        return []
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+class PostgresStatusBackend(StatusBackend):
+    """Shares status through krai_system.processing_status with batched upserts and LISTEN/NOTIFY"""
+
+    name = "postgres"
+    persistent = True
+
+    def __init__(self, db_pool, dsn: Optional[str] = None, flush_interval: float = 0.5,
+                 stale_after_minutes: int = 30):
+        self.db_pool = db_pool
+        self.dsn = dsn
+        self.flush_interval = flush_interval
+        self.stale_after_minutes = stale_after_minutes
+        self.worker_id = worker_id()
+
+        # Latest live status object per process; serialized once per flush
+        self._dirty: Dict[str, Any] = {}
+        self._flush_now = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._listen_conn = None
+        self._on_remote_update = None
+        self._running = False
+
+        self.stats = {
+            "saves": 0,
+            "flushes": 0,
+            "rows_written": 0,
+            "remote_updates": 0,
+            "flush_errors": 0,
+            "listen_reconnects": 0
+        }
+
+    async def start(self, on_remote_update: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        self._on_remote_update = on_remote_update
+        self._running = True
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+        if self.dsn:
+            self._listener = asyncio.create_task(self._listen_loop())
+        else:
+            logger.warning("⚠️ No database DSN for status LISTEN, remote updates disabled")
+
+        logger.info(f"✅ Postgres status backend started (worker {self.worker_id})")
+
+    async def stop(self):
+        self._running = False
+        self._flush_now.set()
+        if self._flusher:
+            await self._flusher
+        if self._dirty:
+            await self.flush()
+
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    def save(self, process_id: str, status, final: bool = False):
+        self.stats["saves"] += 1
+        self._dirty[process_id] = status
+        if final:
+            self._flush_now.set()
+
+    async def _flush_loop(self):
+        """Write dirty statuses every flush_interval (or immediately on final states)"""
+        while self._running:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+
+            if self._dirty:
+                await self.flush()
+
+    async def flush(self):
+        """Upsert all pending statuses in one round trip and notify other workers"""
+        pending, self._dirty = self._dirty, {}
+
+        rows = []
+        for process_id, status in pending.items():
+            data = status.to_dict()
+            rows.append((
+                process_id,
+                data["document_id"],
+                data["filename"],
+                data["overall_status"],
+                data["current_stage"],
+                data["overall_progress_percent"],
+                json.dumps(data),
+                self.worker_id,
+                data["overall_status"] in ("completed", "failed")
+            ))
+
+        try:
+            async with self.db_pool.acquire() as conn:
+                with SQL_DURATION.time(statement="upsert_processing_status"):
+                    await conn.executemany(
+                        """
+                        INSERT INTO krai_system.processing_status
+                        (process_id, document_id, filename, overall_status, current_stage,
+                         progress_percent, status, worker_id, updated_at, completed_at)
+                        VALUES ($1, $2::uuid, $3, $4, $5, $6, $7::jsonb, $8, NOW(),
+                                CASE WHEN $9 THEN NOW() END)
+                        ON CONFLICT (process_id) DO UPDATE SET
+                            document_id = EXCLUDED.document_id,
+                            overall_status = EXCLUDED.overall_status,
+                            current_stage = EXCLUDED.current_stage,
+                            progress_percent = EXCLUDED.progress_percent,
+                            status = EXCLUDED.status,
+                            updated_at = EXCLUDED.updated_at,
+                            completed_at = EXCLUDED.completed_at
+                        """,
+                        rows
+                    )
+
+                process_ids = list(pending.keys())
+                for i in range(0, len(process_ids), NOTIFY_BATCH_SIZE):
+                    payload = json.dumps({"worker": self.worker_id, "ids": process_ids[i:i + NOTIFY_BATCH_SIZE]})
+                    await conn.execute("SELECT pg_notify($1, $2)", NOTIFY_CHANNEL, payload)
+
+            self.stats["flushes"] += 1
+            self.stats["rows_written"] += len(rows)
+
+        except Exception as e:
+            self.stats["flush_errors"] += 1
+            logger.error(f"❌ Status flush failed ({len(rows)} rows): {e}")
+            # Keep the newest state for the next attempt
+            for process_id, status in pending.items():
+                self._dirty.setdefault(process_id, status)
+
+    async def _listen_loop(self):
+        """
+        Hold a LISTEN connection outside the pool and reconnect when it is lost.
+
+        LISTEN needs a connection for the worker's lifetime; taking it from the
+        pool would shrink the pool permanently and a dropped connection would
+        silently end remote updates.
+        """
+        import asyncpg
+
+        delay = LISTEN_RECONNECT_MIN_DELAY
+        while self._running:
+            lost = asyncio.Event()
+            try:
+                self._listen_conn = await asyncpg.connect(self.dsn)
+                self._listen_conn.add_termination_listener(lambda connection: lost.set())
+                await self._listen_conn.add_listener(NOTIFY_CHANNEL, self._on_notify)
+                logger.info(f"📡 Listening for status updates on '{NOTIFY_CHANNEL}'")
+                delay = LISTEN_RECONNECT_MIN_DELAY
+                await lost.wait()
+                logger.warning("⚠️ Status LISTEN connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Status LISTEN unavailable, retrying in {delay:.0f}s: {e}")
+            finally:
+                if self._listen_conn is not None:
+                    conn, self._listen_conn = self._listen_conn, None
+                    if not conn.is_closed():
+                        await conn.close()
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, LISTEN_RECONNECT_MAX_DELAY)
+            self.stats["listen_reconnects"] += 1
+
+    def _on_notify(self, connection, pid, channel, payload):
+        """asyncpg listener callback (runs on the event loop)"""
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+
+        if message.get("worker") == self.worker_id or not self._on_remote_update:
+            return
+        asyncio.create_task(self._fetch_remote(message.get("ids", [])))
+
+    async def _fetch_remote(self, process_ids: List[str]):
+        """Load statuses written by another worker and hand them to the manager"""
+        try:
+            async with self.db_pool.acquire() as conn:
+                rows = await conn.fetch(
+                    "SELECT process_id, status FROM krai_system.processing_status WHERE process_id = ANY($1)",
+                    process_ids
+                )
+            for row in rows:
+                self.stats["remote_updates"] += 1
+                self._on_remote_update(row["process_id"], json.loads(row["status"]))
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to load remote status update: {e}")
+
+    async def load(self, process_id: str) -> Optional[Dict[str, Any]]:
+        async with self.db_pool.acquire() as conn:
+            row = await conn.fetchrow(
+                "SELECT status FROM krai_system.processing_status WHERE process_id = $1",
+                process_id
+            )
+        return json.loads(row["status"]) if row else None
+
+    async def load_by_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            uuid.UUID(document_id)
+        except ValueError:
+            return None
+
+        async with self.db_pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT status FROM krai_system.processing_status
+                WHERE document_id = $1::uuid
+                ORDER BY updated_at DESC
+                LIMIT 1
+                """,
+                document_id
+            )
+        return json.loads(row["status"]) if row else None
+
+    async def list_active(self, exclude: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        async with self.db_pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT status FROM krai_system.processing_status
+                WHERE completed_at IS NULL
+                  AND updated_at > NOW() - make_interval(mins => $1)
+                  AND worker_id <> $2
+                ORDER BY created_at
+                """,
+                self.stale_after_minutes, self.worker_id
+            )
+        excluded = set(exclude or [])
+        return [
+            status for status in (json.loads(row["status"]) for row in rows)
+            if status.get("process_id") not in excluded
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            self.stats,
+            backend=self.name,
+            worker_id=self.worker_id,
+            pending_writes=len(self._dirty),
+            flush_interval=self.flush_interval,
+            listening=self._listen_conn is not None
+        )
+
+def create_status_backend(db_pool, dsn: Optional[str] = None) -> StatusBackend:
+    """Select the backend from KRAI_STATUS_BACKEND (memory | postgres)"""
+    backend = os.getenv("KRAI_STATUS_BACKEND", "memory").lower()
+
+    if backend == "postgres":
+        flush_interval = float(os.getenv("KRAI_STATUS_FLUSH_INTERVAL", "0.5"))
+        return PostgresStatusBackend(db_pool, dsn=dsn, flush_interval=flush_interval)
+
+    if backend != "memory":
+        logger.warning(f"⚠️ Unknown KRAI_STATUS_BACKEND '{backend}', using in-memory status")
+    return StatusBackend()
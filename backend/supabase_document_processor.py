@@ -24,6 +24,9 @@ from tests.json_config_classifier import JSONConfigClassifier
 from tests.json_version_extractor import JSONVersionExtractor
 from tests.intelligent_model_extractor import IntelligentModelExtractor
 from config.supabase_config import SupabaseConfig, SupabaseStorage
+from upload_spool import DocumentSource
+from pdf_pages import ImageRef, iter_pymupdf_pages
+from embedding_backfill import record_pending
 
 # Configure logging
 logging.basicConfig(
@@ -105,12 +108,11 @@ class SupabaseDocumentProcessor:
         try:
             logger.info(f"🚀 Starting Supabase document processing: {file_path.name}")
             
-            # 1. Read file content
-            with open(file_path, 'rb') as f:
-                file_content = f.read()
+            # 1. Hash file content in chunks
+            source = await asyncio.to_thread(DocumentSource.from_path, file_path)
             
-            # 2. Calculate file hash and check for duplicates
-            file_hash = hashlib.sha256(file_content).hexdigest()
+            # 2. Check for duplicates
+            file_hash = source.sha256
             existing_doc = await self._check_duplicate(file_hash)
             
             if existing_doc:
@@ -121,21 +123,25 @@ class SupabaseDocumentProcessor:
                     'message': 'Document already processed'
                 }
             
-            # 3. Upload document to Supabase storage
-            storage_result = await self.supabase_storage.upload_document(file_path, file_content)
+            # 3. Upload document to Supabase storage (the storage API needs the bytes; released right after)
+            storage_result = await self.supabase_storage.upload_document(
+                file_path, await asyncio.to_thread(file_path.read_bytes)
+            )
             if not storage_result:
                 raise Exception("Failed to upload document to Supabase storage")
             
             logger.info(f"✅ Document uploaded to Supabase: {storage_result['url']}")
             
-            # 4. Extract text and images from PDF
-            extraction_result = await self._extract_content(file_content)
-            
-            # 5. Process images and upload to Supabase
-            image_results = await self._process_and_upload_images(
-                extraction_result['images'], 
-                file_content
-            )
+            # PyMuPDF reads pages from the file on demand; the document stays open until images are uploaded
+            doc = fitz.open(file_path)
+            try:
+                # 4. Extract text and image references from PDF
+                extraction_result = await self._extract_content(doc)
+                
+                # 5. Process images and upload to Supabase
+                image_results = await self._process_and_upload_images(extraction_result['images'])
+            finally:
+                doc.close()
             
             # 6. Classify document using JSON config
             classification_result = await self._classify_document(
@@ -225,88 +231,56 @@ class SupabaseDocumentProcessor:
             row = await conn.fetchrow(query, file_hash)
             return dict(row) if row else None
     
-    async def _extract_content(self, file_content: bytes) -> Dict:
-        """Extract text and images from PDF"""
+    async def _extract_content(self, doc) -> Dict:
+        """Extract text and image references from an open PDF, one page at a time"""
         try:
-            # Open PDF from bytes
-            doc = fitz.open(stream=file_content, filetype="pdf")
-            
-            text_content = ""
+            text_parts = []
             images = []
-            total_pages = len(doc)
-            
-            for page_num in range(total_pages):
-                page = doc[page_num]
-                
-                # Extract text
-                page_text = page.get_text()
-                text_content += f"\n--- PAGE {page_num + 1} ---\n{page_text}"
-                
-                # Extract images with metadata
-                image_list = page.get_images()
-                for img_index, img in enumerate(image_list):
-                    try:
-                        # Get image data
-                        xref = img[0]
-                        pix = fitz.Pixmap(doc, xref)
-                        
-                        if pix.n - pix.alpha < 4:  # GRAY or RGB
-                            img_data = pix.tobytes("png")
-                            
-                            images.append({
-                                'page': page_num + 1,
-                                'index': img_index,
-                                'xref': xref,
-                                'data': img_data,
-                                'width': pix.width,
-                                'height': pix.height,
-                                'colorspace': pix.colorspace.name if pix.colorspace else 'unknown'
-                            })
-                        
-                        pix = None
-                        
-                    except Exception as e:
-                        logger.warning(f"⚠️ Failed to extract image {img_index} from page {page_num + 1}: {e}")
             
-            doc.close()
+            for page_no, page_text, image_refs in iter_pymupdf_pages(doc):
+                text_parts.append(f"\n--- PAGE {page_no} ---\n{page_text}")
+                images.extend(image_refs)
             
             return {
-                'text': text_content,
+                'text': "".join(text_parts),
                 'images': images,
-                'pages': total_pages
+                'pages': len(doc)
             }
             
         except Exception as e:
             logger.error(f"❌ Content extraction failed: {e}")
             raise
     
-    async def _process_and_upload_images(self, images: List[Dict], file_content: bytes) -> List[Dict]:
-        """Process and upload images to Supabase storage"""
+    async def _process_and_upload_images(self, images: List[ImageRef]) -> List[Dict]:
+        """Render and upload images to Supabase storage, one at a time"""
         image_results = []
         
         for image in images:
             try:
+                # Render only this image; its bytes are released after the upload
+                image_data = image.load()
+                
                 # Generate unique filename
-                image_hash = hashlib.sha256(image['data']).hexdigest()
-                filename = f"page_{image['page']}_img_{image['index']}_{image_hash[:8]}.png"
+                image_hash = hashlib.sha256(image_data).hexdigest()
+                filename = f"page_{image.page_no}_img_{image.index}_{image_hash[:8]}.png"
                 
                 # Upload image to Supabase
                 image_path = Path(filename)
                 storage_result = await self.supabase_storage.upload_image(
                     image_path, 
-                    image['data']
+                    image_data
                 )
                 
                 if storage_result:
                     image_results.append({
-                        'page': image['page'],
-                        'index': image['index'],
+                        'page': image.page_no,
+                        'index': image.index,
                         'hash': image_hash,
                         'url': storage_result['url'],
-                        'width': image['width'],
-                        'height': image['height'],
-                        'colorspace': image['colorspace'],
-                        'size': len(image['data'])
+                        'width': image.width,
+                        'height': image.height,
+                        'colorspace': image.colorspace,
+                        'size': len(image_data)
                     })
                     
                     logger.info(f"✅ Image uploaded: {filename}")
@@ -515,11 +489,12 @@ class SupabaseDocumentProcessor:
                 for chunk_index, chunk in enumerate(chunks):
                     query = """
                         INSERT INTO krai_intelligence.chunks (
-                            document_id, chunk_index, page_start, page_end,
+                            document_id, manufacturer_id, chunk_index, page_start, page_end,
                             text_chunk, token_count, fingerprint, section_title,
                             processing_status
                         ) VALUES (
-                            $1, $2, $3, $4, $5, $6, $7, $8, $9
+                            $1, (SELECT manufacturer_id FROM krai_core.documents WHERE id = $1),
+                            $2, $3, $4, $5, $6, $7, $8, $9
                         ) RETURNING id
                     """
                     
@@ -669,6 +644,7 @@ class SupabaseDocumentProcessor:
         try:
             embeddings = []
             embedding_ids = []
+            pending_chunk_ids = []
             
             async with self.db_pool.acquire() as conn:
                 # Generate embeddings using Ollama API
@@ -689,13 +665,20 @@ class SupabaseDocumentProcessor:
                     if row:
                         chunk_id = row['id']
                         
+                        if embedding_vector is None:
+                            # Re-embedded later by the backfill worker instead of storing a zero vector
+                            pending_chunk_ids.append(chunk_id)
+                            continue
+                        
                         # Store embedding
                         query = """
                             INSERT INTO krai_intelligence.embeddings (
-                                chunk_id, embedding, model_name, model_version, created_at
-                            ) VALUES (
-                                $1, $2, $3, $4, NOW()
-                            ) RETURNING id
+                                chunk_id, manufacturer_id, embedding, model_name, model_version, created_at
+                            )
+                            SELECT c.id, c.manufacturer_id, $2::vector, $3, $4, NOW()
+                            FROM krai_intelligence.chunks c
+                            WHERE c.id = $1
+                            RETURNING id
                         """
                         
                         # Convert embedding to string format for pgvector
@@ -712,6 +695,8 @@ class SupabaseDocumentProcessor:
                             'embedding_vector': embedding_vector,
                             'model_name': 'all-MiniLM-L6-v2'
                         })
+                
+                await record_pending(conn, pending_chunk_ids, 'embeddinggemma:300m', "embedding failed")
             
             logger.info(f"✅ Generated {len(embeddings)} embeddings for document {document_id}")
             
@@ -775,8 +760,8 @@ class SupabaseDocumentProcessor:
         """Get processing statistics"""
         return self.stats.copy()
     
-    async def _generate_ollama_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings using Ollama API"""
+    async def _generate_ollama_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Generate embeddings using Ollama API (None for texts that failed)"""
         try:
             import httpx
             
@@ -798,15 +783,13 @@ class SupabaseDocumentProcessor:
                         embeddings.append(result["embedding"])
                     else:
                         logger.error(f"❌ Ollama embedding failed: {response.status_code} - {response.text}")
-                        # Fallback to zero vector
-                        embeddings.append([0.0] * 768)
+                        embeddings.append(None)
             
             return embeddings
             
         except Exception as e:
             logger.error(f"❌ Ollama embedding generation failed: {e}")
-            # Fallback to zero vectors
-            return [[0.0] * 768 for _ in texts]
+            return [None] * len(texts)
 
 # Main execution function
 async def main():
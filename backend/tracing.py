@@ -0,0 +1,336 @@
+# KRAI Engine - Pipeline Tracing
+# Lightweight spans propagated with contextvars; exported as JSON files or OTLP/JSON
+
+import asyncio
+import json
+import logging
+import os
+import secrets
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# A 5000-page manual produces one span per Ollama request and DB batch; cap runaway traces
+MAX_SPANS_PER_TRACE = 20000
+MAX_RECENT_TRACES = 200
+SERVICE_NAME = "krai-engine"
+
+# Innermost open span of the current task; asyncio tasks and to_thread copy it on creation
+_current_span: ContextVar[Optional["Span"]] = ContextVar("krai_current_span", default=None)
+
+def _new_id(nbytes: int) -> str:
+    return secrets.token_hex(nbytes)
+
+class Span:
+    """One timed operation inside a trace"""
+
+    __slots__ = ("trace", "span_id", "parent", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent = parent
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def finish(self, error: Optional[Union[BaseException, str]] = None):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+
+class Trace:
+    """All spans of one processing job, keyed by its process_id"""
+
+    def __init__(self, process_id: str, name: str, attributes: Dict[str, Any]):
+        self.process_id = process_id
+        self.trace_id = _new_id(16)
+        self.spans: List[Span] = []
+        self.dropped_spans = 0
+        # Spans opened in one call and closed in another (processing stages)
+        self.open_spans: Dict[str, Span] = {}
+        self.root = Span(self, name, None, dict(attributes, process_id=process_id))
+        self.spans.append(self.root)
+
+    @property
+    def finished(self) -> bool:
+        return self.root.end_ns is not None
+
+    def add(self, span: Span) -> bool:
+        if len(self.spans) >= MAX_SPANS_PER_TRACE:
+            self.dropped_spans += 1
+            return False
+        # list.append is atomic, so spans finished in to_thread workers need no lock
+        self.spans.append(span)
+        return True
+
+    def to_tree(self) -> Dict[str, Any]:
+        """Nested span tree plus a per-name time breakdown"""
+        nodes: Dict[str, Dict[str, Any]] = {}
+        breakdown: Dict[str, Dict[str, Any]] = {}
+
+        for span in self.spans:
+            nodes[span.span_id] = {
+                "name": span.name,
+                "span_id": span.span_id,
+                "offset_ms": round((span.start_ns - self.root.start_ns) / 1e6, 3),
+                "duration_ms": round(span.duration_ms, 3) if span.duration_ms is not None else None,
+                "attributes": span.attributes,
+                "error": span.error,
+                "children": []
+            }
+            if span is not self.root and span.duration_ms is not None:
+                entry = breakdown.setdefault(span.name, {"count": 0, "total_ms": 0.0, "errors": 0})
+                entry["count"] += 1
+                entry["total_ms"] += span.duration_ms
+                entry["errors"] += 1 if span.error else 0
+
+        for span in self.spans:
+            if span.parent is not None and span.parent.span_id in nodes:
+                nodes[span.parent.span_id]["children"].append(nodes[span.span_id])
+
+        for entry in breakdown.values():
+            entry["total_ms"] = round(entry["total_ms"], 3)
+
+        return {
+            "process_id": self.process_id,
+            "trace_id": self.trace_id,
+            "finished": self.finished,
+            "duration_ms": nodes[self.root.span_id]["duration_ms"],
+            "span_count": len(self.spans),
+            "dropped_spans": self.dropped_spans,
+            "breakdown": dict(sorted(breakdown.items(), key=lambda item: -item[1]["total_ms"])),
+            "root": nodes[self.root.span_id]
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """OTLP/JSON ExportTraceServiceRequest (what an OTLP/HTTP collector accepts on /v1/traces)"""
+        spans = []
+        for span in self.spans:
+            otlp_span = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                "attributes": [_otlp_attribute(key, value) for key, value in span.attributes.items()],
+                # STATUS_CODE_OK = 1, STATUS_CODE_ERROR = 2
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1}
+            }
+            if span.parent is not None:
+                otlp_span["parentSpanId"] = span.parent.span_id
+            spans.append(otlp_span)
+
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": "krai.tracing"}, "spans": spans}]
+            }]
+        }
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+class Tracer:
+    """Creates traces per process_id and spans inside them
+
+    Spans are only recorded while a trace is active in the current context, so
+    code paths outside a processing job (search, CLI tools) pay a single
+    ContextVar lookup per span.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("KRAI_TRACING", "true").lower() == "true"
+        self.exporters = [name.strip() for name in os.getenv("KRAI_TRACE_EXPORT", "none").lower().split(",")
+                          if name.strip() and name.strip() != "none"]
+        self.trace_dir = Path(os.getenv("KRAI_TRACE_DIR", "traces"))
+        self.otlp_endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318").rstrip("/")
+        self._active: Dict[str, Trace] = {}
+        self._recent: "OrderedDict[str, Trace]" = OrderedDict()
+        self._export_tasks = set()
+
+    # ---- traces ----
+
+    def begin_trace(self, process_id: str, name: str, **attributes) -> Optional[Trace]:
+        """Open the root span of a job and make it current for this task"""
+        if not self.enabled:
+            return None
+        trace = Trace(process_id, name, attributes)
+        self._active[process_id] = trace
+        _current_span.set(trace.root)
+        return trace
+
+    def end_trace(self, trace: Optional[Trace], error: Optional[BaseException] = None):
+        """Close the root span (and anything left open), keep the trace for the API and export it"""
+        if trace is None:
+            return
+        for span in list(trace.open_spans.values()):
+            span.finish(error)
+        trace.open_spans.clear()
+        trace.root.finish(error)
+        if _current_span.get() is not None and _current_span.get().trace is trace:
+            _current_span.set(None)
+
+        self._active.pop(trace.process_id, None)
+        self._recent[trace.process_id] = trace
+        while len(self._recent) > MAX_RECENT_TRACES:
+            self._recent.popitem(last=False)
+
+        self._export(trace)
+
+    def get_trace(self, process_id: str) -> Optional[Trace]:
+        return self._active.get(process_id) or self._recent.get(process_id)
+
+    def load_exported(self, process_id: str) -> Optional[Dict[str, Any]]:
+        """Span tree written by the JSON exporter (traces evicted from memory or from other workers)"""
+        path = self.trace_dir / f"{Path(process_id).name}.json"
+        if not path.is_file():
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    # ---- spans ----
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def start_span(self, name: str, **attributes) -> Optional[Span]:
+        """Open a child of the current span and make it current"""
+        parent = _current_span.get()
+        if parent is None:
+            return None
+        span = Span(parent.trace, name, parent, attributes)
+        if not parent.trace.add(span):
+            return None
+        _current_span.set(span)
+        return span
+
+    def end_span(self, span: Optional[Span], error: Optional[BaseException] = None):
+        if span is None:
+            return
+        span.finish(error)
+        if _current_span.get() is span:
+            _current_span.set(span.parent)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        """Time a with-block as a child span (no-op outside a trace)"""
+        span = self.start_span(name, **attributes)
+        if span is None:
+            yield None
+            return
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, e)
+            raise
+        else:
+            self.end_span(span)
+
+    def open_span(self, process_id: str, key: str, name: str, **attributes) -> Optional[Span]:
+        """Start a span that is closed by a later close_span() call (e.g. a processing stage)"""
+        trace = self._active.get(process_id)
+        current = _current_span.get()
+        if trace is None or current is None or current.trace is not trace:
+            return None
+        previous = trace.open_spans.pop(key, None)
+        if previous is not None:
+            self.end_span(previous)
+        span = self.start_span(name, **attributes)
+        if span is not None:
+            trace.open_spans[key] = span
+        return span
+
+    def close_span(self, process_id: str, key: str, error: Optional[Union[BaseException, str]] = None):
+        trace = self._active.get(process_id)
+        if trace is None:
+            return
+        self.end_span(trace.open_spans.pop(key, None), error)
+
+    # ---- export ----
+
+    def _export(self, trace: Trace):
+        if not self.exporters:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        for exporter in self.exporters:
+            if exporter == "json":
+                if loop:
+                    self._track(loop.run_in_executor(None, self._write_json, trace))
+                else:
+                    self._write_json(trace)
+            elif exporter == "otlp":
+                if loop:
+                    self._track(loop.create_task(self._post_otlp(trace)))
+                else:
+                    logger.warning("⚠️ OTLP trace export needs a running event loop")
+            else:
+                logger.warning(f"⚠️ Unknown KRAI_TRACE_EXPORT exporter '{exporter}'")
+
+    def _track(self, future):
+        self._export_tasks.add(future)
+        future.add_done_callback(self._export_tasks.discard)
+
+    def _write_json(self, trace: Trace):
+        try:
+            self.trace_dir.mkdir(parents=True, exist_ok=True)
+            path = self.trace_dir / f"{Path(trace.process_id).name}.json"
+            tmp_path = path.with_suffix(".json.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(trace.to_tree(), f, default=str)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"⚠️ Trace export to {self.trace_dir} failed: {e}")
+
+    async def _post_otlp(self, trace: Trace):
+        import httpx
+
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.post(f"{self.otlp_endpoint}/v1/traces", json=trace.to_otlp(), timeout=10.0)
+            if response.status_code >= 300:
+                logger.warning(f"⚠️ OTLP trace export failed: {response.status_code} - {response.text[:200]}")
+        except Exception as e:
+            logger.warning(f"⚠️ OTLP trace export failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "exporters": self.exporters or ["none"],
+            "active_traces": len(self._active),
+            "recent_traces": len(self._recent)
+        }
+
+# Global tracer
+tracer = Tracer()
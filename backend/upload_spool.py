@@ -0,0 +1,132 @@
+# KRAI Engine - Spooled Uploads
+# Streams uploads to disk with an incremental SHA-256 so documents never sit in worker memory
+
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import resource
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+SPOOL_CHUNK_SIZE = 1024 * 1024  # 1 MB
+MB = 1024 * 1024
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds MAX_DOCUMENT_SIZE_MB"""
+
+class DocumentSource:
+    """A document on disk (spooled upload or local file) with its size and SHA-256"""
+
+    def __init__(self, path: Path, size: int, sha256: str, filename: Optional[str] = None, owned: bool = False):
+        self.path = Path(path)
+        self.size = size
+        self.sha256 = sha256
+        self.filename = filename or self.path.name
+        # Owned sources are spool files that are deleted on cleanup()
+        self.owned = owned
+
+    @classmethod
+    def from_path(cls, path: Union[str, Path], chunk_size: int = SPOOL_CHUNK_SIZE) -> "DocumentSource":
+        """Hash an existing file in fixed-size chunks (blocking)"""
+        path = Path(path)
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+                size += len(chunk)
+        return cls(path, size, digest.hexdigest())
+
+    @contextmanager
+    def open(self) -> Iterator[Any]:
+        """Read-only mmap of the document (plain file handle for empty files)"""
+        with open(self.path, 'rb') as f:
+            if self.size == 0:
+                yield f
+                return
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield mapped
+            finally:
+                mapped.close()
+
+    def cleanup(self):
+        """Delete the spool file"""
+        if not self.owned:
+            return
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to remove spool file {self.path}: {e}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"filename": self.filename, "size": self.size, "sha256": self.sha256}
+
+def max_upload_bytes() -> int:
+    """Upload limit from MAX_DOCUMENT_SIZE_MB (0 disables the limit)"""
+    return int(float(os.getenv("MAX_DOCUMENT_SIZE_MB", "500")) * MB)
+
+async def spool_upload(upload, path: Optional[Path] = None, max_bytes: Optional[int] = None,
+                       chunk_size: int = SPOOL_CHUNK_SIZE) -> DocumentSource:
+    """Stream a FastAPI UploadFile to disk, hashing as it goes
+
+    Without a path the file is spooled to KRAI_UPLOAD_SPOOL_DIR (or the system
+    temp dir) and the returned source owns it.
+    """
+    if max_bytes is None:
+        max_bytes = max_upload_bytes()
+
+    owned = path is None
+    if owned:
+        spool_dir = os.getenv("KRAI_UPLOAD_SPOOL_DIR") or None
+        if spool_dir:
+            Path(spool_dir).mkdir(parents=True, exist_ok=True)
+        fd, spool_name = tempfile.mkstemp(prefix="krai_upload_", suffix=Path(upload.filename or "").suffix,
+                                          dir=spool_dir)
+        os.close(fd)
+        path = Path(spool_name)
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, 'wb') as spool:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds {max_bytes // MB} MB")
+                digest.update(chunk)
+                await asyncio.to_thread(spool.write, chunk)
+    except BaseException:
+        try:
+            Path(path).unlink()
+        except FileNotFoundError:
+            pass
+        raise
+
+    return DocumentSource(path, size, digest.hexdigest(), filename=upload.filename, owned=owned)
+
+def peak_rss_bytes() -> int:
+    """High-water mark of this process's resident set size"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def current_rss_bytes() -> int:
+    """Current resident set size (0 where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
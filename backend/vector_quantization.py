@@ -0,0 +1,71 @@
+# KRAI Engine - Vector Quantization
+# halfvec / binary-quantized embedding storage with full-precision rescoring
+
+"""
+Embeddings are always kept at full precision in krai_intelligence.embeddings.embedding.
+With KRAI_VECTOR_QUANTIZATION set (performance_config["vector_quantization"]), ingestion also writes the L2-normalized
+halfvec and binary-quantized copies added by 08_vector_quantization.sql, and
+search walks the much smaller HNSW index on one of those copies for a wider
+candidate set before rescoring it against the full-precision vectors.
+
+    none     - HNSW on the float32 column (idx_embeddings_vector_hnsw)
+    halfvec  - HNSW on embedding_half (inner product), rescored
+    binary   - HNSW on embedding_bits (Hamming distance), rescored
+
+Independently, model_config["embedding"]["truncate_dimension"] selects a
+Matryoshka coarse index: an expression HNSW index on the first N dimensions of
+the full vector (09_matryoshka_index.sql). It needs no extra column and takes
+precedence over the quantized columns for candidate retrieval; the rescoring
+step is the same.
+"""
+
+import math
+from enum import Enum
+from typing import List, Optional, Sequence, Tuple
+
+DEFAULT_RESCORE_CANDIDATES = 200
+
+class QuantizationMode(str, Enum):
+    """Which stored representation the ANN search walks"""
+    NONE = "none"
+    HALFVEC = "halfvec"
+    BINARY = "binary"
+
+    @property
+    def quantized(self) -> bool:
+        return self is not QuantizationMode.NONE
+
+def l2_normalize(vector: Sequence[float]) -> List[float]:
+    """Unit-length copy (cosine distance becomes 1 - inner product)"""
+    norm = math.sqrt(sum(v * v for v in vector))
+    if not norm:
+        return list(vector)
+    return [v / norm for v in vector]
+
+def vector_literal(vector: Sequence[float]) -> str:
+    """pgvector text format"""
+    return '[' + ','.join(map(str, vector)) + ']'
+
+def insert_columns(mode: QuantizationMode, vector_param: str = "$2") -> Tuple[str, str]:
+    """Extra (columns, values) for INSERT INTO embeddings when quantized copies are stored"""
+    if not mode.quantized:
+        return "", ""
+    return (", embedding_half, embedding_bits",
+            f", {vector_param}::halfvec(768), binary_quantize({vector_param}::vector)::bit(768)")
+
+def matryoshka_prefix(vector_expression: str, dimensions: int) -> str:
+    """Leading dimensions of a vector; must match the index expression in 09_matryoshka_index.sql"""
+    return f"(subvector({vector_expression}, 1, {int(dimensions)})::vector({int(dimensions)}))"
+
+def candidate_order(mode: QuantizationMode, vector_param: str = "$1", alias: str = "e",
+                    coarse_dimension: Optional[int] = None) -> str:
+    """ORDER BY expression that lets the planner use the mode's HNSW index"""
+    if coarse_dimension:
+        # Cosine distance normalizes, so the truncated prefix needs no re-normalization
+        return (f"{matryoshka_prefix(f'{alias}.embedding', coarse_dimension)} <=> "
+                f"{matryoshka_prefix(f'{vector_param}::vector', coarse_dimension)}")
+    if mode is QuantizationMode.HALFVEC:
+        return f"{alias}.embedding_half <#> {vector_param}::halfvec(768)"
+    if mode is QuantizationMode.BINARY:
+        return f"{alias}.embedding_bits <~> binary_quantize({vector_param}::vector)::bit(768)"
+    return f"{alias}.embedding <=> {vector_param}::vector"
@@ -0,0 +1,61 @@
+-- ======================================================================
+-- 🔢 KR-AI-ENGINE - ERROR CODE & PART NUMBER INDEX
+-- ======================================================================
+--
+-- Applies:
+-- - Part number postings table (code -> chunk/page)
+-- - Hash indexes for O(1) equality lookups on error codes / part numbers
+-- - Unique postings per (chunk, code) so re-indexing is idempotent
+-- ======================================================================
+
+-- ======================================================================
+-- PART NUMBER POSTINGS
+-- ======================================================================
+
+CREATE TABLE IF NOT EXISTS krai_intelligence.part_number_mentions (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    chunk_id UUID REFERENCES krai_intelligence.chunks(id) ON DELETE CASCADE,
+    document_id UUID REFERENCES krai_core.documents(id) ON DELETE CASCADE,
+    manufacturer_id UUID REFERENCES krai_core.manufacturers(id),
+    part_number VARCHAR(100) NOT NULL,
+    part_description TEXT,
+    page_number INTEGER,
+    extraction_method VARCHAR(50),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE krai_intelligence.part_number_mentions ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "service_role_part_number_mentions_all" ON krai_intelligence.part_number_mentions;
+CREATE POLICY "service_role_part_number_mentions_all" ON krai_intelligence.part_number_mentions FOR ALL
+    USING (true);
+
+-- ======================================================================
+-- LOOKUP INDEXES (codes are stored upper-cased by the ingestion pipeline)
+-- ======================================================================
+
+CREATE INDEX IF NOT EXISTS idx_error_codes_code_hash
+    ON krai_intelligence.error_codes
+    USING hash (error_code);
+
+CREATE INDEX IF NOT EXISTS idx_part_number_mentions_code_hash
+    ON krai_intelligence.part_number_mentions
+    USING hash (part_number);
+
+-- One posting per chunk and code
+CREATE UNIQUE INDEX IF NOT EXISTS idx_error_codes_chunk_code_unique
+    ON krai_intelligence.error_codes (chunk_id, error_code)
+    WHERE chunk_id IS NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_part_number_mentions_chunk_code_unique
+    ON krai_intelligence.part_number_mentions (chunk_id, part_number);
+
+-- Foreign key indexes
+CREATE INDEX IF NOT EXISTS idx_part_number_mentions_document_id
+    ON krai_intelligence.part_number_mentions (document_id);
+
+CREATE INDEX IF NOT EXISTS idx_part_number_mentions_manufacturer_id
+    ON krai_intelligence.part_number_mentions (manufacturer_id);
+
+ANALYZE krai_intelligence.error_codes;
+ANALYZE krai_intelligence.part_number_mentions;
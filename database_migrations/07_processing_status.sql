@@ -0,0 +1,53 @@
+-- ======================================================================
+-- 📊 KR-AI-ENGINE - SHARED PROCESSING STATUS
+-- ======================================================================
+--
+-- Applies:
+-- - krai_system.processing_status: one row per processing job, written in
+--   batches by every API worker (KRAI_STATUS_BACKEND=postgres)
+-- - Lookup by process id (primary key) and by document id (hash index)
+-- - Workers announce changes via NOTIFY krai_processing_status
+-- ======================================================================
+
+CREATE TABLE IF NOT EXISTS krai_system.processing_status (
+    process_id VARCHAR(64) PRIMARY KEY,
+    document_id UUID,
+    filename VARCHAR(255) NOT NULL,
+    overall_status VARCHAR(20) NOT NULL,
+    current_stage VARCHAR(50),
+    progress_percent INTEGER DEFAULT 0,
+    status JSONB NOT NULL,
+    worker_id VARCHAR(255),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    completed_at TIMESTAMP WITH TIME ZONE
+);
+
+ALTER TABLE krai_system.processing_status ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "service_role_processing_status_all" ON krai_system.processing_status;
+CREATE POLICY "service_role_processing_status_all" ON krai_system.processing_status FOR ALL
+    USING (true);
+
+-- Document id lookups (equality only)
+CREATE INDEX IF NOT EXISTS idx_processing_status_document_hash
+    ON krai_system.processing_status
+    USING hash (document_id);
+
+-- Active jobs across workers (status monitor snapshot)
+CREATE INDEX IF NOT EXISTS idx_processing_status_active
+    ON krai_system.processing_status (updated_at)
+    WHERE completed_at IS NULL;
+
+-- Remove finished jobs after 30 days
+CREATE OR REPLACE FUNCTION krai_system.cleanup_processing_status(retention_days INTEGER DEFAULT 30)
+RETURNS INTEGER AS $$
+DECLARE
+    deleted_count INTEGER;
+BEGIN
+    DELETE FROM krai_system.processing_status
+    WHERE completed_at < NOW() - make_interval(days => retention_days);
+    GET DIAGNOSTICS deleted_count = ROW_COUNT;
+    RETURN deleted_count;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,66 @@
+-- ======================================================================
+-- 🗜️ KR-AI-ENGINE - QUANTIZED EMBEDDING STORAGE
+-- ======================================================================
+--
+-- Applies (pgvector >= 0.7):
+-- - embedding_half: L2-normalized halfvec copy of the embedding (2 bytes/dim)
+-- - embedding_bits: binary-quantized copy (1 bit/dim)
+-- - HNSW indexes on both; search ranks candidates there and rescores them
+--   against the full-precision embedding column
+-- - krai_intelligence.quantize_embeddings_batch() to backfill existing rows
+--
+-- Written by the ingestion pipeline when KRAI_VECTOR_QUANTIZATION is
+-- halfvec or binary. Once all rows are backfilled and search runs in a
+-- quantized mode, idx_embeddings_vector_hnsw is no longer used and can be
+-- dropped to free its memory:
+--     DROP INDEX CONCURRENTLY krai_intelligence.idx_embeddings_vector_hnsw;
+-- ======================================================================
+
+ALTER TABLE krai_intelligence.embeddings
+    ADD COLUMN IF NOT EXISTS embedding_half halfvec(768),
+    ADD COLUMN IF NOT EXISTS embedding_bits bit(768);
+
+-- Vectors are unit length, so inner product ranks like cosine and is cheaper
+CREATE INDEX IF NOT EXISTS idx_embeddings_half_hnsw
+    ON krai_intelligence.embeddings
+    USING hnsw (embedding_half halfvec_ip_ops);
+
+CREATE INDEX IF NOT EXISTS idx_embeddings_bits_hnsw
+    ON krai_intelligence.embeddings
+    USING hnsw (embedding_bits bit_hamming_ops);
+
+-- ======================================================================
+-- BACKFILL
+-- ======================================================================
+-- Fills the quantized columns for up to batch_size rows and returns the
+-- number of rows updated. Call repeatedly until it returns 0:
+--     SELECT krai_intelligence.quantize_embeddings_batch(10000);
+
+CREATE OR REPLACE FUNCTION krai_intelligence.quantize_embeddings_batch(batch_size INTEGER DEFAULT 10000)
+RETURNS INTEGER AS $$
+DECLARE
+    updated INTEGER;
+BEGIN
+    WITH batch AS (
+        SELECT id
+        FROM krai_intelligence.embeddings
+        WHERE embedding IS NOT NULL AND embedding_half IS NULL
+        LIMIT batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE krai_intelligence.embeddings e
+    SET embedding_half = l2_normalize(e.embedding)::halfvec(768),
+        embedding_bits = binary_quantize(e.embedding)::bit(768)
+    FROM batch
+    WHERE e.id = batch.id;
+
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    RETURN updated;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    RAISE NOTICE '🗜️ Quantized embedding columns ready (halfvec + bit, HNSW)';
+    RAISE NOTICE '   Backfill: SELECT krai_intelligence.quantize_embeddings_batch(10000); until it returns 0';
+END $$;
@@ -0,0 +1,45 @@
+-- ======================================================================
+-- 🪆 KR-AI-ENGINE - MATRYOSHKA COARSE INDEX
+-- ======================================================================
+--
+-- Applies (pgvector >= 0.7):
+-- - krai_intelligence.create_matryoshka_index(dims): expression HNSW index on
+--   the first N dimensions of the full embedding (embeddinggemma is trained
+--   so its 256/128-dim prefixes stay usable)
+--
+-- No index is built here. OLLAMA_EMBEDDING_TRUNCATE_DIM defaults to 0 (off),
+-- and an unused HNSW index would only slow down every embedding insert.
+-- To opt in, build the index for the prefix length first, then set the knob:
+--   SELECT krai_intelligence.create_matryoshka_index(256);
+--   OLLAMA_EMBEDDING_TRUNCATE_DIM=256
+--
+-- Used when OLLAMA_EMBEDDING_TRUNCATE_DIM matches an index created this way:
+-- search fetches KRAI_RESCORE_CANDIDATES candidates from the prefix index
+-- and ranks them on the full 768-dim vectors. No extra column is stored.
+-- The expression must stay identical to matryoshka_prefix() in
+-- backend/vector_quantization.py or the planner will not use the index.
+-- ======================================================================
+
+CREATE OR REPLACE FUNCTION krai_intelligence.create_matryoshka_index(dims INTEGER)
+RETURNS TEXT AS $$
+DECLARE
+    index_name TEXT := format('idx_embeddings_mrl%s_hnsw', dims);
+BEGIN
+    IF dims <= 0 OR dims >= 768 THEN
+        RAISE EXCEPTION 'Matryoshka prefix must be between 1 and 767 dimensions, got %', dims;
+    END IF;
+
+    EXECUTE format(
+        'CREATE INDEX IF NOT EXISTS %I ON krai_intelligence.embeddings '
+        'USING hnsw ((subvector(embedding, 1, %s)::vector(%s)) vector_cosine_ops)',
+        index_name, dims, dims
+    );
+    RETURN index_name;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    RAISE NOTICE '🪆 Matryoshka index helper installed (no index built, OLLAMA_EMBEDDING_TRUNCATE_DIM is opt-in)';
+    RAISE NOTICE '   Opt in: SELECT krai_intelligence.create_matryoshka_index(256); then OLLAMA_EMBEDDING_TRUNCATE_DIM=256';
+END $$;
@@ -0,0 +1,61 @@
+-- ======================================================================
+-- 🩹 KR-AI-ENGINE - PENDING EMBEDDINGS (BACKFILL QUEUE)
+-- ======================================================================
+--
+-- Applies:
+-- - krai_intelligence.pending_embeddings: chunks whose embedding call failed,
+--   re-embedded in batches by the backfill worker (backend/embedding_backfill.py)
+-- - Moves existing zero-vector embeddings (the old failure fallback) into the
+--   queue and deletes them
+-- - CHECK constraint so a zero vector can never be stored (and indexed) again
+-- ======================================================================
+
+CREATE TABLE IF NOT EXISTS krai_intelligence.pending_embeddings (
+    chunk_id UUID NOT NULL REFERENCES krai_intelligence.chunks(id) ON DELETE CASCADE,
+    model_name VARCHAR(100) NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (chunk_id, model_name)
+);
+
+-- The worker leases due rows per model in next_attempt_at order
+CREATE INDEX IF NOT EXISTS idx_pending_embeddings_due
+    ON krai_intelligence.pending_embeddings (model_name, next_attempt_at);
+
+-- ======================================================================
+-- ZERO-VECTOR CLEANUP
+-- ======================================================================
+
+INSERT INTO krai_intelligence.pending_embeddings (chunk_id, model_name, last_error)
+SELECT chunk_id, model_name, 'zero-vector fallback (migrated)'
+FROM krai_intelligence.embeddings
+WHERE embedding IS NOT NULL AND vector_norm(embedding) = 0
+ON CONFLICT (chunk_id, model_name) DO NOTHING;
+
+DELETE FROM krai_intelligence.embeddings
+WHERE embedding IS NOT NULL AND vector_norm(embedding) = 0;
+
+-- NOT VALID first so adding the constraint does not block writes; VALIDATE
+-- then scans the table under a lock that still allows inserts
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'embeddings_embedding_nonzero'
+    ) THEN
+        ALTER TABLE krai_intelligence.embeddings
+            ADD CONSTRAINT embeddings_embedding_nonzero
+            CHECK (vector_norm(embedding) > 0) NOT VALID;
+    END IF;
+END $$;
+
+ALTER TABLE krai_intelligence.embeddings VALIDATE CONSTRAINT embeddings_embedding_nonzero;
+
+DO $$
+DECLARE
+    queued INTEGER;
+BEGIN
+    SELECT COUNT(*) INTO queued FROM krai_intelligence.pending_embeddings;
+    RAISE NOTICE '🩹 Pending embeddings queue ready (% chunks waiting for the backfill worker)', queued;
+END $$;
@@ -0,0 +1,58 @@
+-- ======================================================================
+-- 🔁 KR-AI-ENGINE - ONLINE RE-EMBEDDING MIGRATIONS
+-- ======================================================================
+--
+-- Applies:
+-- - krai_intelligence.embedding_migrations: one row per embedding model
+--   change, driven by the re-embedding job (backend/embedding_migration.py)
+--     running    -> chunks are re-embedded into target_model rows in batches,
+--                   search keeps serving source_model
+--     collecting -> cut over: search and ingestion use target_model, the
+--                   source_model rows are deleted in batches
+--     completed  -> source_model rows are gone
+--     cancelling -> cancelled before the cut-over, target_model rows are
+--                   deleted in batches (then cancelled)
+-- - At most one migration is active at a time
+-- - idx_embeddings_model for the batched garbage collection
+-- ======================================================================
+
+CREATE TABLE IF NOT EXISTS krai_intelligence.embedding_migrations (
+    id SERIAL PRIMARY KEY,
+    source_model VARCHAR(100) NOT NULL,
+    source_version VARCHAR(50) NOT NULL DEFAULT 'latest',
+    target_model VARCHAR(100) NOT NULL,
+    target_version VARCHAR(50) NOT NULL DEFAULT 'latest',
+    status VARCHAR(20) NOT NULL DEFAULT 'running'
+        CHECK (status IN ('running', 'collecting', 'completed', 'cancelling', 'cancelled', 'failed')),
+    total_chunks BIGINT NOT NULL DEFAULT 0,
+    migrated_chunks BIGINT NOT NULL DEFAULT 0,
+    failed_chunks BIGINT NOT NULL DEFAULT 0,
+    gc_deleted BIGINT NOT NULL DEFAULT 0,
+    -- Keyset position of the first pass over krai_intelligence.chunks (ordered by id)
+    chunk_cursor UUID,
+    pass_complete BOOLEAN NOT NULL DEFAULT FALSE,
+    -- Recent re-embedding rate, written by the worker holding the lease
+    chunks_per_second DOUBLE PRECISION,
+    last_error TEXT,
+    -- One API worker drives a migration at a time; others take over when the lease expires
+    worker_id TEXT,
+    lease_until TIMESTAMP WITH TIME ZONE,
+    started_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    cut_over_at TIMESTAMP WITH TIME ZONE,
+    completed_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_embedding_migrations_one_active
+    ON krai_intelligence.embedding_migrations ((TRUE))
+    WHERE status IN ('running', 'collecting', 'cancelling');
+
+-- Garbage collection deletes one model's rows in batches
+CREATE INDEX IF NOT EXISTS idx_embeddings_model
+    ON krai_intelligence.embeddings (model_name);
+
+DO $$
+BEGIN
+    RAISE NOTICE '🔁 Embedding migrations ready';
+    RAISE NOTICE '   Start: POST /api/production/embeddings/migrations {"target_model": "..."}';
+END $$;
@@ -0,0 +1,201 @@
+-- ======================================================================
+-- 🎯 KR-AI-ENGINE - FILTERED VECTOR SEARCH (PARTIAL HNSW PER SCOPE)
+-- ======================================================================
+--
+-- Applies (pgvector >= 0.5):
+-- - manufacturer_id / document_type denormalized onto krai_intelligence.embeddings
+--   (filled by a trigger on insert, kept in sync when a document is reassigned)
+-- - krai_intelligence.vector_index_scopes: row count per manufacturer and
+--   per (manufacturer, document_type); scopes with at least min_rows rows get a
+--   partial HNSW index of their own (index_name), smaller ones are searched
+--   exactly through idx_embeddings_scope
+-- - krai_intelligence.refresh_vector_index_scopes(min_rows, per_document_type)
+--
+-- A search filtered to one manufacturer then walks that manufacturer's small
+-- index instead of the global one (where the filter drops most candidates and
+-- recall collapses). HybridSearchEngine routes filtered searches using
+-- vector_index_scopes; the WHERE clause of each partial index must match the
+-- literal predicate built in backend/hybrid_search.py (scope_predicate).
+-- ======================================================================
+
+ALTER TABLE krai_intelligence.embeddings
+    ADD COLUMN IF NOT EXISTS manufacturer_id UUID,
+    ADD COLUMN IF NOT EXISTS document_type VARCHAR(100);
+
+-- Exact search of small scopes and per-scope row counts
+CREATE INDEX IF NOT EXISTS idx_embeddings_scope
+    ON krai_intelligence.embeddings (manufacturer_id, document_type);
+
+CREATE TABLE IF NOT EXISTS krai_intelligence.vector_index_scopes (
+    id SERIAL PRIMARY KEY,
+    manufacturer_id UUID NOT NULL REFERENCES krai_core.manufacturers(id) ON DELETE CASCADE,
+    document_type VARCHAR(100),
+    row_count BIGINT NOT NULL DEFAULT 0,
+    index_name TEXT,
+    refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_vector_index_scopes_scope
+    ON krai_intelligence.vector_index_scopes (manufacturer_id, COALESCE(document_type, ''));
+
+-- ======================================================================
+-- DENORMALIZATION
+-- ======================================================================
+
+CREATE OR REPLACE FUNCTION krai_intelligence.embeddings_fill_scope()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.manufacturer_id IS NULL OR NEW.document_type IS NULL THEN
+        SELECT COALESCE(NEW.manufacturer_id, d.manufacturer_id), COALESCE(NEW.document_type, d.document_type)
+        INTO NEW.manufacturer_id, NEW.document_type
+        FROM krai_intelligence.chunks c
+        JOIN krai_core.documents d ON d.id = c.document_id
+        WHERE c.id = NEW.chunk_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_embeddings_fill_scope ON krai_intelligence.embeddings;
+CREATE TRIGGER trg_embeddings_fill_scope
+    BEFORE INSERT ON krai_intelligence.embeddings
+    FOR EACH ROW EXECUTE FUNCTION krai_intelligence.embeddings_fill_scope();
+
+CREATE OR REPLACE FUNCTION krai_intelligence.documents_propagate_scope()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE krai_intelligence.embeddings e
+    SET manufacturer_id = NEW.manufacturer_id, document_type = NEW.document_type
+    FROM krai_intelligence.chunks c
+    WHERE c.document_id = NEW.id AND e.chunk_id = c.id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_documents_propagate_scope ON krai_core.documents;
+CREATE TRIGGER trg_documents_propagate_scope
+    AFTER UPDATE OF manufacturer_id, document_type ON krai_core.documents
+    FOR EACH ROW
+    WHEN (OLD.manufacturer_id IS DISTINCT FROM NEW.manufacturer_id
+          OR OLD.document_type IS DISTINCT FROM NEW.document_type)
+    EXECUTE FUNCTION krai_intelligence.documents_propagate_scope();
+
+-- Fills the denormalized columns for up to batch_size existing rows and
+-- returns the number of rows updated. Call repeatedly until it returns 0:
+--     SELECT krai_intelligence.denormalize_embeddings_batch(10000);
+CREATE OR REPLACE FUNCTION krai_intelligence.denormalize_embeddings_batch(batch_size INTEGER DEFAULT 10000)
+RETURNS INTEGER AS $$
+DECLARE
+    updated INTEGER;
+BEGIN
+    WITH batch AS (
+        SELECT e.id, d.manufacturer_id, d.document_type
+        FROM krai_intelligence.embeddings e
+        JOIN krai_intelligence.chunks c ON c.id = e.chunk_id
+        JOIN krai_core.documents d ON d.id = c.document_id
+        WHERE e.manufacturer_id IS NULL AND d.manufacturer_id IS NOT NULL
+        LIMIT batch_size
+        FOR UPDATE OF e SKIP LOCKED
+    )
+    UPDATE krai_intelligence.embeddings e
+    SET manufacturer_id = batch.manufacturer_id, document_type = batch.document_type
+    FROM batch
+    WHERE e.id = batch.id;
+
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    RETURN updated;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ======================================================================
+-- SCOPES AND PARTIAL INDEXES
+-- ======================================================================
+-- Recounts every manufacturer (and, with per_document_type, every
+-- manufacturer/document_type pair), creates a partial HNSW index for scopes
+-- with at least min_rows embeddings and drops indexes of scopes that no
+-- longer qualify. Returns the number of indexed scopes. Re-run after large
+-- ingestions; index builds block writes to the table while they run, so
+-- schedule it outside ingestion windows:
+--     SELECT krai_intelligence.refresh_vector_index_scopes(10000, true);
+
+CREATE OR REPLACE FUNCTION krai_intelligence.refresh_vector_index_scopes(
+    min_rows INTEGER DEFAULT 10000, per_document_type BOOLEAN DEFAULT FALSE)
+RETURNS INTEGER AS $$
+DECLARE
+    scope RECORD;
+    name TEXT;
+    predicate TEXT;
+    indexed INTEGER := 0;
+BEGIN
+    CREATE TEMP TABLE IF NOT EXISTS vector_scope_counts (
+        manufacturer_id UUID, document_type VARCHAR(100), row_count BIGINT
+    ) ON COMMIT DROP;
+    TRUNCATE vector_scope_counts;
+
+    INSERT INTO vector_scope_counts
+    SELECT manufacturer_id, NULL, COUNT(*)
+    FROM krai_intelligence.embeddings
+    WHERE manufacturer_id IS NOT NULL
+    GROUP BY manufacturer_id;
+
+    IF per_document_type THEN
+        INSERT INTO vector_scope_counts
+        SELECT manufacturer_id, document_type, COUNT(*)
+        FROM krai_intelligence.embeddings
+        WHERE manufacturer_id IS NOT NULL AND document_type IS NOT NULL
+        GROUP BY manufacturer_id, document_type;
+    END IF;
+
+    -- Scopes that disappeared or fell below min_rows lose their index
+    FOR scope IN
+        SELECT s.id, s.index_name
+        FROM krai_intelligence.vector_index_scopes s
+        LEFT JOIN vector_scope_counts n
+            ON n.manufacturer_id = s.manufacturer_id
+           AND COALESCE(n.document_type, '') = COALESCE(s.document_type, '')
+        WHERE s.index_name IS NOT NULL AND (n.row_count IS NULL OR n.row_count < min_rows)
+    LOOP
+        EXECUTE format('DROP INDEX IF EXISTS krai_intelligence.%I', scope.index_name);
+        UPDATE krai_intelligence.vector_index_scopes SET index_name = NULL WHERE id = scope.id;
+    END LOOP;
+
+    DELETE FROM krai_intelligence.vector_index_scopes s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM vector_scope_counts n
+        WHERE n.manufacturer_id = s.manufacturer_id
+          AND COALESCE(n.document_type, '') = COALESCE(s.document_type, '')
+    );
+
+    FOR scope IN SELECT * FROM vector_scope_counts LOOP
+        name := NULL;
+        IF scope.row_count >= min_rows THEN
+            name := 'idx_embeddings_scope_' || substr(md5(scope.manufacturer_id::text || '|'
+                                                          || COALESCE(scope.document_type, '')), 1, 16) || '_hnsw';
+            predicate := format('manufacturer_id = %L::uuid', scope.manufacturer_id);
+            IF scope.document_type IS NOT NULL THEN
+                predicate := predicate || format(' AND document_type = %L', scope.document_type);
+            END IF;
+            EXECUTE format(
+                'CREATE INDEX IF NOT EXISTS %I ON krai_intelligence.embeddings '
+                'USING hnsw (embedding vector_cosine_ops) WHERE %s',
+                name, predicate
+            );
+            indexed := indexed + 1;
+        END IF;
+
+        INSERT INTO krai_intelligence.vector_index_scopes (manufacturer_id, document_type, row_count, index_name, refreshed_at)
+        VALUES (scope.manufacturer_id, scope.document_type, scope.row_count, name, NOW())
+        ON CONFLICT (manufacturer_id, COALESCE(document_type, ''))
+        DO UPDATE SET row_count = EXCLUDED.row_count, index_name = EXCLUDED.index_name, refreshed_at = NOW();
+    END LOOP;
+
+    RETURN indexed;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    RAISE NOTICE '🎯 Filtered vector search ready (manufacturer_id / document_type on embeddings)';
+    RAISE NOTICE '   Backfill: SELECT krai_intelligence.denormalize_embeddings_batch(10000); until it returns 0';
+    RAISE NOTICE '   Then:     SELECT krai_intelligence.refresh_vector_index_scopes(10000, true);';
+END $$;
@@ -0,0 +1,302 @@
+-- ======================================================================
+-- 🔑 KR-AI-ENGINE - MANUFACTURER KEYS ON CHUNKS
+-- ======================================================================
+--
+-- Applies (no table rewrite, safe during ingestion):
+-- - manufacturer_id on krai_intelligence.chunks, pending_embeddings and
+--   krai_system.processing_queue (nullable, filled from the owning document
+--   or chunk by BEFORE INSERT triggers)
+-- - Documents without a manufacturer are assigned to 'unknown'
+-- - documents_propagate_scope(): a document moved to another manufacturer
+--   moves its chunks and every row that references them
+-- - krai_core.delete_document(id): deletes a document with its chunks and
+--   embeddings, keyed by manufacturer
+-- - Batched backfill of the new columns and of embeddings.manufacturer_id
+--   (one short transaction per batch)
+--
+-- The backend joins chunks to embeddings and postings on
+-- (id, manufacturer_id) and binds manufacturer filters to manufacturer_id.
+-- That works on these plain tables; 14_partitioned_content.sql later turns
+-- the same predicates into partition pruning.
+-- ======================================================================
+
+-- Adding a nullable column only updates the catalog, but it still needs a
+-- brief exclusive lock: fail fast instead of queueing behind long queries
+SET lock_timeout = '10s';
+
+ALTER TABLE krai_intelligence.chunks ADD COLUMN IF NOT EXISTS manufacturer_id UUID;
+ALTER TABLE krai_intelligence.pending_embeddings ADD COLUMN IF NOT EXISTS manufacturer_id UUID;
+ALTER TABLE krai_system.processing_queue ADD COLUMN IF NOT EXISTS manufacturer_id UUID;
+
+RESET lock_timeout;
+
+INSERT INTO krai_core.manufacturers (name, display_name)
+VALUES ('unknown', 'UNKNOWN')
+ON CONFLICT (name) DO NOTHING;
+
+UPDATE krai_core.documents
+SET manufacturer_id = (SELECT id FROM krai_core.manufacturers WHERE name = 'unknown')
+WHERE manufacturer_id IS NULL;
+
+-- ======================================================================
+-- FILL ON INSERT
+-- ======================================================================
+-- The backend passes manufacturer_id for chunks and embeddings; the
+-- triggers cover other writers. Once the tables are partitioned rows are
+-- routed before BEFORE INSERT triggers run, so there the key is required.
+
+CREATE OR REPLACE FUNCTION krai_intelligence.chunks_fill_manufacturer()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.manufacturer_id IS NULL THEN
+        SELECT d.manufacturer_id INTO NEW.manufacturer_id
+        FROM krai_core.documents d
+        WHERE d.id = NEW.document_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_chunks_fill_manufacturer ON krai_intelligence.chunks;
+CREATE TRIGGER trg_chunks_fill_manufacturer
+    BEFORE INSERT ON krai_intelligence.chunks
+    FOR EACH ROW EXECUTE FUNCTION krai_intelligence.chunks_fill_manufacturer();
+
+-- pending_embeddings and processing_queue stay unpartitioned; their writers only know the chunk
+CREATE OR REPLACE FUNCTION krai_intelligence.fill_chunk_manufacturer()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.manufacturer_id IS NULL AND NEW.chunk_id IS NOT NULL THEN
+        SELECT c.manufacturer_id INTO NEW.manufacturer_id
+        FROM krai_intelligence.chunks c
+        WHERE c.id = NEW.chunk_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_pending_embeddings_fill_manufacturer ON krai_intelligence.pending_embeddings;
+CREATE TRIGGER trg_pending_embeddings_fill_manufacturer
+    BEFORE INSERT ON krai_intelligence.pending_embeddings
+    FOR EACH ROW EXECUTE FUNCTION krai_intelligence.fill_chunk_manufacturer();
+
+DROP TRIGGER IF EXISTS trg_processing_queue_fill_manufacturer ON krai_system.processing_queue;
+CREATE TRIGGER trg_processing_queue_fill_manufacturer
+    BEFORE INSERT ON krai_system.processing_queue
+    FOR EACH ROW EXECUTE FUNCTION krai_intelligence.fill_chunk_manufacturer();
+
+-- A document moved to another manufacturer moves its chunks. On the
+-- partitioned tables ON UPDATE CASCADE moves the referencing rows with them
+-- and the follow-up updates find nothing; on plain tables they do the move.
+-- Every predicate carries a manufacturer so the updates prune to partitions.
+-- The document type is copied onto the embeddings (12_filtered_vector_indexes.sql)
+CREATE OR REPLACE FUNCTION krai_intelligence.documents_propagate_scope()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF OLD.manufacturer_id IS DISTINCT FROM NEW.manufacturer_id THEN
+        UPDATE krai_intelligence.chunks
+        SET manufacturer_id = NEW.manufacturer_id
+        WHERE manufacturer_id = OLD.manufacturer_id AND document_id = NEW.id;
+
+        UPDATE krai_intelligence.embeddings e
+        SET manufacturer_id = NEW.manufacturer_id
+        FROM krai_intelligence.chunks c
+        WHERE c.manufacturer_id = NEW.manufacturer_id AND c.document_id = NEW.id
+          AND e.manufacturer_id = OLD.manufacturer_id AND e.chunk_id = c.id;
+        UPDATE krai_intelligence.error_codes x
+        SET manufacturer_id = NEW.manufacturer_id
+        FROM krai_intelligence.chunks c
+        WHERE c.manufacturer_id = NEW.manufacturer_id AND c.document_id = NEW.id
+          AND x.manufacturer_id = OLD.manufacturer_id AND x.chunk_id = c.id;
+        UPDATE krai_intelligence.part_number_mentions x
+        SET manufacturer_id = NEW.manufacturer_id
+        FROM krai_intelligence.chunks c
+        WHERE c.manufacturer_id = NEW.manufacturer_id AND c.document_id = NEW.id
+          AND x.manufacturer_id = OLD.manufacturer_id AND x.chunk_id = c.id;
+        UPDATE krai_intelligence.pending_embeddings x
+        SET manufacturer_id = NEW.manufacturer_id
+        FROM krai_intelligence.chunks c
+        WHERE c.manufacturer_id = NEW.manufacturer_id AND c.document_id = NEW.id
+          AND x.manufacturer_id = OLD.manufacturer_id AND x.chunk_id = c.id;
+        UPDATE krai_system.processing_queue x
+        SET manufacturer_id = NEW.manufacturer_id
+        FROM krai_intelligence.chunks c
+        WHERE c.manufacturer_id = NEW.manufacturer_id AND c.document_id = NEW.id
+          AND x.manufacturer_id = OLD.manufacturer_id AND x.chunk_id = c.id;
+    END IF;
+    IF OLD.document_type IS DISTINCT FROM NEW.document_type THEN
+        UPDATE krai_intelligence.embeddings e
+        SET document_type = NEW.document_type
+        FROM krai_intelligence.chunks c
+        WHERE c.manufacturer_id = NEW.manufacturer_id AND c.document_id = NEW.id
+          AND e.manufacturer_id = NEW.manufacturer_id AND e.chunk_id = c.id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ======================================================================
+-- DELETES
+-- ======================================================================
+
+-- Deletes a document with its chunks and embeddings; returns false when it
+-- does not exist. Queued tasks of the document are removed first. The
+-- manufacturer in every predicate prunes the deletes to one partition of
+-- each table once 14_partitioned_content.sql has run
+CREATE OR REPLACE FUNCTION krai_core.delete_document(target UUID)
+RETURNS BOOLEAN AS $$
+DECLARE
+    manufacturer UUID;
+BEGIN
+    SELECT manufacturer_id INTO manufacturer FROM krai_core.documents WHERE id = target FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN FALSE;
+    END IF;
+
+    DELETE FROM krai_system.processing_queue WHERE document_id = target;
+    DELETE FROM krai_system.processing_queue q
+    USING krai_intelligence.chunks c
+    WHERE q.manufacturer_id = manufacturer AND c.manufacturer_id = manufacturer
+      AND c.document_id = target AND q.chunk_id = c.id;
+    DELETE FROM krai_intelligence.embeddings e
+    USING krai_intelligence.chunks c
+    WHERE e.manufacturer_id = manufacturer AND c.manufacturer_id = manufacturer
+      AND c.document_id = target AND e.chunk_id = c.id;
+    DELETE FROM krai_intelligence.chunks
+    WHERE manufacturer_id = manufacturer AND document_id = target;
+    DELETE FROM krai_core.documents WHERE id = target;
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ======================================================================
+-- BACKFILL
+-- ======================================================================
+-- Fills manufacturer_id for up to batch_size rows per table and returns the
+-- number of rows updated. Chunks take it from their document, the other
+-- tables from their chunk; embeddings also get the document type. Call
+-- repeatedly until it returns 0:
+--     SELECT krai_intelligence.backfill_manufacturer_keys_batch(10000);
+CREATE OR REPLACE FUNCTION krai_intelligence.backfill_manufacturer_keys_batch(batch_size INTEGER DEFAULT 10000)
+RETURNS INTEGER AS $$
+DECLARE
+    updated INTEGER;
+    total INTEGER := 0;
+BEGIN
+    WITH batch AS (
+        SELECT c.id, d.manufacturer_id
+        FROM krai_intelligence.chunks c
+        JOIN krai_core.documents d ON d.id = c.document_id
+        WHERE c.manufacturer_id IS NULL AND d.manufacturer_id IS NOT NULL
+        LIMIT batch_size
+    )
+    UPDATE krai_intelligence.chunks c
+    SET manufacturer_id = batch.manufacturer_id
+    FROM batch
+    WHERE c.id = batch.id;
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    total := total + updated;
+
+    WITH batch AS (
+        SELECT e.id, c.manufacturer_id, d.document_type
+        FROM krai_intelligence.embeddings e
+        JOIN krai_intelligence.chunks c ON c.id = e.chunk_id
+        JOIN krai_core.documents d ON d.id = c.document_id
+        WHERE e.manufacturer_id IS NULL AND c.manufacturer_id IS NOT NULL
+        LIMIT batch_size
+    )
+    UPDATE krai_intelligence.embeddings e
+    SET manufacturer_id = batch.manufacturer_id,
+        document_type = COALESCE(e.document_type, batch.document_type)
+    FROM batch
+    WHERE e.id = batch.id;
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    total := total + updated;
+
+    WITH batch AS (
+        SELECT x.id, c.manufacturer_id
+        FROM krai_intelligence.error_codes x
+        JOIN krai_intelligence.chunks c ON c.id = x.chunk_id
+        WHERE x.manufacturer_id IS NULL AND c.manufacturer_id IS NOT NULL
+        LIMIT batch_size
+    )
+    UPDATE krai_intelligence.error_codes x
+    SET manufacturer_id = batch.manufacturer_id
+    FROM batch
+    WHERE x.id = batch.id;
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    total := total + updated;
+
+    WITH batch AS (
+        SELECT x.id, c.manufacturer_id
+        FROM krai_intelligence.part_number_mentions x
+        JOIN krai_intelligence.chunks c ON c.id = x.chunk_id
+        WHERE x.manufacturer_id IS NULL AND c.manufacturer_id IS NOT NULL
+        LIMIT batch_size
+    )
+    UPDATE krai_intelligence.part_number_mentions x
+    SET manufacturer_id = batch.manufacturer_id
+    FROM batch
+    WHERE x.id = batch.id;
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    total := total + updated;
+
+    WITH batch AS (
+        SELECT x.chunk_id, x.model_name, c.manufacturer_id
+        FROM krai_intelligence.pending_embeddings x
+        JOIN krai_intelligence.chunks c ON c.id = x.chunk_id
+        WHERE x.manufacturer_id IS NULL AND c.manufacturer_id IS NOT NULL
+        LIMIT batch_size
+    )
+    UPDATE krai_intelligence.pending_embeddings x
+    SET manufacturer_id = batch.manufacturer_id
+    FROM batch
+    WHERE x.chunk_id = batch.chunk_id AND x.model_name = batch.model_name;
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    total := total + updated;
+
+    WITH batch AS (
+        SELECT x.id, c.manufacturer_id
+        FROM krai_system.processing_queue x
+        JOIN krai_intelligence.chunks c ON c.id = x.chunk_id
+        WHERE x.manufacturer_id IS NULL AND c.manufacturer_id IS NOT NULL
+        LIMIT batch_size
+    )
+    UPDATE krai_system.processing_queue x
+    SET manufacturer_id = batch.manufacturer_id
+    FROM batch
+    WHERE x.id = batch.id;
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    total := total + updated;
+
+    RETURN total;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Commits after every batch so row locks are held briefly (psql runs this
+-- file outside a transaction block)
+DO $$
+DECLARE
+    updated INTEGER;
+BEGIN
+    LOOP
+        updated := krai_intelligence.backfill_manufacturer_keys_batch(10000);
+        COMMIT;
+        EXIT WHEN updated = 0;
+    END LOOP;
+END $$;
+
+-- Lookups of queued tasks by chunk (delete_document, foreign key actions)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_processing_queue_chunk
+    ON krai_system.processing_queue (chunk_id, manufacturer_id)
+    WHERE chunk_id IS NOT NULL;
+
+ANALYZE krai_intelligence.chunks;
+ANALYZE krai_intelligence.embeddings;
+
+DO $$
+BEGIN
+    RAISE NOTICE '🔑 manufacturer_id ready on chunks, pending_embeddings and processing_queue';
+    RAISE NOTICE '   Delete: SELECT krai_core.delete_document(''<uuid>'');';
+    RAISE NOTICE '   Partitioning by manufacturer: 14_partitioned_content.sql (maintenance window)';
+END $$;
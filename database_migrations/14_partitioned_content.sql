@@ -0,0 +1,437 @@
+-- ======================================================================
+-- 🧱 KR-AI-ENGINE - PARTITIONED CHUNKS AND EMBEDDINGS
+-- ======================================================================
+--
+-- Applies (PostgreSQL >= 15, pgvector >= 0.5; requires 13_content_manufacturer_keys.sql):
+-- - krai_intelligence.chunks and krai_intelligence.embeddings become LIST
+--   partitioned by manufacturer_id, one partition per manufacturer
+--   (chunks_m_<uuid> / embeddings_m_<uuid>, attached when a manufacturer is
+--   inserted). Primary keys become (id, manufacturer_id); embeddings,
+--   error_codes, part_number_mentions, pending_embeddings and
+--   krai_system.processing_queue reference chunks through
+--   (chunk_id, manufacturer_id), ON UPDATE CASCADE so a document moved to
+--   another manufacturer moves its rows along
+-- - krai_core.delete_document(id) (13_content_manufacturer_keys.sql) then
+--   only touches that manufacturer's partitions (and their indexes)
+-- - krai_intelligence.drop_manufacturer_content(id): drops a manufacturer's
+--   partitions instead of deleting row by row
+-- - refresh_vector_index_scopes(): a manufacturer scope is its partition's
+--   HNSW index; (manufacturer, document_type) scopes get partial indexes on
+--   the partition only
+-- - krai_intelligence.content_partitions: rows and size per partition
+--
+-- Search queries prune by the literal or bound manufacturer_id they carry
+-- (backend/hybrid_search.py); the backend runs unchanged on the plain tables
+-- of migration 13. VACUUM, REINDEX and ANALYZE can run per
+-- partition, e.g. VACUUM krai_intelligence.embeddings_m_<uuid>.
+--
+-- The conversion copies both tables and rebuilds their indexes (including
+-- HNSW) in one transaction holding an exclusive lock: run it in a
+-- maintenance window. It is skipped when the tables are already partitioned.
+-- ======================================================================
+
+DO $$
+BEGIN
+    IF current_setting('server_version_num')::INTEGER < 150000 THEN
+        -- Older releases turn a cross-partition UPDATE into DELETE + INSERT, which
+        -- would fire ON DELETE CASCADE on the referencing rows
+        RAISE EXCEPTION '14_partitioned_content.sql needs PostgreSQL 15 or later';
+    END IF;
+END $$;
+
+-- The partition key is NOT NULL (documents created since migration 13 included)
+UPDATE krai_core.documents
+SET manufacturer_id = (SELECT id FROM krai_core.manufacturers WHERE name = 'unknown')
+WHERE manufacturer_id IS NULL;
+
+-- ======================================================================
+-- PARTITIONS
+-- ======================================================================
+
+-- Runs inside the manufacturer INSERT of ingestion. CREATE TABLE ... PARTITION
+-- OF would lock both parents exclusively and stall every search; a standalone
+-- table attached afterwards needs only SHARE UPDATE EXCLUSIVE on the parent.
+-- The CHECK constraint lets ATTACH skip its validation scan.
+CREATE OR REPLACE FUNCTION krai_intelligence.ensure_manufacturer_partitions(manufacturer UUID)
+RETURNS VOID AS $$
+DECLARE
+    suffix TEXT := replace(manufacturer::text, '-', '');
+    parent TEXT;
+    partition TEXT;
+BEGIN
+    FOREACH parent IN ARRAY ARRAY['chunks', 'embeddings'] LOOP
+        partition := parent || '_m_' || suffix;
+        IF (SELECT relkind FROM pg_class WHERE oid = format('krai_intelligence.%I', parent)::regclass) = 'p'
+           AND to_regclass(format('krai_intelligence.%I', partition)) IS NULL THEN
+            EXECUTE format('CREATE TABLE krai_intelligence.%I (LIKE krai_intelligence.%I '
+                           'INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)', partition, parent);
+            EXECUTE format('ALTER TABLE krai_intelligence.%I ADD CONSTRAINT %I CHECK (manufacturer_id = %L::uuid)',
+                           partition, partition || '_key', manufacturer);
+            EXECUTE format('ALTER TABLE krai_intelligence.%I ATTACH PARTITION krai_intelligence.%I FOR VALUES IN (%L)',
+                           parent, partition, manufacturer);
+            EXECUTE format('ALTER TABLE krai_intelligence.%I DROP CONSTRAINT %I', partition, partition || '_key');
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION krai_intelligence.manufacturers_create_partitions()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM krai_intelligence.ensure_manufacturer_partitions(NEW.id);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_manufacturers_create_partitions ON krai_core.manufacturers;
+CREATE TRIGGER trg_manufacturers_create_partitions
+    AFTER INSERT ON krai_core.manufacturers
+    FOR EACH ROW EXECUTE FUNCTION krai_intelligence.manufacturers_create_partitions();
+
+-- ======================================================================
+-- CONVERSION
+-- ======================================================================
+
+CREATE OR REPLACE FUNCTION krai_intelligence.partition_chunks_and_embeddings()
+RETURNS VOID AS $$
+DECLARE
+    item RECORD;
+    manufacturer UUID;
+    column_list TEXT;
+    select_list TEXT;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'krai_intelligence.chunks'::regclass) = 'p' THEN
+        RAISE NOTICE '🧱 krai_intelligence.chunks is already partitioned';
+        RETURN;
+    END IF;
+
+    LOCK TABLE krai_intelligence.chunks, krai_intelligence.embeddings IN ACCESS EXCLUSIVE MODE;
+
+    -- Indexes and triggers to recreate on the partitioned tables. Primary keys
+    -- change shape; the per-manufacturer partial indexes of 12_filtered_vector_indexes.sql
+    -- are replaced by the partitions themselves. Rows are routed to a partition
+    -- before BEFORE INSERT triggers run, so the manufacturer_id fill of
+    -- 13_content_manufacturer_keys.sql cannot work there and is not recreated
+    CREATE TEMP TABLE partition_ddl ON COMMIT DROP AS
+    SELECT 1 AS step, pg_get_indexdef(i.indexrelid) AS ddl
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE i.indrelid IN ('krai_intelligence.chunks'::regclass, 'krai_intelligence.embeddings'::regclass)
+      AND NOT i.indisprimary AND NOT i.indisunique
+      AND c.relname NOT LIKE 'idx\_embeddings\_scope\_%\_hnsw'
+    UNION ALL
+    SELECT 2, pg_get_triggerdef(t.oid)
+    FROM pg_trigger t
+    WHERE t.tgrelid IN ('krai_intelligence.chunks'::regclass, 'krai_intelligence.embeddings'::regclass)
+      AND NOT t.tgisinternal
+      AND t.tgname <> 'trg_chunks_fill_manufacturer';
+
+    -- Foreign keys pointing at chunks are recreated on (chunk_id, manufacturer_id) below
+    FOR item IN
+        SELECT conrelid::regclass AS tbl, conname
+        FROM pg_constraint
+        WHERE contype = 'f' AND confrelid = 'krai_intelligence.chunks'::regclass
+    LOOP
+        EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', item.tbl, item.conname);
+    END LOOP;
+
+    ALTER TABLE krai_intelligence.chunks RENAME TO chunks_unpartitioned;
+    ALTER TABLE krai_intelligence.embeddings RENAME TO embeddings_unpartitioned;
+    FOR item IN
+        SELECT c.relname, i.indisprimary, i.indrelid::regclass AS tbl, con.conname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        LEFT JOIN pg_constraint con ON con.conindid = i.indexrelid AND con.conrelid = i.indrelid
+        WHERE i.indrelid IN ('krai_intelligence.chunks_unpartitioned'::regclass,
+                             'krai_intelligence.embeddings_unpartitioned'::regclass)
+    LOOP
+        IF item.conname IS NOT NULL THEN
+            EXECUTE format('ALTER TABLE %s RENAME CONSTRAINT %I TO %I', item.tbl, item.conname,
+                           left('unpartitioned_' || item.conname, 63));
+        ELSE
+            EXECUTE format('DROP INDEX krai_intelligence.%I', item.relname);
+        END IF;
+    END LOOP;
+
+    CREATE TABLE krai_intelligence.chunks (
+        LIKE krai_intelligence.chunks_unpartitioned
+            INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE INCLUDING COMMENTS,
+        PRIMARY KEY (id, manufacturer_id)
+    ) PARTITION BY LIST (manufacturer_id);
+
+    CREATE TABLE krai_intelligence.embeddings (
+        LIKE krai_intelligence.embeddings_unpartitioned
+            INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE INCLUDING COMMENTS,
+        PRIMARY KEY (id, manufacturer_id)
+    ) PARTITION BY LIST (manufacturer_id);
+
+    FOR manufacturer IN SELECT id FROM krai_core.manufacturers LOOP
+        PERFORM krai_intelligence.ensure_manufacturer_partitions(manufacturer);
+    END LOOP;
+
+    -- Copy: the partition key comes from the owning document
+    SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum),
+           string_agg(CASE WHEN attname = 'manufacturer_id' THEN 'd.manufacturer_id'
+                           ELSE 'c.' || quote_ident(attname) END, ', ' ORDER BY attnum)
+    INTO column_list, select_list
+    FROM pg_attribute
+    WHERE attrelid = 'krai_intelligence.chunks_unpartitioned'::regclass AND attnum > 0 AND NOT attisdropped;
+    EXECUTE format('INSERT INTO krai_intelligence.chunks (%s) SELECT %s '
+                   'FROM krai_intelligence.chunks_unpartitioned c '
+                   'JOIN krai_core.documents d ON d.id = c.document_id', column_list, select_list);
+
+    SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum),
+           string_agg(CASE WHEN attname = 'manufacturer_id' THEN 'c.manufacturer_id'
+                           WHEN attname = 'document_type' THEN 'd.document_type'
+                           ELSE 'e.' || quote_ident(attname) END, ', ' ORDER BY attnum)
+    INTO column_list, select_list
+    FROM pg_attribute
+    WHERE attrelid = 'krai_intelligence.embeddings_unpartitioned'::regclass AND attnum > 0 AND NOT attisdropped;
+    EXECUTE format('INSERT INTO krai_intelligence.embeddings (%s) SELECT %s '
+                   'FROM krai_intelligence.embeddings_unpartitioned e '
+                   'JOIN krai_intelligence.chunks c ON c.id = e.chunk_id '
+                   'JOIN krai_core.documents d ON d.id = c.document_id', column_list, select_list);
+
+    DROP TABLE krai_intelligence.embeddings_unpartitioned;
+    DROP TABLE krai_intelligence.chunks_unpartitioned;
+
+    -- Referencing rows follow the manufacturer of their chunk
+    UPDATE krai_intelligence.error_codes x SET manufacturer_id = c.manufacturer_id
+    FROM krai_intelligence.chunks c
+    WHERE c.id = x.chunk_id AND x.manufacturer_id IS DISTINCT FROM c.manufacturer_id;
+    UPDATE krai_intelligence.part_number_mentions x SET manufacturer_id = c.manufacturer_id
+    FROM krai_intelligence.chunks c
+    WHERE c.id = x.chunk_id AND x.manufacturer_id IS DISTINCT FROM c.manufacturer_id;
+    UPDATE krai_intelligence.pending_embeddings x SET manufacturer_id = c.manufacturer_id
+    FROM krai_intelligence.chunks c
+    WHERE c.id = x.chunk_id AND x.manufacturer_id IS DISTINCT FROM c.manufacturer_id;
+    DELETE FROM krai_intelligence.pending_embeddings WHERE manufacturer_id IS NULL;
+    UPDATE krai_system.processing_queue x SET manufacturer_id = c.manufacturer_id
+    FROM krai_intelligence.chunks c
+    WHERE c.id = x.chunk_id AND x.manufacturer_id IS DISTINCT FROM c.manufacturer_id;
+
+    ALTER TABLE krai_intelligence.chunks
+        ADD CONSTRAINT chunks_document_id_fkey FOREIGN KEY (document_id)
+            REFERENCES krai_core.documents(id) ON DELETE CASCADE;
+    ALTER TABLE krai_intelligence.embeddings
+        ADD CONSTRAINT embeddings_chunk_fkey FOREIGN KEY (chunk_id, manufacturer_id)
+            REFERENCES krai_intelligence.chunks(id, manufacturer_id) ON DELETE CASCADE ON UPDATE CASCADE;
+    ALTER TABLE krai_intelligence.error_codes
+        ADD CONSTRAINT error_codes_chunk_fkey FOREIGN KEY (chunk_id, manufacturer_id)
+            REFERENCES krai_intelligence.chunks(id, manufacturer_id) ON DELETE CASCADE ON UPDATE CASCADE;
+    ALTER TABLE krai_intelligence.part_number_mentions
+        ADD CONSTRAINT part_number_mentions_chunk_fkey FOREIGN KEY (chunk_id, manufacturer_id)
+            REFERENCES krai_intelligence.chunks(id, manufacturer_id) ON DELETE CASCADE ON UPDATE CASCADE;
+    ALTER TABLE krai_intelligence.pending_embeddings
+        ALTER COLUMN manufacturer_id SET NOT NULL,
+        ADD CONSTRAINT pending_embeddings_chunk_fkey FOREIGN KEY (chunk_id, manufacturer_id)
+            REFERENCES krai_intelligence.chunks(id, manufacturer_id) ON DELETE CASCADE ON UPDATE CASCADE;
+    ALTER TABLE krai_system.processing_queue
+        ADD CONSTRAINT processing_queue_chunk_fkey FOREIGN KEY (chunk_id, manufacturer_id)
+            REFERENCES krai_intelligence.chunks(id, manufacturer_id) ON DELETE CASCADE ON UPDATE CASCADE;
+
+    -- Indexes on the parents are created on every partition (and on new ones)
+    FOR item IN SELECT ddl FROM partition_ddl ORDER BY step LOOP
+        EXECUTE item.ddl;
+    END LOOP;
+
+    ALTER TABLE krai_intelligence.chunks ENABLE ROW LEVEL SECURITY;
+    ALTER TABLE krai_intelligence.embeddings ENABLE ROW LEVEL SECURITY;
+    CREATE POLICY "service_role_chunks_all" ON krai_intelligence.chunks FOR ALL USING (true);
+    CREATE POLICY "service_role_embeddings_all" ON krai_intelligence.embeddings FOR ALL USING (true);
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'krai_service_role') THEN
+        GRANT ALL ON krai_intelligence.chunks, krai_intelligence.embeddings TO krai_service_role;
+    END IF;
+
+    -- Scope indexes of the old table are gone; refresh_vector_index_scopes rebuilds them
+    UPDATE krai_intelligence.vector_index_scopes SET index_name = NULL;
+
+    ANALYZE krai_intelligence.chunks;
+    ANALYZE krai_intelligence.embeddings;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT krai_intelligence.partition_chunks_and_embeddings();
+
+-- ======================================================================
+-- INSERTS
+-- ======================================================================
+
+-- Rows are routed before BEFORE INSERT triggers run: inserts must carry
+-- manufacturer_id, the trigger of 12_filtered_vector_indexes.sql only fills
+-- the document type
+CREATE OR REPLACE FUNCTION krai_intelligence.embeddings_fill_scope()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.document_type IS NULL THEN
+        SELECT d.document_type INTO NEW.document_type
+        FROM krai_intelligence.chunks c
+        JOIN krai_core.documents d ON d.id = c.document_id
+        WHERE c.manufacturer_id = NEW.manufacturer_id AND c.id = NEW.chunk_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ======================================================================
+-- PARTITION DROPS
+-- ======================================================================
+
+-- Removes all documents of a manufacturer by dropping its partitions (the
+-- manufacturer row stays, with new empty partitions). Returns the number of
+-- documents removed
+CREATE OR REPLACE FUNCTION krai_intelligence.drop_manufacturer_content(manufacturer UUID)
+RETURNS INTEGER AS $$
+DECLARE
+    suffix TEXT := replace(manufacturer::text, '-', '');
+    removed INTEGER;
+BEGIN
+    -- Rows referencing the chunk partition must be gone before it is dropped
+    DELETE FROM krai_system.processing_queue WHERE manufacturer_id = manufacturer;
+    DELETE FROM krai_system.processing_queue
+    WHERE document_id IN (SELECT id FROM krai_core.documents WHERE manufacturer_id = manufacturer);
+    DELETE FROM krai_intelligence.pending_embeddings WHERE manufacturer_id = manufacturer;
+    DELETE FROM krai_intelligence.error_codes WHERE manufacturer_id = manufacturer;
+    DELETE FROM krai_intelligence.part_number_mentions WHERE manufacturer_id = manufacturer;
+    DELETE FROM krai_intelligence.vector_index_scopes WHERE manufacturer_id = manufacturer;
+    -- Detaching (rather than dropping) keeps the foreign keys of the parents intact
+    IF to_regclass(format('krai_intelligence.%I', 'embeddings_m_' || suffix)) IS NOT NULL THEN
+        EXECUTE format('ALTER TABLE krai_intelligence.embeddings DETACH PARTITION krai_intelligence.%I',
+                       'embeddings_m_' || suffix);
+        EXECUTE format('DROP TABLE krai_intelligence.%I', 'embeddings_m_' || suffix);
+    END IF;
+    IF to_regclass(format('krai_intelligence.%I', 'chunks_m_' || suffix)) IS NOT NULL THEN
+        EXECUTE format('ALTER TABLE krai_intelligence.chunks DETACH PARTITION krai_intelligence.%I',
+                       'chunks_m_' || suffix);
+        EXECUTE format('DROP TABLE krai_intelligence.%I', 'chunks_m_' || suffix);
+    END IF;
+
+    DELETE FROM krai_core.documents WHERE manufacturer_id = manufacturer;
+    GET DIAGNOSTICS removed = ROW_COUNT;
+
+    PERFORM krai_intelligence.ensure_manufacturer_partitions(manufacturer);
+    RETURN removed;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE VIEW krai_intelligence.content_partitions AS
+SELECT m.name AS manufacturer,
+       p.relid::regclass AS partition,
+       parent.relname AS parent_table,
+       c.reltuples::BIGINT AS estimated_rows,
+       pg_total_relation_size(p.relid) AS total_bytes
+FROM pg_partition_tree('krai_intelligence.chunks') p
+JOIN pg_class c ON c.oid = p.relid
+JOIN pg_class parent ON parent.oid = p.parentrelid
+JOIN krai_core.manufacturers m ON c.relname = 'chunks_m_' || replace(m.id::text, '-', '')
+WHERE p.isleaf
+UNION ALL
+SELECT m.name, p.relid::regclass, parent.relname, c.reltuples::BIGINT, pg_total_relation_size(p.relid)
+FROM pg_partition_tree('krai_intelligence.embeddings') p
+JOIN pg_class c ON c.oid = p.relid
+JOIN pg_class parent ON parent.oid = p.parentrelid
+JOIN krai_core.manufacturers m ON c.relname = 'embeddings_m_' || replace(m.id::text, '-', '')
+WHERE p.isleaf;
+
+-- ======================================================================
+-- VECTOR INDEX SCOPES ON PARTITIONS
+-- ======================================================================
+-- A manufacturer scope is its embeddings partition, searched through the
+-- partition's HNSW index (index_name). (manufacturer, document_type) scopes
+-- with at least min_rows rows get a partial HNSW index on that partition
+-- only; the predicate still matches scope_predicate in hybrid_search.py.
+
+CREATE OR REPLACE FUNCTION krai_intelligence.refresh_vector_index_scopes(
+    min_rows INTEGER DEFAULT 10000, per_document_type BOOLEAN DEFAULT FALSE)
+RETURNS INTEGER AS $$
+DECLARE
+    scope RECORD;
+    name TEXT;
+    partition TEXT;
+    indexed INTEGER := 0;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'krai_intelligence.embeddings'::regclass) <> 'p' THEN
+        RAISE EXCEPTION 'krai_intelligence.embeddings is not partitioned, run partition_chunks_and_embeddings() first';
+    END IF;
+
+    CREATE TEMP TABLE IF NOT EXISTS vector_scope_counts (
+        manufacturer_id UUID, document_type VARCHAR(100), row_count BIGINT
+    ) ON COMMIT DROP;
+    TRUNCATE vector_scope_counts;
+
+    INSERT INTO vector_scope_counts
+    SELECT manufacturer_id, NULL, COUNT(*)
+    FROM krai_intelligence.embeddings
+    GROUP BY manufacturer_id;
+
+    IF per_document_type THEN
+        INSERT INTO vector_scope_counts
+        SELECT manufacturer_id, document_type, COUNT(*)
+        FROM krai_intelligence.embeddings
+        WHERE document_type IS NOT NULL
+        GROUP BY manufacturer_id, document_type;
+    END IF;
+
+    -- Document type scopes that disappeared or fell below min_rows lose their index
+    FOR scope IN
+        SELECT s.id, s.index_name
+        FROM krai_intelligence.vector_index_scopes s
+        LEFT JOIN vector_scope_counts n
+            ON n.manufacturer_id = s.manufacturer_id AND n.document_type = s.document_type
+        WHERE s.document_type IS NOT NULL AND s.index_name IS NOT NULL
+          AND (n.row_count IS NULL OR n.row_count < min_rows)
+    LOOP
+        EXECUTE format('DROP INDEX IF EXISTS krai_intelligence.%I', scope.index_name);
+        UPDATE krai_intelligence.vector_index_scopes SET index_name = NULL WHERE id = scope.id;
+    END LOOP;
+
+    DELETE FROM krai_intelligence.vector_index_scopes s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM vector_scope_counts n
+        WHERE n.manufacturer_id = s.manufacturer_id
+          AND COALESCE(n.document_type, '') = COALESCE(s.document_type, '')
+    );
+
+    FOR scope IN SELECT * FROM vector_scope_counts LOOP
+        partition := 'embeddings_m_' || replace(scope.manufacturer_id::text, '-', '');
+        name := NULL;
+        IF scope.document_type IS NULL THEN
+            SELECT c.relname INTO name
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_am a ON a.oid = c.relam
+            WHERE i.indrelid = format('krai_intelligence.%I', partition)::regclass
+              AND a.amname = 'hnsw' AND i.indpred IS NULL AND i.indexprs IS NULL
+              AND pg_get_indexdef(i.indexrelid) LIKE '%(embedding vector_cosine_ops)%'
+            LIMIT 1;
+        ELSIF scope.row_count >= min_rows THEN
+            name := 'idx_embeddings_scope_' || substr(md5(scope.manufacturer_id::text || '|'
+                                                          || scope.document_type), 1, 16) || '_hnsw';
+            EXECUTE format(
+                'CREATE INDEX IF NOT EXISTS %I ON krai_intelligence.%I '
+                'USING hnsw (embedding vector_cosine_ops) WHERE manufacturer_id = %L::uuid AND document_type = %L',
+                name, partition, scope.manufacturer_id, scope.document_type
+            );
+        END IF;
+        IF name IS NOT NULL THEN
+            indexed := indexed + 1;
+        END IF;
+
+        INSERT INTO krai_intelligence.vector_index_scopes (manufacturer_id, document_type, row_count, index_name, refreshed_at)
+        VALUES (scope.manufacturer_id, scope.document_type, scope.row_count, name, NOW())
+        ON CONFLICT (manufacturer_id, COALESCE(document_type, ''))
+        DO UPDATE SET row_count = EXCLUDED.row_count, index_name = EXCLUDED.index_name, refreshed_at = NOW();
+    END LOOP;
+
+    RETURN indexed;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT krai_intelligence.refresh_vector_index_scopes(10000, false);
+
+DO $$
+BEGIN
+    RAISE NOTICE '🧱 krai_intelligence.chunks / embeddings partitioned by manufacturer';
+    RAISE NOTICE '   Partitions: SELECT * FROM krai_intelligence.content_partitions;';
+    RAISE NOTICE '   Drop:       SELECT krai_intelligence.drop_manufacturer_content(''<uuid>'');';
+END $$;
@@ -0,0 +1,47 @@
+-- ======================================================================
+-- 📑 KR-AI-ENGINE - KEYSET PAGINATION FOR DOCUMENT LISTINGS
+-- ======================================================================
+--
+-- Applies:
+-- - krai_core.documents.created_at NOT NULL (keyset cursors cannot address NULLs)
+-- - One (filter..., created_at DESC, id DESC) index per filter combination of
+--   /api/documents/list and /api/supabase/documents/list
+--
+-- The listing APIs page with (created_at, id) < (cursor) instead of OFFSET
+-- and select only id/created_at for the page (backend/pagination.py). Every
+-- column of that query is part of the matching index, so each page is an
+-- index-only scan that stops after LIMIT rows regardless of depth. Details,
+-- manufacturer names and chunk/image counts are then fetched for the page
+-- rows only.
+-- ======================================================================
+
+UPDATE krai_core.documents
+SET created_at = COALESCE(updated_at, NOW())
+WHERE created_at IS NULL;
+
+ALTER TABLE krai_core.documents ALTER COLUMN created_at SET NOT NULL;
+
+-- No filter
+CREATE INDEX IF NOT EXISTS idx_documents_created_id
+    ON krai_core.documents (created_at DESC, id DESC);
+
+-- ?document_type=
+CREATE INDEX IF NOT EXISTS idx_documents_type_created_id
+    ON krai_core.documents (document_type, created_at DESC, id DESC);
+
+-- ?manufacturer=
+CREATE INDEX IF NOT EXISTS idx_documents_manufacturer_created_id
+    ON krai_core.documents (manufacturer_id, created_at DESC, id DESC);
+
+-- ?manufacturer=&document_type=
+CREATE INDEX IF NOT EXISTS idx_documents_manufacturer_type_created_id
+    ON krai_core.documents (manufacturer_id, document_type, created_at DESC, id DESC);
+
+-- Index-only scans depend on an up-to-date visibility map
+VACUUM (ANALYZE) krai_core.documents;
+
+DO $$
+BEGIN
+    RAISE NOTICE '📑 Keyset pagination indexes ready on krai_core.documents';
+    RAISE NOTICE '   Page with ?cursor=<X-Next-Cursor> instead of ?offset=';
+END $$;
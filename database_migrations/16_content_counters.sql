@@ -0,0 +1,286 @@
+-- ======================================================================
+-- 🧮 KR-AI-ENGINE - INCREMENTALLY MAINTAINED CONTENT COUNTERS
+-- ======================================================================
+--
+-- Applies:
+-- - krai_system.content_counters: row counts of documents, images, chunks
+--   and embeddings plus the summed document size, spread over 16 slots per
+--   counter so concurrent ingestion does not queue on one hot row
+-- - Statement-level triggers (transition tables) that add the rows inserted
+--   or deleted by each statement, in the same transaction
+-- - krai_system.reconcile_content_counter(name): recounts one counter exactly
+--   and returns the drift it corrected
+-- - drop_manufacturer_content() subtracts the partitions it drops (only
+--   when 14_partitioned_content.sql is installed)
+--
+-- Stats endpoints read krai_system.content_counter_totals (at most 16 rows
+-- per counter) instead of COUNT(*) over the tables. backend/content_counters.py
+-- runs the reconciliation periodically (KRAI_COUNTER_RECONCILE_INTERVAL).
+-- Requires 13_content_manufacturer_keys.sql; the counters work with or
+-- without partitioning. Re-run this file after 14_partitioned_content.sql if
+-- that migration is applied later, so drop_manufacturer_content() keeps
+-- subtracting what it drops.
+-- ======================================================================
+
+CREATE TABLE IF NOT EXISTS krai_system.content_counters (
+    name VARCHAR(50) NOT NULL,
+    slot SMALLINT NOT NULL,
+    value BIGINT NOT NULL DEFAULT 0,
+    reconciled_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (name, slot)
+);
+
+-- Every slot exists up front, so maintenance is always an UPDATE and the
+-- reconciliation can lock all slots of a counter
+INSERT INTO krai_system.content_counters (name, slot)
+SELECT counter, slot
+FROM unnest(ARRAY['documents', 'document_bytes', 'images', 'chunks', 'embeddings']) AS counter,
+     generate_series(0, 15) AS slot
+ON CONFLICT (name, slot) DO NOTHING;
+
+CREATE OR REPLACE VIEW krai_system.content_counter_totals AS
+SELECT name, SUM(value)::BIGINT AS value, MIN(reconciled_at) AS reconciled_at
+FROM krai_system.content_counters
+GROUP BY name;
+
+-- Each connection adds to its own slot
+CREATE OR REPLACE FUNCTION krai_system.bump_content_counter(counter TEXT, delta BIGINT)
+RETURNS VOID AS $$
+BEGIN
+    IF delta <> 0 THEN
+        UPDATE krai_system.content_counters
+        SET value = value + delta
+        WHERE name = counter AND slot = pg_backend_pid() % 16;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ======================================================================
+-- TRIGGERS
+-- ======================================================================
+-- One counter update per statement, not per row. Transition tables need a
+-- trigger per event; TG_ARGV[0] is the counter name.
+
+CREATE OR REPLACE FUNCTION krai_system.count_inserted_rows()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM krai_system.bump_content_counter(TG_ARGV[0], (SELECT COUNT(*) FROM new_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION krai_system.count_deleted_rows()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM krai_system.bump_content_counter(TG_ARGV[0], -(SELECT COUNT(*) FROM old_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION krai_system.count_inserted_documents()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM krai_system.bump_content_counter('documents', (SELECT COUNT(*) FROM new_rows));
+    PERFORM krai_system.bump_content_counter('document_bytes', (SELECT COALESCE(SUM(file_size), 0) FROM new_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION krai_system.count_deleted_documents()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM krai_system.bump_content_counter('documents', -(SELECT COUNT(*) FROM old_rows));
+    PERFORM krai_system.bump_content_counter('document_bytes', -(SELECT COALESCE(SUM(file_size), 0) FROM old_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables do not combine with column lists; a changed size is
+-- rare enough for a row-level trigger
+CREATE OR REPLACE FUNCTION krai_system.count_resized_document()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM krai_system.bump_content_counter('document_bytes', COALESCE(NEW.file_size, 0) - COALESCE(OLD.file_size, 0));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION krai_system.reset_content_counters()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE krai_system.content_counters SET value = 0, reconciled_at = NOW() WHERE name = ANY(TG_ARGV);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_documents_count_insert ON krai_core.documents;
+CREATE TRIGGER trg_documents_count_insert
+    AFTER INSERT ON krai_core.documents
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION krai_system.count_inserted_documents();
+
+DROP TRIGGER IF EXISTS trg_documents_count_delete ON krai_core.documents;
+CREATE TRIGGER trg_documents_count_delete
+    AFTER DELETE ON krai_core.documents
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION krai_system.count_deleted_documents();
+
+DROP TRIGGER IF EXISTS trg_documents_count_resize ON krai_core.documents;
+CREATE TRIGGER trg_documents_count_resize
+    AFTER UPDATE OF file_size ON krai_core.documents
+    FOR EACH ROW
+    WHEN (OLD.file_size IS DISTINCT FROM NEW.file_size)
+    EXECUTE FUNCTION krai_system.count_resized_document();
+
+DROP TRIGGER IF EXISTS trg_documents_count_truncate ON krai_core.documents;
+CREATE TRIGGER trg_documents_count_truncate
+    AFTER TRUNCATE ON krai_core.documents
+    FOR EACH STATEMENT EXECUTE FUNCTION krai_system.reset_content_counters('documents', 'document_bytes');
+
+-- Images, chunks and embeddings count rows only. Once the tables are
+-- partitioned (14_partitioned_content.sql) the triggers sit on the parent and see rows of every partition, including
+-- those removed by ON DELETE CASCADE.
+DO $$
+DECLARE
+    target RECORD;
+BEGIN
+    FOR target IN
+        SELECT * FROM (VALUES
+            ('krai_content', 'images', 'images'),
+            ('krai_intelligence', 'chunks', 'chunks'),
+            ('krai_intelligence', 'embeddings', 'embeddings')
+        ) AS t(schema_name, table_name, counter)
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I.%I',
+                       'trg_' || target.table_name || '_count_insert', target.schema_name, target.table_name);
+        EXECUTE format('CREATE TRIGGER %I AFTER INSERT ON %I.%I REFERENCING NEW TABLE AS new_rows '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION krai_system.count_inserted_rows(%L)',
+                       'trg_' || target.table_name || '_count_insert', target.schema_name, target.table_name,
+                       target.counter);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I.%I',
+                       'trg_' || target.table_name || '_count_delete', target.schema_name, target.table_name);
+        EXECUTE format('CREATE TRIGGER %I AFTER DELETE ON %I.%I REFERENCING OLD TABLE AS old_rows '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION krai_system.count_deleted_rows(%L)',
+                       'trg_' || target.table_name || '_count_delete', target.schema_name, target.table_name,
+                       target.counter);
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I.%I',
+                       'trg_' || target.table_name || '_count_truncate', target.schema_name, target.table_name);
+        EXECUTE format('CREATE TRIGGER %I AFTER TRUNCATE ON %I.%I '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION krai_system.reset_content_counters(%L)',
+                       'trg_' || target.table_name || '_count_truncate', target.schema_name, target.table_name,
+                       target.counter);
+    END LOOP;
+END $$;
+
+-- Dropped partitions fire no DELETE triggers: subtract their rows first.
+-- Without partitioning there is nothing to override.
+DO $$
+BEGIN
+    IF to_regprocedure('krai_intelligence.ensure_manufacturer_partitions(uuid)') IS NULL THEN
+        RETURN;
+    END IF;
+    EXECUTE $fn$
+CREATE OR REPLACE FUNCTION krai_intelligence.drop_manufacturer_content(manufacturer UUID)
+RETURNS INTEGER AS $body$
+DECLARE
+    suffix TEXT := replace(manufacturer::text, '-', '');
+    dropped BIGINT;
+    removed INTEGER;
+BEGIN
+    -- Rows referencing the chunk partition must be gone before it is dropped
+    DELETE FROM krai_system.processing_queue WHERE manufacturer_id = manufacturer;
+    DELETE FROM krai_system.processing_queue
+    WHERE document_id IN (SELECT id FROM krai_core.documents WHERE manufacturer_id = manufacturer);
+    DELETE FROM krai_intelligence.pending_embeddings WHERE manufacturer_id = manufacturer;
+    DELETE FROM krai_intelligence.error_codes WHERE manufacturer_id = manufacturer;
+    DELETE FROM krai_intelligence.part_number_mentions WHERE manufacturer_id = manufacturer;
+    DELETE FROM krai_intelligence.vector_index_scopes WHERE manufacturer_id = manufacturer;
+    -- Detaching (rather than dropping) keeps the foreign keys of the parents intact
+    IF to_regclass(format('krai_intelligence.%I', 'embeddings_m_' || suffix)) IS NOT NULL THEN
+        EXECUTE format('ALTER TABLE krai_intelligence.embeddings DETACH PARTITION krai_intelligence.%I',
+                       'embeddings_m_' || suffix);
+        EXECUTE format('SELECT COUNT(*) FROM krai_intelligence.%I', 'embeddings_m_' || suffix) INTO dropped;
+        PERFORM krai_system.bump_content_counter('embeddings', -dropped);
+        EXECUTE format('DROP TABLE krai_intelligence.%I', 'embeddings_m_' || suffix);
+    END IF;
+    IF to_regclass(format('krai_intelligence.%I', 'chunks_m_' || suffix)) IS NOT NULL THEN
+        EXECUTE format('ALTER TABLE krai_intelligence.chunks DETACH PARTITION krai_intelligence.%I',
+                       'chunks_m_' || suffix);
+        EXECUTE format('SELECT COUNT(*) FROM krai_intelligence.%I', 'chunks_m_' || suffix) INTO dropped;
+        PERFORM krai_system.bump_content_counter('chunks', -dropped);
+        EXECUTE format('DROP TABLE krai_intelligence.%I', 'chunks_m_' || suffix);
+    END IF;
+
+    DELETE FROM krai_core.documents WHERE manufacturer_id = manufacturer;
+    GET DIAGNOSTICS removed = ROW_COUNT;
+
+    PERFORM krai_intelligence.ensure_manufacturer_partitions(manufacturer);
+    RETURN removed;
+END;
+$body$ LANGUAGE plpgsql
+    $fn$;
+END $$;
+
+-- ======================================================================
+-- RECONCILIATION
+-- ======================================================================
+-- Recounts one counter and folds all slots into slot 0; returns the drift
+-- (exact minus maintained value). Locking every slot first makes writers
+-- that already added to the counter commit before the recount (their rows
+-- are counted) and holds back the others until it is done (their rows are
+-- not), so no concurrent change is lost. Writers of that table wait for the
+-- duration of the COUNT: call it per counter, each in its own transaction:
+--     SELECT krai_system.reconcile_content_counter('chunks');
+
+CREATE OR REPLACE FUNCTION krai_system.reconcile_content_counter(counter TEXT)
+RETURNS BIGINT AS $$
+DECLARE
+    maintained BIGINT;
+    actual BIGINT;
+BEGIN
+    PERFORM 1 FROM krai_system.content_counters WHERE name = counter FOR UPDATE;
+    SELECT COALESCE(SUM(value), 0) INTO maintained FROM krai_system.content_counters WHERE name = counter;
+
+    actual := CASE counter
+        WHEN 'documents' THEN (SELECT COUNT(*) FROM krai_core.documents)
+        WHEN 'document_bytes' THEN (SELECT COALESCE(SUM(file_size), 0) FROM krai_core.documents)
+        WHEN 'images' THEN (SELECT COUNT(*) FROM krai_content.images)
+        WHEN 'chunks' THEN (SELECT COUNT(*) FROM krai_intelligence.chunks)
+        WHEN 'embeddings' THEN (SELECT COUNT(*) FROM krai_intelligence.embeddings)
+    END;
+    IF actual IS NULL THEN
+        RAISE EXCEPTION 'Unknown content counter: %', counter;
+    END IF;
+
+    UPDATE krai_system.content_counters
+    SET value = CASE WHEN slot = 0 THEN actual ELSE 0 END, reconciled_at = NOW()
+    WHERE name = counter;
+    RETURN actual - maintained;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Initial values
+SELECT krai_system.reconcile_content_counter(name)
+FROM (SELECT DISTINCT name FROM krai_system.content_counters) AS counters;
+
+ALTER TABLE krai_system.content_counters ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "service_role_content_counters_all" ON krai_system.content_counters;
+CREATE POLICY "service_role_content_counters_all" ON krai_system.content_counters FOR ALL
+    USING (true);
+
+-- Triggers fire for whichever role writes the content tables
+ALTER FUNCTION krai_system.bump_content_counter(TEXT, BIGINT) SECURITY DEFINER;
+ALTER FUNCTION krai_system.reset_content_counters() SECURITY DEFINER;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'krai_service_role') THEN
+        GRANT ALL ON krai_system.content_counters, krai_system.content_counter_totals TO krai_service_role;
+    END IF;
+END $$;
+
+DO $$
+BEGIN
+    RAISE NOTICE '🧮 Content counters ready: SELECT * FROM krai_system.content_counter_totals;';
+    RAISE NOTICE '   Drift correction: SELECT krai_system.reconcile_content_counter(''chunks'');';
+END $$;
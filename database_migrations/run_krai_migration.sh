@@ -66,14 +66,27 @@ execute_sql() {
 }
 
 # Show migration plan
-echo "📋 MIGRATION PLAN - 5 Optimized Steps:"
+echo "📋 MIGRATION PLAN - 16 Optimized Steps:"
 echo "1️⃣  Complete Schema      (Tables + Architecture)"
 echo "2️⃣  Security & RLS       (Policies + Roles)"  
 echo "3️⃣  Performance          (Indexes + Functions)"
 echo "4️⃣  Extensions & Storage (Buckets + Samples)"
 echo "5️⃣  Performance Testing  (Index verification + Health check)"
+echo "6️⃣  Code Index           (Error code / part number postings)"
+echo "7️⃣  Processing Status    (Shared status across API workers)"
+echo "8️⃣  Vector Quantization  (halfvec / binary copies + HNSW)"
+echo "9️⃣  Matryoshka Index     (Prefix index helper, opt-in)"
+echo "1️⃣0️⃣ Embedding Backfill   (Pending queue, zero-vector cleanup)"
+echo "1️⃣1️⃣ Embedding Migrations (Online re-embedding + cut-over)"
+echo "1️⃣2️⃣ Filtered Vectors     (Partial HNSW per manufacturer / type)"
+echo "1️⃣3️⃣ Manufacturer Keys    (manufacturer_id on chunks, batched backfill)"
+echo "1️⃣4️⃣ Partitioned Content  (Chunks + embeddings by manufacturer, PG >= 15, optional)"
+echo "1️⃣5️⃣ Listing Indexes      (Keyset pagination on created_at, id)"
+echo "1️⃣6️⃣ Content Counters     (Trigger-maintained stats + reconciliation)"
 echo ""
-echo "⏱️  Estimated time: 3-4 minutes"
+echo "⚠️  Step 14 rewrites krai_intelligence.chunks and embeddings (copy + index"
+echo "   rebuild incl. HNSW) under an EXCLUSIVE lock - you will be asked before it runs"
+echo "⏱️  Estimated time: 3-4 minutes on an empty database, longer with existing content"
 echo ""
 
 read -p "🤔 Continue with migration? (y/N): " -n 1 -r
@@ -87,12 +100,32 @@ echo ""
 echo "🎬 Starting migration..."
 echo ""
 
-# Execute all 5 consolidated steps
+# Execute all consolidated steps
 execute_sql "1" "01_krai_complete_schema.sql" "Complete Schema (10 schemas, 31+ tables, extensions)"
 execute_sql "2" "02_security_and_rls.sql" "Security & RLS (Policies, roles, permissions)"
 execute_sql "3" "03_performance_and_indexes.sql" "Performance (Indexes, functions, materialized views)"
 execute_sql "4" "04_extensions_and_storage.sql" "Extensions & Storage (Buckets, samples, validation)"
 execute_sql "5" "05_performance_test.sql" "Performance Tests (Index verification, system health)"
+execute_sql "6" "06_code_index.sql" "Code Index (Error code / part number postings, hash indexes)"
+execute_sql "7" "07_processing_status.sql" "Processing Status (Shared status table for multi-worker deployments)"
+execute_sql "8" "08_vector_quantization.sql" "Vector Quantization (halfvec / binary embedding copies, HNSW)"
+execute_sql "9" "09_matryoshka_index.sql" "Matryoshka Index (create_matryoshka_index helper, index is opt-in)"
+execute_sql "10" "10_embedding_backfill.sql" "Embedding Backfill (pending queue, zero-vector cleanup)"
+execute_sql "11" "11_embedding_migrations.sql" "Embedding Migrations (online re-embedding, cut-over, batched GC)"
+execute_sql "12" "12_filtered_vector_indexes.sql" "Filtered Vector Indexes (partial HNSW per manufacturer / document type)"
+execute_sql "13" "13_content_manufacturer_keys.sql" "Manufacturer Keys (manufacturer_id on chunks, queue and pending embeddings)"
+
+read -p "🧱 Run step 14 now? It locks chunks and embeddings exclusively while they are copied (y/N): " -n 1 -r
+echo ""
+if [[ $REPLY =~ ^[Yy]$ ]]; then
+    execute_sql "14" "14_partitioned_content.sql" "Partitioned Content (chunks / embeddings LIST-partitioned by manufacturer)"
+else
+    echo "⏭️  Step 14 skipped - run it later in a maintenance window:"
+    echo "   docker exec -i supabase_db_KR-AI-Engine psql -U postgres -d postgres < 14_partitioned_content.sql"
+    echo ""
+fi
+execute_sql "15" "15_document_listing_indexes.sql" "Document Listing Indexes (keyset pagination on created_at, id)"
+execute_sql "16" "16_content_counters.sql" "Content Counters (trigger-maintained stats, reconciliation)"
 
 echo "🎉 SUCCESS! KRAI SCHEMA MIGRATION COMPLETED!"
 echo "=============================================="
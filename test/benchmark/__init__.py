@@ -0,0 +1,17 @@
+"""
+KRAI Engine ingestion benchmark
+
+Deterministic stand-ins for Ollama and Supabase Storage plus a runner that
+drives ProductionDocumentProcessor.process_document over a generated corpus
+against a local Postgres with pgvector:
+
+    stub_server.py     - threaded JSON HTTP server the fakes run on (one child process each)
+    fake_ollama.py     - hash-based embeddings, canned generate/chat, configurable latency
+    fake_storage.py    - Supabase Storage object API that keeps sizes and hashes only
+    corpus.py          - seeded service-manual PDFs (error tables, parts lists, JPEG/Flate images)
+    run_ingestion.py   - runs the pipeline, writes a JSON report, compares with a baseline
+    quantization_report.py - recall/latency/size of float32 vs halfvec/binary/Matryoshka HNSW at 1M vectors
+    filtered_search_report.py - manufacturer-filtered recall/latency: global HNSW vs per-scope partial indexes
+    pool_routing.py    - multi-host Ollama routing checks (model-aware, sticky, least outstanding, failover)
+    model_affinity.py  - ingestion wall time and model loads with vs without the model affinity scheduler
+"""
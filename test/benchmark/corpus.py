@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+Seeded synthetic PDF corpus for load tests and the ingestion benchmark
+
+Builds service-manual-like PDFs in HP, Konica Minolta, Lexmark and UTAX
+styles: cover and procedure pages, error-code tables, parts lists, diagrams
+embedded as JPEG (DCTDecode) or Flate images, and a small set of icons that
+repeat on many pages and across documents. Safety boilerplate recurs verbatim
+so dedup paths see realistic repetition. The same seed and options always
+produce byte-identical files (JPEG bytes additionally depend on the
+Pillow/libjpeg build). Pages are written one at a time, so documents with
+thousands of pages need constant memory.
+
+A corpus.json manifest records the options and, per document, the error codes
+and part numbers that were placed (ground truth for code-index and search
+benchmarks).
+
+Usage:
+    python test/benchmark/corpus.py --out corpus --documents 50 --pages 20-400 --seed 7
+    python test/benchmark/corpus.py --out big --documents 2 --pages 5000 --image-ratio 0.5 --jpeg-ratio 1
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import random
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+PATTERNS_PATH = Path(__file__).resolve().parent.parent.parent / "backend" / "config" / "error_code_patterns.json"
+
+MANIFEST_NAME = "corpus.json"
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+
+# Per-manufacturer look and numbering schemes (formats follow config/error_code_patterns.json)
+STYLES = {
+    "hp": {
+        "display": "HP",
+        "font": "Helvetica",
+        "series": ["LaserJet Managed E", "Color LaserJet Managed E", "LaserJet Enterprise X"],
+        "model": lambda rng: f"E{rng.randint(500, 899)}{rng.choice(['', 'dn', 'z'])}",
+        "error_code": lambda rng: f"{rng.randint(10, 99)}.{rng.randint(0, 99):02d}.{rng.randint(0, 99):02d}",
+        "part_number": lambda rng: f"{rng.choice(['RM2', 'RM1', 'C4127'])}-{rng.randint(10000, 99999)}",
+        "header": "{display} {series} {model} - Service Manual",
+        "footer": "ENWW  {page}",
+    },
+    "konica_minolta": {
+        "display": "Konica Minolta",
+        "font": "Times-Roman",
+        "series": ["bizhub C", "bizhub", "AccurioPress"],
+        "model": lambda rng: f"{rng.choice(['C', ''])}{rng.randint(25, 75)}{rng.choice(['0i', '8', '0'])}",
+        "error_code": lambda rng: rng.choice([f"C{rng.randint(1000, 9999)}", f"J{rng.randint(10, 99)}-{rng.randint(1, 99):02d}"]),
+        "part_number": lambda rng: f"A{rng.randint(0, 9)}{rng.choice('ABCDEFGH')}{rng.randint(0, 9)}-{rng.randint(1000, 9999)}",
+        "header": "{display} {series}{model} SERVICE MANUAL  Field Service",
+        "footer": "{page}",
+    },
+    "lexmark": {
+        "display": "Lexmark",
+        "font": "Helvetica",
+        "series": ["CX", "XC", "MX"],
+        "model": lambda rng: f"{rng.randint(700, 999)}{rng.choice(['', 'de', 'dxe'])}",
+        "error_code": lambda rng: f"{rng.randint(100, 999)}.{rng.randint(0, 99):02d}",
+        "part_number": lambda rng: f"40X{rng.randint(1000, 9999)}",
+        "header": "{display} {series}{model}  7528-xxx  Service Manual",
+        "footer": "Diagnostic information  {page}",
+    },
+    "utax": {
+        "display": "UTAX",
+        "font": "Courier",
+        "series": ["", "P-", "LP "],
+        "model": lambda rng: f"{rng.randint(30, 80)}{rng.choice(['58i', '06ci', '61i'])}",
+        "error_code": lambda rng: f"{rng.randint(1000, 99999):05d}",
+        "part_number": lambda rng: f"U{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}",
+        "header": "{display} {series}{model}  Service Manual  Rev. {revision}",
+        "footer": "- {page} -",
+    },
+}
+
+COMPONENTS = ["fuser unit", "transfer roller", "pickup roller", "duplex unit", "toner cartridge", "drum unit",
+              "scanner assembly", "main controller board", "high-voltage power supply", "laser/scanner unit",
+              "registration sensor", "exit sensor", "tray 2 lift motor", "paper feed clutch", "waste toner box"]
+
+SYMPTOMS = ["Paper jam detected at", "Abnormal temperature in", "Communication error with", "Motor lock detected in",
+            "Sensor did not turn on in", "Unexpected voltage in", "Home position error in"]
+
+ACTIONS = ["Check the connector of the", "Replace the", "Clean the", "Reseat the", "Verify the harness to the",
+           "Update the firmware for the", "Inspect the gears of the"]
+
+BOILERPLATE = [
+    "WARNING: Disconnect the power cord before servicing. Hazardous voltages are present inside the device.",
+    "CAUTION: The fuser is hot. Allow the device to cool for at least 30 minutes before touching it.",
+    "NOTE: Use only genuine replacement parts. Third-party parts may void the warranty.",
+    "ESD: Wear a grounded wrist strap when handling circuit boards to avoid electrostatic damage.",
+]
+
+ICON_NAMES = ["warning", "hot_surface", "esd", "note", "jam", "toner"]
+ICON_SIZE = 48
+
+# ---------------------------------------------------------------------------
+# Raster images (pure Python; pixels are drawn with row slices so large
+# diagrams stay cheap)
+# ---------------------------------------------------------------------------
+
+class Raster:
+    """RGB pixel buffer with rectangle primitives"""
+
+    def __init__(self, width: int, height: int, background: Tuple[int, int, int]):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(bytes(background) * (width * height))
+
+    def fill(self, x0: int, y0: int, x1: int, y1: int, color: Tuple[int, int, int]):
+        x0, x1 = max(0, min(x0, x1)), min(self.width, max(x0, x1))
+        y0, y1 = max(0, min(y0, y1)), min(self.height, max(y0, y1))
+        if x1 <= x0 or y1 <= y0:
+            return
+        row = bytes(color) * (x1 - x0)
+        for y in range(y0, y1):
+            start = (y * self.width + x0) * 3
+            self.pixels[start:start + len(row)] = row
+
+    def outline(self, x0: int, y0: int, x1: int, y1: int, color: Tuple[int, int, int], thickness: int = 2):
+        self.fill(x0, y0, x1, y0 + thickness, color)
+        self.fill(x0, y1 - thickness, x1, y1, color)
+        self.fill(x0, y0, x0 + thickness, y1, color)
+        self.fill(x1 - thickness, y0, x1, y1, color)
+
+def diagram_raster(rng: random.Random, width: int, height: int) -> Raster:
+    """Exploded-view / schematic look: boxes, leader lines and callout markers"""
+    raster = Raster(width, height, (250, 250, 247))
+    for _ in range(rng.randint(6, 14)):
+        x0, y0 = rng.randrange(0, width - 40), rng.randrange(0, height - 40)
+        x1, y1 = x0 + rng.randint(30, width // 3), y0 + rng.randint(20, height // 3)
+        shade = rng.randint(120, 220)
+        if rng.random() < 0.5:
+            raster.fill(x0, y0, x1, y1, (shade, shade, shade + 20 if shade < 235 else shade))
+        raster.outline(x0, y0, x1, y1, (40, 40, 40))
+    for _ in range(rng.randint(4, 10)):
+        # Leader line with a numbered callout box at its end
+        y = rng.randrange(10, height - 10)
+        x0, x1 = rng.randrange(0, width // 2), rng.randrange(width // 2, width)
+        raster.fill(x0, y, x1, y + 1, (20, 20, 20))
+        raster.fill(x1 - 10, y - 8, x1 + 6, y + 8, (200, 30, 30))
+    return raster
+
+def icon_raster(index: int) -> Raster:
+    """Fixed pictograms; identical across documents so cross-document dedup has something to find"""
+    palette = [(250, 200, 0), (230, 60, 20), (30, 90, 200), (40, 160, 60), (120, 120, 120), (20, 20, 20)]
+    raster = Raster(ICON_SIZE, ICON_SIZE, (255, 255, 255))
+    color = palette[index % len(palette)]
+    for step in range(ICON_SIZE // 2):
+        # Triangle / diamond silhouettes drawn row by row
+        half = step if index % 2 == 0 else min(step, ICON_SIZE // 2 - step)
+        raster.fill(ICON_SIZE // 2 - half, 4 + step * 2 - 4, ICON_SIZE // 2 + half, 4 + step * 2 - 2, color)
+    raster.fill(ICON_SIZE // 2 - 2, 14, ICON_SIZE // 2 + 2, 32, (0, 0, 0))
+    raster.fill(ICON_SIZE // 2 - 2, 36, ICON_SIZE // 2 + 2, 40, (0, 0, 0))
+    return raster
+
+def encode_image(raster: Raster, jpeg: bool, quality: int = 80) -> Tuple[bytes, str]:
+    """(stream data, PDF filter) for a raster"""
+    if jpeg:
+        from PIL import Image
+
+        out = io.BytesIO()
+        Image.frombytes("RGB", (raster.width, raster.height), bytes(raster.pixels)).save(
+            out, "JPEG", quality=quality, optimize=False)
+        return out.getvalue(), "/DCTDecode"
+    return zlib.compress(bytes(raster.pixels), 6), "/FlateDecode"
+
+# ---------------------------------------------------------------------------
+# PDF writing
+# ---------------------------------------------------------------------------
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+class PDFWriter:
+    """Streams objects to disk; the page tree and xref are written at close()"""
+
+    def __init__(self, path: Path, fonts: Dict[str, str]):
+        self.file = open(path, "wb")
+        self.offsets: Dict[int, int] = {}
+        self.page_numbers: List[int] = []
+        self.next_number = 3  # 1 catalog, 2 page tree
+        self.file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self.fonts = {name: self.write(f"<< /Type /Font /Subtype /Type1 /BaseFont /{base} >>".encode())
+                      for name, base in fonts.items()}
+
+    def allocate(self) -> int:
+        number = self.next_number
+        self.next_number += 1
+        return number
+
+    def write(self, body: bytes, number: Optional[int] = None) -> int:
+        number = number or self.allocate()
+        self.offsets[number] = self.file.tell()
+        self.file.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+        return number
+
+    def write_stream(self, data: bytes, dictionary: str = "") -> int:
+        return self.write(f"<< {dictionary} /Length {len(data)} >>\nstream\n".encode() + data + b"\nendstream")
+
+    def write_image(self, data: bytes, pdf_filter: str, width: int, height: int) -> int:
+        return self.write_stream(data, f"/Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                                       f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter {pdf_filter}")
+
+    def add_page(self, content: bytes, xobjects: Dict[str, int]):
+        content_number = self.write_stream(zlib.compress(content), "/Filter /FlateDecode")
+        fonts = " ".join(f"/{name} {number} 0 R" for name, number in self.fonts.items())
+        images = " ".join(f"/{name} {number} 0 R" for name, number in xobjects.items())
+        self.page_numbers.append(self.write((
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << {fonts} >> /XObject << {images} >> >> /Contents {content_number} 0 R >>"
+        ).encode()))
+
+    def close(self, info: Dict[str, str]):
+        kids = " ".join(f"{number} 0 R" for number in self.page_numbers)
+        self.write(f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_numbers)} >>".encode(), 2)
+        self.write(b"<< /Type /Catalog /Pages 2 0 R >>", 1)
+        info_entries = " ".join(f"/{key} ({_escape(value)})" for key, value in info.items())
+        info_number = self.write(f"<< {info_entries} >>".encode())
+
+        total = self.next_number
+        xref_offset = self.file.tell()
+        self.file.write(f"xref\n0 {total}\n0000000000 65535 f \n".encode())
+        for number in range(1, total):
+            self.file.write(f"{self.offsets[number]:010d} 00000 n \n".encode())
+        self.file.write(f"trailer\n<< /Size {total} /Root 1 0 R /Info {info_number} 0 R >>\n"
+                        f"startxref\n{xref_offset}\n%%EOF\n".encode())
+        self.file.close()
+
+class PageCanvas:
+    """Collects content-stream operators for one page"""
+
+    def __init__(self, font: str = "F1"):
+        self.ops: List[str] = []
+        self.font = font
+        self.y = PAGE_HEIGHT - 60
+
+    def text(self, x: float, y: float, text: str, size: float = 9, font: Optional[str] = None):
+        self.ops.append(f"BT /{font or self.font} {size} Tf {x} {y} Td ({_escape(text)}) Tj ET")
+
+    def line(self, text: str, size: float = 9, indent: float = 0, leading: float = 12):
+        self.text(54 + indent, self.y, text, size)
+        self.y -= leading
+
+    def rect(self, x: float, y: float, w: float, h: float):
+        self.ops.append(f"{x} {y} {w} {h} re S")
+
+    def image(self, name: str, x: float, y: float, w: float, h: float):
+        self.ops.append(f"q {w} 0 0 {h} {x} {y} cm /{name} Do Q")
+
+    def content(self) -> bytes:
+        return "\n".join(self.ops).encode("latin-1", "replace")
+
+def _wrap(text: str, width: int = 95) -> List[str]:
+    lines, current = [], ""
+    for word in text.split():
+        if current and len(current) + len(word) + 1 > width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}".strip()
+    if current:
+        lines.append(current)
+    return lines
+
+# ---------------------------------------------------------------------------
+# Documents
+# ---------------------------------------------------------------------------
+
+def _known_codes(manufacturer: str) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    """Example error codes / part numbers from the classifier config, so placed codes are ones it knows"""
+    try:
+        with open(PATTERNS_PATH, encoding="utf-8") as f:
+            patterns = json.load(f)
+    except (OSError, ValueError):
+        return [], []
+    errors = patterns.get("error_code_patterns", {}).get(manufacturer, {}).get("examples", [])
+    parts = [part for part in patterns.get("part_number_patterns", {}).get(manufacturer, {}).get("examples", [])
+             if "X" not in part.get("part_number", "X")]
+    return errors, parts
+
+def _page_kind(rng: random.Random, page_no: int) -> str:
+    if page_no == 1:
+        return "cover"
+    roll = rng.random()
+    if roll < 0.20:
+        return "error_table"
+    if roll < 0.35:
+        return "parts_list"
+    return "procedure"
+
+def generate_document(path: Path, manufacturer: str, pages: int, rng: random.Random,
+                      image_ratio: float = 0.3, jpeg_ratio: float = 0.5, icon_mode: str = "shared",
+                      image_size: Tuple[int, int] = (480, 360)) -> Dict[str, Any]:
+    """Write one PDF; returns its manifest entry"""
+    style = STYLES[manufacturer]
+    series = rng.choice(style["series"])
+    model = style["model"](rng)
+    header = style["header"].format(display=style["display"], series=series, model=model,
+                                    revision=rng.randint(1, 9))
+    known_errors, known_parts = _known_codes(manufacturer)
+    placed_codes, placed_parts = set(), set()
+    image_count = jpeg_count = 0
+
+    writer = PDFWriter(path, {"F1": style["font"], "F2": "Helvetica-Bold"})
+
+    # Shared icon XObjects: written once, referenced from every page that shows them
+    shared_icons: Dict[str, int] = {}
+    if icon_mode == "shared":
+        for index, name in enumerate(ICON_NAMES):
+            data, pdf_filter = encode_image(icon_raster(index), jpeg=False)
+            shared_icons[name] = writer.write_image(data, pdf_filter, ICON_SIZE, ICON_SIZE)
+
+    def error_code() -> Tuple[str, str]:
+        if known_errors and rng.random() < 0.4:
+            example = rng.choice(known_errors)
+            return example["code"], example.get("description", "")
+        component = rng.choice(COMPONENTS)
+        return style["error_code"](rng), f"{rng.choice(SYMPTOMS)} {component}"
+
+    def part_number() -> Tuple[str, str]:
+        if known_parts and rng.random() < 0.4:
+            example = rng.choice(known_parts)
+            return example["part_number"], example.get("description", "")
+        return style["part_number"](rng), rng.choice(COMPONENTS).title()
+
+    for page_no in range(1, pages + 1):
+        canvas = PageCanvas()
+        xobjects: Dict[str, int] = {}
+        kind = _page_kind(rng, page_no)
+
+        canvas.text(54, PAGE_HEIGHT - 36, header, 8, font="F2")
+        canvas.text(PAGE_WIDTH - 110, 30, style["footer"].format(page=page_no), 8)
+
+        if kind == "cover":
+            canvas.y = PAGE_HEIGHT - 200
+            canvas.line(f"{style['display']} {series}{model}", 24, leading=34)
+            canvas.line("Service Manual", 18, leading=28)
+            canvas.line(f"Document revision {rng.randint(1, 12)}.{rng.randint(0, 9)}", 11, leading=18)
+            for text in BOILERPLATE:
+                for wrapped in _wrap(text):
+                    canvas.line(wrapped, 8)
+
+        elif kind == "error_table":
+            canvas.line("Error code table", 13, leading=22)
+            top = canvas.y + 10
+            rows = rng.randint(18, 40)
+            for _ in range(rows):
+                code, description = error_code()
+                placed_codes.add(code)
+                canvas.text(58, canvas.y, code, 8)
+                canvas.text(140, canvas.y, description[:60], 8)
+                canvas.text(420, canvas.y, f"{rng.choice(ACTIONS)} {rng.choice(COMPONENTS)}"[:36], 7)
+                canvas.y -= 13
+                if canvas.y < 70:
+                    break
+            canvas.rect(54, canvas.y + 6, PAGE_WIDTH - 108, top - canvas.y)
+            canvas.rect(136, canvas.y + 6, 0, top - canvas.y)
+            canvas.rect(416, canvas.y + 6, 0, top - canvas.y)
+
+        elif kind == "parts_list":
+            canvas.line("Parts list", 13, leading=22)
+            for ref in range(1, rng.randint(15, 45)):
+                part, description = part_number()
+                placed_parts.add(part)
+                canvas.text(58, canvas.y, str(ref), 8)
+                canvas.text(90, canvas.y, part, 8)
+                canvas.text(200, canvas.y, description[:60], 8)
+                canvas.text(500, canvas.y, str(rng.randint(1, 4)), 8)
+                canvas.y -= 13
+                if canvas.y < 70:
+                    break
+
+        else:
+            component = rng.choice(COMPONENTS)
+            canvas.line(f"Removal and replacement: {component}", 13, leading=22)
+            code, description = error_code()
+            placed_codes.add(code)
+            for text in [f"Related error code {code}: {description}.",
+                         rng.choice(BOILERPLATE)] + [
+                             f"Step {step}: {rng.choice(ACTIONS)} {rng.choice(COMPONENTS)} and "
+                             f"{rng.choice(['remove two screws', 'release the latch', 'slide it out', 'disconnect J' + str(rng.randint(100, 999))])}."
+                             for step in range(1, rng.randint(4, 12))]:
+                for wrapped in _wrap(text):
+                    canvas.line(wrapped, 9)
+
+        # Icons next to the page heading
+        if rng.random() < 0.6:
+            for icon_slot, name in enumerate(rng.sample(ICON_NAMES, rng.randint(1, 2))):
+                if icon_mode == "shared":
+                    number = shared_icons[name]
+                else:
+                    data, pdf_filter = encode_image(icon_raster(ICON_NAMES.index(name)), jpeg=False)
+                    number = writer.write_image(data, pdf_filter, ICON_SIZE, ICON_SIZE)
+                xobjects[f"Icon{icon_slot}"] = number
+                canvas.image(f"Icon{icon_slot}", PAGE_WIDTH - 90 - icon_slot * 40, PAGE_HEIGHT - 90, 32, 32)
+
+        # Diagram below the text
+        if kind != "cover" and rng.random() < image_ratio and canvas.y > 250:
+            width, height = image_size
+            jpeg = rng.random() < jpeg_ratio
+            data, pdf_filter = encode_image(diagram_raster(rng, width, height), jpeg=jpeg)
+            xobjects["Fig0"] = writer.write_image(data, pdf_filter, width, height)
+            draw_height = min(canvas.y - 80, 300)
+            canvas.image("Fig0", 72, canvas.y - draw_height - 10, draw_height * width / height, draw_height)
+            image_count += 1
+            jpeg_count += jpeg
+
+        writer.add_page(canvas.content(), xobjects)
+
+    writer.close({
+        "Title": header,
+        "Author": style["display"],
+        "Producer": "KRAI synthetic corpus",
+        # Fixed date keeps files byte-identical between runs
+        "CreationDate": "D:20240101000000Z",
+    })
+
+    return {
+        "file": path.name,
+        "manufacturer": manufacturer,
+        "model": f"{series}{model}",
+        "pages": pages,
+        "images": image_count,
+        "jpeg_images": jpeg_count,
+        "error_codes": sorted(placed_codes),
+        "part_numbers": sorted(placed_parts),
+    }
+
+def parse_pages(pages: Union[int, str]) -> Tuple[int, int]:
+    """"200" or "20-400" -> (min, max)"""
+    if isinstance(pages, int):
+        return pages, pages
+    low, _, high = str(pages).partition("-")
+    return int(low), int(high or low)
+
+def generate_corpus(out_dir: Path, documents: int, pages: Union[int, str], seed: int = 42,
+                    manufacturers: Optional[List[str]] = None, image_ratio: float = 0.3,
+                    jpeg_ratio: float = 0.5, icon_mode: str = "shared",
+                    image_size: Tuple[int, int] = (480, 360)) -> List[Path]:
+    """Write the corpus below out_dir; reused as-is when its manifest has the same options"""
+    manufacturers = manufacturers or list(STYLES)
+    min_pages, max_pages = parse_pages(pages)
+    options = {
+        "documents": documents, "pages": [min_pages, max_pages], "seed": seed, "manufacturers": manufacturers,
+        "image_ratio": image_ratio, "jpeg_ratio": jpeg_ratio, "icon_mode": icon_mode, "image_size": list(image_size),
+    }
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / MANIFEST_NAME
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text())
+        paths = [out_dir / doc["file"] for doc in manifest.get("documents", [])]
+        if manifest.get("options") == options and all(path.exists() for path in paths):
+            return paths
+
+    entries = []
+    for doc_index in range(documents):
+        rng = random.Random(f"{seed}:{doc_index}")
+        manufacturer = manufacturers[doc_index % len(manufacturers)]
+        doc_pages = rng.randint(min_pages, max_pages)
+        path = out_dir / f"{STYLES[manufacturer]['display'].replace(' ', '_')}_SM_{seed}_{doc_index:04d}.pdf"
+        entry = generate_document(path, manufacturer, doc_pages, rng, image_ratio, jpeg_ratio, icon_mode, image_size)
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        entry["sha256"] = digest.hexdigest()
+        entry["size"] = path.stat().st_size
+        entries.append(entry)
+
+    manifest_path.write_text(json.dumps({"options": options, "documents": entries}, indent=2))
+    return [out_dir / entry["file"] for entry in entries]
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic synthetic service-manual corpus")
+    parser.add_argument("--out", type=str, default="benchmark_corpus", help="Output directory")
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--pages", type=str, default="20-200", help="Pages per document: N or MIN-MAX")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--manufacturers", nargs="+", choices=list(STYLES), help="Styles to rotate through (default all)")
+    parser.add_argument("--image-ratio", type=float, default=0.3, help="Share of pages with a diagram")
+    parser.add_argument("--jpeg-ratio", type=float, default=0.5, help="Share of diagrams stored as JPEG (rest Flate)")
+    parser.add_argument("--icon-mode", choices=["shared", "copied"], default="shared",
+                        help="Icons as one shared XObject per document, or a copy on every page")
+    parser.add_argument("--image-size", type=str, default="480x360", help="Diagram size WIDTHxHEIGHT in pixels")
+    args = parser.parse_args()
+
+    width, _, height = args.image_size.partition("x")
+    paths = generate_corpus(Path(args.out), args.documents, args.pages, args.seed, args.manufacturers,
+                            args.image_ratio, args.jpeg_ratio, args.icon_mode, (int(width), int(height)))
+    total = sum(path.stat().st_size for path in paths)
+    print(f"✅ {len(paths)} documents, {total / 1024 / 1024:.1f} MB in {args.out} (manifest: {MANIFEST_NAME})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Deterministic fake Ollama server
+
+Embeddings are derived from a SHA-256 of model + text, so the same chunk
+always gets the same unit vector and different chunks get uncorrelated ones.
+generate/chat return a canned answer that mentions an error code and a part
+so downstream classification paths are exercised. Latency per operation is
+configurable to model a real GPU box.
+
+--gpu-slots N models how many models fit in VRAM at once: requesting a model
+that is not resident waits for the least recently used idle model to unload
+and then pays --swap-latency-ms (counted as model_loads in /_stats). An
+empty /api/generate only loads the model, like Ollama's preload request.
+
+Usage:
+    python test/benchmark/fake_ollama.py --port 11435 --embed-latency-ms 25 --generate-latency-ms 800
+    python test/benchmark/fake_ollama.py --gpu-slots 1 --swap-latency-ms 3000
+"""
+
+import argparse
+import hashlib
+import math
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List
+
+from stub_server import StubHandler, serve
+
+DEFAULT_MODELS = ["embeddinggemma:latest", "llama3.2:3b", "llava:7b"]
+
+VISION_ANSWER = ("Technical diagram of the fuser unit. Error code C2557 is shown on the control panel. "
+                 "Replace part RM2-5425 following the removal procedure step 3.")
+
+def hash_embedding(text: str, dimension: int = 768, model: str = "") -> List[float]:
+    """Deterministic unit vector for a text (no model needed)"""
+    raw = hashlib.shake_256(f"{model}\0{text}".encode("utf-8")).digest(dimension * 2)
+    values = [value / 32768.0 for value in struct.unpack(f"<{dimension}h", raw)]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values]
+
+class FakeOllamaHandler(StubHandler):
+    models = DEFAULT_MODELS
+    dimension = 768
+    embed_latency_ms = 0.0
+    generate_latency_ms = 0.0
+    # Probability-free failure injection: every Nth request answers 500 (0 = never)
+    fail_every = 0
+    # VRAM model: resident model -> requests running on it (0 slots = unlimited, no swaps)
+    gpu_slots = 0
+    swap_latency_ms = 0.0
+    resident: "OrderedDict[str, int]" = OrderedDict()
+    gpu = threading.Condition()
+
+    @contextmanager
+    def loaded(self, model: str, keep_alive=None):
+        """Run a request on `model`, loading it (and evicting an idle one) first"""
+        if not self.gpu_slots:
+            yield
+            return
+        with self.gpu:
+            while model not in self.resident:
+                if len(self.resident) < self.gpu_slots:
+                    self.count("model_loads")
+                    # Loading blocks the GPU for everyone, as a real single-GPU Ollama does
+                    self.sleep_ms(self.swap_latency_ms)
+                    self.resident[model] = 0
+                    break
+                idle = [name for name, running in self.resident.items() if not running]
+                if idle:
+                    del self.resident[idle[0]]
+                    self.count("model_unloads")
+                else:
+                    self.gpu.wait()
+            self.resident.move_to_end(model)
+            self.resident[model] += 1
+        try:
+            yield
+        finally:
+            with self.gpu:
+                self.resident[model] -= 1
+                if keep_alive in (0, "0", "0s") and not self.resident[model]:
+                    del self.resident[model]
+                    self.count("model_unloads")
+                self.gpu.notify_all()
+
+    def _maybe_fail(self) -> bool:
+        if not self.fail_every:
+            return False
+        self.count("requests_total")
+        with self.stats_lock:
+            total = self.stats["requests_total"]
+        if total % self.fail_every == 0:
+            self.count("injected_failures")
+            self.send_json({"error": "injected failure"}, status=500)
+            return True
+        return False
+
+    def do_GET(self):
+        if self.handle_stats():
+            return
+        if self.path == "/api/tags":
+            self.count("tags")
+            self.send_json({"models": [{"name": name, "model": name, "size": 0} for name in self.models]})
+        elif self.path == "/api/ps":
+            running = list(self.resident) if self.gpu_slots else self.models
+            self.send_json({"models": [{"name": name, "model": name} for name in running]})
+        else:
+            self.send_empty(404)
+
+    def do_POST(self):
+        request = self.read_json()
+        model = request.get("model", "")
+        if self.path in ("/api/embeddings", "/api/embed", "/api/generate", "/api/chat"):
+            with self.loaded(model, request.get("keep_alive")):
+                self.handle_model_request(request, model)
+        elif self.path == "/api/show":
+            self.send_json({"model_info": {"embedding_length": self.dimension}})
+        else:
+            self.send_empty(404)
+
+    def handle_model_request(self, request, model: str):
+        if self.path in ("/api/embeddings", "/api/embed") and self._maybe_fail():
+            return
+        if self.path == "/api/embeddings":
+            # Legacy single-prompt endpoint used by the processor
+            self.count("embeddings")
+            self.sleep_ms(self.embed_latency_ms)
+            self.send_json({"embedding": hash_embedding(request.get("prompt", ""), self.dimension, model)})
+
+        elif self.path == "/api/embed":
+            inputs = request.get("input", "")
+            inputs = [inputs] if isinstance(inputs, str) else list(inputs)
+            self.count("embed_batches")
+            self.count("embed_inputs", len(inputs))
+            self.sleep_ms(self.embed_latency_ms)
+            self.send_json({"model": model, "embeddings": [hash_embedding(text, self.dimension, model)
+                                                           for text in inputs]})
+
+        elif self.path == "/api/generate" and "prompt" not in request:
+            # Preload request: the model is now resident
+            self.count("preloads")
+            self.send_json({"model": model, "response": "", "done": True, "done_reason": "load"})
+
+        elif self.path == "/api/generate":
+            if self._maybe_fail():
+                return
+            vision = bool(request.get("images"))
+            self.count("generate_vision" if vision else "generate")
+            start = time.perf_counter()
+            self.sleep_ms(self.generate_latency_ms)
+            prompt_hash = hashlib.sha256(request.get("prompt", "").encode()).hexdigest()[:8]
+            answer = VISION_ANSWER if vision else f"Deterministic answer {prompt_hash}."
+            self.send_json({
+                "model": model,
+                "response": answer,
+                "done": True,
+                "total_duration": int((time.perf_counter() - start) * 1e9)
+            })
+
+        elif self.path == "/api/chat":
+            if self._maybe_fail():
+                return
+            self.count("chat")
+            self.sleep_ms(self.generate_latency_ms)
+            self.send_json({
+                "model": model,
+                "message": {"role": "assistant", "content": "Deterministic chat answer."},
+                "done": True
+            })
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic fake Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--models", nargs="+", default=DEFAULT_MODELS, help="Models listed by /api/tags")
+    parser.add_argument("--dimension", type=int, default=768, help="Embedding dimension")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--generate-latency-ms", type=float, default=0.0)
+    parser.add_argument("--fail-every", type=int, default=0, help="Answer every Nth embed/generate request with 500")
+    parser.add_argument("--gpu-slots", type=int, default=0, help="Models resident at once (0 = unlimited)")
+    parser.add_argument("--swap-latency-ms", type=float, default=0.0, help="Cost of loading a non-resident model")
+    args = parser.parse_args()
+
+    FakeOllamaHandler.models = args.models
+    FakeOllamaHandler.dimension = args.dimension
+    FakeOllamaHandler.embed_latency_ms = args.embed_latency_ms
+    FakeOllamaHandler.generate_latency_ms = args.generate_latency_ms
+    FakeOllamaHandler.fail_every = args.fail_every
+    FakeOllamaHandler.gpu_slots = args.gpu_slots
+    FakeOllamaHandler.swap_latency_ms = args.swap_latency_ms
+    serve(FakeOllamaHandler, args.host, args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Fake Supabase Storage server
+
+Implements the bucket and object routes SupabaseStorage uses
+(/storage/v1/bucket, HEAD/POST/GET /storage/v1/object/{bucket}/{name}).
+Objects are reduced to size and SHA-256 unless --keep-bytes is given, so a
+long benchmark run does not grow the fake's memory.
+
+Usage:
+    python test/benchmark/fake_storage.py --port 54329 --upload-latency-ms 15
+"""
+
+import argparse
+import hashlib
+import threading
+from typing import Dict, Tuple
+
+from stub_server import StubHandler, serve
+
+PREFIX = "/storage/v1"
+
+class FakeStorageHandler(StubHandler):
+    upload_latency_ms = 0.0
+    keep_bytes = False
+
+    buckets: Dict[str, dict] = {}
+    # (bucket, name) -> (size, sha256, bytes or None)
+    objects: Dict[Tuple[str, str], Tuple[int, str, bytes]] = {}
+    objects_lock = threading.Lock()
+
+    def _object_key(self):
+        path = self.path.split("?", 1)[0]
+        if not path.startswith(f"{PREFIX}/object/"):
+            return None
+        parts = path[len(f"{PREFIX}/object/"):].split("/", 1)
+        return tuple(parts) if len(parts) == 2 else None
+
+    def do_GET(self):
+        if self.handle_stats():
+            return
+        if self.path.startswith(f"{PREFIX}/bucket"):
+            self.send_json(list(self.buckets.values()))
+            return
+
+        key = self._object_key()
+        with self.objects_lock:
+            stored = self.objects.get(key) if key else None
+        if stored is None:
+            self.send_json({"error": "not_found"}, status=404)
+            return
+        size, _, data = stored
+        body = data if data is not None else b"\0" * size
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        key = self._object_key()
+        with self.objects_lock:
+            exists = key is not None and key in self.objects
+        self.count("head")
+        self.send_empty(200 if exists else 404)
+
+    def do_POST(self):
+        if self.path.startswith(f"{PREFIX}/bucket"):
+            bucket = self.read_json()
+            if bucket.get("id") in self.buckets:
+                self.send_json({"error": "Duplicate"}, status=409)
+                return
+            self.buckets[bucket.get("id")] = bucket
+            self.send_json({"name": bucket.get("id")})
+            return
+
+        key = self._object_key()
+        if key is None:
+            self.send_empty(404)
+            return
+
+        data = self.read_body()
+        self.sleep_ms(self.upload_latency_ms)
+        with self.objects_lock:
+            self.objects[key] = (len(data), hashlib.sha256(data).hexdigest(), data if self.keep_bytes else None)
+        self.count("uploads")
+        self.count("uploaded_bytes", len(data))
+        self.send_json({"Key": "/".join(key)})
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Supabase Storage server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54329)
+    parser.add_argument("--upload-latency-ms", type=float, default=0.0)
+    parser.add_argument("--keep-bytes", action="store_true", help="Keep uploaded bytes so GET returns them")
+    args = parser.parse_args()
+
+    FakeStorageHandler.upload_latency_ms = args.upload_latency_ms
+    FakeStorageHandler.keep_bytes = args.keep_bytes
+    serve(FakeStorageHandler, args.host, args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Model affinity benchmark
+
+Runs the ingestion benchmark twice over the same mixed corpus (some documents
+image-heavy, some text-only) against a fake Ollama that keeps one model in
+VRAM and pays --swap-latency-ms per model load: once with the model affinity
+scheduler and once with OLLAMA_MODEL_AFFINITY=false. Prints wall time and the
+number of model loads of both runs.
+
+Needs the same Postgres as run_ingestion.py.
+
+Usage:
+    python test/benchmark/model_affinity.py --documents 10 --swap-latency-ms 3000 --output affinity.json
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+
+def run(args, affinity: bool, extra: List[str]) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = Path(tmp) / "report.json"
+        command = [
+            sys.executable, str(BENCHMARK_DIR / "run_ingestion.py"),
+            "--documents", str(args.documents),
+            "--pages", args.pages,
+            "--image-ratio", str(args.image_ratio),
+            "--concurrency", str(args.documents),
+            "--gpu-slots", str(args.gpu_slots),
+            "--swap-latency-ms", str(args.swap_latency_ms),
+            "--output", str(report_path),
+        ] + extra + ([] if affinity else ["--no-model-affinity"])
+        completed = subprocess.run(command)
+        if not report_path.exists():
+            raise RuntimeError(f"run_ingestion.py failed with exit code {completed.returncode}")
+        return json.loads(report_path.read_text())
+
+def summary(report: Dict[str, Any]) -> Dict[str, Any]:
+    results, ollama = report["results"], report["stub_requests"]["ollama"]
+    return {
+        "wall_seconds": results["wall_seconds"],
+        "document_seconds_p95": results["document_seconds_p95"],
+        "documents_failed": results["documents_failed"],
+        "model_loads": ollama.get("model_loads", 0),
+        "vision_calls": ollama.get("generate_vision", 0),
+        "embedding_calls": ollama.get("embeddings", 0),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Wall time with and without Ollama model affinity")
+    parser.add_argument("--documents", type=int, default=10, help="Documents, all processed concurrently")
+    parser.add_argument("--pages", type=str, default="10-40", help="Pages per document: N or MIN-MAX")
+    parser.add_argument("--image-ratio", type=float, default=0.3, help="Share of corpus pages with a diagram")
+    parser.add_argument("--gpu-slots", type=int, default=1, help="Models the fake Ollama keeps resident")
+    parser.add_argument("--swap-latency-ms", type=float, default=3000.0, help="Cost of loading a model")
+    parser.add_argument("--output", type=str, help="Write both summaries as JSON")
+    args, extra = parser.parse_known_args()
+
+    runs = {}
+    for name, affinity in (("with_affinity", True), ("without_affinity", False)):
+        print(f"▶️ Ingestion {name.replace('_', ' ')}", flush=True)
+        runs[name] = summary(run(args, affinity, extra))
+
+    with_, without = runs["with_affinity"], runs["without_affinity"]
+    print(f"\n{'':<22}{'with':>12}{'without':>12}")
+    for key in with_:
+        print(f"{key:<22}{with_[key]:>12}{without[key]:>12}")
+    if with_["wall_seconds"]:
+        print(f"\n⏱️ Speedup: {without['wall_seconds'] / with_['wall_seconds']:.2f}x, "
+              f"model loads {without['model_loads']} -> {with_['model_loads']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"config": vars(args), "extra_args": extra, **runs}, indent=2))
+    sys.exit(1 if with_["documents_failed"] or without["documents_failed"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Ollama pool routing check
+
+Starts three fake Ollama hosts and drives OllamaTransport over them the way
+ingestion does (a few documents in flight, each with sequential vision calls
+and a burst of embeddings):
+
+    fast    - 5 ms embeddings, all models
+    slow    - 40 ms embeddings, all models
+    embed   - 5 ms embeddings, embedding model only (no vision model)
+
+Checks that vision work never reaches the host without the vision model, that
+every document stays on one host per model, that the fast host takes more
+embeddings than the slow one (least outstanding requests), and - after the
+fast host is stopped halfway through a second round - that all calls still
+succeed and nothing is routed to the dead host once it is marked unhealthy.
+Exit code 1 when a check fails.
+
+Usage:
+    python test/benchmark/pool_routing.py
+    python test/benchmark/pool_routing.py --documents 40 --in-flight 8 --chunks 100 --output pool_routing.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCHMARK_DIR.parent.parent / "backend"
+sys.path.insert(0, str(BENCHMARK_DIR))
+sys.path.insert(0, str(BACKEND_DIR))
+
+from stub_server import start_stub
+
+logging.basicConfig(level=logging.WARNING, format="%(message)s")
+logger = logging.getLogger("krai.benchmark")
+logger.setLevel(logging.INFO)
+
+EMBED_MODEL = "embeddinggemma:latest"
+VISION_MODEL = "llava:7b"
+
+async def run_round(transport, args, offset: int = 0, halfway=None) -> Dict[str, int]:
+    """Process --documents fake documents, --in-flight at a time; `halfway` runs once half of them finished"""
+    outcome = Counter()
+    finished = 0
+    semaphore = asyncio.Semaphore(args.in_flight)
+
+    async def document(index: int):
+        async with semaphore:
+            await process(index)
+
+    async def process(index: int):
+        nonlocal finished
+        token = transport.pool.bind_document(f"doc-{index}")
+        try:
+            for image in range(args.images):
+                await transport.post("/api/generate", {"model": VISION_MODEL, "prompt": "describe", "images": ["x"]},
+                                     operation="vision", model=VISION_MODEL)
+            await asyncio.gather(*(
+                transport.post("/api/embeddings", {"model": EMBED_MODEL, "prompt": f"doc {index} chunk {chunk}"},
+                               operation="embed", model=EMBED_MODEL)
+                for chunk in range(args.chunks)
+            ))
+            outcome["succeeded"] += 1
+        except Exception as e:
+            logger.warning(f"   doc-{index} failed: {e}")
+            outcome["failed"] += 1
+        finally:
+            transport.pool.release_document(token)
+            finished += 1
+            if halfway and finished == args.documents // 2:
+                await halfway()
+
+    await asyncio.gather(*(document(index) for index in range(offset, offset + args.documents)))
+    return dict(outcome)
+
+async def run(args, hosts: Dict[str, Any]) -> Dict[str, Any]:
+    import ollama_pool
+    from ollama_transport import OllamaTransport
+
+    url_names = {stub.url: name for name, stub in hosts.items()}
+    transport = OllamaTransport([stub.url for stub in hosts.values()], retry_attempts=3, retry_delay=0.05,
+                                max_concurrency=args.concurrency, health_interval=0.5, backend_failure_threshold=3)
+    routes: List[Dict[str, Any]] = []
+
+    # Record every routing decision with the document it was made for
+    choose = transport.pool.choose
+    def recording_choose(model, exclude=()):
+        backend = choose(model, exclude)
+        routes.append({"document": ollama_pool._document_key.get(), "model": model,
+                       "host": url_names[backend.url], "retry": bool(exclude)})
+        return backend
+    transport.pool.choose = recording_choose
+
+    await transport.list_models()
+    transport.pool.start_health_checks()
+    checks = {}
+    try:
+        logger.info(f"▶️ Round 1: {args.documents} documents ({args.in_flight} in flight), all hosts up")
+        first = await run_round(transport, args)
+        first_routes = list(routes)
+
+        by_host = Counter((route["host"], route["model"]) for route in first_routes)
+        checks["no_vision_on_embed_only_host"] = by_host[("embed", VISION_MODEL)] == 0
+        hosts_per_document = defaultdict(set)
+        for route in first_routes:
+            hosts_per_document[(route["document"], route["model"])].add(route["host"])
+        checks["sticky_per_document_and_model"] = all(len(h) == 1 for h in hosts_per_document.values())
+        checks["fast_host_takes_more_embeddings"] = by_host[("fast", EMBED_MODEL)] > by_host[("slow", EMBED_MODEL)]
+        checks["round_1_all_succeeded"] = first.get("failed", 0) == 0
+
+        logger.info(f"▶️ Round 2: {args.documents} documents, fast host stopped halfway")
+        routes.clear()
+        stopped_at = {}
+
+        async def stop_fast():
+            hosts["fast"].stop()
+            stopped_at["route"] = len(routes)
+
+        second = await run_round(transport, args, offset=args.documents, halfway=stop_fast)
+        fast = next(b for b in transport.pool.backends if url_names[b.url] == "fast")
+        after_unhealthy = [route for route in routes[stopped_at.get("route", 0):]]
+        # Once enough failures marked it unhealthy, nothing else may go to the fast host
+        first_failover = next((i for i, route in enumerate(after_unhealthy) if route["retry"]), None)
+        late = after_unhealthy[first_failover + args.concurrency * 3:] if first_failover is not None else []
+        checks["round_2_all_succeeded"] = second.get("failed", 0) == 0
+        checks["dead_host_marked_unhealthy"] = not fast.healthy
+        checks["no_routes_to_dead_host"] = not any(route["host"] == "fast" for route in late)
+
+        return {
+            "round_1": {"documents": first, "routes": dict(Counter(f"{h}/{m}" for h, m in by_host.elements()))},
+            "round_2": {"documents": second,
+                        "routes": dict(Counter(f"{r['host']}/{r['model']}" for r in routes)),
+                        "retried_routes": sum(1 for r in routes if r["retry"])},
+            "pool": transport.pool.snapshot(),
+            "checks": checks,
+        }
+    finally:
+        await transport.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Routing checks for the multi-host Ollama pool")
+    parser.add_argument("--documents", type=int, default=24, help="Documents per round")
+    parser.add_argument("--in-flight", type=int, default=6, help="Documents processed concurrently")
+    parser.add_argument("--chunks", type=int, default=60, help="Embeddings per document")
+    parser.add_argument("--images", type=int, default=3, help="Vision calls per document")
+    parser.add_argument("--concurrency", type=int, default=4, help="OLLAMA_MAX_CONCURRENCY per host")
+    parser.add_argument("--output", type=str, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    hosts = {
+        "fast": start_stub("fake_ollama", ["--embed-latency-ms", "5", "--generate-latency-ms", "50"]),
+        "slow": start_stub("fake_ollama", ["--embed-latency-ms", "40", "--generate-latency-ms", "200"]),
+        "embed": start_stub("fake_ollama", ["--embed-latency-ms", "5", "--models", EMBED_MODEL]),
+    }
+    try:
+        report = asyncio.run(run(args, hosts))
+    finally:
+        for stub in hosts.values():
+            stub.stop()
+
+    for round_name in ("round_1", "round_2"):
+        logger.info(f"   {round_name}: {report[round_name]['documents']} {report[round_name]['routes']}")
+    for name, ok in report["checks"].items():
+        logger.info(f"   {'✅' if ok else '❌'} {name}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    sys.exit(0 if all(report["checks"].values()) else 1)
+
+if __name__ == "__main__":
+    main()
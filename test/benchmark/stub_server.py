@@ -0,0 +1,126 @@
+"""
+Minimal threaded JSON HTTP server shared by the fake Ollama and fake storage
+
+Each fake runs in its own process (see start_stub) so it never competes with
+the pipeline under test for the GIL or shows up in its RSS.
+"""
+
+import json
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+READY_PREFIX = "READY "
+
+class StubHandler(BaseHTTPRequestHandler):
+    """JSON helpers, per-route request counters and a GET /_stats endpoint"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "KRAIStub/1.0"
+    # Headers and body are separate writes; with Nagle on, keep-alive clients stall ~40 ms per response
+    disable_nagle_algorithm = True
+
+    # Shared by all handler threads of one server
+    stats: Counter = Counter()
+    stats_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def count(self, key: str, amount: int = 1):
+        with self.stats_lock:
+            self.stats[key] += amount
+
+    def read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def read_json(self) -> Dict[str, Any]:
+        body = self.read_body()
+        return json.loads(body) if body else {}
+
+    def send_json(self, payload: Any, status: int = 200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_empty(self, status: int):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def sleep_ms(self, latency_ms: float):
+        if latency_ms > 0:
+            time.sleep(latency_ms / 1000)
+
+    def handle_stats(self) -> bool:
+        if self.path != "/_stats":
+            return False
+        with self.stats_lock:
+            self.send_json(dict(self.stats))
+        return True
+
+def serve(handler_cls, host: str = "127.0.0.1", port: int = 0):
+    """Serve forever; prints "READY <url>" once listening so a parent can pick up the port"""
+    server = ThreadingHTTPServer((host, port), handler_cls)
+    server.daemon_threads = True
+    print(f"{READY_PREFIX}http://{host}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+class StubProcess:
+    """A fake server running as a child process"""
+
+    def __init__(self, script: Path, args: Optional[List[str]] = None, timeout: float = 15.0):
+        self.process = subprocess.Popen(
+            [sys.executable, str(script), "--port", "0"] + list(args or []),
+            stdout=subprocess.PIPE, text=True
+        )
+        self.url = None
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            line = self.process.stdout.readline()
+            if not line:
+                break
+            if line.startswith(READY_PREFIX):
+                self.url = line[len(READY_PREFIX):].strip()
+                break
+        if not self.url:
+            self.stop()
+            raise RuntimeError(f"{script.name} did not start")
+
+    def stats(self) -> Dict[str, Any]:
+        import urllib.request
+
+        with urllib.request.urlopen(f"{self.url}/_stats", timeout=5) as response:
+            return json.loads(response.read())
+
+    def stop(self):
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def __enter__(self) -> "StubProcess":
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def start_stub(name: str, args: Optional[List[str]] = None) -> StubProcess:
+    """Start fake_ollama / fake_storage from this package as a child process"""
+    return StubProcess(Path(__file__).parent / f"{name}.py", args)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark hybrid (full-text + vector) search against vector-only search
+
+Builds a query set from the error codes in config/error_code_patterns.json
+that actually occur in stored chunks. Ground truth for a code is every chunk
+whose text contains the code verbatim. Each query is run as a bare code and
+as "code + description" to exercise both the fast path and RRF fusion.
+
+Requires a populated database and a running Ollama instance:
+    cd backend && python ../test/scripts/benchmark_hybrid_search.py --k 10
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "backend"))
+
+from production_document_processor import ProductionDocumentProcessor
+from hybrid_search import SearchMode
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PATTERNS_PATH = Path(__file__).parent.parent.parent / "backend" / "config" / "error_code_patterns.json"
+
+async def build_query_set(db_pool, max_codes: int):
+    """Collect (query, relevant chunk ids) pairs for codes present in the corpus"""
+    with open(PATTERNS_PATH, 'r', encoding='utf-8') as f:
+        patterns = json.load(f)
+
+    queries = []
+    async with db_pool.acquire() as conn:
+        for manufacturer, settings in patterns["error_code_patterns"].items():
+            for example in settings.get("examples", []):
+                rows = await conn.fetch(
+                    "SELECT id FROM krai_intelligence.chunks WHERE position($1 in text_chunk) > 0",
+                    example["code"]
+                )
+                if not rows:
+                    continue
+
+                relevant = {str(row["id"]) for row in rows}
+                queries.append({"query": example["code"], "kind": "code_only", "relevant": relevant})
+                queries.append({
+                    "query": f"{example['code']} {example['description']}",
+                    "kind": "code_with_context",
+                    "relevant": relevant
+                })
+
+                if len(queries) >= max_codes * 2:
+                    return queries
+
+    return queries
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def run_mode(processor, queries, mode: SearchMode, k: int, repeats: int):
+    """Run every query in one mode and score recall@k, MRR and latency"""
+    latencies = []
+    recalls = []
+    reciprocal_ranks = []
+    fast_path_hits = 0
+
+    for item in queries:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            response = await processor.search_engine.search(item["query"], limit=k, mode=mode)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        returned = [result["chunk_id"] for result in response["results"]]
+        hits = [chunk_id for chunk_id in returned if chunk_id in item["relevant"]]
+        recalls.append(len(hits) / min(k, len(item["relevant"])))
+        first_hit = next((rank for rank, chunk_id in enumerate(returned, start=1)
+                          if chunk_id in item["relevant"]), None)
+        reciprocal_ranks.append(1.0 / first_hit if first_hit else 0.0)
+        fast_path_hits += 1 if response.get("fast_path") else 0
+
+    return {
+        "mode": mode.value,
+        "queries": len(queries),
+        f"recall_at_{k}": round(statistics.mean(recalls), 4) if recalls else 0.0,
+        "mrr": round(statistics.mean(reciprocal_ranks), 4) if reciprocal_ranks else 0.0,
+        "latency_ms_p50": round(percentile(latencies, 50), 2),
+        "latency_ms_p95": round(percentile(latencies, 95), 2),
+        "fast_path_queries": fast_path_hits
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Hybrid vs vector-only search benchmark")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument("--max-codes", type=int, default=50, help="Maximum error codes to sample")
+    parser.add_argument("--repeats", type=int, default=3, help="Latency repetitions per query")
+    parser.add_argument("--output", type=str, default="hybrid_search_benchmark.json", help="Report file")
+    args = parser.parse_args()
+
+    processor = ProductionDocumentProcessor()
+    await processor.initialize()
+
+    try:
+        queries = await build_query_set(processor.db_pool, args.max_codes)
+        if not queries:
+            logger.error("❌ No known error codes found in stored chunks - process some documents first")
+            return
+
+        logger.info(f"🔍 Benchmarking {len(queries)} queries (k={args.k})")
+
+        report = {"k": args.k, "results": {}}
+        for kind in ("code_only", "code_with_context"):
+            subset = [item for item in queries if item["kind"] == kind]
+            report["results"][kind] = [
+                await run_mode(processor, subset, mode, args.k, args.repeats)
+                for mode in (SearchMode.VECTOR, SearchMode.LEXICAL, SearchMode.HYBRID)
+            ]
+
+        for kind, rows in report["results"].items():
+            logger.info(f"📊 {kind}")
+            for row in rows:
+                logger.info(
+                    f"   {row['mode']:<8} recall@{args.k}={row[f'recall_at_{args.k}']:.3f} "
+                    f"mrr={row['mrr']:.3f} p50={row['latency_ms_p50']}ms p95={row['latency_ms_p95']}ms "
+                    f"fast_path={row['fast_path_queries']}"
+                )
+
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"✅ Report written to {args.output}")
+
+    finally:
+        await processor.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
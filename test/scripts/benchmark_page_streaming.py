@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for page-streaming PDF extraction
+
+Writes a synthetic PDF (default 5000 pages, one text block and one JPEG
+XObject per page) and measures peak RSS of three extraction strategies, each
+in a fresh interpreter so the high-water marks do not mix:
+
+    eager      - the previous behaviour: whole file in a BytesIO, every page's
+                 text and every image's bytes collected before returning
+    streaming  - pdf_pages.iter_pdf_pages over an mmap, images loaded one at a
+                 time and released (what the pipeline now does)
+    pipeline   - ProductionDocumentProcessor._extract_content_with_gpu over an
+                 mmap, then every ImageRef materialized one by one
+
+Usage:
+    python test/scripts/benchmark_page_streaming.py --pages 5000
+    python test/scripts/benchmark_page_streaming.py --pages 5000 --image-kb 64 --output page_streaming.json
+"""
+
+import argparse
+import json
+import logging
+import random
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return (peak if sys.platform == "darwin" else peak * 1024) / (1024 * 1024)
+
+def write_synthetic_pdf(path: Path, pages: int, image_kb: int, seed: int = 42):
+    """Minimal multi-page PDF writer (text + one DCT image per page), no third-party deps"""
+    rng = random.Random(seed)
+    offsets = []
+    # Object numbers: 1 catalog, 2 pages, 3 font, then per page: page, content, image
+    total_objects = 3 + pages * 3
+
+    with open(path, "wb") as f:
+        def write_object(number: int, body: bytes):
+            offsets.append((number, f.tell()))
+            f.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        kids = " ".join(f"{4 + i * 3} 0 R" for i in range(pages))
+        write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+        write_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+        for i in range(pages):
+            page_obj, content_obj, image_obj = 4 + i * 3, 5 + i * 3, 6 + i * 3
+            write_object(page_obj, (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                f"/Resources << /Font << /F1 3 0 R >> /XObject << /Im{i} {image_obj} 0 R >> >> "
+                f"/Contents {content_obj} 0 R >>"
+            ).encode())
+
+            lines = [f"Page {i + 1} - Error code C{rng.randint(1000, 9999)}: replace fuser unit "
+                     f"part {rng.randint(100000, 999999)}-{rng.randint(10, 99)}" for _ in range(20)]
+            text_ops = "".join(f"BT /F1 10 Tf 72 {740 - n * 14} Td ({line}) Tj ET\n" for n, line in enumerate(lines))
+            content = (text_ops + f"q 200 0 0 150 72 300 cm /Im{i} Do Q\n").encode()
+            write_object(content_obj, f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream")
+
+            # Opaque JPEG-sized payload: the extractor forwards DCT data without decoding it
+            image = b"\xff\xd8\xff\xe0" + rng.randbytes(image_kb * 1024) + b"\xff\xd9"
+            write_object(image_obj, (
+                f"<< /Type /XObject /Subtype /Image /Width 200 /Height 150 /ColorSpace /DeviceRGB "
+                f"/BitsPerComponent 8 /Filter /DCTDecode /Length {len(image)} >>\nstream\n"
+            ).encode() + image + b"\nendstream")
+
+        xref_offset = f.tell()
+        positions = dict(offsets)
+        f.write(f"xref\n0 {total_objects + 1}\n0000000000 65535 f \n".encode())
+        for number in range(1, total_objects + 1):
+            f.write(f"{positions[number]:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {total_objects + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+def run_eager(pdf_path: Path) -> dict:
+    """Previous extraction: full bytes in memory, all text and image bytes collected"""
+    import io
+    import PyPDF2
+
+    content = pdf_path.read_bytes()
+    reader = PyPDF2.PdfReader(io.BytesIO(content))
+    text_content, images = [], []
+    for page in reader.pages:
+        text_content.append(page.extract_text())
+        xobjects = page["/Resources"]["/XObject"].get_object()
+        for name in xobjects:
+            obj = xobjects[name].get_object()
+            if obj.get("/Subtype") == "/Image":
+                images.append(obj._data)
+    text = "\n".join(text_content)
+    return {"pages": len(reader.pages), "text_chars": len(text), "images": len(images),
+            "image_bytes": sum(len(image) for image in images)}
+
+def run_streaming(pdf_path: Path) -> dict:
+    """iter_pdf_pages over an mmap; image bytes loaded and dropped one at a time"""
+    from pdf_pages import iter_pdf_pages
+    from upload_spool import DocumentSource
+
+    source = DocumentSource.from_path(pdf_path)
+    pages = text_chars = image_count = image_bytes = 0
+    with source.open() as stream:
+        for page_no, text, image_refs in iter_pdf_pages(stream):
+            pages = page_no
+            text_chars += len(text)
+            for ref in image_refs:
+                image_count += 1
+                image_bytes += len(ref.load())
+    return {"pages": pages, "text_chars": text_chars, "images": image_count, "image_bytes": image_bytes}
+
+def run_pipeline(pdf_path: Path) -> dict:
+    """The processor's extraction step followed by one-by-one image loading"""
+    import asyncio
+    from production_document_processor import ProductionDocumentProcessor
+    from upload_spool import DocumentSource
+
+    processor = ProductionDocumentProcessor.__new__(ProductionDocumentProcessor)
+    source = DocumentSource.from_path(pdf_path)
+    with source.open() as stream:
+        result = asyncio.run(processor._extract_content_with_gpu(stream))
+        image_bytes = sum(len(ref.load()) for ref in result["images"])
+    return {"pages": result["pages"], "text_chars": len(result["text"]),
+            "images": len(result["images"]), "image_bytes": image_bytes}
+
+STRATEGIES = {"eager": run_eager, "streaming": run_streaming, "pipeline": run_pipeline}
+
+def child(strategy: str, pdf_path: Path):
+    """Run one strategy and print a JSON line (executed in a fresh interpreter)"""
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    result = STRATEGIES[strategy](pdf_path)
+    result.update({
+        "strategy": strategy,
+        "seconds": round(time.perf_counter() - start, 2),
+        "baseline_rss_mb": round(baseline, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    })
+    result["extraction_rss_mb"] = round(result["peak_rss_mb"] - baseline, 1)
+    print(json.dumps(result))
+
+def main():
+    parser = argparse.ArgumentParser(description="Page-streaming extraction memory benchmark")
+    parser.add_argument("--pages", type=int, default=5000, help="Pages in the synthetic PDF")
+    parser.add_argument("--image-kb", type=int, default=32, help="Image payload per page (KB)")
+    parser.add_argument("--pdf", type=str, default="synthetic_pages.pdf", help="Synthetic PDF path (reused if present)")
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES), choices=list(STRATEGIES))
+    parser.add_argument("--output", type=str, help="Write the report as JSON")
+    parser.add_argument("--child", choices=list(STRATEGIES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    pdf_path = Path(args.pdf)
+    if args.child:
+        child(args.child, pdf_path)
+        return
+
+    if not pdf_path.exists():
+        logger.info(f"📄 Writing {args.pages}-page synthetic PDF to {pdf_path}")
+        write_synthetic_pdf(pdf_path, args.pages, args.image_kb)
+    logger.info(f"📄 {pdf_path} ({pdf_path.stat().st_size / 1024 / 1024:.1f} MB)")
+
+    report = {"pdf": str(pdf_path), "file_size_mb": round(pdf_path.stat().st_size / 1024 / 1024, 1), "runs": []}
+    for strategy in args.strategies:
+        completed = subprocess.run(
+            [sys.executable, str(Path(__file__).resolve()), "--child", strategy, "--pdf", str(pdf_path.resolve())],
+            capture_output=True, text=True, cwd=str(BACKEND_DIR)
+        )
+        if completed.returncode != 0:
+            logger.error(f"❌ {strategy} failed:\n{completed.stderr[-2000:]}")
+            continue
+        run = json.loads(completed.stdout.strip().splitlines()[-1])
+        report["runs"].append(run)
+        logger.info(f"   {strategy:<10} peak={run['peak_rss_mb']} MB (+{run['extraction_rss_mb']} MB) "
+                    f"pages={run['pages']} images={run['images']} time={run['seconds']}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"✅ Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Load test for the processing status stream
+
+Opens N simultaneous status-monitor clients (default 200) against a running
+API and compares the event stream (SSE or WebSocket) with the old 2-second
+polling of /api/production/processing/status. While the clients are
+connected, a probe measures the latency of the polling endpoint, which takes
+the status manager lock, to show whether dashboards still contend for it.
+
+Usage:
+    python test/scripts/load_test_status_stream.py --clients 200 --mode sse
+    python test/scripts/load_test_status_stream.py --clients 200 --mode poll
+    python test/scripts/load_test_status_stream.py --upload test_documents/HP_E786_SM.pdf
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+from pathlib import Path
+
+import aiohttp
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STATUS_PATH = "/api/production/processing/status"
+EVENTS_PATH = "/api/production/processing/events"
+WEBSOCKET_PATH = "/ws/processing"
+UPLOAD_PATH = "/api/production/documents/upload"
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+class ClientStats:
+    """Per-run counters shared by all simulated clients"""
+
+    def __init__(self):
+        self.connected = 0
+        self.failed = 0
+        self.messages = 0
+        self.bytes_received = 0
+        self.time_to_snapshot = []
+        self.delivery_lag = []
+        self.request_latency = []
+
+    def record_batch(self, batch: dict):
+        self.messages += 1
+        if "timestamp" in batch:
+            self.delivery_lag.append((time.time() - batch["timestamp"]) * 1000)
+
+async def sse_client(session: aiohttp.ClientSession, base_url: str, stats: ClientStats, stop: asyncio.Event):
+    """Consume the Server-Sent Events stream until stopped"""
+    started = time.perf_counter()
+    try:
+        async with session.get(f"{base_url}{EVENTS_PATH}", timeout=aiohttp.ClientTimeout(total=None)) as response:
+            if response.status != 200:
+                stats.failed += 1
+                return
+            stats.connected += 1
+
+            event_type = None
+            while not stop.is_set():
+                try:
+                    line = await asyncio.wait_for(response.content.readline(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    continue
+                if not line:
+                    break
+
+                stats.bytes_received += len(line)
+                text = line.decode("utf-8").rstrip("\n")
+                if text.startswith("event: "):
+                    event_type = text[len("event: "):]
+                elif text.startswith("data: "):
+                    payload = json.loads(text[len("data: "):])
+                    if event_type == "snapshot":
+                        stats.time_to_snapshot.append((time.perf_counter() - started) * 1000)
+                    elif event_type == "delta":
+                        stats.record_batch(payload)
+    except Exception as e:
+        logger.debug(f"SSE client failed: {e}")
+        stats.failed += 1
+
+async def websocket_client(session: aiohttp.ClientSession, base_url: str, stats: ClientStats, stop: asyncio.Event):
+    """Consume the WebSocket stream until stopped"""
+    started = time.perf_counter()
+    ws_url = base_url.replace("http://", "ws://").replace("https://", "wss://") + WEBSOCKET_PATH
+    try:
+        async with session.ws_connect(ws_url) as ws:
+            stats.connected += 1
+            while not stop.is_set():
+                try:
+                    message = await asyncio.wait_for(ws.receive(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    continue
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    break
+
+                stats.bytes_received += len(message.data)
+                payload = json.loads(message.data)
+                if payload.get("type") == "snapshot":
+                    stats.time_to_snapshot.append((time.perf_counter() - started) * 1000)
+                elif payload.get("type") == "delta":
+                    stats.record_batch(payload)
+    except Exception as e:
+        logger.debug(f"WebSocket client failed: {e}")
+        stats.failed += 1
+
+async def polling_client(session: aiohttp.ClientSession, base_url: str, stats: ClientStats,
+                         stop: asyncio.Event, interval: float = 2.0):
+    """Reproduce the old dashboard: poll the full status every 2 seconds"""
+    stats.connected += 1
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            async with session.get(f"{base_url}{STATUS_PATH}") as response:
+                body = await response.read()
+                stats.bytes_received += len(body)
+                stats.messages += 1
+                stats.request_latency.append((time.perf_counter() - started) * 1000)
+        except Exception as e:
+            logger.debug(f"Polling client failed: {e}")
+            stats.failed += 1
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+async def status_probe(session: aiohttp.ClientSession, base_url: str, latencies: list, stop: asyncio.Event):
+    """Measure /processing/status latency once per second while the load runs"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            async with session.get(f"{base_url}{STATUS_PATH}") as response:
+                await response.read()
+                latencies.append((time.perf_counter() - started) * 1000)
+        except Exception as e:
+            logger.debug(f"Probe failed: {e}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            pass
+
+async def upload_document(session: aiohttp.ClientSession, base_url: str, path: Path):
+    """Upload a document so the stream has real stage transitions to deliver"""
+    data = aiohttp.FormData()
+    data.add_field("file", path.read_bytes(), filename=path.name, content_type="application/pdf")
+    async with session.post(f"{base_url}{UPLOAD_PATH}", data=data,
+                            timeout=aiohttp.ClientTimeout(total=None)) as response:
+        logger.info(f"📄 Upload of {path.name} finished with HTTP {response.status}")
+
+async def run_load_test(args) -> dict:
+    stats = ClientStats()
+    probe_latencies = []
+    stop = asyncio.Event()
+
+    client_fn = {"sse": sse_client, "ws": websocket_client, "poll": polling_client}[args.mode]
+    connector = aiohttp.TCPConnector(limit=0)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        clients = [asyncio.create_task(client_fn(session, args.base_url, stats, stop))
+                   for _ in range(args.clients)]
+        probe = asyncio.create_task(status_probe(session, args.base_url, probe_latencies, stop))
+
+        if args.upload:
+            asyncio.create_task(upload_document(session, args.base_url, Path(args.upload)))
+
+        await asyncio.sleep(args.duration)
+        stop.set()
+        await asyncio.gather(*clients, probe, return_exceptions=True)
+
+    return {
+        "mode": args.mode,
+        "clients": args.clients,
+        "duration_seconds": args.duration,
+        "connected": stats.connected,
+        "failed": stats.failed,
+        "messages_received": stats.messages,
+        "bytes_received": stats.bytes_received,
+        "bytes_per_client_per_second": round(stats.bytes_received / max(args.clients * args.duration, 1), 1),
+        "time_to_snapshot_ms_p50": round(percentile(stats.time_to_snapshot, 50), 2),
+        "time_to_snapshot_ms_p95": round(percentile(stats.time_to_snapshot, 95), 2),
+        "delivery_lag_ms_p50": round(percentile(stats.delivery_lag, 50), 2),
+        "delivery_lag_ms_p95": round(percentile(stats.delivery_lag, 95), 2),
+        "poll_latency_ms_p50": round(percentile(stats.request_latency, 50), 2),
+        "poll_latency_ms_p95": round(percentile(stats.request_latency, 95), 2),
+        "status_probe_ms_p50": round(percentile(probe_latencies, 50), 2),
+        "status_probe_ms_p95": round(percentile(probe_latencies, 95), 2),
+        "status_probe_ms_mean": round(statistics.mean(probe_latencies), 2) if probe_latencies else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Processing status stream load test")
+    parser.add_argument("--base-url", default="http://localhost:8001", help="API base URL")
+    parser.add_argument("--clients", type=int, default=200, help="Simultaneous monitor clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="Test duration in seconds")
+    parser.add_argument("--mode", choices=["sse", "ws", "poll"], default="sse", help="Client type")
+    parser.add_argument("--upload", type=str, help="Optional PDF to upload during the test")
+    parser.add_argument("--output", type=str, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    logger.info(f"🚀 {args.clients} {args.mode} clients for {args.duration:.0f}s against {args.base_url}")
+    report = asyncio.run(run_load_test(args))
+
+    for key, value in report.items():
+        logger.info(f"   {key}: {value}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"✅ Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()